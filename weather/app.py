@@ -1,18 +1,276 @@
+import io
+import json
+import os
+import sys
+import threading
+import time
+from typing import Optional
+
 from dotenv import load_dotenv
-from flask import Flask, jsonify, make_response, Response, request
+from flask import Blueprint, current_app, Flask, jsonify, make_response, redirect, Response, request
+
+# Load environment variables from .env file before the modules below read their settings
+load_dotenv()
 
-from weather.models.user_model import User
+from weather.models.alerts_model import AlertsModel
+from weather.models import favorites_model as favorites_module
 from weather.models.favorites_model import FavoritesModel
-from weather.utils.sql_utils import check_database_connection, check_table_exists
-from weather.models.user_model import User, create_user, get_all_users, update_password, update_username
+from weather.models.forecast_model import FORECAST_FIELDS, ForecastModel
+from weather.utils import sql_utils, write_queue_utils
+from weather.utils.cache_snapshot_utils import CacheSnapshotter
+from weather.utils.geocoding_utils import (
+    batch_get_latitude_longitude,
+    cached_location_names,
+    geocode_cache,
+    get_offline_geocoder,
+    normalize_location_name
+)
+from weather.utils.health_utils import HealthMonitor
+from weather.utils.idempotency_utils import idempotency_store, idempotent
+from weather.utils.profiling_utils import DEFAULT_HOT_MODULES, request_profiler
+from weather.utils.shared_cache_utils import SHARED_CACHE_PATH
+from weather.utils.stream_utils import (
+    STREAM_HEARTBEAT_SECONDS,
+    STREAM_PORT,
+    STREAM_QUEUE_SIZE,
+    STREAM_SERVER_URL,
+    ObservationFeed
+)
+from weather.utils.pubsub_utils import PubSubHub
+from weather.utils.quota_utils import quota_manager
+from weather.utils.record_utils import RecordJSONProvider
+from weather.utils.sql_trace_utils import sql_tracer
+from weather.utils.sql_utils import check_database_tables
+from weather.utils.suggest_utils import LocationSuggestIndex
+from weather.utils.transfer_utils import (
+    FORMATS,
+    IMPORT_CHUNK_SIZE,
+    decode_favorites,
+    encode_favorites,
+    export_favorites,
+    format_for_content_type,
+    import_favorites
+)
+from weather.utils.user_cache_utils import user_cache
+from weather.utils.weather_provider_utils import weather_backend, weather_cache
+from weather.models.user_model import create_user, get_all_users, update_password, update_username
+
+
+api = Blueprint('api', __name__)
+
+# Without a stream server (STREAM_PORT), each /api/stream subscriber holds a request
+# thread, so at most half of a worker's threads serve streams and the rest stay free
+STREAM_MAX_SUBSCRIBERS = int(os.getenv("STREAM_MAX_SUBSCRIBERS", str(max(1, int(os.getenv("WEB_THREADS", "8")) // 2))))
+
+# Seconds between background health check runs; probes are answered from the last run
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "10"))
+
+# Process-local state, created on first use after create_app has run in the worker
+db_path = None
+favorites_model = None
+forecast_model = None
+analytics_model = None
+alerts_model = None
+observation_hub = None
+observation_feed = None
+suggest_index = None
+health_monitor = None
+cache_snapshotter = None
+_init_lock = threading.Lock()
+
+# Set when the worker is asked to stop, so open streams end and let it exit
+draining = threading.Event()
+
+# Request threads that may be held by open streams at once
+_stream_slots = threading.BoundedSemaphore(STREAM_MAX_SUBSCRIBERS)
+
+
+def create_app(config: Optional[dict] = None) -> Flask:
+    """
+    Builds the application for the calling process.
 
-# Load environment variables from .env file
-load_dotenv()
+    Models, caches and worker pools are created on first use rather than
+    here, so a worker can answer its first request sooner. Under the
+    production server each worker calls this after it has been forked.
+
+    The weather and geocode caches are the exception: they are loaded from
+    the snapshot left by the previous process before the app is returned,
+    and snapshotted periodically from then on. When they live in the shared
+    cache file (SHARED_CACHE_PATH), that file already outlives the process
+    and no snapshot is kept.
+
+    Args:
+        config (dict, optional): Flask config overrides. DB_PATH selects the
+            database and defaults to the DB_PATH environment variable.
+            CACHE_SNAPSHOT_PATH is the cache snapshot file, next to the
+            database by default; set it empty to disable snapshots.
+
+    Returns:
+        Flask: The configured application.
+    """
+    global db_path, favorites_model, forecast_model, analytics_model, alerts_model, observation_hub, suggest_index
+    global health_monitor, cache_snapshotter, observation_feed
+
+    app = Flask(__name__)
+    # Serializes row records (favorites, users) without building a dict per row
+    app.json = RecordJSONProvider(app)
+    app.config['DB_PATH'] = os.getenv('DB_PATH', './db/user_catalog.db')
+    app.config['CACHE_SNAPSHOT_PATH'] = os.getenv('CACHE_SNAPSHOT_PATH')
+    app.config.update(config or {})
+    db_path = app.config['DB_PATH']
+    if app.config['CACHE_SNAPSHOT_PATH'] is None:
+        app.config['CACHE_SNAPSHOT_PATH'] = os.path.join(os.path.dirname(db_path), 'cache_snapshot.bin')
+    # user_model reaches the database through sql_utils, so point it at the same file
+    sql_utils.DB_PATH = db_path
+
+    favorites_model = forecast_model = analytics_model = alerts_model = observation_hub = suggest_index = None
+    if observation_feed is not None:
+        observation_feed.stop()
+        observation_feed = None
+    if health_monitor is not None:
+        health_monitor.stop()
+        health_monitor = None
+    draining.clear()
+
+    if cache_snapshotter is not None:
+        cache_snapshotter.stop()
+        cache_snapshotter = None
+    if app.config['CACHE_SNAPSHOT_PATH'] and not SHARED_CACHE_PATH:
+        # Warm caches before the first request, so a restart does not start with a burst of upstream calls
+        cache_snapshotter = CacheSnapshotter(app.config['CACHE_SNAPSHOT_PATH'])
+        cache_snapshotter.start()
+
+    app.register_blueprint(api)
+    request_profiler.install(app)
+    sql_tracer.install(app)
+    app.logger.info(f"Application created in process {os.getpid()} with database {db_path}")
+    return app
+
+
+def get_favorites_model() -> FavoritesModel:
+    """
+    Returns the favorites model, creating it on first use together with the
+    alert engine that listens to its observations and the stream hub.
+
+    The hub is fed from the database rather than by the model, so streams
+    served by this worker also receive observations recorded by the others.
+    """
+    global favorites_model, alerts_model, observation_hub, observation_feed
+    if favorites_model is None:
+        with _init_lock:
+            if favorites_model is None:
+                model = FavoritesModel(db_path)
+                hub = PubSubHub(max_queue=STREAM_QUEUE_SIZE)
+                feed = None
+                if not (STREAM_SERVER_URL or STREAM_PORT):
+                    feed = ObservationFeed(db_path, hub.publish)
+                    feed.start()
+                alerts = AlertsModel(db_path)
+                model.observations.add_listener(alerts.on_observation)
+                observation_hub, observation_feed, alerts_model = hub, feed, alerts
+                favorites_model = model
+    return favorites_model
+
+
+def get_observation_hub() -> PubSubHub:
+    """
+    Returns the hub fanning new observations out to /api/stream subscribers.
+    """
+    get_favorites_model()
+    return observation_hub
+
+
+def get_alerts_model() -> AlertsModel:
+    """
+    Returns the alert engine evaluating new observations.
+    """
+    get_favorites_model()
+    return alerts_model
+
+
+def get_health_monitor() -> HealthMonitor:
+    """
+    Returns the health monitor, running the first checks and starting its refresh thread on first use.
+    """
+    global health_monitor
+    if health_monitor is None:
+        with _init_lock:
+            if health_monitor is None:
+                monitor = HealthMonitor(interval=HEALTH_CHECK_INTERVAL)
+                monitor.add_check('database', lambda: check_database_tables(('users', 'user_favorites')))
+                for provider in filter(None, (weather_backend.primary, weather_backend.secondary)):
+                    monitor.add_check(f'upstream:{provider.name}', provider.check_health, critical=False)
+                monitor.start()
+                health_monitor = monitor
+    return health_monitor
+
+
+def get_forecast_model() -> ForecastModel:
+    """
+    Returns the forecast model, creating it on first use.
+    """
+    global forecast_model
+    if forecast_model is None:
+        with _init_lock:
+            if forecast_model is None:
+                forecast_model = ForecastModel(db_path)
+    return forecast_model
+
+
+def get_analytics_model() -> "AnalyticsModel":
+    """
+    Returns the analytics model, importing it (and numpy) on first use.
+    """
+    global analytics_model
+    if analytics_model is None:
+        with _init_lock:
+            if analytics_model is None:
+                from weather.models.analytics_model import AnalyticsModel
+                analytics_model = AnalyticsModel(db_path)
+    return analytics_model
 
-app = Flask(__name__)
 
+def shutdown_app() -> None:
+    """
+    Releases the process's resources before it exits.
 
-favorites_model = FavoritesModel('./db/user_catalog.db')
+    Open streams are closed, queued alert deliveries and database writes are
+    committed, the upstream fetch pools stop accepting work and the caches
+    are snapshotted for the next process.
+    """
+    draining.set()
+    if health_monitor is not None:
+        health_monitor.stop()
+    if observation_feed is not None:
+        observation_feed.stop()
+    if observation_hub is not None:
+        observation_hub.close_all()
+    if alerts_model is not None:
+        alerts_model.deliveries.stop()
+    write_queue_utils.stop_all()
+    favorites_module._fetch_executor.shutdown(wait=False)
+    weather_backend.shutdown()
+    weather_cache.shutdown()
+    if cache_snapshotter is not None:
+        cache_snapshotter.stop()
+
+
+def get_suggest_index() -> LocationSuggestIndex:
+    """
+    Returns the location suggestion index, building it from the favorites and the geocode cache on first use.
+    """
+    global suggest_index
+    if suggest_index is None:
+        # Created before taking _init_lock, which get_favorites_model takes itself
+        model = get_favorites_model()
+        with _init_lock:
+            if suggest_index is None:
+                index = LocationSuggestIndex()
+                index.add_many(model.get_location_popularity())
+                index.add_many((name, 0) for name in cached_location_names())
+                suggest_index = index
+                current_app.logger.info("Built location suggestion index with %d names", len(index))
+    return suggest_index
 
 
 ####################################################
@@ -21,42 +279,78 @@ favorites_model = FavoritesModel('./db/user_catalog.db')
 #
 ####################################################
 
-@app.route('/api/health', methods=['GET'])
+@api.route('/api/health', methods=['GET'])
+@api.route('/api/health/live', methods=['GET'])
 def healthcheck() -> Response:
     """
-    Health check route to verify the service is running.
+    Liveness route to verify the service process is running and answering requests.
 
     Returns:
         JSON response indicating the health status of the service.
     """
-    app.logger.info('Health check')
     return make_response(jsonify({'status': 'healthy'}), 200)
 
 
-@app.route('/api/db-check', methods=['GET'])
+@api.route('/api/health/ready', methods=['GET'])
+def readiness_check() -> Response:
+    """
+    Readiness route reporting whether the service can handle traffic.
+
+    Served from the results of the background health checks, so probes never
+    touch the database or upstream APIs themselves.
+
+    Returns:
+        JSON response with the status of every check and when it last ran.
+    Raises:
+        503 error if a critical check is failing or its result is out of date.
+    """
+    status = get_health_monitor().status()
+    return make_response(jsonify({'status': 'ready' if status['ready'] else 'not ready', **status}),
+                         200 if status['ready'] else 503)
+
+
+@api.route('/api/metrics', methods=['GET'])
+def get_metrics() -> Response:
+    """
+    Route to report in-process cache and write queue statistics.
+
+    Returns:
+        JSON response with size, hits, misses and hit rate of the user and geocode caches,
+        how weather reads were answered (fresh, stale, stale-if-error or loaded), the entries
+        last loaded from and saved to the cache snapshot,
+        the stored idempotent responses, per-route SQL totals with likely N+1 queries, and the
+        operations, batches and queue depth of each database write queue.
+    """
+    return make_response(jsonify({
+        'status': 'success',
+        'caches': {
+            'users': user_cache.stats(),
+            'geocode': geocode_cache.stats(),
+            'weather': weather_cache.stats()
+        },
+        'cache_snapshot': cache_snapshotter.stats() if cache_snapshotter is not None else None,
+        'idempotency': idempotency_store.stats(),
+        'sql': sql_tracer.stats(),
+        'write_queues': write_queue_utils.stats()
+    }), 200)
+
+
+@api.route('/api/db-check', methods=['GET'])
 def db_check() -> Response:
     """
-    Route to check if multiple database connections and their respective tables are functional.
+    Route to check that the database is reachable and its users and user_favorites tables exist.
+
+    Served from the most recent background database check.
 
     Returns:
         JSON response indicating the database health status.
     Raises:
-        404 error if there is an issue with the database.
+        503 error if there is an issue with the database.
     """
-
-    try:
-        app.logger.info("Checking database connection...")
-        check_database_connection()
-        app.logger.info("Database connection is OK.")
-        app.logger.info("Checking if users table exists...")
-        check_table_exists("users")
-        app.logger.info("users table exists.")
-        app.logger.info("Checking if user_favorites table exists...")
-        check_table_exists("user_favorites")
-        app.logger.info("user_favorites table exists.")
-        return make_response(jsonify({'database_status': 'healthy'}), 200)
-    except Exception as e:
-        return make_response(jsonify({'error': str(e)}), 404)
+    check = get_health_monitor().status('database')['checks'].get('database', {})
+    if check.get('ok'):
+        return make_response(jsonify({'database_status': 'healthy', 'age_seconds': check['age_seconds']}), 200)
+    return make_response(jsonify({'database_status': 'unhealthy', 'error': check.get('error')}), 503)
 
 
 ##########################################################
@@ -65,7 +359,8 @@ def db_check() -> Response:
 #
 ##########################################################
 
-@app.route('/api/create-user', methods=['POST'])
+@api.route('/api/create-user', methods=['POST'])
+@idempotent(idempotency_store)
 def add_user() -> Response:
     """
     Route to add a new user to the users.
@@ -83,7 +378,7 @@ def add_user() -> Response:
         400 error if input validation fails.
         500 error if there is an issue adding the user to db.
     """
-    app.logger.info('Adding a new user to the db')
+    current_app.logger.info('Adding a new user to the db')
     try:
         data = request.get_json()
 
@@ -96,15 +391,15 @@ def add_user() -> Response:
             return make_response(jsonify({'error': 'Invalid input, all fields are required with valid values'}), 400)
 
         # Add the user to the db
-        app.logger.info('Adding user: %s - %s', id, username)
+        current_app.logger.info('Adding user: %s - %s', id, username)
         create_user(id=id, username=username, email=email, password=password)
-        app.logger.info("User added to db: %s - %s", id, username)
+        current_app.logger.info("User added to db: %s - %s", id, username)
         return make_response(jsonify({'status': 'success', 'user': id}), 201)
     except Exception as e:
-        app.logger.error("Failed to add user: %s", str(e))
+        current_app.logger.error("Failed to add user: %s", str(e))
         return make_response(jsonify({'error': str(e)}), 500)
 
-@app.route('/api/get-all-users', methods=['GET'])
+@api.route('/api/get-all-users', methods=['GET'])
 def get_all_the_users() -> Response:
     """
     Route to retrieve all users in the db.
@@ -113,15 +408,16 @@ def get_all_the_users() -> Response:
         JSON response with the list of users or error message.
     """
     try:
-        app.logger.info("Retrieving all users from the db")
+        current_app.logger.info("Retrieving all users from the db")
         users = get_all_users()
 
         return jsonify({'status': 'success', 'Users': users}), 200
     except Exception as e:
-        app.logger.error(f"Error retrieving users: {e}")
+        current_app.logger.error(f"Error retrieving users: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/update-password', methods=['PUT'])
+@api.route('/api/update-password', methods=['PUT'])
+@idempotent(idempotency_store)
 def update_user_password() -> Response:
     """
     Route to update passwords 
@@ -139,7 +435,7 @@ def update_user_password() -> Response:
         500 error if there is a database error.
     """
     try:
-        app.logger.info("Received request to update password")
+        current_app.logger.info("Received request to update password")
         data = request.get_json()
 
         id = data.get('id')
@@ -149,21 +445,22 @@ def update_user_password() -> Response:
             return make_response(jsonify({'error': 'Invalid input. ID and new_password are required.'}), 400)
 
         # Call the update_password function
-        app.logger.info("Updating password for user with ID %d", id)
+        current_app.logger.info("Updating password for user with ID %d", id)
         try:
             update_password(id=id, new_password=new_password)
         except ValueError as ve:
-            app.logger.error(str(ve))
+            current_app.logger.error(str(ve))
             return make_response(jsonify({'error': str(ve)}), 404)
 
-        app.logger.info("Password updated successfully for user with ID %d", id)
+        current_app.logger.info("Password updated successfully for user with ID %d", id)
         return make_response(jsonify({'status': 'success', 'message': f'Password updated for user ID {id}'}), 200)
 
     except Exception as e:
-        app.logger.error("An unexpected error occurred: %s", str(e))
+        current_app.logger.error("An unexpected error occurred: %s", str(e))
         return make_response(jsonify({'error': 'An unexpected error occurred.', 'details': str(e)}), 500)
 
-@app.route('/api/update-username', methods=['PUT'])
+@api.route('/api/update-username', methods=['PUT'])
+@idempotent(idempotency_store)
 def update_user_username() -> Response:
     """
     Route to update usernames 
@@ -181,7 +478,7 @@ def update_user_username() -> Response:
         500 error if there is a database error.
     """
     try:
-        app.logger.info("Received request to update username")
+        current_app.logger.info("Received request to update username")
         data = request.get_json()
 
         id = data.get('id')
@@ -191,18 +488,18 @@ def update_user_username() -> Response:
             return make_response(jsonify({'error': 'Invalid input. ID and new_username are required.'}), 400)
 
         # Call the update_password function
-        app.logger.info("Updating password for user with ID %d", id)
+        current_app.logger.info("Updating password for user with ID %d", id)
         try:
             update_username(id=id, new_username=new_username)
         except ValueError as ve:
-            app.logger.error(str(ve))
+            current_app.logger.error(str(ve))
             return make_response(jsonify({'error': str(ve)}), 404)
 
-        app.logger.info("Username updated successfully for user with ID %d", id)
+        current_app.logger.info("Username updated successfully for user with ID %d", id)
         return make_response(jsonify({'status': 'success', 'message': f'Username updated for user ID {id}'}), 200)
 
     except Exception as e:
-        app.logger.error("An unexpected error occurred: %s", str(e))
+        current_app.logger.error("An unexpected error occurred: %s", str(e))
         return make_response(jsonify({'error': 'An unexpected error occurred.', 'details': str(e)}), 500)
 
 
@@ -214,7 +511,8 @@ def update_user_username() -> Response:
 
 
 
-@app.route('/api/add-favorite-location', methods=['POST'])
+@api.route('/api/add-favorite-location', methods=['POST'])
+@idempotent(idempotency_store)
 def add_favorite_location() -> Response:
     """
     Route to add favorite location
@@ -240,20 +538,23 @@ def add_favorite_location() -> Response:
             return jsonify({'error': 'User ID and location are required.'}), 400
 
         try:
-            favorites_model.get_user(user_id)  
-            favorites_model.add_favorite_location(user_id, location)
+            get_favorites_model().get_user(user_id)  
+            get_favorites_model().add_favorite_location(user_id, location)
         except ValueError as ve:
-            app.logger.error(f"Error adding favorite location: {ve}")
+            current_app.logger.error(f"Error adding favorite location: {ve}")
             return jsonify({'error': str(ve)}), 404
 
-        app.logger.info(f"Added favorite location {location} for user {user_id}")
+        if suggest_index is not None:
+            suggest_index.add(location['name'])
+
+        current_app.logger.info(f"Added favorite location {location} for user {user_id}")
         return jsonify({'status': 'success', 'message': 'Location added to favorites.'}), 201
 
     except Exception as e:
-        app.logger.error(f"Error adding favorite location: {e}")
+        current_app.logger.error(f"Error adding favorite location: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/remove-favorite-location', methods=['DELETE'])
+@api.route('/api/remove-favorite-location', methods=['DELETE'])
 def remove_favorite_location() -> Response:
     """
     Route to remove favorite location from user. 
@@ -277,17 +578,17 @@ def remove_favorite_location() -> Response:
         if not user_id or not location:
             return make_response(jsonify({'error': 'User ID and location are required.'}), 400)
 
-        favorites_model.remove_favorite_location(user_id, location)
+        get_favorites_model().remove_favorite_location(user_id, location)
 
-        app.logger.info(f"Removed favorite location {location} for user {user_id}")
+        current_app.logger.info(f"Removed favorite location {location} for user {user_id}")
         return make_response(jsonify({'status': 'success', 'message': 'Location removed from favorites.'}), 200)
 
     except Exception as e:
-        app.logger.error(f"Error removing favorite location: {e}")
+        current_app.logger.error(f"Error removing favorite location: {e}")
         return make_response(jsonify({'error': str(e)}), 500)
 
 
-@app.route('/api/get-favorite-locations/<int:user_id>', methods=['GET'])
+@api.route('/api/get-favorite-locations/<int:user_id>', methods=['GET'])
 def get_favorite_locations(user_id: int) -> Response:
     """
     Route to retrieve all favorite locations for a specific user.
@@ -302,17 +603,17 @@ def get_favorite_locations(user_id: int) -> Response:
         404 error if the user ID does not exist or has no favorite locations.
         500 error if there is an unexpected error."""
     try:
-        locations = favorites_model.get_favorite_locations(user_id)
+        locations = get_favorites_model().get_favorite_locations(user_id)
         return jsonify({'status': 'success', 'favorite_locations': locations}), 200
     except ValueError as ve:
-        app.logger.error(f"Error getting favorite locations: {ve}")
+        current_app.logger.error(f"Error getting favorite locations: {ve}")
         return jsonify({'error': str(ve)}), 404
     except Exception as e:
-        app.logger.error(f"Error getting favorite locations: {e}")
+        current_app.logger.error(f"Error getting favorite locations: {e}")
         return jsonify({'error': 'An unexpected error occurred.'}), 500
 
 
-@app.route('/api/get_favorites_length', methods=['GET'])
+@api.route('/api/get_favorites_length', methods=['GET'])
 def get_favorites_length() -> Response:
     """
     Route to retrieve all favorite locations for a specific user.
@@ -329,15 +630,16 @@ def get_favorites_length() -> Response:
     """
     
     try:
-        length = favorites_model.get_favorites_length()
+        length = get_favorites_model().get_favorites_length()
         return make_response(jsonify({'favorites_length': length}), 200)
 
     except Exception as e:
-        app.logger.error(f"Error getting favorites length: {e}")
+        current_app.logger.error(f"Error getting favorites length: {e}")
         return make_response(jsonify({'error': str(e)}), 500)
 
 
-@app.route('/api/update_weather_data/<int:user_id>', methods=['POST'])
+@api.route('/api/update_weather_data/<int:user_id>', methods=['POST'])
+@idempotent(idempotency_store)
 def update_weather_data(user_id) -> Response:
     """Route to update weather data for all favorite locations of a user.
     Args:
@@ -351,21 +653,143 @@ def update_weather_data(user_id) -> Response:
         500 error if there is an unexpected error during the weather data update.
     """
     try:
-        favorites_model.update_weather_data(user_id)
+        get_favorites_model().update_weather_data(user_id)
 
-        app.logger.info(f"Weather data updated for user {user_id}")
+        current_app.logger.info(f"Weather data updated for user {user_id}")
         return jsonify({'status': 'success', 'message': 'Weather data updated.'}), 200
 
     except ValueError as ve:
-        app.logger.error(f"Error updating weather data: {ve}")
+        current_app.logger.error(f"Error updating weather data: {ve}")
         return jsonify({'error': str(ve)}), 404
 
     except Exception as e:
-        app.logger.error(f"Error updating weather data: {e}")
+        current_app.logger.error(f"Error updating weather data: {e}")
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/check-if-empty', methods=['GET'])
+@api.route('/api/quota', methods=['GET'])
+def get_quota_usage() -> Response:
+    """
+    Route to report upstream API usage against each provider's limits.
+
+    Returns:
+        JSON response with, per provider, its limits, recent usage, remaining
+        budget and the projected epoch time the daily budget runs out (or null),
+        plus the weather backend's hedge delay and hedge counters.
+    """
+    return make_response(jsonify({
+        'status': 'success',
+        'providers': quota_manager.usage(),
+        'weather_backend': weather_backend.stats()
+    }), 200)
+
+
+@api.route('/api/admin/profile', methods=['GET'])
+def get_profile() -> Response:
+    """
+    Route to list the hottest functions of the profiled requests.
+
+    Query Parameters:
+        modules (str, optional): Comma-separated source files to report on.
+            Defaults to favorites_model.py, user_model.py and sql_utils.py.
+        endpoint (str, optional): Restricts the report to one route, e.g. api.add_favorite_location.
+        sort (str, optional): cumulative (default) or total.
+        limit (int, optional): The number of functions returned (default 20).
+
+    Returns:
+        JSON response with the profiled request count per route and, per function,
+        its calls and total and cumulative seconds.
+
+    Raises:
+        400 error if a parameter is invalid.
+    """
+    modules = request.args.get('modules')
+    try:
+        report = request_profiler.hot_functions(
+            modules=modules.split(',') if modules else DEFAULT_HOT_MODULES,
+            endpoint=request.args.get('endpoint'),
+            sort=request.args.get('sort', 'cumulative'),
+            limit=request.args.get('limit', 20, type=int)
+        )
+    except ValueError as e:
+        return make_response(jsonify({'error': str(e)}), 400)
+    return make_response(jsonify({
+        'status': 'success',
+        'enabled': request_profiler.enabled,
+        'sample_rate': request_profiler.sample_rate,
+        **report
+    }), 200)
+
+
+@api.route('/api/dashboard/<int:user_id>', methods=['GET'])
+def get_dashboard(user_id: int) -> Response:
+    """
+    Route to retrieve every favorite location of a user with its latest weather in one call.
+
+    Weather that expired recently is returned at once and refreshed in the
+    background. Missing or older weather is fetched concurrently within a latency
+    budget; entries that could not be refreshed in time, or whose fetch failed,
+    are returned with their last weather and "stale": true.
+
+    Args:
+        user_id (int): The ID of the user whose dashboard is retrieved.
+
+    Query Parameters:
+        max_age (int, optional): Seconds after which weather is refreshed. Defaults to WEATHER_MAX_AGE (1800).
+        budget_ms (int, optional): Milliseconds to wait for upstream fetches. Defaults to 2000.
+
+    Returns:
+        JSON response with the list of favorites and their weather.
+
+    Raises:
+        400 error if input validation fails.
+        500 error if there is an unexpected error.
+    """
+    try:
+        max_age = request.args.get('max_age', int(weather_cache.max_age), type=int)
+        budget_ms = request.args.get('budget_ms', 2000, type=int)
+
+        if max_age is None or max_age < 0 or budget_ms is None or not 0 <= budget_ms <= 10000:
+            return make_response(jsonify({'error': 'max_age must be non-negative and budget_ms between 0 and 10000.'}), 400)
+
+        favorites = get_favorites_model().get_dashboard(user_id, max_age=max_age, budget=budget_ms / 1000)
+        return make_response(jsonify({'status': 'success', 'favorites': favorites}), 200)
+
+    except Exception as e:
+        current_app.logger.error(f"Error getting dashboard: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+
+@api.route('/api/favorites/<int:user_id>/summary', methods=['GET'])
+def get_favorites_summary(user_id: int) -> Response:
+    """
+    Route to summarize the latest weather across a user's favorite locations.
+
+    Args:
+        user_id (int): The ID of the user whose favorites are summarized.
+
+    Returns:
+        JSON response with the warmest, coldest and windiest favorites and the
+        averages across them, in metric and imperial units.
+
+    Raises:
+        404 error if none of the user's favorites has a weather reading yet.
+        500 error if there is an unexpected error.
+    """
+    try:
+        summary = get_analytics_model().summarize_user(user_id)
+        return make_response(jsonify({'status': 'success', 'summary': summary}), 200)
+
+    except ValueError as ve:
+        current_app.logger.error(f"Error summarizing favorites: {ve}")
+        return make_response(jsonify({'error': str(ve)}), 404)
+
+    except Exception as e:
+        current_app.logger.error(f"Error summarizing favorites: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+
+@api.route('/api/check-if-empty', methods=['GET'])
 def check_if_empty() -> Response:
     """
     Route to check if there are any favorite locations across all users.
@@ -376,13 +800,579 @@ def check_if_empty() -> Response:
         500 error if there is an unexpected error during the check.
     """
     try:
-        favorites_model.check_if_empty()
+        get_favorites_model().check_if_empty()
         return make_response(jsonify({'status': 'success', 'message': 'Favorites are not empty.'}), 200)
 
     except Exception as e:
-        app.logger.error(f"Error checking if empty: {e}")
+        current_app.logger.error(f"Error checking if empty: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+
+@api.route('/api/stream/<int:user_id>', methods=['GET'])
+def stream_weather_updates(user_id: int) -> Response:
+    """
+    Route to stream new weather observations for a user's favorite locations as Server-Sent Events.
+
+    Each observation is sent as an "observation" event. A comment line is sent
+    as a keepalive whenever no event arrived within the heartbeat interval. If
+    a client falls behind, its oldest queued events are dropped.
+
+    When a stream server runs (STREAM_PORT or STREAM_SERVER_URL is set), the
+    client is redirected to it, so idle streams hold no request thread.
+    Otherwise each stream holds one of this worker's request threads, and at
+    most STREAM_MAX_SUBSCRIBERS are open at once.
+
+    Args:
+        user_id (int): The ID of the user whose favorites are streamed.
+
+    Returns:
+        A text/event-stream response, or a 307 redirect to the stream server.
+
+    Raises:
+        404 error if the user has no favorite locations.
+        503 error if the maximum number of streams is already open.
+        500 error if there is an unexpected error.
+    """
+    if STREAM_SERVER_URL or STREAM_PORT:
+        base = STREAM_SERVER_URL or f"{request.scheme}://{request.host.rsplit(':', 1)[0]}:{STREAM_PORT}"
+        return redirect(f"{base.rstrip('/')}/api/stream/{user_id}", code=307)
+
+    if not _stream_slots.acquire(blocking=False):
+        return make_response(jsonify({'error': 'Too many open streams, retry later.'}), 503)
+    try:
+        locations = get_favorites_model().get_favorite_locations(user_id)
+        if not locations:
+            _stream_slots.release()
+            return make_response(jsonify({'error': f'No favorite locations found for user {user_id}'}), 404)
+
+        subscription = get_observation_hub().subscribe(location['name'] for location in locations)
+        logger = current_app.logger
+        logger.info(f"Opened weather stream for user {user_id}")
+
+        def generate():
+            yield f"retry: {int(STREAM_HEARTBEAT_SECONDS * 1000)}\n\n"
+            while not subscription.closed and not draining.is_set():
+                events = subscription.get(timeout=STREAM_HEARTBEAT_SECONDS)
+                if not events:
+                    yield ": keepalive\n\n"
+                for event in events:
+                    yield f"event: observation\ndata: {json.dumps(event)}\n\n"
+
+        def close():
+            # Runs when the response is closed, whether or not the generator ever started
+            subscription.close()
+            _stream_slots.release()
+            logger.info(f"Closed weather stream for user {user_id}")
+
+        response = Response(generate(), mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+        response.call_on_close(close)
+        return response
+
+    except Exception as e:
+        _stream_slots.release()
+        current_app.logger.error(f"Error opening weather stream: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+
+############################################################
+#
+# Favorites Transfer
+#
+############################################################
+
+
+@api.route('/api/export-favorites', methods=['GET'])
+def export_favorites_route() -> Response:
+    """
+    Route to stream the favorites of all users, or of selected users, as NDJSON or CSV.
+
+    Rows are read from the database in batches while the response is sent,
+    so exports of any size use constant memory.
+
+    Query Parameters:
+        format (str, optional): ndjson (default) or csv.
+        user_ids (str, optional): Comma-separated user IDs; all users when omitted.
+
+    Returns:
+        A streamed application/x-ndjson or text/csv response.
+
+    Raises:
+        400 error if input validation fails.
+        500 error if there is an unexpected error.
+    """
+    try:
+        fmt = request.args.get('format', 'ndjson')
+        if fmt not in FORMATS:
+            return make_response(jsonify({'error': f"format must be one of {', '.join(FORMATS)}."}), 400)
+
+        user_ids = None
+        if request.args.get('user_ids'):
+            try:
+                user_ids = [int(user_id) for user_id in request.args['user_ids'].split(',')]
+            except ValueError:
+                return make_response(jsonify({'error': 'user_ids must be comma-separated integers.'}), 400)
+            if any(user_id <= 0 for user_id in user_ids):
+                return make_response(jsonify({'error': 'user_ids must be positive.'}), 400)
+
+        current_app.logger.info(f"Exporting favorites as {fmt} for {'all users' if user_ids is None else user_ids}")
+        return Response(encode_favorites(export_favorites(db_path, user_ids), fmt), mimetype=FORMATS[fmt],
+                        headers={'Content-Disposition': f'attachment; filename=favorites.{fmt}'})
+
+    except Exception as e:
+        current_app.logger.error(f"Error exporting favorites: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+
+# Not idempotent: replaying it would mean hashing, and so buffering, the whole upload
+@api.route('/api/import-favorites', methods=['POST'])
+def import_favorites_route() -> Response:
+    """
+    Route to import favorites from a streamed NDJSON or CSV request body.
+
+    The body is parsed while it is read and written in transactions of
+    chunk_size rows, so imports of any size use constant memory. Favorites
+    of users that do not exist are skipped. If a line is invalid, the chunks
+    committed before it stay imported.
+
+    Query Parameters:
+        format (str, optional): ndjson or csv; defaults to the Content-Type
+            (application/x-ndjson or text/csv), otherwise ndjson.
+        chunk_size (int, optional): The favorites written per transaction.
+
+    Returns:
+        JSON response with the rows read, imported and skipped.
+
+    Raises:
+        400 error if input validation fails or a line is invalid.
+        500 error if there is an unexpected error.
+    """
+    global suggest_index
+    try:
+        fmt = request.args.get('format') or format_for_content_type(request.content_type)
+        chunk_size = request.args.get('chunk_size', IMPORT_CHUNK_SIZE, type=int)
+        if fmt not in FORMATS:
+            return make_response(jsonify({'error': f"format must be one of {', '.join(FORMATS)}."}), 400)
+        if not chunk_size or chunk_size <= 0:
+            return make_response(jsonify({'error': 'chunk_size must be a positive integer.'}), 400)
+
+        lines = io.TextIOWrapper(io.BufferedReader(request.stream), encoding='utf-8', newline='')
+        try:
+            counts = import_favorites(db_path, decode_favorites(lines, fmt), chunk_size=chunk_size)
+        except ValueError as ve:
+            current_app.logger.error(f"Error importing favorites: {ve}")
+            return make_response(jsonify({'error': str(ve)}), 400)
+
+        # Rebuilt with the imported names on next use
+        suggest_index = None
+        current_app.logger.info(f"Imported favorites: {counts}")
+        return make_response(jsonify({'status': 'success', **counts}), 200)
+
+    except Exception as e:
+        current_app.logger.error(f"Error importing favorites: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+
+############################################################
+#
+# Alerts
+#
+############################################################
+
+
+@api.route('/api/alerts', methods=['POST'])
+@idempotent(idempotency_store)
+def create_alert() -> Response:
+    """
+    Route to create a weather alert rule for one of a user's favorite locations.
+
+    Expected JSON Input:
+        user_id (int): The ID of the user creating the rule.
+        location (str): The name of the favorite location to watch.
+        metric (str): The observation field to compare, e.g. temp_c.
+        operator (str): "<" or ">".
+        threshold (float): The value to compare against.
+
+    Returns:
+        JSON response with the created rule.
+
+    Raises:
+        400 error if input validation fails.
+        404 error if the user ID does not exist.
+        500 error if there is an unexpected error.
+    """
+    try:
+        data = request.get_json()
+        user_id = data.get('user_id')
+        location = data.get('location')
+
+        if not user_id or not location or 'threshold' not in data:
+            return make_response(jsonify({'error': 'user_id, location, metric, operator and threshold are required.'}), 400)
+
+        try:
+            get_favorites_model().get_user(user_id)
+        except ValueError as ve:
+            return make_response(jsonify({'error': str(ve)}), 404)
+
+        try:
+            rule = get_alerts_model().create_rule(user_id, location, data.get('metric'), data.get('operator'), data.get('threshold'))
+        except ValueError as ve:
+            return make_response(jsonify({'error': str(ve)}), 400)
+
+        return make_response(jsonify({'status': 'success', 'rule': rule}), 201)
+
+    except Exception as e:
+        current_app.logger.error(f"Error creating alert rule: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+
+@api.route('/api/alerts/<int:user_id>', methods=['GET'])
+def get_alerts(user_id: int) -> Response:
+    """
+    Route to retrieve a user's alert rules and most recent triggered alerts.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        JSON response with the rules and the recent alerts, newest first.
+
+    Raises:
+        500 error if there is an unexpected error.
+    """
+    try:
+        return make_response(jsonify({
+            'status': 'success',
+            'rules': get_alerts_model().get_rules(user_id),
+            'alerts': get_alerts_model().get_events(user_id),
+        }), 200)
+
+    except Exception as e:
+        current_app.logger.error(f"Error getting alerts: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+
+@api.route('/api/alerts/<int:rule_id>', methods=['DELETE'])
+def delete_alert(rule_id: int) -> Response:
+    """
+    Route to delete one of a user's alert rules.
+
+    Expected JSON Input:
+        user_id (int): The ID of the user owning the rule.
+
+    Returns:
+        JSON response indicating success of the deletion.
+
+    Raises:
+        400 error if input validation fails.
+        404 error if the user has no rule with that ID.
+        500 error if there is an unexpected error.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        user_id = data.get('user_id')
+
+        if not user_id:
+            return make_response(jsonify({'error': 'user_id is required.'}), 400)
+
+        try:
+            get_alerts_model().delete_rule(user_id, rule_id)
+        except ValueError as ve:
+            return make_response(jsonify({'error': str(ve)}), 404)
+
+        return make_response(jsonify({'status': 'success', 'message': f'Alert rule {rule_id} deleted.'}), 200)
+
+    except Exception as e:
+        current_app.logger.error(f"Error deleting alert rule: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+
+############################################################
+#
+# Weather History
+#
+############################################################
+
+
+@api.route('/api/history/<int:user_id>', methods=['GET'])
+def get_weather_history(user_id: int) -> Response:
+    """
+    Route to retrieve the observation history of a user's favorite locations.
+
+    Short ranges are served from raw observations, longer ones from the hourly
+    or daily rollups, so the amount of data read stays bounded.
+
+    Args:
+        user_id (int): The ID of the user whose history is retrieved.
+
+    Query Parameters:
+        start (int, optional): Epoch seconds the range starts at. Defaults to 24 hours before end.
+        end (int, optional): Epoch seconds the range ends at. Defaults to now.
+        resolution (str, optional): raw, hour or day. Defaults to the resolution fitting the range.
+
+    Returns:
+        JSON response with the resolution used and the points of each location.
+
+    Raises:
+        400 error if input validation fails.
+        500 error if there is an unexpected error.
+    """
+    try:
+        end = request.args.get('end', int(time.time()), type=int)
+        start = request.args.get('start', end - 24 * 3600, type=int)
+        resolution = request.args.get('resolution')
+
+        try:
+            history = get_favorites_model().observations.get_history(user_id, start, end, resolution)
+        except ValueError as ve:
+            return make_response(jsonify({'error': str(ve)}), 400)
+
+        return make_response(jsonify({'status': 'success', **history}), 200)
+
+    except Exception as e:
+        current_app.logger.error(f"Error getting weather history: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+
+@api.route('/api/rollups/run', methods=['POST'])
+@idempotent(idempotency_store)
+def run_rollups() -> Response:
+    """
+    Route to aggregate new observations into the hourly and daily rollups and apply retention.
+
+    Returns:
+        JSON response with the number of observations processed and rows deleted.
+
+    Raises:
+        500 error if there is an unexpected error.
+    """
+    try:
+        processed = get_favorites_model().observations.run_rollups()
+        deleted = get_favorites_model().observations.apply_retention()
+        current_app.logger.info(f"Rolled up {processed} observations, retention: {deleted}")
+        return make_response(jsonify({'status': 'success', 'processed': processed, **deleted}), 200)
+
+    except Exception as e:
+        current_app.logger.error(f"Error running rollups: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+
+############################################################
+#
+# Forecasts
+#
+############################################################
+
+
+@api.route('/api/forecast/refresh/<int:user_id>', methods=['POST'])
+@idempotent(idempotency_store)
+def refresh_forecasts(user_id: int) -> Response:
+    """
+    Route to fetch and store the hourly forecast for every favorite location of a user.
+
+    Args:
+        user_id (int): The ID of the user whose forecasts should be refreshed.
+
+    Expected JSON Input (optional):
+        days (int): The number of forecast days to fetch (1-14). Defaults to 3.
+
+    Returns:
+        JSON response with the number of locations whose forecast was stored.
+
+    Raises:
+        400 error if input validation fails.
+        404 error if the user has no geocoded favorite locations.
+        500 error if there is an unexpected error.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        days = data.get('days', 3)
+
+        if not isinstance(days, int) or not 1 <= days <= 14:
+            return make_response(jsonify({'error': 'days must be an integer between 1 and 14.'}), 400)
+
+        stored = get_forecast_model().refresh_user_forecasts(user_id, days=days)
+        current_app.logger.info(f"Refreshed forecasts for {stored} locations of user {user_id}")
+        return make_response(jsonify({'status': 'success', 'locations_updated': stored}), 200)
+
+    except ValueError as ve:
+        current_app.logger.error(f"Error refreshing forecasts: {ve}")
+        return make_response(jsonify({'error': str(ve)}), 404)
+
+    except Exception as e:
+        current_app.logger.error(f"Error refreshing forecasts: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+
+@api.route('/api/forecast/<int:user_id>', methods=['GET'])
+def get_forecast(user_id: int) -> Response:
+    """
+    Route to retrieve a time window of the stored hourly forecasts for a user's favorite locations.
+
+    Args:
+        user_id (int): The ID of the user whose forecasts are retrieved.
+
+    Query Parameters:
+        start (int, optional): Epoch seconds the window starts at. Defaults to now.
+        end (int, optional): Epoch seconds the window ends at. Defaults to 24 hours after start.
+        fields (str, optional): Comma-separated forecast fields. Defaults to all fields.
+
+    Returns:
+        JSON response with one entry per location holding one list of values per field.
+
+    Raises:
+        400 error if input validation fails.
+        500 error if there is an unexpected error.
+    """
+    try:
+        start = request.args.get('start', int(time.time()), type=int)
+        end = request.args.get('end', start + 24 * 3600, type=int)
+        fields = request.args.get('fields')
+        fields = [field.strip() for field in fields.split(',')] if fields else list(FORECAST_FIELDS)
+
+        try:
+            forecasts = get_forecast_model().get_forecast_window(user_id, start, end, fields)
+        except ValueError as ve:
+            return make_response(jsonify({'error': str(ve)}), 400)
+
+        return make_response(jsonify({'status': 'success', 'forecasts': forecasts}), 200)
+
+    except Exception as e:
+        current_app.logger.error(f"Error getting forecasts: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+
+############################################################
+#
+# Geocoding
+#
+############################################################
+
+
+@api.route('/api/geocode-batch', methods=['POST'])
+@idempotent(idempotency_store)
+def geocode_batch() -> Response:
+    """
+    Route to resolve coordinates for many location names in one request.
+
+    Expected JSON Input:
+        locations (list[str]): The location names to geocode.
+
+    Returns:
+        JSON response mapping each location name to its coordinates, or null if it could not be resolved.
+
+    Raises:
+        400 error if input validation fails.
+        500 error if there is an unexpected error.
+    """
+    try:
+        data = request.get_json()
+        locations = data.get('locations') if data else None
+
+        if not isinstance(locations, list) or not locations or not all(isinstance(loc, str) for loc in locations):
+            return make_response(jsonify({'error': 'locations must be a non-empty list of names.'}), 400)
+
+        current_app.logger.info("Geocoding %d locations", len(locations))
+        coordinates = batch_get_latitude_longitude(locations)
+        if suggest_index is not None:
+            for name, coords in coordinates.items():
+                if coords:
+                    suggest_index.add(name, popularity=0)
+        results = {
+            name: {'lat': coords[0], 'lon': coords[1]} if coords else None
+            for name, coords in coordinates.items()
+        }
+        return make_response(jsonify({'status': 'success', 'results': results}), 200)
+
+    except Exception as e:
+        current_app.logger.error(f"Error geocoding locations: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+
+@api.route('/api/backfill-coordinates', methods=['POST'])
+@idempotent(idempotency_store)
+def backfill_coordinates() -> Response:
+    """
+    Route to fill in missing coordinates for every favorite location.
+
+    Expected JSON Input (optional):
+        chunk_size (int): The number of location names updated per transaction.
+
+    Returns:
+        JSON response with the number of locations resolved and rows updated.
+
+    Raises:
+        400 error if input validation fails.
+        500 error if there is an unexpected error.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        chunk_size = data.get('chunk_size', 500)
+
+        if not isinstance(chunk_size, int) or chunk_size <= 0:
+            return make_response(jsonify({'error': 'chunk_size must be a positive integer.'}), 400)
+
+        stats = get_favorites_model().backfill_coordinates(chunk_size=chunk_size)
+        current_app.logger.info(f"Backfilled coordinates: {stats}")
+        return make_response(jsonify({'status': 'success', **stats}), 200)
+
+    except Exception as e:
+        current_app.logger.error(f"Error backfilling coordinates: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+
+@api.route('/api/locations/suggest', methods=['GET'])
+def suggest_locations() -> Response:
+    """
+    Route to suggest location names matching what the user has typed so far.
+
+    Query Parameters:
+        q (str): The prefix typed by the user.
+        limit (int, optional): The maximum number of suggestions. Defaults to 10.
+
+    Returns:
+        JSON response with suggestions ranked by how many favorites use them,
+        followed by matches from the offline gazetteer when one is configured.
+
+    Raises:
+        400 error if input validation fails.
+        500 error if there is an unexpected error.
+    """
+    try:
+        prefix = request.args.get('q', '').strip()
+        limit = request.args.get('limit', 10, type=int)
+
+        if not prefix or not limit or limit <= 0 or limit > 50:
+            return make_response(jsonify({'error': 'q is required and limit must be between 1 and 50.'}), 400)
+
+        suggestions = get_suggest_index().suggest(prefix, limit)
+
+        gazetteer = get_offline_geocoder()
+        if gazetteer is not None and len(suggestions) < limit:
+            seen = {normalize_location_name(suggestion['name']) for suggestion in suggestions}
+            for name, lat, lon, population in gazetteer.search_prefix(prefix, limit):
+                if len(suggestions) >= limit:
+                    break
+                if name not in seen:
+                    suggestions.append({'name': name, 'popularity': 0, 'lat': lat, 'lon': lon})
+
+        return make_response(jsonify({'status': 'success', 'suggestions': suggestions}), 200)
+
+    except Exception as e:
+        current_app.logger.error(f"Error suggesting locations: {e}")
         return make_response(jsonify({'error': str(e)}), 500)
 
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    if '--profile-startup' in sys.argv:
+        # Reports import, app creation and first-use timings instead of serving
+        from weather.utils.startup_utils import profile_startup
+        profile_startup(create_app, {
+            'favorites_model': get_favorites_model,
+            'forecast_model': get_forecast_model,
+            'analytics_model': get_analytics_model,
+            'suggest_index': get_suggest_index,
+        }, cwd=os.path.dirname(os.path.abspath(__file__)))
+    else:
+        # Development server; production runs `gunicorn -c gunicorn.conf.py "app:create_app()"`
+        create_app().run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,67 @@
+## Memory and time per row when fetching favorites as dicts versus slotted records,
+## and the time to serialize each to JSON through the app's JSON provider.
+## Run from the weather directory: python -m benchmarks.row_memory [rows]
+
+import gc
+import sqlite3
+import sys
+import time
+import tracemalloc
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from weather.models.favorites_model import FavoriteLocation
+from weather.utils.record_utils import RecordJSONProvider
+
+
+def build_database(rows: int) -> sqlite3.Connection:
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE user_favorites (user_id INTEGER, location_name TEXT, latitude REAL, longitude REAL)")
+    conn.executemany("INSERT INTO user_favorites VALUES (1, ?, ?, ?)",
+                     ((f"City {i % 5000}", i * 1e-6, -i * 1e-6) for i in range(rows)))
+    return conn
+
+
+def fetch_dicts(conn: sqlite3.Connection) -> list:
+    conn.row_factory = None
+    rows = conn.execute("SELECT location_name, latitude, longitude FROM user_favorites").fetchall()
+    return [{"name": row[0], "lat": row[1], "lon": row[2]} for row in rows]
+
+
+def fetch_records(conn: sqlite3.Connection) -> list:
+    conn.row_factory = FavoriteLocation.row_factory
+    return conn.execute("SELECT location_name, latitude, longitude FROM user_favorites").fetchall()
+
+
+def measure(name: str, fetch, conn: sqlite3.Connection, rows: int) -> None:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fetch(conn)
+    elapsed = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<8} retained {retained / rows:7.1f} B/row   peak {peak / rows:7.1f} B/row   {elapsed:6.2f} s")
+    del result
+
+
+def measure_dumps(name: str, provider: DefaultJSONProvider, payload: list) -> None:
+    gc.collect()
+    start = time.perf_counter()
+    provider.dumps({"favorites": payload})
+    print(f"{name:<24} {time.perf_counter() - start:6.2f} s")
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    conn = build_database(rows)
+    print(f"Fetching {rows} rows")
+    measure("dicts", fetch_dicts, conn, rows)
+    measure("records", fetch_records, conn, rows)
+
+    app = Flask(__name__)
+    print("Serializing")
+    measure_dumps("dicts, default provider", DefaultJSONProvider(app), fetch_dicts(conn))
+    measure_dumps("dicts, record provider", RecordJSONProvider(app), fetch_dicts(conn))
+    measure_dumps("records, record provider", RecordJSONProvider(app), fetch_records(conn))
@@ -13,5 +13,5 @@ else
     echo "Skipping database creation."
 fi
 
-# Start the Python application
-exec python3 app.py
+# Start the application under the multi-worker production server
+exec gunicorn -c gunicorn.conf.py "app:create_app()"
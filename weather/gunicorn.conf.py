@@ -0,0 +1,85 @@
+## Production server settings, used by entrypoint.sh:
+## gunicorn -c gunicorn.conf.py "app:create_app()"
+
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# One worker process per core (plus a spare), each with a pool of request threads
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count() * 2 + 1)))
+worker_class = "gthread"
+threads = int(os.getenv("WEB_THREADS", "8"))
+
+# Workers import the app and build their own models, caches and thread pools;
+# pools and open SQLite connections do not survive a fork, so nothing is preloaded
+preload_app = False
+
+# Workers share one weather and geocode cache file next to the database unless
+# SHARED_CACHE_PATH says otherwise (set it empty for a cache per worker)
+os.environ.setdefault("SHARED_CACHE_PATH", os.path.join(
+    os.path.dirname(os.getenv("DB_PATH", "./db/user_catalog.db")), "shared_cache.db"))
+
+# /api/stream redirects to a stream server on this port, which holds every open
+# stream on one event loop instead of a request thread each (set it empty to
+# serve streams from the workers)
+os.environ.setdefault("STREAM_PORT", "5002")
+stream_server = None
+
+timeout = int(os.getenv("WEB_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("WEB_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info")
+
+
+def on_starting(server):
+    """
+    Starts the stream server next to the workers.
+    """
+    global stream_server
+    if os.environ["STREAM_PORT"]:
+        stream_server = subprocess.Popen([sys.executable, "-m", "weather.utils.stream_utils",
+                                          "--port", os.environ["STREAM_PORT"]])
+        server.log.info("Stream server started on port %s (pid %s)", os.environ["STREAM_PORT"], stream_server.pid)
+
+
+def on_exit(server):
+    """
+    Stops the stream server, ending its open streams.
+    """
+    if stream_server is not None:
+        stream_server.terminate()
+        try:
+            stream_server.wait(graceful_timeout)
+        except subprocess.TimeoutExpired:
+            stream_server.kill()
+
+
+def post_worker_init(worker):
+    """
+    Ends open event streams as soon as a worker is told to stop, so it can drain within graceful_timeout.
+    """
+    handle_exit = worker.handle_exit
+
+    def drain_and_exit(sig, frame):
+        from app import draining
+        draining.set()
+        handle_exit(sig, frame)
+
+    signal.signal(signal.SIGTERM, drain_and_exit)
+    worker.log.info("Worker %s ready", worker.pid)
+
+
+def worker_exit(server, worker):
+    """
+    Flushes queued alert deliveries and stops the worker's fetch pools.
+    """
+    from app import shutdown_app
+    shutdown_app()
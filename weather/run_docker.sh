@@ -5,6 +5,7 @@ IMAGE_NAME="weatherapp"
 CONTAINER_TAG="0.0.1"
 HOST_PORT=5001
 CONTAINER_PORT=5000
+STREAM_PORT=5002
 DB_VOLUME_PATH="./db"   # Adjust this to the desired host path for the database persistence
 BUILD=true  # Set this to true if you want to build the image
 
@@ -45,6 +46,7 @@ docker run -d \
   --name ${IMAGE_NAME}_container \
   --env-file .env \
   -p ${HOST_PORT}:${CONTAINER_PORT} \
+  -p ${STREAM_PORT}:${STREAM_PORT} \
   -v ${DB_VOLUME_PATH}:/app/db \
   ${IMAGE_NAME}:${CONTAINER_TAG}
 
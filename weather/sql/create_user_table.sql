@@ -16,4 +16,114 @@ CREATE TABLE user_favorites (
     latitude REAL,
     longitude REAL,
     FOREIGN KEY (user_id) REFERENCES users(id)
-);
\ No newline at end of file
+);
+
+DROP TABLE IF EXISTS location_forecasts;
+CREATE TABLE location_forecasts (
+    location_name TEXT PRIMARY KEY,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    start_time INTEGER NOT NULL,
+    step_seconds INTEGER NOT NULL,
+    hours INTEGER NOT NULL,
+    fetched_at INTEGER NOT NULL,
+    temp_c BLOB NOT NULL,
+    feelslike_c BLOB NOT NULL,
+    wind_kph BLOB NOT NULL,
+    humidity BLOB NOT NULL,
+    precip_mm BLOB NOT NULL,
+    chance_of_rain BLOB NOT NULL
+);
+
+DROP TABLE IF EXISTS weather_observations;
+CREATE TABLE weather_observations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    location_name TEXT NOT NULL,
+    latitude REAL,
+    longitude REAL,
+    observed_at INTEGER NOT NULL,
+    temp_c REAL,
+    feelslike_c REAL,
+    wind_kph REAL,
+    humidity REAL,
+    precip_mm REAL,
+    condition TEXT
+);
+CREATE INDEX idx_weather_observations_location_time ON weather_observations (location_name, observed_at);
+
+DROP TABLE IF EXISTS observations_hourly;
+CREATE TABLE observations_hourly (
+    location_name TEXT NOT NULL,
+    bucket_start INTEGER NOT NULL,
+    samples INTEGER NOT NULL,
+    temp_c_min REAL, temp_c_max REAL, temp_c_sum REAL, temp_c_count INTEGER,
+    wind_kph_min REAL, wind_kph_max REAL, wind_kph_sum REAL, wind_kph_count INTEGER,
+    humidity_min REAL, humidity_max REAL, humidity_sum REAL, humidity_count INTEGER,
+    precip_mm_min REAL, precip_mm_max REAL, precip_mm_sum REAL, precip_mm_count INTEGER,
+    PRIMARY KEY (location_name, bucket_start)
+);
+
+DROP TABLE IF EXISTS observations_daily;
+CREATE TABLE observations_daily (
+    location_name TEXT NOT NULL,
+    bucket_start INTEGER NOT NULL,
+    samples INTEGER NOT NULL,
+    temp_c_min REAL, temp_c_max REAL, temp_c_sum REAL, temp_c_count INTEGER,
+    wind_kph_min REAL, wind_kph_max REAL, wind_kph_sum REAL, wind_kph_count INTEGER,
+    humidity_min REAL, humidity_max REAL, humidity_sum REAL, humidity_count INTEGER,
+    precip_mm_min REAL, precip_mm_max REAL, precip_mm_sum REAL, precip_mm_count INTEGER,
+    PRIMARY KEY (location_name, bucket_start)
+);
+
+DROP TABLE IF EXISTS rollup_watermarks;
+CREATE TABLE rollup_watermarks (
+    name TEXT PRIMARY KEY,
+    last_observation_id INTEGER NOT NULL
+);
+
+DROP TABLE IF EXISTS alert_rules;
+CREATE TABLE alert_rules (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    location_name TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    operator TEXT NOT NULL CHECK (operator IN ('<', '>')),
+    threshold REAL NOT NULL,
+    matched INTEGER NOT NULL DEFAULT 0,
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
+CREATE INDEX idx_alert_rules_user ON alert_rules (user_id);
+
+-- Bumped by every rule change, so each worker process knows when to reload its rule index
+DROP TABLE IF EXISTS alert_rules_version;
+CREATE TABLE alert_rules_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL
+);
+INSERT INTO alert_rules_version (id, version) VALUES (1, 0);
+CREATE TRIGGER alert_rules_inserted AFTER INSERT ON alert_rules
+BEGIN
+    UPDATE alert_rules_version SET version = version + 1;
+END;
+CREATE TRIGGER alert_rules_deleted AFTER DELETE ON alert_rules
+BEGIN
+    UPDATE alert_rules_version SET version = version + 1;
+END;
+CREATE TRIGGER alert_rules_matched AFTER UPDATE OF matched ON alert_rules WHEN OLD.matched != NEW.matched
+BEGIN
+    UPDATE alert_rules_version SET version = version + 1;
+END;
+
+DROP TABLE IF EXISTS alert_events;
+CREATE TABLE alert_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    rule_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    location_name TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    operator TEXT NOT NULL,
+    threshold REAL NOT NULL,
+    value REAL NOT NULL,
+    triggered_at INTEGER NOT NULL
+);
+CREATE INDEX idx_alert_events_user ON alert_events (user_id, triggered_at);
@@ -0,0 +1,155 @@
+import os
+import sqlite3
+
+import pytest
+
+from weather.models.alerts_model import AlertsModel
+
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), '..', 'sql', 'create_user_table.sql')
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Fixture to provide a temporary database with the application schema."""
+    path = str(tmp_path / "test.db")
+    with sqlite3.connect(path) as conn:
+        with open(SCHEMA_PATH) as f:
+            conn.executescript(f.read())
+    return path
+
+@pytest.fixture
+def alerts_model(db_path):
+    """Fixture to provide an AlertsModel whose deliveries are flushed explicitly."""
+    model = AlertsModel(db_path, max_batch=1000, max_delay=60)
+    yield model
+    model.deliveries.stop()
+
+def observe(model, location, **values):
+    model.on_observation(location, 0.0, 0.0, {'observed_at': 0, **values})
+    model.deliveries.flush()
+
+def fired_rules(model, user_id=1):
+    return [event['rule_id'] for event in model.get_events(user_id)]
+
+##################################################
+# Rule Management Test Cases
+##################################################
+
+def test_create_rule_validation(alerts_model):
+    """Test that invalid metrics, operators and thresholds are rejected."""
+    with pytest.raises(ValueError, match="Invalid metric: pressure"):
+        alerts_model.create_rule(1, 'Oslo', 'pressure', '<', 0)
+    with pytest.raises(ValueError, match="Invalid operator: ="):
+        alerts_model.create_rule(1, 'Oslo', 'temp_c', '=', 0)
+    with pytest.raises(ValueError, match="Invalid threshold: cold"):
+        alerts_model.create_rule(1, 'Oslo', 'temp_c', '<', 'cold')
+
+def test_get_and_delete_rules(alerts_model):
+    """Test listing and deleting a user's rules."""
+    rule = alerts_model.create_rule(1, 'Oslo', 'temp_c', '<', 0)
+    alerts_model.create_rule(2, 'Oslo', 'temp_c', '<', 0)
+
+    assert [r['id'] for r in alerts_model.get_rules(1)] == [rule['id']]
+
+    with pytest.raises(ValueError, match="not found for user 2"):
+        alerts_model.delete_rule(2, rule['id'])
+    alerts_model.delete_rule(1, rule['id'])
+    assert alerts_model.get_rules(1) == []
+
+##################################################
+# Evaluation Test Cases
+##################################################
+
+def test_rule_fires_only_on_crossing(alerts_model):
+    """Test that a rule fires when it starts matching and not on repeated matches."""
+    rule = alerts_model.create_rule(1, 'Oslo', 'temp_c', '<', 0)
+
+    observe(alerts_model, 'Oslo', temp_c=5.0)
+    assert fired_rules(alerts_model) == []
+
+    observe(alerts_model, 'Oslo', temp_c=-1.0)
+    observe(alerts_model, 'Oslo', temp_c=-3.0)
+    assert fired_rules(alerts_model) == [rule['id']]
+
+    observe(alerts_model, 'Oslo', temp_c=2.0)
+    observe(alerts_model, 'Oslo', temp_c=-2.0)
+    assert fired_rules(alerts_model) == [rule['id'], rule['id']]
+
+def test_only_crossed_thresholds_fire(alerts_model):
+    """Test that only rules with thresholds between the old and new value change state."""
+    below_zero = alerts_model.create_rule(1, 'Oslo', 'temp_c', '<', 0)
+    below_ten = alerts_model.create_rule(1, 'Oslo', 'temp_c', '<', 10)
+    above_twenty = alerts_model.create_rule(1, 'Oslo', 'temp_c', '>', 20)
+    windy = alerts_model.create_rule(1, 'Oslo', 'wind_kph', '>', 50)
+    elsewhere = alerts_model.create_rule(1, 'Bergen', 'temp_c', '<', 10)
+
+    observe(alerts_model, 'Oslo', temp_c=15.0, wind_kph=10.0)
+    assert fired_rules(alerts_model) == []
+
+    observe(alerts_model, 'Oslo', temp_c=5.0, wind_kph=60.0)
+    assert sorted(fired_rules(alerts_model)) == sorted([below_ten['id'], windy['id']])
+
+    observe(alerts_model, 'Oslo', temp_c=25.0)
+    assert fired_rules(alerts_model)[0] == above_twenty['id']
+    assert below_zero['id'] not in fired_rules(alerts_model)
+    assert elsewhere['id'] not in fired_rules(alerts_model)
+
+def test_create_rule_fires_on_current_value(alerts_model):
+    """Test that a new rule already satisfied by the last value fires once."""
+    observe(alerts_model, 'Oslo', temp_c=-5.0)
+
+    rule = alerts_model.create_rule(1, 'Oslo', 'temp_c', '<', 0)
+    alerts_model.deliveries.flush()
+    observe(alerts_model, 'Oslo', temp_c=-6.0)
+
+    assert fired_rules(alerts_model) == [rule['id']]
+
+def test_state_survives_reload(alerts_model, db_path):
+    """Test that a matched rule does not fire again after the index is rebuilt."""
+    rule = alerts_model.create_rule(1, 'Oslo', 'temp_c', '<', 0)
+    observe(alerts_model, 'Oslo', temp_c=-1.0)
+
+    reloaded = AlertsModel(db_path, max_batch=1000, max_delay=60)
+    observe(reloaded, 'Oslo', temp_c=-2.0)
+    reloaded.deliveries.stop()
+
+    assert fired_rules(alerts_model) == [rule['id']]
+
+def test_rule_changes_reach_other_workers(alerts_model, db_path):
+    """Test that rules created, fired and deleted through one worker's model are seen by another's."""
+    other = AlertsModel(db_path, max_batch=1000, max_delay=60)
+    observe(other, 'Oslo', temp_c=5.0)
+
+    rule = alerts_model.create_rule(1, 'Oslo', 'temp_c', '<', 0)
+    assert [r['id'] for r in other.get_rules(1)] == [rule['id']]
+
+    # Both workers see the same crossing; the alert is delivered once
+    observe(other, 'Oslo', temp_c=-1.0)
+    observe(alerts_model, 'Oslo', temp_c=-1.0)
+    assert fired_rules(alerts_model) == [rule['id']]
+    assert other.get_rules(1)[0]['matched'] and alerts_model.get_rules(1)[0]['matched']
+
+    alerts_model.delete_rule(1, rule['id'])
+    observe(other, 'Oslo', temp_c=5.0)
+    observe(other, 'Oslo', temp_c=-1.0)
+    other.deliveries.stop()
+    assert other.get_rules(1) == []
+    assert fired_rules(alerts_model) == [rule['id']]
+
+def test_deliveries_are_batched(db_path):
+    """Test that alerts reach the store through the batching queue."""
+    model = AlertsModel(db_path, max_batch=2, max_delay=60)
+    model.create_rule(1, 'Oslo', 'temp_c', '<', 0)
+    model.create_rule(1, 'Oslo', 'temp_c', '<', 1)
+
+    model.on_observation('Oslo', 0.0, 0.0, {'observed_at': 0, 'temp_c': -1.0})
+    model.deliveries.stop()
+
+    assert len(model.get_events(1)) == 2
+    assert model.deliveries.delivered == 2
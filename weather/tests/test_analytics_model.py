@@ -0,0 +1,103 @@
+import os
+import sqlite3
+
+import numpy as np
+import pytest
+
+from weather.models.analytics_model import READING_DTYPE, AnalyticsModel, celsius_to_fahrenheit, kph_to_mph
+
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), '..', 'sql', 'create_user_table.sql')
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Fixture to provide a database with two users and observations for their favorites."""
+    path = str(tmp_path / "test.db")
+    with sqlite3.connect(path) as conn:
+        with open(SCHEMA_PATH) as f:
+            conn.executescript(f.read())
+        conn.executemany("INSERT INTO users (id, username, email, password, salt) VALUES (?, ?, ?, 'pw', 'salt')",
+                         [(1, 'user1', 'u1@email.com'), (2, 'user2', 'u2@email.com')])
+        conn.executemany("INSERT INTO user_favorites (user_id, location_name) VALUES (?, ?)",
+                         [(1, 'Oslo'), (1, 'Cairo'), (1, 'Wellington'), (2, 'Cairo'), (2, 'Nowhere')])
+        conn.executemany("""
+            INSERT INTO weather_observations (location_name, observed_at, temp_c, feelslike_c, wind_kph, humidity)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [
+            ('Oslo', 100, 5.0, 5.0, 10.0, 80.0),
+            ('Cairo', 100, 20.0, 20.0, 5.0, 20.0),
+            ('Cairo', 200, 30.0, 31.0, 5.0, 20.0),
+            ('Wellington', 150, 12.0, 10.0, 40.0, None),
+        ])
+    return path
+
+@pytest.fixture
+def analytics_model(db_path):
+    """Fixture to provide a new instance of AnalyticsModel for each test."""
+    return AnalyticsModel(db_path)
+
+##################################################
+# Loading Test Cases
+##################################################
+
+def test_load_latest_readings(analytics_model):
+    """Test that only the latest observation per location is loaded, sorted by user."""
+    readings = analytics_model.load_latest_readings()
+
+    assert readings['user_id'].tolist() == [1, 1, 1, 2]
+    cairo = readings[readings['name'] == 'Cairo']
+    assert cairo['temp_c'].tolist() == [30.0, 30.0]
+    assert np.isnan(readings[readings['name'] == 'Wellington']['humidity'][0])
+
+def test_load_latest_readings_no_users(analytics_model):
+    """Test that an empty user list loads no readings."""
+    assert len(analytics_model.load_latest_readings([])) == 0
+
+##################################################
+# Summary Test Cases
+##################################################
+
+def test_summarize_user(analytics_model):
+    """Test rankings, averages and unit conversions for one user."""
+    summary = analytics_model.summarize_user(1)
+
+    assert summary['locations'] == 3
+    assert summary['latest_observation'] == 200
+    assert summary['warmest'] == {'name': 'Cairo', 'temp_c': 30.0, 'temp_f': 86.0}
+    assert summary['coldest'] == {'name': 'Oslo', 'temp_c': 5.0, 'temp_f': 41.0}
+    assert summary['windiest']['name'] == 'Wellington'
+    assert summary['averages']['temp_c'] == pytest.approx(15.67, abs=0.01)
+    assert summary['averages']['humidity'] == 50.0
+
+def test_summarize_users_batch(analytics_model):
+    """Test that a batch summary matches the per-user summaries."""
+    summaries = analytics_model.summarize_users()
+
+    assert sorted(summaries) == [1, 2]
+    assert summaries[1] == analytics_model.summarize_user(1)
+    assert summaries[2]['locations'] == 1
+    assert summaries[2]['warmest']['name'] == 'Cairo'
+
+def test_summarize_user_without_readings(analytics_model):
+    """Test that a user without readings raises an error."""
+    with pytest.raises(ValueError, match="No weather readings found for favorites of user 3"):
+        analytics_model.summarize_user(3)
+
+def test_summarize_readings_all_missing():
+    """Test that a user whose values are all missing gets no extremes."""
+    readings = np.array([(1, 'Oslo', np.nan, np.nan, np.nan, np.nan, 1)],
+                        dtype=READING_DTYPE)
+    summary = AnalyticsModel.summarize_readings(readings)[1]
+    assert summary['warmest'] == {'name': None, 'temp_c': None, 'temp_f': None}
+    assert summary['averages']['temp_c'] is None
+
+def test_unit_conversions():
+    """Test vectorized unit conversions."""
+    assert celsius_to_fahrenheit(np.array([0.0, 100.0])).tolist() == [32.0, 212.0]
+    assert kph_to_mph(np.array([100.0]))[0] == pytest.approx(62.1371)
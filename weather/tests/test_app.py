@@ -0,0 +1,112 @@
+import os
+import sqlite3
+import threading
+
+import pytest
+
+import app as app_module
+from weather.models.observations_model import ObservationsModel
+
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), '..', 'sql', 'create_user_table.sql')
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """Fixture to provide a test client over a temporary database where user 1 follows London."""
+    path = str(tmp_path / "test.db")
+    with sqlite3.connect(path) as conn:
+        with open(SCHEMA_PATH) as f:
+            conn.executescript(f.read())
+        conn.execute("INSERT INTO user_favorites (user_id, location_name, latitude, longitude) "
+                     "VALUES (1, 'London', 51.5, -0.12)")
+    monkeypatch.setattr(app_module, "STREAM_PORT", "")
+    monkeypatch.setattr(app_module, "STREAM_SERVER_URL", "")
+    monkeypatch.setattr(app_module, "_stream_slots", threading.BoundedSemaphore(3))
+    app = app_module.create_app({'DB_PATH': path, 'CACHE_SNAPSHOT_PATH': ''})
+    yield app.test_client()
+    if app_module.observation_hub is not None:
+        app_module.observation_hub.close_all()
+
+def open_stream(client, user_id=1):
+    return client.get(f'/api/stream/{user_id}', buffered=False)
+
+##################################################
+# Stream Route Test Cases
+##################################################
+
+def test_concurrent_streams_are_capped(client):
+    """Test that streams beyond the cap get 503 and a closed stream frees its request thread."""
+    streams = [open_stream(client) for _ in range(3)]
+    assert [response.status_code for response in streams] == [200] * 3
+    assert app_module.get_observation_hub().subscriber_count() == 3
+
+    assert open_stream(client).status_code == 503
+
+    streams.pop().close()
+    assert app_module.get_observation_hub().subscriber_count() == 2
+    streams.append(open_stream(client))
+    assert streams[-1].status_code == 200
+    for response in streams:
+        response.close()
+    assert app_module.get_observation_hub().subscriber_count() == 0
+
+def test_open_streams_receive_observations(client):
+    """Test that every open stream receives an observation recorded for its favorite by another worker."""
+    streams = [open_stream(client) for _ in range(3)]
+    chunks = [iter(response.response) for response in streams]
+    assert all(next(chunk).startswith(b"retry:") for chunk in chunks)
+
+    ObservationsModel(app_module.db_path).record_observation(
+        'London', 51.5, -0.12, {'observed_at': 1700000000, 'temp_c': 12.5, 'condition': 'Sunny'})
+
+    for chunk in chunks:
+        assert next(chunk).startswith(b'event: observation\ndata: {"name": "London"')
+    for response in streams:
+        response.close()
+
+def test_missing_favorites_do_not_hold_a_stream(client):
+    """Test that a 404 for a user without favorites leaves every stream slot free."""
+    for _ in range(5):
+        assert open_stream(client, user_id=2).status_code == 404
+    streams = [open_stream(client) for _ in range(3)]
+    assert [response.status_code for response in streams] == [200] * 3
+    for response in streams:
+        response.close()
+
+def test_streams_redirect_to_stream_server(client, monkeypatch):
+    """Test that with a stream server configured the route redirects to it on the same host."""
+    monkeypatch.setattr(app_module, "STREAM_PORT", "5002")
+    response = client.get('/api/stream/1', base_url='http://weather.example:5000')
+
+    assert response.status_code == 307
+    assert response.headers['Location'] == 'http://weather.example:5002/api/stream/1'
+
+##################################################
+# Lazy Initialization Test Cases
+##################################################
+
+def test_suggest_index_is_built_once_by_concurrent_requests(client, mocker):
+    """Test that the first requests arriving together build the suggestion index once."""
+    build = mocker.spy(app_module.LocationSuggestIndex, 'add_many')
+    start = threading.Barrier(4)
+    indexes = []
+
+    def first_request():
+        start.wait(5)
+        with client.application.app_context():
+            indexes.append(app_module.get_suggest_index())
+
+    threads = [threading.Thread(target=first_request) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(indexes) == 4 and all(index is indexes[0] for index in indexes)
+    assert build.call_count == 2
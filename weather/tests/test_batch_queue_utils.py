@@ -0,0 +1,71 @@
+import threading
+import time
+
+from weather.utils.batch_queue_utils import BatchingQueue
+
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+class RecordingSink:
+    """A sink keeping every batch it receives and signalling each one."""
+
+    def __init__(self):
+        self.batches = []
+        self.received = threading.Event()
+
+    def __call__(self, batch):
+        self.batches.append(batch)
+        self.received.set()
+
+    def wait(self, timeout):
+        received = self.received.wait(timeout)
+        self.received.clear()
+        return received
+
+##################################################
+# Batching Queue Test Cases
+##################################################
+
+def test_single_items_are_delivered_within_max_delay():
+    """Test that every lone item is delivered after max_delay, not only the first one."""
+    sink = RecordingSink()
+    queue = BatchingQueue(sink, max_batch=100, max_delay=0.1)
+    try:
+        queue.put(1)
+        assert sink.wait(1)
+
+        started = time.monotonic()
+        queue.put(2)
+        assert sink.wait(1)
+        assert time.monotonic() - started < 0.5
+        assert sink.batches == [[1], [2]]
+    finally:
+        queue.stop()
+
+def test_full_batch_is_delivered_at_once():
+    """Test that a batch reaching max_batch is delivered without waiting for max_delay."""
+    sink = RecordingSink()
+    queue = BatchingQueue(sink, max_batch=3, max_delay=60)
+    try:
+        for item in range(3):
+            queue.put(item)
+        assert sink.wait(1)
+        assert sink.batches == [[0, 1, 2]]
+    finally:
+        queue.stop()
+
+def test_stop_delivers_remaining_items():
+    """Test that items still queued when the queue stops are delivered."""
+    sink = RecordingSink()
+    queue = BatchingQueue(sink, max_batch=100, max_delay=60)
+    queue.put(1)
+    queue.put(2)
+
+    queue.stop()
+
+    assert [item for batch in sink.batches for item in batch] == [1, 2]
+    assert queue.delivered == 2
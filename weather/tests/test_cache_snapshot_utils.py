@@ -0,0 +1,139 @@
+import multiprocessing
+import time
+
+import pytest
+
+from weather.utils import cache_snapshot_utils
+from weather.utils.cache_snapshot_utils import CacheSnapshotter, load_caches, read_snapshot, save_caches
+from weather.utils.cache_utils import StaleWhileRevalidateCache, TTLCache
+
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+def make_caches():
+    weather = StaleWhileRevalidateCache(max_age=60, stale_while_revalidate=60, stale_if_error=600)
+    return TTLCache(max_entries=100), weather
+
+@pytest.fixture
+def snapshot(tmp_path):
+    """Fixture to provide the path of a snapshot file that does not exist yet."""
+    return str(tmp_path / "cache_snapshot.bin")
+
+def observation(temp_c, condition="Sunny"):
+    return {"observed_at": 1700000000, "temp_c": temp_c, "feelslike_c": None, "wind_kph": 5.5,
+            "humidity": 40.0, "precip_mm": 0.0, "condition": condition}
+
+def save_from_worker(snapshot, city, start):
+    geocode, weather = make_caches()
+    weather.prime(city, observation(10.0), time.time())
+    start.wait(10)
+    for _ in range(20):
+        save_caches(snapshot, geocode, weather)
+
+##################################################
+# Snapshot Test Cases
+##################################################
+
+def test_round_trip_preserves_ages(snapshot):
+    """Test that entries loaded from a snapshot keep their values and original ages."""
+    geocode, weather = make_caches()
+    now = time.time()
+    geocode.set("são paulo", (-23.55, -46.63, "São Paulo"), stored_at=now - 500)
+    weather.prime("London", observation(12.5), now - 30)
+    weather.prime("Paris", observation(None, condition=None), now - 90)
+
+    assert save_caches(snapshot, geocode, weather) == {"geocode": 1, "weather": 2}
+
+    geocode, weather = make_caches()
+    assert load_caches(snapshot, geocode, weather) == {"geocode": 1, "weather": 2}
+    assert geocode.get_entry("são paulo")[0] == (-23.55, -46.63, "São Paulo")
+    assert geocode.get_entry("são paulo")[1] == pytest.approx(500, abs=5)
+    value, age = weather.peek("London")
+    assert value == observation(12.5) and age == pytest.approx(30, abs=5)
+    assert weather.peek("Paris")[0] == observation(None, condition=None)
+
+def test_saves_merge_entries_of_other_processes(snapshot):
+    """Test that a save keeps entries saved by another process and the newest value of shared keys."""
+    now = time.time()
+    geocode, weather = make_caches()
+    weather.prime("London", observation(10.0), now - 50)
+    weather.prime("Paris", observation(20.0), now - 50)
+    save_caches(snapshot, geocode, weather)
+
+    geocode, weather = make_caches()
+    weather.prime("London", observation(11.0), now - 10)
+    save_caches(snapshot, geocode, weather)
+
+    _, entries = read_snapshot(snapshot)
+    assert {key: value["temp_c"] for key, value, _ in entries} == {"London": 11.0, "Paris": 20.0}
+
+def test_concurrent_saves_keep_every_worker_entries(snapshot):
+    """Test that workers saving at the same time do not drop each other's entries."""
+    context = multiprocessing.get_context("fork")
+    start = context.Event()
+    cities = [f"City {i}" for i in range(4)]
+    workers = [context.Process(target=save_from_worker, args=(snapshot, city, start)) for city in cities]
+    for worker in workers:
+        worker.start()
+    start.set()
+    for worker in workers:
+        worker.join(30)
+
+    assert [worker.exitcode for worker in workers] == [0] * len(workers)
+    _, entries = read_snapshot(snapshot)
+    assert sorted(key for key, _, _ in entries) == cities
+
+def test_failed_save_is_logged(snapshot, mocker):
+    """Test that an unexpected error while saving is logged instead of raised."""
+    mocker.patch.object(cache_snapshot_utils, "save_caches", side_effect=TypeError("bad entry"))
+    log = mocker.patch.object(cache_snapshot_utils.logger, "exception")
+
+    CacheSnapshotter(snapshot, interval=0).save()
+
+    log.assert_called_once()
+
+def test_load_skips_expired_and_older_entries(snapshot):
+    """Test that weather past the stale-if-error limit, or older than the cached value, is not loaded."""
+    now = time.time()
+    geocode, weather = make_caches()
+    weather.prime("London", observation(10.0), now - 50)
+    weather.prime("Oslo", observation(0.0), now - 60)
+    save_caches(snapshot, geocode, weather)
+
+    geocode, weather = make_caches()
+    weather.prime("London", observation(11.0), now - 5)
+    # Oslo expires between the save and this process starting
+    weather.max_age = 1
+    weather.stale_if_error = weather.stale_while_revalidate = 10
+
+    assert load_caches(snapshot, geocode, weather)["weather"] == 0
+    assert weather.peek("London")[0]["temp_c"] == 11.0
+    assert weather.peek("Oslo") is None
+
+@pytest.mark.parametrize("content", [b"", b"WCS2", b"NOPE" + bytes(20)])
+def test_unreadable_snapshots_are_rejected(snapshot, content):
+    """Test that empty, truncated or foreign files raise ValueError."""
+    with open(snapshot, "wb") as f:
+        f.write(content)
+
+    with pytest.raises(ValueError):
+        load_caches(snapshot, *make_caches())
+
+def test_truncated_text_is_rejected(snapshot):
+    """Test that a snapshot cut short inside its text section raises ValueError."""
+    geocode, weather = make_caches()
+    weather.prime("London", observation(10.0), time.time())
+    save_caches(snapshot, geocode, weather)
+    with open(snapshot, "r+b") as f:
+        f.truncate(len(f.read()) - 2)
+
+    with pytest.raises(ValueError, match="truncated"):
+        read_snapshot(snapshot)
+
+def test_missing_snapshot_loads_nothing(snapshot):
+    """Test that the first start, with no snapshot yet, leaves the caches empty."""
+    assert load_caches(snapshot, *make_caches()) == {"geocode": 0, "weather": 0}
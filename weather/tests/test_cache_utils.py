@@ -0,0 +1,129 @@
+import threading
+import time
+
+import pytest
+
+from weather.utils.cache_utils import FRESH, LOADED, STALE, STALE_IF_ERROR, StaleWhileRevalidateCache
+
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+@pytest.fixture
+def cache():
+    """Fixture to provide a cache fresh for 60s, revalidated for 60s more and kept 600s on errors."""
+    cache = StaleWhileRevalidateCache(max_age=60, stale_while_revalidate=60, stale_if_error=600)
+    yield cache
+    cache.shutdown()
+
+def settle(cache):
+    while cache.stats()['in_flight']:
+        time.sleep(0.01)
+
+def fail():
+    raise ConnectionError("upstream down")
+
+##################################################
+# Stale-While-Revalidate Test Cases
+##################################################
+
+def test_missing_key_is_loaded_by_caller(cache):
+    """Test that a miss is left to the caller and a load stores the value."""
+    assert cache.lookup('k', lambda: 1) is None
+    assert cache.load('k', lambda: 1) == (1, 0.0, LOADED)
+    assert cache.lookup('k', fail)[::2] == (1, FRESH)
+
+def test_stale_entry_is_served_and_revalidated_once(cache):
+    """Test that a recently expired entry is returned at once while one background load refreshes it."""
+    cache.prime('k', 'old', time.time() - 90)
+    release = threading.Event()
+    calls = []
+
+    def slow_loader():
+        calls.append(1)
+        release.wait(5)
+        return 'new'
+
+    assert cache.lookup('k', slow_loader)[::2] == ('old', STALE)
+    assert cache.lookup('k', slow_loader)[::2] == ('old', STALE)
+    release.set()
+    settle(cache)
+
+    assert calls == [1]
+    assert cache.lookup('k', fail)[::2] == ('new', FRESH)
+
+def test_entry_past_revalidate_window_needs_a_load(cache):
+    """Test that an entry older than the stale-while-revalidate window is not served as stale."""
+    cache.prime('k', 'old', time.time() - 300)
+
+    assert cache.lookup('k', lambda: 'new') is None
+
+def test_failing_loads_serve_last_value_until_hard_limit(cache):
+    """Test that the last good value covers a failing upstream, without waiting on it, until stale_if_error."""
+    cache.prime('k', 'old', time.time() - 300)
+
+    assert cache.load('k', fail)[::2] == ('old', STALE_IF_ERROR)
+    # The key is known to fail, so reads are answered at once and retried in the background
+    assert cache.lookup('k', fail)[::2] == ('old', STALE_IF_ERROR)
+    settle(cache)
+
+    cache.entries.set('k', 'ancient', stored_at=time.time() - 1000)
+    with pytest.raises(ConnectionError):
+        cache.load('k', fail)
+    assert cache.stats()['failures'] == 3
+
+def test_concurrent_loads_share_one_call(cache):
+    """Test that loads of one key issued together call the loader once."""
+    release = threading.Event()
+    calls = []
+
+    def slow_loader():
+        calls.append(1)
+        release.wait(5)
+        return 'value'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.load('k', slow_loader)[0])) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    while not calls:
+        time.sleep(0.01)
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == [1]
+    assert results == ['value'] * 3
+
+def test_stale_read_after_shutdown_is_not_revalidated(cache):
+    """Test that a stale read after shutdown is served without starting a new refresh pool."""
+    cache.prime('k', 'old', time.time() - 90)
+    cache.shutdown()
+    calls = []
+
+    assert cache.lookup('k', lambda: calls.append(1))[::2] == ('old', STALE)
+    assert cache._executor is None
+    assert cache.stats()['in_flight'] == 0
+    assert calls == []
+
+def test_failed_store_releases_the_key(cache, mocker):
+    """Test that a refresh whose value cannot be stored fails its callers and lets the next refresh run."""
+    mocker.patch.object(cache.entries, 'set', side_effect=TypeError("not serializable"))
+
+    with pytest.raises(TypeError):
+        cache.refresh('k', lambda: object())
+    assert cache.stats()['in_flight'] == 0
+
+    cache.entries.set.side_effect = None
+    assert cache.refresh('k', lambda: 'value') == 'value'
+
+def test_prime_keeps_newer_value(cache):
+    """Test that a value produced earlier than the cached one does not replace it."""
+    cache.prime('k', 'new', time.time() - 10)
+    cache.prime('k', 'old', time.time() - 50)
+
+    assert cache.peek('k')[0] == 'new'
@@ -1,6 +1,14 @@
 import pytest
 import sqlite3
-from weather.models.favorites_model import FavoritesModel
+import threading
+import time
+
+import requests
+
+from weather.models import favorites_model as favorites_module
+from weather.models.favorites_model import FavoriteLocation, FavoritesModel
+from weather.utils.user_cache_utils import user_cache
+from weather.utils.weather_provider_utils import weather_cache
 
 
 ######################################################
@@ -17,6 +25,7 @@ def db_path(tmp_path):
 @pytest.fixture
 def favorites_model(db_path):
     """Fixture to provide a new instance of FavoritesModel for each test."""
+    weather_cache.clear()
     model = FavoritesModel(db_path)
     with sqlite3.connect(db_path) as conn:
         cursor = conn.cursor()
@@ -38,6 +47,21 @@ def favorites_model(db_path):
                 FOREIGN KEY (user_id) REFERENCES users (id)
             )
         """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS weather_observations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                location_name TEXT NOT NULL,
+                latitude REAL,
+                longitude REAL,
+                observed_at INTEGER NOT NULL,
+                temp_c REAL,
+                feelslike_c REAL,
+                wind_kph REAL,
+                humidity REAL,
+                precip_mm REAL,
+                condition TEXT
+            )
+        """)
     return model
 
 @pytest.fixture
@@ -71,6 +95,37 @@ def test_get_nonexistent_user(favorites_model):
     with pytest.raises(ValueError, match="User with ID 999 not found"):
         favorites_model.get_user(999)
 
+def test_get_user_is_cached_until_invalidated(favorites_model, sample_user1, db_path):
+    """Test that repeated lookups skip the database until the user's entry is invalidated."""
+    favorites_model.get_user(1)
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE users SET username = 'renamed' WHERE id = 1")
+
+    assert favorites_model.get_user(1)['username'] == 'username1'
+
+    user_cache.invalidate(db_path, 1)
+    assert favorites_model.get_user(1)['username'] == 'renamed'
+
+def test_get_user_returns_a_copy_of_the_cached_user(favorites_model, sample_user1):
+    """Test that changing a returned user does not change the cached one."""
+    user = favorites_model.get_user(1)
+    user.username = 'changed'
+
+    assert favorites_model.get_user(1)['username'] == 'username1'
+
+def test_missing_user_is_negatively_cached(favorites_model, db_path):
+    """Test that a missing user is remembered until its ID is created."""
+    with pytest.raises(ValueError):
+        favorites_model.get_user(2)
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("INSERT INTO users (id, username, email, password) VALUES (2, 'u', 'u@e.com', 'p')")
+
+    with pytest.raises(ValueError):
+        favorites_model.get_user(2)
+
+    user_cache.invalidate(db_path, 2)
+    assert favorites_model.get_user(2)['username'] == 'u'
+
 ##################################################
 # Favorites Management Test Cases
 ##################################################
@@ -91,6 +146,14 @@ def test_get_favorite_locations(favorites_model, sample_user1, sample_location1,
     assert any(loc['name'] == sample_location1['name'] for loc in locations)
     assert any(loc['name'] == sample_location2['name'] for loc in locations)
 
+def test_get_location_popularity(favorites_model, sample_user1, sample_location1, sample_location2):
+    """Test counting how many favorites reference each location name."""
+    favorites_model.add_favorite_location(1, sample_location1)
+    favorites_model.add_favorite_location(1, sample_location2)
+    favorites_model.add_favorite_location(1, sample_location1)
+
+    assert sorted(favorites_model.get_location_popularity()) == [('London', 1), ('New York', 2)]
+
 ##################################################
 # Weather Data Management Test Cases
 ##################################################
@@ -107,8 +170,160 @@ def test_update_weather_data(favorites_model, sample_user1, sample_location1, mo
 
     favorites_model.update_weather_data(1)
     
-    # Note: This test might need to be adjusted based on how weather data is stored
-    # You might need to add a method to retrieve weather data or modify get_favorite_locations to include it
+    with sqlite3.connect(favorites_model.db_path) as conn:
+        observations = conn.execute("SELECT location_name, temp_c FROM weather_observations").fetchall()
+    assert observations == [('New York', 20)]
+
+def test_backfill_coordinates(favorites_model, sample_user1, sample_location1, mocker):
+    """Test that favorites without coordinates are geocoded and updated in chunks."""
+    favorites_model.add_favorite_location(1, {'name': 'Paris'})
+    favorites_model.add_favorite_location(1, {'name': 'Atlantis'})
+    favorites_model.add_favorite_location(1, {'name': 'Paris'})
+    favorites_model.add_favorite_location(1, sample_location1)
+
+    mocker.patch('weather.models.favorites_model.batch_get_latitude_longitude',
+                 return_value={'Paris': (48.85, 2.35), 'Atlantis': None})
+
+    stats = favorites_model.backfill_coordinates(chunk_size=1)
+
+    assert stats == {'locations': 2, 'resolved': 1, 'rows_updated': 2}
+    locations = favorites_model.get_favorite_locations(1)
+    assert [loc for loc in locations if loc['name'] == 'Paris'] == [FavoriteLocation('Paris', 48.85, 2.35)] * 2
+    assert [loc['lat'] for loc in locations if loc['name'] == 'Atlantis'] == [None]
+
+def test_backfill_coordinates_invalid_chunk_size(favorites_model):
+    """Test that a non-positive chunk size is rejected."""
+    with pytest.raises(ValueError, match="Invalid chunk size: 0"):
+        favorites_model.backfill_coordinates(chunk_size=0)
+
+def test_get_dashboard_fetches_missing_weather(favorites_model, sample_user1, sample_location1, mocker):
+    """Test that favorites without stored weather are fetched and returned fresh."""
+    favorites_model.add_favorite_location(1, sample_location1)
+    favorites_model.add_favorite_location(1, {'name': 'Nowhere'})
+    mock_fetch = mocker.patch('weather.models.favorites_model.fetch_current_weather',
+                              return_value={'observed_at': int(time.time()), 'temp_c': 21.0, 'condition': 'Sunny'})
+
+    dashboard = favorites_model.get_dashboard(1)
+
+    mock_fetch.assert_called_once_with(40.7128, -74.0060)
+    assert [entry['name'] for entry in dashboard] == ['New York', 'Nowhere']
+    assert dashboard[0]['weather']['temp_c'] == 21.0
+    assert dashboard[0]['stale'] is False
+    assert dashboard[1]['weather'] is None
+    assert dashboard[1]['stale'] is True
+
+def test_get_dashboard_uses_stored_weather(favorites_model, sample_user1, sample_location1, mocker):
+    """Test that recent stored observations are served without an upstream call."""
+    favorites_model.add_favorite_location(1, sample_location1)
+    favorites_model.observations.record_observation('New York', 40.7128, -74.0060,
+                                                    {'observed_at': int(time.time()) - 60, 'temp_c': 18.0})
+    mock_fetch = mocker.patch('weather.models.favorites_model.fetch_current_weather')
+
+    dashboard = favorites_model.get_dashboard(1, max_age=600)
+
+    mock_fetch.assert_not_called()
+    assert dashboard[0]['weather']['temp_c'] == 18.0
+    assert dashboard[0]['age_seconds'] >= 60
+    assert dashboard[0]['stale'] is False
+
+def test_get_dashboard_ranks_by_earlier_reads(favorites_model, sample_user1, sample_location1, mocker):
+    """Test that fetches are scheduled before this read is counted, and served favorites are counted after."""
+    favorites_model.add_favorite_location(1, sample_location1)
+    mocker.patch('weather.models.favorites_model.fetch_current_weather',
+                 return_value={'observed_at': int(time.time()), 'temp_c': 21.0})
+    manager = mocker.patch('weather.models.favorites_model.quota_manager')
+    manager.schedule.side_effect = lambda provider, fetches: ([name for name, _ in fetches], [])
+
+    favorites_model.get_dashboard(1)
+
+    assert [call[0] for call in manager.method_calls] == ['schedule', 'record_read']
+    manager.record_read.assert_called_once_with('New York')
+
+def test_get_dashboard_budget_exceeded(favorites_model, sample_user1, sample_location1, mocker):
+    """Test that a fetch missing the budget leaves the old observation marked stale."""
+    favorites_model.add_favorite_location(1, sample_location1)
+    favorites_model.observations.record_observation('New York', 40.7128, -74.0060,
+                                                    {'observed_at': int(time.time()) - 7200, 'temp_c': 10.0})
+    release = threading.Event()
+
+    def slow_fetch(lat, lon):
+        release.wait(5)
+        raise requests.RequestException("too slow")
+
+    mocker.patch('weather.models.favorites_model.fetch_current_weather', side_effect=slow_fetch)
+
+    dashboard = favorites_model.get_dashboard(1, max_age=600, budget=0.05)
+    release.set()
+
+    assert dashboard[0]['weather']['temp_c'] == 10.0
+    assert dashboard[0]['stale'] is True
+
+def test_get_dashboard_joins_queued_loads(favorites_model, sample_user1, sample_location1, mocker):
+    """Test that repeated dashboards missing their budget wait on the one load already queued for a location."""
+    favorites_model.add_favorite_location(1, sample_location1)
+    release = threading.Event()
+    calls = []
+
+    def slow_fetch(lat, lon):
+        calls.append(1)
+        release.wait(5)
+        return {'observed_at': int(time.time()), 'temp_c': 14.0}
+
+    mocker.patch('weather.models.favorites_model.fetch_current_weather', side_effect=slow_fetch)
+    submit = mocker.spy(favorites_module._fetch_executor, 'submit')
+
+    for _ in range(3):
+        assert favorites_model.get_dashboard(1, budget=0.01)[0]['weather'] is None
+    release.set()
+
+    assert submit.call_count == 1
+    assert favorites_model.get_dashboard(1, budget=5)[0]['weather']['temp_c'] == 14.0
+    assert calls == [1]
+
+def test_get_dashboard_serves_stale_while_revalidating(favorites_model, sample_user1, sample_location1, mocker):
+    """Test that recently expired weather is returned at once and refreshed in the background."""
+    favorites_model.add_favorite_location(1, sample_location1)
+    favorites_model.observations.record_observation('New York', 40.7128, -74.0060,
+                                                    {'observed_at': int(time.time()) - 900, 'temp_c': 12.0})
+    release = threading.Event()
+
+    def slow_fetch(lat, lon):
+        release.wait(5)
+        return {'observed_at': int(time.time()), 'temp_c': 14.0}
+
+    mocker.patch('weather.models.favorites_model.fetch_current_weather', side_effect=slow_fetch)
+
+    started = time.time()
+    dashboard = favorites_model.get_dashboard(1, max_age=600, budget=5)
+
+    assert time.time() - started < 1
+    assert dashboard[0]['weather']['temp_c'] == 12.0
+    assert dashboard[0]['cache'] == 'stale'
+    assert dashboard[0]['stale'] is True
+
+    release.set()
+    while weather_cache.stats()['in_flight']:
+        time.sleep(0.01)
+    assert favorites_model.get_dashboard(1, max_age=600)[0]['weather']['temp_c'] == 14.0
+
+def test_get_dashboard_serves_last_weather_while_upstream_fails(favorites_model, sample_user1, sample_location1, mocker):
+    """Test that a failing upstream is answered with the last observation until the stale-if-error limit."""
+    favorites_model.add_favorite_location(1, sample_location1)
+    favorites_model.observations.record_observation('New York', 40.7128, -74.0060,
+                                                    {'observed_at': int(time.time()) - 7200, 'temp_c': 10.0})
+    mocker.patch('weather.models.favorites_model.fetch_current_weather',
+                 side_effect=requests.RequestException("upstream down"))
+
+    dashboard = favorites_model.get_dashboard(1, max_age=600)
+
+    assert dashboard[0]['weather']['temp_c'] == 10.0
+    assert dashboard[0]['cache'] == 'stale-if-error'
+
+    mocker.patch.object(weather_cache, 'stale_if_error', 3600)
+    dashboard = favorites_model.get_dashboard(1, max_age=600)
+
+    assert dashboard[0]['weather'] is None
+    assert dashboard[0]['stale'] is True
 
 ##################################################
 # Utility Function Test Cases
@@ -125,4 +340,4 @@ def test_check_if_empty_with_full_favorites(favorites_model, sample_location1):
 def test_check_if_empty_with_empty_favorites(favorites_model):
     """Test check_if_empty raises error when favorites is empty."""
     with pytest.raises(ValueError, match="No favorite locations found"):
-        favorites_model.check_if_empty()
\ No newline at end of file
+        favorites_model.check_if_empty()
@@ -0,0 +1,143 @@
+from array import array
+import math
+import os
+import sqlite3
+
+import pytest
+
+from weather.models.forecast_model import FORECAST_FIELDS, ForecastModel, pack_series, unpack_series
+
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), '..', 'sql', 'create_user_table.sql')
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Fixture to provide a temporary database with the application schema."""
+    path = str(tmp_path / "test.db")
+    with sqlite3.connect(path) as conn:
+        with open(SCHEMA_PATH) as f:
+            conn.executescript(f.read())
+        conn.execute("INSERT INTO users (id, username, email, password, salt) VALUES (1, 'user1', 'u1@email.com', 'pw', 'salt')")
+        conn.executemany("INSERT INTO user_favorites (user_id, location_name, latitude, longitude) VALUES (?, ?, ?, ?)",
+                         [(1, 'London', 51.5, -0.12), (1, 'Nowhere', None, None)])
+    return path
+
+@pytest.fixture
+def forecast_model(db_path):
+    """Fixture to provide a new instance of ForecastModel for each test."""
+    return ForecastModel(db_path)
+
+def make_series(hours, offset=0.0):
+    return {field: array('f', (float(hour) + offset for hour in range(hours))) for field in FORECAST_FIELDS}
+
+def forecast_payload(start_time, hours):
+    return {'forecast': {'forecastday': [{'hour': [
+        {'time_epoch': start_time + hour * 3600, **{field: float(hour) for field in FORECAST_FIELDS}}
+        for hour in range(hours)
+    ]}]}}
+
+##################################################
+# Serialization Test Cases
+##################################################
+
+def test_pack_unpack_series_slice():
+    """Test that a slice of a packed series is decoded without the rest."""
+    blob = pack_series(array('f', [0.5, 1.5, 2.5, 3.5]))
+    assert len(blob) == 16
+    assert unpack_series(blob).tolist() == [0.5, 1.5, 2.5, 3.5]
+    assert unpack_series(blob, 1, 3).tolist() == [1.5, 2.5]
+
+##################################################
+# Storage Test Cases
+##################################################
+
+def test_store_forecast_is_one_row(forecast_model, db_path):
+    """Test that a location's forecast is stored as a single row."""
+    forecast_model.store_forecast('London', 51.5, -0.12, 1000, make_series(72))
+    forecast_model.store_forecast('London', 51.5, -0.12, 4600, make_series(72))
+
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute("SELECT start_time, hours, length(temp_c) FROM location_forecasts").fetchall()
+    assert rows == [(4600, 72, 72 * 4)]
+
+def test_store_forecast_mismatched_lengths(forecast_model):
+    """Test that series of different lengths are rejected."""
+    series = make_series(24)
+    series['temp_c'] = array('f', [1.0])
+    with pytest.raises(ValueError, match="equal-length series"):
+        forecast_model.store_forecast('London', 51.5, -0.12, 0, series)
+
+def test_get_forecast_window(forecast_model):
+    """Test slicing a time window out of the stored series."""
+    forecast_model.store_forecast('London', 51.5, -0.12, 3600, make_series(48))
+
+    windows = forecast_model.get_forecast_window(1, 3 * 3600 + 1, 6 * 3600, ['temp_c', 'wind_kph'])
+
+    assert windows == [{
+        'name': 'London', 'lat': 51.5, 'lon': -0.12, 'start_time': 4 * 3600, 'step_seconds': 3600,
+        'temp_c': [3.0, 4.0], 'wind_kph': [3.0, 4.0],
+    }]
+
+def test_get_forecast_window_outside_range(forecast_model):
+    """Test that a window outside the stored range returns empty series."""
+    forecast_model.store_forecast('London', 51.5, -0.12, 3600, make_series(24))
+    windows = forecast_model.get_forecast_window(1, 100 * 3600, 200 * 3600, ['temp_c'])
+    assert windows[0]['temp_c'] == []
+
+def test_get_forecast_window_invalid_field(forecast_model):
+    """Test that unknown fields are rejected."""
+    with pytest.raises(ValueError, match="Unknown forecast fields: pressure"):
+        forecast_model.get_forecast_window(1, 0, 3600, ['pressure'])
+
+##################################################
+# Fetching Test Cases
+##################################################
+
+def test_refresh_user_forecasts(forecast_model, mocker):
+    """Test that only geocoded favorites are fetched and stored."""
+    mock_response = mocker.Mock()
+    mock_response.raise_for_status.return_value = None
+    mock_response.json.return_value = forecast_payload(7200, 24)
+    mock_requests = mocker.patch('requests.get', return_value=mock_response)
+
+    assert forecast_model.refresh_user_forecasts(1, days=1) == 1
+    assert mock_requests.call_count == 1
+    assert forecast_model.get_forecast_window(1, 7200, 7200 + 2 * 3600, ['temp_c'])[0]['temp_c'] == [0.0, 1.0]
+
+def test_fetch_forecast_null_fields_are_nan(forecast_model, mocker):
+    """Test that hourly fields sent as null or left out are stored as NaN instead of failing the fetch."""
+    payload = forecast_payload(7200, 2)
+    payload['forecast']['forecastday'][0]['hour'][0]['temp_c'] = None
+    del payload['forecast']['forecastday'][0]['hour'][1]['chance_of_rain']
+    mock_response = mocker.Mock()
+    mock_response.raise_for_status.return_value = None
+    mock_response.json.return_value = payload
+    mocker.patch('requests.get', return_value=mock_response)
+
+    start_time, series = forecast_model.fetch_forecast(51.5, -0.12, days=1)
+
+    assert start_time == 7200
+    assert math.isnan(series['temp_c'][0]) and series['temp_c'][1] == 1.0
+    assert series['chance_of_rain'][0] == 0.0 and math.isnan(series['chance_of_rain'][1])
+
+def test_refresh_user_forecasts_no_locations(forecast_model):
+    """Test that a user without geocoded favorites raises an error."""
+    with pytest.raises(ValueError, match="No geocoded favorite locations found for user 2"):
+        forecast_model.refresh_user_forecasts(2)
+
+def test_refresh_user_forecasts_within_quota(forecast_model, mocker):
+    """Test that locations the WeatherAPI quota postpones are not fetched."""
+    mock_requests = mocker.patch('requests.get')
+    manager = mocker.patch('weather.models.forecast_model.quota_manager')
+    manager.schedule.return_value = ([], ['London'])
+
+    assert forecast_model.refresh_user_forecasts(1) == 0
+    manager.schedule.assert_called_once_with('weatherapi', mocker.ANY)
+    assert list(manager.schedule.call_args[0][1]) == [('London', 1)]
+    mock_requests.assert_not_called()
@@ -0,0 +1,101 @@
+import pytest
+
+from weather.utils import geocoding_utils
+from weather.utils.gazetteer_utils import Gazetteer, build_index
+
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+def geonames_line(geonameid, name, asciiname, lat, lon, population):
+    columns = [str(geonameid), name, asciiname, '', str(lat), str(lon), 'P', 'PPL', 'XX', '',
+               '', '', '', '', str(population), '', '', 'UTC', '2024-01-01']
+    return '\t'.join(columns) + '\n'
+
+@pytest.fixture
+def tsv_path(tmp_path):
+    """Fixture to provide a small GeoNames-style TSV file."""
+    path = tmp_path / "cities.txt"
+    path.write_text(''.join([
+        geonames_line(1, 'London', 'London', 51.5085, -0.1257, 8961989),
+        geonames_line(2, 'London', 'London', 42.9834, -81.2330, 346765),
+        geonames_line(3, 'São Paulo', 'Sao Paulo', -23.5475, -46.6361, 10021295),
+        geonames_line(4, 'Londrina', 'Londrina', -23.3103, -51.1628, 471832),
+        geonames_line(5, 'Paris', 'Paris', 48.8534, 2.3488, 2138551),
+        'not\ta\tvalid\tline\n',
+    ]), encoding='utf-8')
+    return str(path)
+
+@pytest.fixture
+def gazetteer(tsv_path, tmp_path):
+    """Fixture to provide a gazetteer built from the sample TSV file."""
+    index_path = str(tmp_path / "cities.idx")
+    build_index(tsv_path, index_path)
+    gazetteer = Gazetteer(index_path)
+    yield gazetteer
+    gazetteer.close()
+
+##################################################
+# Index Test Cases
+##################################################
+
+def test_build_index(tsv_path, tmp_path):
+    """Test that every distinct name and ascii name becomes a record."""
+    count = build_index(tsv_path, str(tmp_path / "cities.idx"))
+    assert count == 6
+
+def test_lookup_prefers_most_populous(gazetteer):
+    """Test that a shared name resolves to the most populous place."""
+    lat, lon = gazetteer.lookup("london")
+    assert lat == pytest.approx(51.5085, abs=1e-4)
+    assert lon == pytest.approx(-0.1257, abs=1e-4)
+
+def test_lookup_normalizes_and_matches_ascii_name(gazetteer):
+    """Test that lookups ignore case and spacing and match ascii names."""
+    assert gazetteer.lookup("  SAO   paulo") == gazetteer.lookup("São Paulo")
+    assert gazetteer.lookup("São Paulo") is not None
+
+def test_lookup_missing(gazetteer):
+    """Test that an unknown name returns None."""
+    assert gazetteer.lookup("Atlantis") is None
+    assert gazetteer.lookup("Lon") is None
+
+def test_search_prefix(gazetteer):
+    """Test that prefix search returns distinct names by population."""
+    names = [match[0] for match in gazetteer.search_prefix("lon")]
+    assert names == ["london", "londrina"]
+
+def test_invalid_index(tmp_path):
+    """Test that a file that is not an index is rejected."""
+    path = tmp_path / "bad.idx"
+    path.write_bytes(b"not an index at all")
+    with pytest.raises(ValueError, match="unsupported format"):
+        Gazetteer(str(path))
+
+##################################################
+# Geocoder Integration Test Cases
+##################################################
+
+def test_get_latitude_longitude_uses_gazetteer(gazetteer, mocker):
+    """Test that the geocoder answers from the gazetteer without calling the API."""
+    geocoding_utils.geocode_cache.clear()
+    mocker.patch('weather.utils.geocoding_utils.get_offline_geocoder', return_value=gazetteer)
+    mock_requests = mocker.patch('requests.get')
+
+    assert geocoding_utils.get_latitude_longitude("Paris") == gazetteer.lookup("paris")
+    mock_requests.assert_not_called()
+    geocoding_utils.geocode_cache.clear()
+
+def test_unreadable_gazetteer_is_opened_once(tmp_path, mocker):
+    """Test that a missing gazetteer is tried and logged once, then left to Open-Meteo."""
+    mocker.patch('weather.utils.geocoding_utils.GAZETTEER_PATH', str(tmp_path / "missing.idx"))
+    mocker.patch('weather.utils.geocoding_utils._offline_geocoder', None)
+    mocker.patch('weather.utils.geocoding_utils._offline_opened', False)
+    warning = mocker.patch.object(geocoding_utils.logger, 'warning')
+
+    assert geocoding_utils.get_offline_geocoder() is None
+    assert geocoding_utils.get_offline_geocoder() is None
+    assert warning.call_count == 1
@@ -0,0 +1,115 @@
+import pytest
+
+from weather.utils import geocoding_utils
+from weather.utils.geocoding_utils import (
+    batch_get_latitude_longitude,
+    get_latitude_longitude,
+    normalize_location_name
+)
+from weather.utils.rate_limit_utils import RateLimiter
+
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+@pytest.fixture(autouse=True)
+def clear_geocode_cache():
+    """Fixture to start every test with an empty geocode cache."""
+    geocoding_utils.geocode_cache.clear()
+    yield
+    geocoding_utils.geocode_cache.clear()
+
+@pytest.fixture
+def mock_geocode_api(mocker):
+    """Fixture to answer geocoding requests with coordinates derived from the name."""
+    def fake_get(url, params=None, **kwargs):
+        response = mocker.Mock()
+        response.raise_for_status.return_value = None
+        name = params['name']
+        if name.strip().lower() == 'atlantis':
+            response.json.return_value = {}
+        else:
+            response.json.return_value = {'results': [{'latitude': float(len(name)), 'longitude': 1.0}]}
+        return response
+
+    return mocker.patch('requests.get', side_effect=fake_get)
+
+##################################################
+# Normalization Test Cases
+##################################################
+
+def test_normalize_location_name():
+    """Test that case and whitespace variants normalize to the same key."""
+    assert normalize_location_name("  New   York ") == "new york"
+    assert normalize_location_name("NEW YORK") == normalize_location_name("new york")
+
+##################################################
+# Single Lookup Test Cases
+##################################################
+
+def test_get_latitude_longitude_uses_cache(mock_geocode_api):
+    """Test that a repeated lookup of the same city is answered from the cache."""
+    assert get_latitude_longitude("Paris") == (5.0, 1.0)
+    assert get_latitude_longitude(" paris ") == (5.0, 1.0)
+    assert mock_geocode_api.call_count == 1
+    assert mock_geocode_api.call_args.kwargs['timeout'] == geocoding_utils.REQUEST_TIMEOUT
+
+def test_get_latitude_longitude_not_found(mock_geocode_api):
+    """Test that an unknown city returns None and is not cached."""
+    assert get_latitude_longitude("Atlantis") is None
+    assert get_latitude_longitude("Atlantis") is None
+    assert mock_geocode_api.call_count == 2
+
+##################################################
+# Batch Lookup Test Cases
+##################################################
+
+def test_batch_get_latitude_longitude_deduplicates(mock_geocode_api):
+    """Test that spelling variants of one place cost a single upstream call."""
+    results = batch_get_latitude_longitude(["London", "london ", "LONDON", "Rome"])
+
+    assert results == {
+        "London": (6.0, 1.0),
+        "london ": (6.0, 1.0),
+        "LONDON": (6.0, 1.0),
+        "Rome": (4.0, 1.0),
+    }
+    assert mock_geocode_api.call_count == 2
+
+def test_batch_get_latitude_longitude_skips_cached(mock_geocode_api):
+    """Test that cached names are not requested again in a batch."""
+    get_latitude_longitude("Rome")
+    mock_geocode_api.reset_mock()
+
+    results = batch_get_latitude_longitude(["Rome", "Atlantis"])
+
+    assert results == {"Rome": (4.0, 1.0), "Atlantis": None}
+    assert mock_geocode_api.call_count == 1
+
+def test_batch_get_latitude_longitude_rate_limited(mock_geocode_api, mocker):
+    """Test that every upstream request takes a token from the rate limiter."""
+    limiter = RateLimiter(1000)
+    acquire = mocker.spy(limiter, 'acquire')
+
+    batch_get_latitude_longitude(["Oslo", "Lima", "Kyiv"], rate_limiter=limiter)
+
+    assert acquire.call_count == 3
+
+def test_single_lookup_rate_limited(mock_geocode_api, mocker):
+    """Test that single lookups take a token from the same limiter as batches."""
+    acquire = mocker.spy(geocoding_utils.geocode_rate_limiter, 'acquire')
+
+    get_latitude_longitude("Oslo")
+    get_latitude_longitude("Oslo")
+
+    assert acquire.call_count == 1
+
+def test_cached_names_keep_their_spelling(mock_geocode_api):
+    """Test that cached names are listed as first spelled, not as their normalized keys."""
+    get_latitude_longitude("  New   York ")
+    batch_get_latitude_longitude(["São Paulo", "são paulo"])
+
+    assert sorted(geocoding_utils.cached_location_names()) == ["New York", "São Paulo"]
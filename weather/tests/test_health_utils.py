@@ -0,0 +1,69 @@
+import time
+
+from weather.utils.health_utils import HealthMonitor
+
+
+##################################################
+# Health Monitor Test Cases
+##################################################
+
+def test_status_before_first_run_is_not_ready():
+    """Test that an instance is not ready before any check has run."""
+    monitor = HealthMonitor()
+    monitor.add_check('database', lambda: None)
+
+    assert monitor.status() == {'ready': False, 'checks': {}}
+
+def test_failing_critical_check_is_not_ready():
+    """Test that a failing critical check makes the instance not ready and reports its error."""
+    def broken():
+        raise Exception("unable to open database file")
+
+    monitor = HealthMonitor()
+    monitor.add_check('database', broken)
+    monitor.run_checks()
+
+    status = monitor.status()
+    assert not status['ready']
+    assert status['checks']['database']['error'] == "unable to open database file"
+
+def test_failing_non_critical_check_stays_ready():
+    """Test that non-critical checks are reported without affecting readiness."""
+    def upstream_down():
+        raise Exception("timeout")
+
+    monitor = HealthMonitor()
+    monitor.add_check('database', lambda: {'tables': 2})
+    monitor.add_check('upstream', upstream_down, critical=False)
+    monitor.run_checks()
+
+    status = monitor.status()
+    assert status['ready']
+    assert status['checks']['database']['details'] == {'tables': 2}
+    assert not status['checks']['upstream']['ok']
+
+def test_stale_results_are_not_ready():
+    """Test that results older than stale_after no longer count as passing."""
+    monitor = HealthMonitor(interval=10, stale_after=0.01)
+    monitor.add_check('database', lambda: None)
+    monitor.run_checks()
+    time.sleep(0.02)
+
+    status = monitor.status()
+    assert not status['ready']
+    assert "old" in status['checks']['database']['error']
+
+def test_background_thread_refreshes_results():
+    """Test that checks keep running in the background and probes only read the cache."""
+    calls = []
+    monitor = HealthMonitor(interval=0.01)
+    monitor.add_check('database', lambda: calls.append(1))
+    monitor.start()
+    time.sleep(0.1)
+    monitor.stop()
+
+    runs = len(calls)
+    assert runs > 1
+    for _ in range(100):
+        monitor.status()
+    assert len(calls) == runs
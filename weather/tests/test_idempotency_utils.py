@@ -0,0 +1,159 @@
+import threading
+import time
+
+from flask import Flask, jsonify
+import pytest
+
+from weather.utils.idempotency_utils import (EXECUTE, IN_PROGRESS, REPLAY, IdempotencyStore,
+                                            SharedIdempotencyStore, StoredResponse, idempotent)
+
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+class CountingView:
+    """A view returning 201 (or the configured status) and counting its calls."""
+
+    def __init__(self):
+        self.calls = 0
+        self.status = 201
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        return jsonify({'call': self.calls}), self.status
+
+@pytest.fixture
+def view():
+    return CountingView()
+
+@pytest.fixture
+def shared_path(tmp_path):
+    """Fixture to provide the path of a shared store file that does not exist yet."""
+    return str(tmp_path / "shared_cache.db")
+
+@pytest.fixture(params=["local", "shared"])
+def store(request, shared_path):
+    """Fixture to provide a store kept in process memory, then one kept in a shared file."""
+    if request.param == "local":
+        return IdempotencyStore(wait_timeout=5)
+    return SharedIdempotencyStore(shared_path, wait_timeout=5)
+
+def make_client(view, store):
+    app = Flask(__name__)
+    app.add_url_rule('/items', 'items', idempotent(store)(view), methods=['POST'])
+    return app.test_client()
+
+@pytest.fixture
+def client(view, store):
+    """Fixture to provide a test client for an app with one idempotent route."""
+    return make_client(view, store)
+
+def post(client, key=None, body=None):
+    headers = {'Idempotency-Key': key} if key is not None else {}
+    return client.post('/items', json=body or {'name': 'a'}, headers=headers)
+
+##################################################
+# Idempotency Test Cases
+##################################################
+
+def test_retry_replays_stored_response(client, view):
+    """Test that a retry with the same key gets the first response without running the view."""
+    first = post(client, 'key-1')
+    retry = post(client, 'key-1')
+
+    assert view.calls == 1
+    assert retry.status_code == 201
+    assert retry.get_json() == first.get_json() == {'call': 1}
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+
+def test_requests_without_key_always_run(client, view):
+    """Test that requests without the header are not deduplicated."""
+    post(client)
+    post(client)
+
+    assert view.calls == 2
+
+def test_key_reused_for_other_body_is_rejected(client, view):
+    """Test that a key sent with a different body is refused."""
+    post(client, 'key-1', {'name': 'a'})
+
+    response = post(client, 'key-1', {'name': 'b'})
+
+    assert response.status_code == 422
+    assert view.calls == 1
+
+def test_server_errors_are_not_stored(client, view):
+    """Test that a failed request can be retried with the same key."""
+    view.status = 500
+    assert post(client, 'key-1').status_code == 500
+
+    view.status = 201
+    assert post(client, 'key-1').status_code == 201
+    assert view.calls == 2
+
+def test_concurrent_duplicate_waits_for_first(client, view, store):
+    """Test that a duplicate arriving mid-execution waits and replays the first response."""
+    view.release.clear()
+    responses = []
+    first = threading.Thread(target=lambda: responses.append(post(client, 'key-1')))
+    first.start()
+    assert view.started.wait(5)
+
+    duplicate = threading.Thread(target=lambda: responses.append(post(client, 'key-1')))
+    duplicate.start()
+    while store.stats()['waits'] == 0:
+        time.sleep(0.01)
+    view.release.set()
+    first.join(5)
+    duplicate.join(5)
+
+    assert view.calls == 1
+    assert [response.get_json() for response in responses] == [{'call': 1}, {'call': 1}]
+
+def test_invalid_key(client, view):
+    """Test that an overlong key is rejected."""
+    assert post(client, 'k' * 256).status_code == 400
+    assert view.calls == 0
+
+##################################################
+# Shared Store Test Cases
+##################################################
+
+def test_retry_on_another_worker_is_replayed(view, shared_path):
+    """Test that a retry reaching another worker's store replays the first worker's response."""
+    first_worker = make_client(view, SharedIdempotencyStore(shared_path))
+    second_worker = make_client(view, SharedIdempotencyStore(shared_path))
+
+    first = post(first_worker, 'key-1')
+    retry = post(second_worker, 'key-1')
+
+    assert view.calls == 1
+    assert retry.status_code == 201
+    assert retry.get_json() == first.get_json() == {'call': 1}
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert post(second_worker, 'key-1', {'name': 'b'}).status_code == 422
+
+def test_claim_is_seen_by_another_worker(shared_path):
+    """Test that a key being executed by one store is reported in progress by another, then replayed."""
+    first, second = SharedIdempotencyStore(shared_path), SharedIdempotencyStore(shared_path, wait_timeout=0.1)
+
+    assert first.begin('key', 'abc') == (EXECUTE, None)
+    assert second.begin('key', 'abc') == (IN_PROGRESS, None)
+    first.finish('key', StoredResponse(201, b'{}', 'application/json', 'abc'))
+
+    outcome, stored = second.begin('key', 'abc')
+    assert outcome == REPLAY and stored.body == b'{}'
+
+def test_abandoned_claims_expire(shared_path):
+    """Test that a claim left by a worker that died stops blocking the key after claim_ttl."""
+    SharedIdempotencyStore(shared_path).begin('key', 'abc')
+
+    assert SharedIdempotencyStore(shared_path, claim_ttl=0).begin('key', 'abc') == (EXECUTE, None)
@@ -0,0 +1,131 @@
+import os
+import sqlite3
+import time
+
+import pytest
+
+from weather.models.observations_model import ObservationsModel
+
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), '..', 'sql', 'create_user_table.sql')
+HOUR = 3600
+DAY = 86400
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Fixture to provide a temporary database with the application schema."""
+    path = str(tmp_path / "test.db")
+    with sqlite3.connect(path) as conn:
+        with open(SCHEMA_PATH) as f:
+            conn.executescript(f.read())
+        conn.execute("INSERT INTO users (id, username, email, password, salt) VALUES (1, 'user1', 'u1@email.com', 'pw', 'salt')")
+        conn.execute("INSERT INTO user_favorites (user_id, location_name, latitude, longitude) VALUES (1, 'London', 51.5, -0.12)")
+    return path
+
+@pytest.fixture
+def observations_model(db_path):
+    """Fixture to provide a new instance of ObservationsModel for each test."""
+    return ObservationsModel(db_path)
+
+def observation(observed_at, temp_c, wind_kph=10.0):
+    return {'observed_at': observed_at, 'temp_c': temp_c, 'feelslike_c': temp_c, 'wind_kph': wind_kph,
+            'humidity': 50.0, 'precip_mm': 0.0, 'condition': 'Sunny'}
+
+##################################################
+# Rollup Test Cases
+##################################################
+
+def test_run_rollups_aggregates_hourly_and_daily(observations_model):
+    """Test min/max/mean aggregation into hourly and daily buckets."""
+    for observed_at, temp_c in [(DAY, 10.0), (DAY + 60, 14.0), (DAY + HOUR, 20.0)]:
+        observations_model.record_observation('London', 51.5, -0.12, observation(observed_at, temp_c))
+
+    assert observations_model.run_rollups() == 3
+
+    hourly = observations_model.get_history(1, DAY, DAY + 2 * HOUR, resolution='hour')['locations']['London']
+    assert [(p['bucket_start'], p['samples'], p['temp_c_min'], p['temp_c_max'], p['temp_c_mean']) for p in hourly] == [
+        (DAY, 2, 10.0, 14.0, 12.0),
+        (DAY + HOUR, 1, 20.0, 20.0, 20.0),
+    ]
+    daily = observations_model.get_history(1, DAY, 2 * DAY, resolution='day')['locations']['London']
+    assert (daily[0]['samples'], daily[0]['temp_c_min'], daily[0]['temp_c_max']) == (3, 10.0, 20.0)
+
+def test_run_rollups_is_incremental(observations_model):
+    """Test that later runs only process new rows and merge them into existing buckets."""
+    observations_model.record_observation('London', 51.5, -0.12, observation(DAY, 10.0))
+    assert observations_model.run_rollups() == 1
+    assert observations_model.run_rollups() == 0
+
+    observations_model.record_observation('London', 51.5, -0.12, observation(DAY + 10, 0.0))
+    assert observations_model.run_rollups(batch_size=1) == 1
+
+    hourly = observations_model.get_history(1, DAY, DAY + HOUR, resolution='hour')['locations']['London']
+    assert (hourly[0]['samples'], hourly[0]['temp_c_min'], hourly[0]['temp_c_max'], hourly[0]['temp_c_mean']) == (2, 0.0, 10.0, 5.0)
+
+def test_apply_retention_keeps_unprocessed_rows(observations_model, db_path):
+    """Test that raw rows are only deleted once they have been rolled up."""
+    observations_model.record_observation('London', 51.5, -0.12, observation(DAY, 10.0))
+    now = 100 * DAY
+
+    assert observations_model.apply_retention(now)['raw_deleted'] == 0
+    observations_model.run_rollups()
+    assert observations_model.apply_retention(now) == {'raw_deleted': 1, 'hourly_deleted': 1}
+
+    daily = observations_model.get_history(1, 0, 2 * DAY, resolution='day')['locations']['London']
+    assert daily[0]['temp_c_mean'] == 10.0
+
+##################################################
+# History Test Cases
+##################################################
+
+def test_choose_resolution():
+    """Test that the resolution grows coarser with the range."""
+    now = 400 * DAY
+    assert ObservationsModel.choose_resolution(now - DAY, now, now) == 'raw'
+    assert ObservationsModel.choose_resolution(now - 30 * DAY, now, now) == 'hour'
+    assert ObservationsModel.choose_resolution(now - 365 * DAY, now, now) == 'day'
+
+def test_choose_resolution_for_old_short_range():
+    """Test that a short range past raw or hourly retention is served from the rollup that still covers it."""
+    now = 400 * DAY
+    assert ObservationsModel.choose_resolution(now - 10 * DAY, now - 9 * DAY, now) == 'hour'
+    assert ObservationsModel.choose_resolution(now - 100 * DAY, now - 99 * DAY, now) == 'day'
+
+def test_get_history_raw(observations_model):
+    """Test reading raw observations for short ranges."""
+    now = int(time.time())
+    observations_model.record_observation('London', 51.5, -0.12, observation(now, 10.0))
+    observations_model.record_observation('Paris', 48.8, 2.35, observation(now, 12.0))
+
+    history = observations_model.get_history(1, now - HOUR, now + HOUR)
+
+    assert history['resolution'] == 'raw'
+    assert list(history['locations']) == ['London']
+    assert history['locations']['London'][0]['temp_c'] == 10.0
+
+def test_get_history_invalid(observations_model):
+    """Test that invalid ranges and resolutions are rejected."""
+    with pytest.raises(ValueError, match="end must be after its start"):
+        observations_model.get_history(1, DAY, DAY)
+    with pytest.raises(ValueError, match="Invalid resolution: minute"):
+        observations_model.get_history(1, 0, DAY, resolution='minute')
+
+##################################################
+# Listener Test Cases
+##################################################
+
+def test_record_observation_notifies_listeners(observations_model):
+    """Test that listeners see each recorded observation and their errors are contained."""
+    received = []
+    observations_model.add_listener(lambda *args: received.append(args))
+    observations_model.add_listener(lambda *args: 1 / 0)
+
+    observations_model.record_observation('London', 51.5, -0.12, observation(DAY, 10.0))
+
+    assert received == [('London', 51.5, -0.12, observation(DAY, 10.0))]
@@ -0,0 +1,67 @@
+import os
+import pstats
+
+from flask import Flask
+import pytest
+
+from weather.utils.profiling_utils import RequestProfiler
+
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+def busy_work():
+    return sum(i * i for i in range(1000))
+
+def make_app(profiler):
+    app = Flask(__name__)
+    app.add_url_rule('/work', 'work', lambda: str(busy_work()))
+    profiler.install(app)
+    return app.test_client()
+
+##################################################
+# Profiler Test Cases
+##################################################
+
+def test_disabled_profiler_installs_no_hooks():
+    """Test that a profiler with no sample rate and no header adds nothing to the request path."""
+    app = Flask(__name__)
+    RequestProfiler(sample_rate=0, header_enabled=False).install(app)
+
+    assert not any(app.before_request_funcs.values())
+    assert not any(app.teardown_request_funcs.values())
+
+def test_header_forces_profiling(tmp_path):
+    """Test that requests with the debug header are profiled and written per route."""
+    profiler = RequestProfiler(sample_rate=0, header_enabled=True, output_dir=str(tmp_path))
+    client = make_app(profiler)
+
+    client.get('/work')
+    client.get('/work', headers={'X-Profile': '1'})
+    client.get('/work', headers={'X-Profile': '1'})
+
+    report = profiler.hot_functions(modules=['test_profiling_utils.py'])
+    assert report['requests'] == {'work': 2}
+    busy = [function for function in report['functions'] if function['function'].endswith('(busy_work)')]
+    assert busy[0]['calls'] == 2
+    assert pstats.Stats(os.path.join(tmp_path, 'work.pstats')).total_calls > 0
+
+def test_sample_rate_profiles_every_request(tmp_path):
+    """Test that a sample rate of one profiles every request."""
+    profiler = RequestProfiler(sample_rate=1, output_dir=None)
+    client = make_app(profiler)
+
+    for _ in range(3):
+        client.get('/work')
+
+    assert profiler.hot_functions(modules=['test_profiling_utils.py'])['requests'] == {'work': 3}
+
+def test_invalid_arguments():
+    """Test that invalid sample rates and sort orders are rejected."""
+    with pytest.raises(ValueError, match="Invalid sample rate"):
+        RequestProfiler(sample_rate=2)
+    with pytest.raises(ValueError, match="Invalid sort"):
+        RequestProfiler(sample_rate=0).hot_functions(sort="calls")
@@ -0,0 +1,64 @@
+import threading
+
+from weather.utils.pubsub_utils import PubSubHub
+
+
+##################################################
+# Publish/Subscribe Test Cases
+##################################################
+
+def test_publish_fans_out_by_topic():
+    """Test that events reach every subscriber of the topic and nobody else."""
+    hub = PubSubHub()
+    london = hub.subscribe(['London'])
+    both = hub.subscribe(['London', 'Paris'])
+    paris = hub.subscribe(['Paris'])
+
+    assert hub.publish('London', 'rain') == 2
+
+    assert london.get(timeout=0) == ['rain']
+    assert both.get(timeout=0) == ['rain']
+    assert paris.get(timeout=0) == []
+
+def test_full_queue_drops_oldest():
+    """Test drop-oldest back-pressure on a slow subscriber."""
+    hub = PubSubHub(max_queue=2)
+    subscription = hub.subscribe(['London'])
+
+    for event in [1, 2, 3]:
+        hub.publish('London', event)
+
+    assert subscription.get(timeout=0) == [2, 3]
+    assert subscription.dropped == 1
+
+def test_get_waits_for_event():
+    """Test that a waiting subscriber wakes up when an event is published."""
+    hub = PubSubHub()
+    subscription = hub.subscribe(['London'])
+    timer = threading.Timer(0.05, hub.publish, args=('London', 'sun'))
+    timer.start()
+
+    assert subscription.get(timeout=5) == ['sun']
+    timer.join()
+
+def test_close_unsubscribes():
+    """Test that closing a subscription removes it from the hub."""
+    hub = PubSubHub()
+    subscription = hub.subscribe(['London', 'Paris'])
+    assert hub.subscriber_count() == 1
+
+    subscription.close()
+
+    assert hub.subscriber_count() == 0
+    assert hub.publish('London', 'rain') == 0
+    assert subscription.closed
+
+def test_close_all_ends_every_subscription():
+    """Test that closing the hub closes and unsubscribes every subscription."""
+    hub = PubSubHub()
+    subscriptions = [hub.subscribe(['London']), hub.subscribe(['London', 'Paris'])]
+
+    hub.close_all()
+
+    assert all(subscription.closed for subscription in subscriptions)
+    assert hub.subscriber_count() == 0
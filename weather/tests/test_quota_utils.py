@@ -0,0 +1,102 @@
+import pytest
+
+from weather.utils.quota_utils import HIGH_PRIORITY, ProviderQuota, QuotaManager, SharedProviderQuota, create_quota
+
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+@pytest.fixture(params=["local", "shared"])
+def make_quota(request, tmp_path):
+    """Fixture to create provider quotas kept in process memory or in a shared file."""
+    def make(name, per_minute, per_day, reserve_fraction):
+        if request.param == "local":
+            return ProviderQuota(name, per_minute, per_day, reserve_fraction)
+        return SharedProviderQuota(name, per_minute, per_day, str(tmp_path / "shared_cache.db"), reserve_fraction)
+    return make
+
+##################################################
+# Provider Quota Test Cases
+##################################################
+
+def test_per_minute_limit_denies_excess_requests(make_quota):
+    """Test that requests beyond the per-minute bucket are refused and counted."""
+    quota = make_quota("test", per_minute=3, per_day=1000, reserve_fraction=0)
+
+    assert [quota.try_acquire() for _ in range(4)] == [True, True, True, False]
+    usage = quota.usage()
+    assert usage["used_total"] == 3
+    assert usage["denied_total"] == 1
+    assert usage["used_last_minute"] == 3
+
+def test_reserve_is_kept_for_high_priority(make_quota):
+    """Test that low-priority requests stop at the reserve while high-priority ones may use it."""
+    quota = make_quota("test", per_minute=100, per_day=10, reserve_fraction=0.5)
+
+    low = [quota.try_acquire(priority=0.1) for _ in range(10)]
+    assert low.count(True) == 5
+
+    high = [quota.try_acquire(priority=HIGH_PRIORITY) for _ in range(10)]
+    assert high.count(True) == 5
+
+def test_usage_projects_exhaustion_when_draining(make_quota):
+    """Test that a burst faster than the daily refill rate yields a projected exhaustion time."""
+    quota = make_quota("test", per_minute=100, per_day=100, reserve_fraction=0)
+    assert quota.usage()["projected_exhaustion"] is None
+
+    for _ in range(20):
+        quota.try_acquire()
+
+    usage = quota.usage()
+    assert usage["remaining_day"] == 80
+    assert usage["projected_exhaustion"] is not None
+
+def test_shared_quota_is_spent_across_workers(tmp_path):
+    """Test that two workers' quotas on one file share a single budget."""
+    path = str(tmp_path / "shared_cache.db")
+    first, second = (SharedProviderQuota("test", per_minute=4, per_day=1000, path=path, reserve_fraction=0)
+                     for _ in range(2))
+
+    results = [quota.try_acquire() for quota in (first, second) * 3]
+
+    assert results == [True] * 4 + [False] * 2
+    assert first.usage()["used_total"] == 4
+    assert second.usage()["denied_total"] == 2
+
+def test_create_quota_without_path_is_local(tmp_path):
+    """Test that without a shared file the quota stays in process memory."""
+    assert type(create_quota("test", 10, 100, path="")) is ProviderQuota
+    assert isinstance(create_quota("test", 10, 100, path=str(tmp_path / "q.db")), SharedProviderQuota)
+
+##################################################
+# Quota Manager Test Cases
+##################################################
+
+def test_priority_rises_with_reads_and_subscribers():
+    """Test that recent reads and more subscribers raise a location's priority."""
+    manager = QuotaManager([])
+
+    assert manager.priority("Paris", subscribers=50) > manager.priority("Lyon", subscribers=1)
+    before = manager.priority("Lyon", subscribers=1)
+    manager.record_read("Lyon")
+    assert manager.priority("Lyon", subscribers=1) > before
+
+def test_schedule_spends_budget_on_highest_priority():
+    """Test that scheduling admits the most demanded locations and postpones the rest."""
+    manager = QuotaManager([ProviderQuota("test", per_minute=2, per_day=1000, reserve_fraction=0)])
+    manager.record_read("Oslo")
+
+    allowed, postponed = manager.schedule("test", [("Lyon", 1), ("Paris", 40), ("Oslo", 1)])
+
+    assert allowed == ["Oslo", "Paris"]
+    assert postponed == ["Lyon"]
+
+def test_unknown_provider_is_not_limited():
+    """Test that providers without a configured quota are always allowed."""
+    manager = QuotaManager([])
+
+    assert manager.try_acquire("other")
+    assert manager.usage() == {}
@@ -0,0 +1,80 @@
+import json
+import sqlite3
+
+import pytest
+from flask import Flask
+
+from weather.utils.record_utils import Record, RecordJSONProvider, to_plain
+
+
+class Location(Record):
+    """A record used by the tests."""
+
+    __slots__ = ("name", "lat", "lon")
+
+    def __init__(self, name, lat, lon):
+        self.name = name
+        self.lat = lat
+        self.lon = lon
+
+
+##################################################
+# Record Test Cases
+##################################################
+
+def test_record_dict_style_access():
+    """Test that records can be read like the row dicts they replace."""
+    location = Location("Oslo", 59.9, 10.7)
+
+    assert location["name"] == "Oslo"
+    assert location.get("lat") == 59.9
+    assert location.get("missing", "default") == "default"
+    assert list(location.keys()) == ["name", "lat", "lon"]
+    with pytest.raises(KeyError):
+        location["missing"]
+
+def test_record_has_no_instance_dict():
+    """Test that records are slotted."""
+    location = Location("Oslo", 59.9, 10.7)
+
+    assert not hasattr(location, "__dict__")
+    with pytest.raises(AttributeError):
+        location.extra = 1
+
+def test_row_factory_builds_records():
+    """Test that a SQLite row factory produces records directly."""
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = Location.row_factory
+
+    rows = conn.execute("SELECT 'Oslo', 59.9, NULL").fetchall()
+
+    assert rows == [Location("Oslo", 59.9, None)]
+
+##################################################
+# Serialization Test Cases
+##################################################
+
+def test_to_plain_replaces_records_without_copying_the_rest():
+    """Test that records become dicts while containers without records are returned as they are."""
+    numbers = [1.5, None]
+    payload = {"status": "success", "numbers": numbers, "locations": [Location("Zürich", 47.3, 8.5)]}
+
+    plain = to_plain(payload)
+
+    assert plain == {"status": "success", "numbers": [1.5, None], "locations": [{"name": "Zürich", "lat": 47.3, "lon": 8.5}]}
+    assert plain["numbers"] is numbers
+    assert to_plain(numbers) is numbers
+    assert type(plain["locations"][0]) is dict
+
+def test_provider_serializes_records():
+    """Test that the Flask provider handles payloads with and without records."""
+    app = Flask(__name__)
+    app.json = RecordJSONProvider(app)
+
+    with app.app_context():
+        assert json.loads(app.json.dumps({"location": Location("Oslo", 1.0, 2.0)})) == \
+            {"location": {"name": "Oslo", "lat": 1.0, "lon": 2.0}}
+        assert app.json.dumps({"b": 1, "a": [1, 2]}) == '{"a": [1, 2], "b": 1}'
+        # Records to_plain does not look for are still serialized
+        assert json.loads(app.json.dumps({"mixed": [1, Location("Oslo", None, float("nan"))]})) == \
+            {"mixed": [1, {"name": "Oslo", "lat": None, "lon": pytest.approx(float("nan"), nan_ok=True)}]}
@@ -0,0 +1,158 @@
+import os
+import sqlite3
+
+import pytest
+
+from weather.models import user_model
+from weather.models.favorites_model import FavoritesModel
+from weather.utils import shard_utils, sql_utils
+from weather.utils.shard_utils import ShardRouter, reshard, shard_paths
+
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), '..', 'sql', 'create_user_table.sql')
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Fixture to provide a temporary database with the application schema and four users."""
+    path = str(tmp_path / "test.db")
+    with sqlite3.connect(path) as conn:
+        with open(SCHEMA_PATH) as f:
+            conn.executescript(f.read())
+        for user_id in range(1, 5):
+            conn.execute("INSERT INTO users (id, username, email, password, salt) VALUES (?, ?, ?, 'pw', 'salt')",
+                         (user_id, f"user{user_id}", f"u{user_id}@email.com"))
+            conn.execute("INSERT INTO user_favorites (user_id, location_name) VALUES (?, 'London')", (user_id,))
+        conn.execute("INSERT INTO user_favorites (user_id, location_name) VALUES (2, 'Paris')")
+    return path
+
+@pytest.fixture
+def sharded(db_path, mocker):
+    """Fixture moving the database to three shards and routing the models to them."""
+    reshard(db_path, 1, 3)
+    mocker.patch("weather.utils.shard_utils.DB_SHARDS", 3)
+    mocker.patch("weather.utils.sql_utils.DB_PATH", db_path)
+    return db_path
+
+def count(path, table):
+    with sqlite3.connect(path) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+##################################################
+# Routing Test Cases
+##################################################
+
+def test_single_shard_is_the_main_database(db_path):
+    """Test that one shard keeps everything in the main database."""
+    router = ShardRouter(db_path, 1)
+
+    assert router.paths == [db_path]
+    assert router.path_for_user(42) == db_path
+    assert len(router.scatter("SELECT id FROM users")) == 4
+
+def test_users_route_by_id(db_path):
+    """Test that consecutive IDs are spread over the shards."""
+    router = ShardRouter(db_path, 3)
+
+    assert [router.shard_index(user_id) for user_id in range(1, 7)] == [0, 1, 2, 0, 1, 2]
+    assert router.path_for_user(5) == shard_paths(db_path, 3)[1]
+
+def test_invalid_shard_count(db_path):
+    """Test that shard counts SQLite cannot attach are rejected."""
+    with pytest.raises(ValueError, match="Invalid shard count"):
+        ShardRouter(db_path, 11)
+
+##################################################
+# Reshard Test Cases
+##################################################
+
+def test_reshard_moves_rows_to_their_shards(db_path):
+    """Test that resharding partitions users and favorites by ID and empties the main tables."""
+    assert reshard(db_path, 1, 3) == {"users": 4, "favorites": 5}
+
+    paths = shard_paths(db_path, 3)
+    assert [count(path, "users") for path in paths] == [2, 1, 1]
+    assert [count(path, "user_favorites") for path in paths] == [2, 2, 1]
+    assert count(db_path, "users") == 0
+
+def test_reshard_back_to_one(db_path):
+    """Test that resharding to one shard restores the main tables and removes the shard files."""
+    reshard(db_path, 1, 3)
+    reshard(db_path, 3, 2)
+    reshard(db_path, 2, 1)
+
+    assert count(db_path, "users") == 4
+    assert count(db_path, "user_favorites") == 5
+    assert not any(os.path.exists(path) for path in shard_paths(db_path, 3))
+
+def test_catalog_connection_sees_every_shard(db_path):
+    """Test that queries joining favorites with main tables read all shards."""
+    reshard(db_path, 1, 3)
+
+    with ShardRouter(db_path, 3).connect_catalog() as conn:
+        rows = conn.execute("SELECT user_id FROM user_favorites WHERE location_name = 'London' ORDER BY user_id").fetchall()
+
+    assert rows == [(1,), (2,), (3,), (4,)]
+
+##################################################
+# Sharded Model Test Cases
+##################################################
+
+def test_favorites_model_on_shards(sharded):
+    """Test that favorites are written to and read from the user's shard and counted across shards."""
+    model = FavoritesModel(sharded)
+    model.add_favorite_location(3, {'name': 'Oslo', 'lat': 59.9, 'lon': 10.7})
+
+    assert count(shard_paths(sharded, 3)[2], "user_favorites") == 2
+    assert [loc['name'] for loc in model.get_favorite_locations(3)] == ['London', 'Oslo']
+    assert model.get_user(2)['username'] == 'user2'
+    assert sorted(model.get_location_popularity()) == [('London', 4), ('Oslo', 1), ('Paris', 1)]
+    assert model.get_favorites_length() == 6
+
+def test_user_model_on_shards(sharded, mocker):
+    """Test that new users get IDs routing to their shard and are listed from every shard."""
+    mocker.patch("weather.utils.write_queue_utils.WRITE_QUEUE_ENABLED", False)
+
+    user_model.create_user(id=None, username="newuser", email="new@email.com", password="Passwords1")
+
+    users = user_model.get_all_users()
+    new_user = users[-1]
+    router = shard_utils.get_shard_router(sql_utils.DB_PATH)
+    assert [user.id for user in users[:-1]] == [1, 2, 3, 4]
+    assert router.shard_index(new_user.id) == router.shard_for_username("newuser")
+    assert user_model.login_user("newuser", "Passwords1")
+
+    with pytest.raises(ValueError, match="already exists"):
+        user_model.create_user(id=None, username="user4", email="other@email.com", password="Passwords1")
+
+def test_email_is_unique_across_shards(sharded, mocker):
+    """Test that two users with one email on different shards cannot both be created, even when both pass the check."""
+    mocker.patch("weather.utils.write_queue_utils.WRITE_QUEUE_ENABLED", False)
+    router = shard_utils.get_shard_router(sql_utils.DB_PATH)
+    names = [f"racer{i}" for i in range(20)]
+    first = names[0]
+    second = next(name for name in names if router.shard_for_username(name) != router.shard_for_username(first))
+    # Both creations read the shards before either user is written
+    mocker.patch.object(router, "scatter", return_value=[])
+
+    user_model.create_user(id=None, username=first, email="same@email.com", password="Passwords1")
+    with pytest.raises(ValueError, match="already exists"):
+        user_model.create_user(id=None, username=second, email="same@email.com", password="Passwords1")
+
+    assert sum(count(path, "users") for path in router.paths) == 5
+
+def test_existing_emails_are_claimed_by_reshard(sharded, mocker):
+    """Test that a user created after a 1 to N reshard cannot take the email of a user moved by it."""
+    mocker.patch("weather.utils.write_queue_utils.WRITE_QUEUE_ENABLED", False)
+    router = shard_utils.get_shard_router(sql_utils.DB_PATH)
+    # Only the claims can catch the duplicate
+    mocker.patch.object(router, "scatter", return_value=[])
+
+    with pytest.raises(ValueError, match="already exists"):
+        user_model.create_user(id=None, username="newcomer", email="u3@email.com", password="Passwords1")
+    assert sum(count(path, "users") for path in router.paths) == 4
@@ -0,0 +1,139 @@
+import multiprocessing
+import pickle
+import sqlite3
+import time
+
+import pytest
+
+from weather.utils.cache_utils import FRESH, StaleWhileRevalidateCache, TTLCache
+from weather.utils.shared_cache_utils import SharedCache, create_cache
+
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+@pytest.fixture
+def path(tmp_path):
+    """Fixture to provide the path of a shared cache file that does not exist yet."""
+    return str(tmp_path / "shared_cache.db")
+
+def store_in_child(path, key, value):
+    SharedCache(path, "weather").set(key, value)
+
+##################################################
+# Shared Cache Test Cases
+##################################################
+
+def test_entries_are_shared_between_instances(path):
+    """Test that a value set through one instance is read through another with its age."""
+    SharedCache(path, "geocode").set("london", (51.5, -0.12), stored_at=time.time() - 30)
+
+    value, age = SharedCache(path, "geocode").get_entry("london")
+    assert value == (51.5, -0.12)
+    assert age == pytest.approx(30, abs=5)
+    assert SharedCache(path, "weather").get("london") is None
+
+def test_entries_are_shared_between_processes(path):
+    """Test that a value stored by another process is visible here."""
+    cache = SharedCache(path, "weather")
+    assert cache.get("Paris") is None
+
+    child = multiprocessing.get_context("fork").Process(target=store_in_child, args=(path, "Paris", {"temp_c": 20.5}))
+    child.start()
+    child.join(10)
+
+    assert child.exitcode == 0
+    assert cache.get("Paris") == {"temp_c": 20.5}
+
+def test_expired_entries_are_removed(path):
+    """Test that an entry older than the ttl is a miss and is deleted."""
+    cache = SharedCache(path, "users", ttl=60)
+    cache.set("1", "alice", stored_at=time.time() - 120)
+
+    assert cache.get_entry("1") is None
+    assert len(cache) == 0
+    assert cache.stats()["misses"] == 1
+
+def test_least_recently_used_entries_are_evicted(path):
+    """Test that the oldest entries are evicted once the cache holds more than max_entries."""
+    cache = SharedCache(path, "geocode", max_entries=3)
+    for i in range(5):
+        cache.set(f"city{i}", (float(i), float(i)))
+
+    assert [key for key, _, _ in cache.items()] == ["city2", "city3", "city4"]
+    assert cache.stats()["evictions"] == 2
+
+def test_set_if_newer_keeps_newest_value(path):
+    """Test that a conditional set only replaces an older value, in both cache backends."""
+    for cache in (SharedCache(path, "weather"), TTLCache()):
+        assert cache.set_if_newer("k", "new", 200.0)
+        assert not cache.set_if_newer("k", "old", 100.0)
+        assert cache.get("k") == "new"
+
+def test_stale_while_revalidate_over_shared_entries(path):
+    """Test that a value loaded by one worker's cache is answered fresh by another's."""
+    first, second = (StaleWhileRevalidateCache(60, 60, 600, entries=SharedCache(path, "weather")) for _ in range(2))
+    first.load("London", lambda: {"temp_c": 12.0})
+
+    assert second.lookup("London", lambda: None)[::2] == ({"temp_c": 12.0}, FRESH)
+
+def test_values_keep_tuples_and_are_stored_as_json(path):
+    """Test that tuples come back as tuples and the file holds JSON rather than pickles."""
+    cache = SharedCache(path, "geocode")
+    cache.set("são paulo", (-23.55, -46.63, "São Paulo"))
+    cache.set("nested", {"point": (1.0, 2.0), "names": ["a", "b"], "temp_c": None})
+
+    assert cache.get("são paulo") == (-23.55, -46.63, "São Paulo")
+    assert isinstance(cache.get("são paulo"), tuple)
+    assert cache.get("nested") == {"point": (1.0, 2.0), "names": ["a", "b"], "temp_c": None}
+    with sqlite3.connect(path) as conn:
+        stored = conn.execute("SELECT value FROM cache_entries WHERE key = 'são paulo'").fetchone()[0]
+    assert stored == '{"__tuple__":[-23.55,-46.63,"São Paulo"]}'
+
+def test_pickled_entries_are_never_loaded(path, mocker):
+    """Test that a pickle written into the file by another process is a miss and is not unpickled."""
+    cache = SharedCache(path, "weather")
+    cache.set("London", {"temp_c": 12.0})
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE cache_entries SET value = ? WHERE key = 'London'", (pickle.dumps({"temp_c": 1.0}),))
+    loads = mocker.patch("pickle.loads")
+
+    assert cache.get("London") is None
+    assert list(cache.items()) == []
+    loads.assert_not_called()
+
+def test_database_errors_are_misses(path, mocker):
+    """Test that a locked or broken cache file makes every operation miss or do nothing instead of raising."""
+    cache = SharedCache(path, "weather")
+    cache.set("London", {"temp_c": 12.0})
+    mocker.patch.object(cache, "_connect", side_effect=sqlite3.OperationalError("database is locked"))
+
+    assert cache.get("London") is None
+    cache.set("Paris", {"temp_c": 20.0})
+    assert not cache.set_if_newer("Paris", {"temp_c": 21.0}, time.time())
+    cache.delete("London")
+    cache.clear()
+    assert cache.evict() == 0
+    assert list(cache.items()) == [] and len(cache) == 0
+    assert cache.stats()["size"] is None
+
+def test_failed_touch_still_returns_the_value(path):
+    """Test that a hit is served while another process holds the write lock that moving it would need."""
+    cache = SharedCache(path, "weather", timeout=0.05)
+    cache.set("London", {"temp_c": 12.0}, stored_at=time.time() - 120)
+    writer = sqlite3.connect(path, isolation_level=None)
+    writer.execute("UPDATE cache_entries SET used_at = used_at - 120")
+    writer.execute("BEGIN IMMEDIATE")
+    try:
+        assert cache.get("London") == {"temp_c": 12.0}
+    finally:
+        writer.execute("ROLLBACK")
+        writer.close()
+
+def test_create_cache_without_path_is_local(path):
+    """Test that without a shared cache file the cache stays in process memory."""
+    assert isinstance(create_cache("geocode", 10, path=""), TTLCache)
+    assert isinstance(create_cache("geocode", 10, path=path), SharedCache)
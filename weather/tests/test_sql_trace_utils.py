@@ -0,0 +1,111 @@
+from flask import Flask
+import pytest
+
+from weather.utils import sql_trace_utils
+from weather.utils.sql_trace_utils import QueryTrace, SQLTracer, fingerprint, traced_connect
+
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Fixture to provide a database with a few favorites."""
+    path = str(tmp_path / "trace.db")
+    conn = traced_connect(path)
+    conn.execute("CREATE TABLE user_favorites (id INTEGER PRIMARY KEY, user_id INTEGER, location_name TEXT)")
+    conn.executemany("INSERT INTO user_favorites (user_id, location_name) VALUES (?, ?)",
+                     [(1, "Oslo"), (1, "Rome"), (2, "Lima")])
+    conn.commit()
+    conn.close()
+    return path
+
+@pytest.fixture
+def trace():
+    """Fixture to make a fresh trace the active one for the test."""
+    trace = QueryTrace()
+    token = sql_trace_utils._current_trace.set(trace)
+    yield trace
+    sql_trace_utils._current_trace.reset(token)
+
+def make_app(tracer, db_path, lookups):
+    app = Flask(__name__)
+
+    def locations():
+        conn = traced_connect(db_path)
+        try:
+            for user_id in range(1, lookups + 1):
+                conn.execute("SELECT location_name FROM user_favorites WHERE user_id = ?", (user_id,)).fetchall()
+        finally:
+            conn.close()
+        return "ok"
+
+    app.add_url_rule('/locations', 'locations', locations)
+    tracer.install(app)
+    return app.test_client()
+
+##################################################
+# Fingerprint Test Cases
+##################################################
+
+def test_fingerprint_ignores_literals_and_whitespace():
+    """Test that statements differing only in literals, spacing or list length share a fingerprint."""
+    assert fingerprint("SELECT *  FROM users\n WHERE id = 5 AND name = 'bob'") == \
+        fingerprint("SELECT * FROM users WHERE id = 12 AND name = 'o''neil'")
+    assert fingerprint("SELECT * FROM users WHERE id IN (?, ?)") == \
+        fingerprint("SELECT * FROM users WHERE id IN (?,?,?,?)") == "SELECT * FROM users WHERE id IN (?+)"
+
+##################################################
+# Trace Test Cases
+##################################################
+
+def test_traced_connection_records_queries_and_rows(db_path, trace):
+    """Test that statements and fetched rows are recorded in the active trace."""
+    with traced_connect(db_path) as conn:
+        conn.execute("SELECT location_name FROM user_favorites WHERE user_id = ?", (1,)).fetchall()
+        conn.execute("SELECT COUNT(*) FROM user_favorites").fetchone()
+
+    assert trace.queries == 2
+    assert trace.rows == 3
+    assert trace.fingerprints["SELECT location_name FROM user_favorites WHERE user_id = ?"][:2] == [1, 2]
+
+def test_queries_outside_a_request_are_not_recorded(db_path):
+    """Test that traced connections cost nothing when no trace is active."""
+    with traced_connect(db_path) as conn:
+        assert len(conn.execute("SELECT * FROM user_favorites").fetchall()) == 3
+
+def test_repeated_fingerprint_is_flagged(trace):
+    """Test that a fingerprint executed threshold times is reported as N+1."""
+    for _ in range(3):
+        trace.record("SELECT * FROM users WHERE id = ?", 1, 1, 0.001)
+    trace.record("SELECT COUNT(*) FROM users", 1, 1, 0.001)
+
+    assert trace.repeated(threshold=3) == {"SELECT * FROM users WHERE id = ?": 3}
+    assert trace.header(threshold=3).endswith("n_plus_one=1; max_repeat=3")
+
+##################################################
+# Tracer Test Cases
+##################################################
+
+def test_response_header_and_route_stats(db_path):
+    """Test that each response carries its trace summary and the route totals flag the N+1 loop."""
+    tracer = SQLTracer(enabled=True, threshold=3)
+    client = make_app(tracer, db_path, lookups=4)
+
+    response = client.get('/locations')
+
+    assert response.headers['X-SQL-Trace'].startswith("queries=4; rows=3;")
+    route = tracer.stats()['locations']
+    assert route['requests'] == 1
+    assert route['n_plus_one_requests'] == 1
+    assert route['n_plus_one'] == [{"query": "SELECT location_name FROM user_favorites WHERE user_id = ?",
+                                    "max_executions": 4}]
+
+def test_disabled_tracer_installs_no_hooks(db_path):
+    """Test that a disabled tracer adds no header."""
+    client = make_app(SQLTracer(enabled=False), db_path, lookups=1)
+
+    assert 'X-SQL-Trace' not in client.get('/locations').headers
@@ -0,0 +1,38 @@
+import io
+
+from flask import Flask
+
+from weather.utils.startup_utils import import_breakdown, profile_startup
+
+
+##################################################
+# Startup Profiling Test Cases
+##################################################
+
+def test_import_breakdown_lists_direct_imports():
+    """Test that a module's total import time and its direct imports are reported."""
+    total, children = import_breakdown("json")
+
+    names = [name for name, _ in children]
+    assert total > 0
+    assert "json.decoder" in names
+    assert [cumulative for _, cumulative in children] == sorted((cumulative for _, cumulative in children), reverse=True)
+
+def test_profile_startup_reports_each_phase():
+    """Test that the report covers app creation, the first health check and each lazy service."""
+    def create_app():
+        app = Flask(__name__)
+        app.add_url_rule('/api/health', 'health', lambda: {'status': 'healthy'})
+        return app
+
+    def failing():
+        raise RuntimeError("no database")
+
+    out = io.StringIO()
+    profile_startup(create_app, {'model': lambda: None, 'broken': failing}, module="json", out=out)
+
+    report = out.getvalue()
+    assert "import json:" in report
+    assert "first /api/health (200)" in report
+    assert "  model" in report
+    assert "failed: no database" in report
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import os
+import sqlite3
+
+import pytest
+
+from weather.utils.stream_utils import ObservationFeed, StreamServer, read_observations
+
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), '..', 'sql', 'create_user_table.sql')
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Fixture to provide a temporary database where user 1 follows London and user 2 follows Paris."""
+    path = str(tmp_path / "test.db")
+    with sqlite3.connect(path) as conn:
+        with open(SCHEMA_PATH) as f:
+            conn.executescript(f.read())
+        conn.executemany("INSERT INTO user_favorites (user_id, location_name, latitude, longitude) VALUES (?, ?, ?, ?)",
+                         [(1, "London", 51.5, -0.12), (2, "Paris", 48.85, 2.35)])
+    return path
+
+def record(db_path, name, temp_c):
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("INSERT INTO weather_observations (location_name, latitude, longitude, observed_at, temp_c, condition) "
+                     "VALUES (?, 0, 0, 1700000000, ?, 'Sunny')", (name, temp_c))
+
+async def open_stream(server, path):
+    reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\nAccept: text/event-stream\r\n\r\n".encode())
+    await writer.drain()
+    status = (await reader.readline()).decode()
+    while (await reader.readline()) != b"\r\n":
+        pass
+    return status, reader, writer
+
+async def next_event(reader):
+    lines = []
+    while True:
+        line = (await asyncio.wait_for(reader.readline(), 5)).decode().rstrip("\n")
+        if line:
+            lines.append(line)
+        elif lines and lines[0].startswith("event:"):
+            return json.loads(lines[1][len("data: "):])
+        else:
+            lines = []
+
+def run_with_server(db_path, scenario, **kwargs):
+    async def main():
+        server = StreamServer(db_path, host="127.0.0.1", port=0, poll_interval=0.05, **kwargs)
+        await server.start()
+        try:
+            return await scenario(server)
+        finally:
+            await server.stop()
+    return asyncio.run(main())
+
+##################################################
+# Stream Server Test Cases
+##################################################
+
+def test_observations_fan_out_to_concurrent_streams(db_path):
+    """Test that many streams open at once each receive the observations of their own favorites."""
+    record(db_path, "London", 1.0)
+
+    async def scenario(server):
+        streams = [await open_stream(server, f"/api/stream/{1 + i % 2}") for i in range(20)]
+        assert all(status.startswith("HTTP/1.1 200") for status, _, _ in streams)
+        assert server.stats()["streams"] == 20
+
+        record(db_path, "London", 12.5)
+        record(db_path, "Paris", 20.0)
+        events = await asyncio.gather(*(next_event(reader) for _, reader, _ in streams))
+        for _, _, writer in streams:
+            writer.close()
+        return events
+
+    events = run_with_server(db_path, scenario)
+    # The observation recorded before the server started is not replayed
+    assert [(event["name"], event["weather"]["temp_c"]) for event in events] == [("London", 12.5), ("Paris", 20.0)] * 10
+    assert events[0]["lat"] == 0 and events[0]["weather"]["condition"] == "Sunny"
+
+def test_streams_beyond_the_limit_are_refused(db_path):
+    """Test that a stream past max_subscribers gets 503 and a closed stream frees its place."""
+    async def scenario(server):
+        first = await open_stream(server, "/api/stream/1")
+        second = await open_stream(server, "/api/stream/1")
+        refused, _, _ = await open_stream(server, "/api/stream/1")
+        first[2].close()
+        for _ in range(100):
+            if server.stats()["streams"] < 2:
+                break
+            await asyncio.sleep(0.01)
+        reopened, _, writer = await open_stream(server, "/api/stream/1")
+        writer.close()
+        second[2].close()
+        return refused, reopened
+
+    refused, reopened = run_with_server(db_path, scenario, max_subscribers=2)
+    assert refused.startswith("HTTP/1.1 503")
+    assert reopened.startswith("HTTP/1.1 200")
+
+@pytest.mark.parametrize("path,status", [("/api/stream/3", "404"), ("/api/dashboard/1", "404")])
+def test_unknown_streams_are_not_found(db_path, path, status):
+    """Test that users without favorites and other routes get 404."""
+    async def scenario(server):
+        answer, _, writer = await open_stream(server, path)
+        writer.close()
+        return answer
+
+    assert run_with_server(db_path, scenario).startswith(f"HTTP/1.1 {status}")
+
+def test_read_observations_after_id(db_path):
+    """Test that only observations recorded after the given ID are read, in order."""
+    for temp_c in (1.0, 2.0, 3.0):
+        record(db_path, "Oslo", temp_c)
+
+    with sqlite3.connect(db_path) as conn:
+        rows = read_observations(conn, after_id=1)
+    assert [(row_id, event["weather"]["temp_c"]) for row_id, _, event in rows] == [(2, 2.0), (3, 3.0)]
+
+def test_feed_publishes_observations_of_every_process(db_path):
+    """Test that the feed publishes observations recorded after it started, whoever recorded them."""
+    record(db_path, "London", 1.0)
+    published = []
+    feed = ObservationFeed(db_path, lambda name, event: published.append((name, event["weather"]["temp_c"])), interval=60)
+    feed.start()
+
+    record(db_path, "London", 2.0)
+    record(db_path, "Paris", 3.0)
+    assert feed.poll() == 2
+    assert feed.poll() == 0
+    feed.stop()
+
+    assert published == [("London", 2.0), ("Paris", 3.0)]
@@ -0,0 +1,57 @@
+import pytest
+
+from weather.utils.suggest_utils import LocationSuggestIndex
+
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+@pytest.fixture
+def suggest_index():
+    """Fixture to provide an index with a few locations of varying popularity."""
+    index = LocationSuggestIndex()
+    index.add_many([('London', 5), ('Londrina', 1), ('Long Beach', 3), ('Paris', 10)])
+    return index
+
+##################################################
+# Suggestion Test Cases
+##################################################
+
+def test_suggest_ranks_by_popularity(suggest_index):
+    """Test that matches are ordered by popularity."""
+    suggestions = suggest_index.suggest('lon')
+    assert [s['name'] for s in suggestions] == ['London', 'Long Beach', 'Londrina']
+    assert suggestions[0]['popularity'] == 5
+
+def test_suggest_normalizes_prefix(suggest_index):
+    """Test that the prefix is matched regardless of case and spacing."""
+    assert [s['name'] for s in suggest_index.suggest('  LONG  b')] == ['Long Beach']
+
+def test_suggest_limit_and_no_match(suggest_index):
+    """Test the result limit and a prefix without matches."""
+    assert len(suggest_index.suggest('lon', limit=1)) == 1
+    assert suggest_index.suggest('xyz') == []
+    assert suggest_index.suggest('   ') == []
+
+def test_add_updates_incrementally(suggest_index):
+    """Test that adding names updates popularity and inserts new names in order."""
+    suggest_index.add('londrina', 10)
+    suggest_index.add('Lonavala')
+
+    suggestions = suggest_index.suggest('lon')
+    assert [s['name'] for s in suggestions] == ['Londrina', 'London', 'Long Beach', 'Lonavala']
+    assert len(suggest_index) == 5
+
+def test_short_prefix_ranks_every_match():
+    """Test that the most popular names are found however many names share a short prefix."""
+    index = LocationSuggestIndex(top_k=5)
+    index.add_many([(f'Aa{i:05d}', 1) for i in range(5000)] + [('Azul', 50)])
+    index.add('Aztec', 40)
+    index.add('Aa04999', 100)
+
+    assert [s['name'] for s in index.suggest('a', limit=3)] == ['Aa04999', 'Azul', 'Aztec']
+    assert [s['name'] for s in index.suggest('a', limit=8)][:3] == ['Aa04999', 'Azul', 'Aztec']
+    assert [s['name'] for s in index.suggest('aa04', limit=1)] == ['Aa04999']
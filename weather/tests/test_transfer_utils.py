@@ -0,0 +1,121 @@
+import os
+import sqlite3
+
+import pytest
+
+from weather.utils.shard_utils import reshard
+from weather.utils.transfer_utils import (
+    decode_favorites,
+    encode_favorites,
+    export_favorites,
+    format_for_content_type,
+    import_favorites
+)
+
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), '..', 'sql', 'create_user_table.sql')
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+def make_db(path, favorites=()):
+    with sqlite3.connect(path) as conn:
+        with open(SCHEMA_PATH) as f:
+            conn.executescript(f.read())
+        for user_id in range(1, 5):
+            conn.execute("INSERT INTO users (id, username, email, password, salt) VALUES (?, ?, ?, 'pw', 'salt')",
+                         (user_id, f"user{user_id}", f"u{user_id}@email.com"))
+        conn.executemany("INSERT INTO user_favorites (user_id, location_name, latitude, longitude) VALUES (?, ?, ?, ?)",
+                         favorites)
+    return path
+
+@pytest.fixture
+def source(tmp_path):
+    """Fixture to provide a database with four users and their favorites."""
+    return make_db(str(tmp_path / "source.db"), [
+        (1, "London", 51.5, -0.12), (2, "Paris", None, None), (2, 'Quote "City", UK', 1.0, 2.0), (4, "Lima", -12.0, -77.0),
+    ])
+
+@pytest.fixture
+def target(tmp_path):
+    """Fixture to provide a database with the same users and no favorites."""
+    return make_db(str(tmp_path / "target.db"))
+
+def favorites(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT user_id, location_name, latitude, longitude FROM user_favorites ORDER BY id").fetchall()
+
+##################################################
+# Export Test Cases
+##################################################
+
+def test_export_streams_in_batches(source):
+    """Test that every favorite is exported in insertion order, whatever the batch size."""
+    assert list(export_favorites(source, batch_size=1)) == favorites(source)
+
+def test_export_selected_users(source):
+    """Test that only the favorites of the requested users are exported."""
+    assert [row[0] for row in export_favorites(source, user_ids=[2, 3])] == [2, 2]
+
+def test_export_from_shards(source, mocker):
+    """Test that a sharded database exports the favorites of every shard once."""
+    reshard(source, 1, 3)
+    mocker.patch("weather.utils.shard_utils.DB_SHARDS", 3)
+
+    assert sorted(export_favorites(source)) == sorted([
+        (1, "London", 51.5, -0.12), (2, "Paris", None, None), (2, 'Quote "City", UK', 1.0, 2.0), (4, "Lima", -12.0, -77.0),
+    ])
+    assert [row[0] for row in export_favorites(source, user_ids=[4])] == [4]
+
+##################################################
+# Round Trip Test Cases
+##################################################
+
+@pytest.mark.parametrize("fmt", ["ndjson", "csv"])
+def test_round_trip(source, target, fmt):
+    """Test that an export imported into another database reproduces the favorites."""
+    text = "".join(encode_favorites(export_favorites(source), fmt, batch_size=2))
+    counts = import_favorites(target, decode_favorites(text.splitlines(keepends=True), fmt), chunk_size=3)
+
+    assert counts == {"rows": 4, "imported": 4, "skipped": 0}
+    assert favorites(target) == favorites(source)
+
+def test_import_skips_unknown_users(target):
+    """Test that favorites of users missing from the target are skipped."""
+    counts = import_favorites(target, [(1, "Rome", None, None), (9, "Oslo", None, None)])
+
+    assert counts == {"rows": 2, "imported": 1, "skipped": 1}
+    assert favorites(target) == [(1, "Rome", None, None)]
+
+def test_import_keeps_committed_chunks_on_error(target):
+    """Test that an invalid line stops the import after the chunks already committed."""
+    lines = ['{"user_id": 1, "location_name": "Rome"}\n', '{"user_id": 2, "location_name": "Oslo"}\n',
+             '{"user_id": 3, "location_name": "Kyiv"}\n', '{"user_id": "x", "location_name": "Bad"}\n']
+
+    with pytest.raises(ValueError, match=r"Line 4: user_id .*\(2 favorites were imported"):
+        import_favorites(target, decode_favorites(lines, "ndjson"), chunk_size=2)
+    assert [row[1] for row in favorites(target)] == ["Rome", "Oslo"]
+
+##################################################
+# Format Test Cases
+##################################################
+
+def test_decode_validation():
+    """Test that malformed lines are rejected with their line number."""
+    with pytest.raises(ValueError, match="Line 2: invalid JSON"):
+        list(decode_favorites(['{"user_id": 1, "location_name": "Rome"}', '{oops'], "ndjson"))
+    with pytest.raises(ValueError, match="missing location_name"):
+        list(decode_favorites(["user_id,name\n", "1,Rome\n"], "csv"))
+    with pytest.raises(ValueError, match="Line 2: latitude must be a number"):
+        list(decode_favorites(["user_id,location_name,latitude\n", "1,Rome,north\n"], "csv"))
+    with pytest.raises(ValueError, match="Invalid format"):
+        list(decode_favorites([], "xml"))
+
+def test_format_for_content_type():
+    """Test that the import format follows the request's content type."""
+    assert format_for_content_type("text/csv; charset=utf-8") == "csv"
+    assert format_for_content_type("application/x-ndjson") == "ndjson"
+    assert format_for_content_type(None) == "ndjson"
@@ -0,0 +1,75 @@
+from weather.utils.user_cache_utils import UserCache
+
+
+######################################################
+#
+#    Helpers
+#
+######################################################
+
+class CountingLoader:
+    """Loads users from a dict and counts how often it was asked."""
+
+    def __init__(self, users):
+        self.users = users
+        self.calls = 0
+
+    def __call__(self, user_id):
+        self.calls += 1
+        return self.users.get(user_id)
+
+##################################################
+# User Cache Test Cases
+##################################################
+
+def test_hit_skips_loader():
+    """Test that a cached user is served without calling the loader again."""
+    cache = UserCache()
+    loader = CountingLoader({1: {"id": 1, "username": "a", "email": "a@e.com"}})
+
+    assert cache.get("db", 1, loader)["username"] == "a"
+    assert cache.get("db", 1, loader)["username"] == "a"
+    assert loader.calls == 1
+
+def test_missing_user_is_negatively_cached():
+    """Test that a missing ID is remembered and invalidation clears it."""
+    cache = UserCache()
+    loader = CountingLoader({})
+
+    assert cache.get("db", 7, loader) is None
+    assert cache.get("db", 7, loader) is None
+    assert loader.calls == 1
+
+    loader.users[7] = {"id": 7, "username": "new", "email": "n@e.com"}
+    cache.invalidate("db", 7)
+    assert cache.get("db", 7, loader)["username"] == "new"
+
+def test_negative_entries_expire():
+    """Test that negative entries expire after their TTL."""
+    cache = UserCache(negative_ttl=0)
+    loader = CountingLoader({})
+
+    cache.get("db", 7, loader)
+    cache.get("db", 7, loader)
+
+    assert loader.calls == 2
+
+def test_databases_do_not_share_entries():
+    """Test that the same ID in different databases is cached separately."""
+    cache = UserCache()
+    cache.get("one.db", 1, CountingLoader({1: {"id": 1, "username": "one", "email": "1@e.com"}}))
+
+    assert cache.get("two.db", 1, CountingLoader({})) is None
+
+def test_stats_report_hit_rate():
+    """Test that positive and negative hits both count towards the hit rate."""
+    cache = UserCache()
+    loader = CountingLoader({1: {"id": 1, "username": "a", "email": "a@e.com"}})
+    for user_id in [1, 1, 2, 2]:
+        cache.get("db", user_id, loader)
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["negative_hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["hit_rate"] == 0.5
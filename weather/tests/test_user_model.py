@@ -13,6 +13,8 @@ from weather.models.user_model import (
     update_username,
     login_user
 )
+from weather.utils import sql_utils
+from weather.utils.user_cache_utils import user_cache
 
 ######################################################
 #
@@ -34,11 +36,15 @@ def mock_cursor(mocker):
    mock_conn.commit.return_value = None
 
    @contextmanager
-   def mock_get_db_connection():
+   def mock_get_db_connection(db_path=None):
        yield mock_conn  
 
 
    mocker.patch("weather.models.user_model.get_db_connection", mock_get_db_connection)
+   # Run writes inline on the mocked connection instead of the writer thread
+   mocker.patch("weather.utils.write_queue_utils.WRITE_QUEUE_ENABLED", False)
+   # Users cached by earlier tests would skip the mocked lookups
+   user_cache.clear()
 
 
    return mock_cursor  
@@ -172,7 +178,7 @@ def test_get_all_users(mock_cursor):
    ]
    
    expected_query = normalize_whitespace("""
-       SELECT id, username, email, password FROM users
+       SELECT id, username, email FROM users
    """)
    
    actual_query = normalize_whitespace(mock_cursor.execute.call_args[0][0])
@@ -205,7 +211,7 @@ def test_update_password(mock_cursor):
         update_password(user_id, new_password)
 
         expected_select_query = normalize_whitespace(
-            "SELECT username FROM users WHERE id = ?"
+            "SELECT id, username, email FROM users WHERE id = ?"
         )
         actual_select_query = normalize_whitespace(
             mock_cursor.execute.call_args_list[0][0][0]  
@@ -252,6 +258,19 @@ def test_update_password_invalid_id(mock_cursor):
         update_password(user_id, new_password)
 
 
+def test_update_password_checks_user_through_cache(mock_cursor):
+    """
+    Test case checking that a cached user is updated without a lookup query.
+    """
+    user_cache.users.set((sql_utils.DB_PATH, 1), "cached user")
+
+    with patch("bcrypt.gensalt", return_value=b"salt"), patch("bcrypt.hashpw", return_value=b"hashed"):
+        update_password(1, "newSecurePassword")
+
+    queries = [normalize_whitespace(call[0][0]) for call in mock_cursor.execute.call_args_list]
+    assert queries == ["UPDATE users SET password = ?, salt = ? WHERE id = ?"]
+
+
 
 
 def test_update_username(mock_cursor):
@@ -292,3 +311,14 @@ def test_update_username_invalid_id(mock_cursor):
     with pytest.raises(ValueError, match=f"No user found with id {user_id}."):
         update_username(user_id, new_username)
 
+
+def test_update_username_invalidates_user_cache(mock_cursor, mocker):
+    """
+    Test case checking that a renamed user is dropped from the shared user cache.
+    """
+    mock_cursor.fetchone.return_value = ["Username"]
+    mock_invalidate = mocker.patch("weather.models.user_model.user_cache.invalidate")
+
+    update_username(1, "newUsername")
+
+    assert mock_invalidate.call_args[0][1] == 1
@@ -0,0 +1,164 @@
+import threading
+
+import pytest
+import requests
+
+from weather.utils.weather_api_utils import REQUEST_TIMEOUT, fetch_current_weather
+from weather.utils.weather_provider_utils import (
+    HEDGE_MIN_SAMPLES,
+    HedgedWeatherBackend,
+    OpenMeteoProvider,
+    WeatherProvider,
+    parse_open_meteo_current
+)
+
+
+class FakeProvider(WeatherProvider):
+    """A provider answering after a delay, or failing."""
+
+    def __init__(self, name, delay=0.0, fail=False):
+        super().__init__()
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self.release = threading.Event()
+
+    def _fetch(self, lat, lon):
+        self.calls += 1
+        self.release.wait(self.delay)
+        if self.fail:
+            raise requests.ConnectionError(f"{self.name} is down")
+        return {"observed_at": 1700000000, "temp_c": 10.0, "condition": self.name}
+
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+@pytest.fixture
+def fast_latencies():
+    """Fixture to give a provider enough fast samples for a small hedge delay."""
+    def fill(provider, latency=0.01):
+        for _ in range(HEDGE_MIN_SAMPLES):
+            provider._latencies.append(latency)
+    return fill
+
+##################################################
+# Normalization Test Cases
+##################################################
+
+def test_parse_open_meteo_current():
+    """Test that Open-Meteo variables map onto the normalized observation fields."""
+    payload = {"current": {
+        "time": 1700000000, "temperature_2m": 3.5, "apparent_temperature": 1.0, "wind_speed_10m": 12.0,
+        "relative_humidity_2m": 80, "precipitation": 0.4, "weather_code": 61
+    }}
+
+    assert parse_open_meteo_current(payload) == {
+        "observed_at": 1700000000, "temp_c": 3.5, "feelslike_c": 1.0, "wind_kph": 12.0,
+        "humidity": 80, "precip_mm": 0.4, "condition": "Slight rain"
+    }
+
+def test_latency_percentile():
+    """Test percentiles over recorded latencies."""
+    provider = FakeProvider("p")
+    assert provider.latency_percentile(50) is None
+
+    for latency in [0.1, 0.2, 0.3, 0.4, 1.0]:
+        provider._latencies.append(latency)
+
+    assert provider.latency_percentile(50) == 0.3
+    assert provider.latency_percentile(99) == 1.0
+
+##################################################
+# Hedging Test Cases
+##################################################
+
+def test_fast_primary_is_not_hedged():
+    """Test that a primary answering within the delay is used without a hedge."""
+    primary, secondary = FakeProvider("weatherapi"), FakeProvider("open-meteo")
+    backend = HedgedWeatherBackend(primary, secondary)
+
+    assert backend.fetch_current(1.0, 2.0)["condition"] == "weatherapi"
+    assert secondary.calls == 0
+    assert backend.hedges_sent == 0
+
+def test_slow_primary_is_hedged(fast_latencies):
+    """Test that a primary slower than its percentile delay loses to the secondary."""
+    primary, secondary = FakeProvider("weatherapi", delay=5.0), FakeProvider("open-meteo")
+    fast_latencies(primary)
+    backend = HedgedWeatherBackend(primary, secondary)
+
+    assert backend.fetch_current(1.0, 2.0)["condition"] == "open-meteo"
+    assert backend.hedges_sent == 1
+    assert backend.hedges_won == 1
+    primary.release.set()
+
+def test_failing_primary_falls_back():
+    """Test that a primary error is answered by the secondary without waiting for the delay."""
+    primary, secondary = FakeProvider("weatherapi", fail=True), FakeProvider("open-meteo")
+    backend = HedgedWeatherBackend(primary, secondary)
+
+    assert backend.fetch_current(1.0, 2.0)["condition"] == "open-meteo"
+
+def test_all_providers_failing_raises():
+    """Test that a request exception is raised when every provider fails."""
+    primary, secondary = FakeProvider("weatherapi", fail=True), FakeProvider("open-meteo", fail=True)
+    backend = HedgedWeatherBackend(primary, secondary)
+
+    with pytest.raises(requests.RequestException):
+        backend.fetch_current(1.0, 2.0)
+
+def test_queue_wait_does_not_count_toward_hedge_delay(fast_latencies):
+    """Test that a primary call waiting for a free hedge thread is not hedged for that wait."""
+    primary, secondary = FakeProvider("weatherapi"), FakeProvider("open-meteo")
+    fast_latencies(primary, latency=0.2)
+    backend = HedgedWeatherBackend(primary, secondary, max_workers=1)
+    blocker = threading.Event()
+    backend._executor.submit(blocker.wait, 5)
+    threading.Timer(0.5, blocker.set).start()
+
+    assert backend.fetch_current(1.0, 2.0)["condition"] == "weatherapi"
+    assert backend.hedges_sent == 0
+
+def test_hedge_delay_tracks_percentile(fast_latencies):
+    """Test that the hedge delay follows the primary's latency percentile once enough samples exist."""
+    primary = FakeProvider("weatherapi")
+    backend = HedgedWeatherBackend(primary, FakeProvider("open-meteo"), percentile=95)
+    default_delay = backend.hedge_delay()
+
+    fast_latencies(primary, latency=0.2)
+
+    assert backend.hedge_delay() == 0.2
+    assert backend.hedge_delay() != default_delay
+
+def test_check_health_follows_last_call():
+    """Test that a provider reports unhealthy after a failure until it succeeds again."""
+    provider = FakeProvider("weatherapi", fail=True)
+    provider.check_health()
+
+    with pytest.raises(requests.RequestException):
+        provider.fetch_current(1.0, 2.0)
+    with pytest.raises(Exception, match="weatherapi is down"):
+        provider.check_health()
+
+    provider.fail = False
+    provider.fetch_current(1.0, 2.0)
+    assert provider.check_health()["last_success"] is not None
+
+def test_provider_base_is_abstract():
+    """Test that a provider without _fetch cannot be created."""
+    with pytest.raises(TypeError):
+        WeatherProvider()
+
+@pytest.mark.parametrize("fetch", [lambda: fetch_current_weather(1.0, 2.0), lambda: OpenMeteoProvider()._fetch(1.0, 2.0)])
+def test_provider_requests_time_out(mocker, fetch):
+    """Test that upstream calls are sent with a connect and read timeout."""
+    mock_get = mocker.patch('requests.get', side_effect=requests.Timeout("read timed out"))
+
+    with pytest.raises(requests.Timeout):
+        fetch()
+    assert mock_get.call_args.kwargs["timeout"] == REQUEST_TIMEOUT
@@ -0,0 +1,118 @@
+from concurrent.futures import ThreadPoolExecutor
+import sqlite3
+
+import pytest
+
+from weather.utils import write_queue_utils
+from weather.utils.write_queue_utils import WriteQueue, submit_write
+
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Fixture to provide a temporary database with a single table."""
+    path = str(tmp_path / "test.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT UNIQUE)")
+    return path
+
+def insert(name):
+    def operation(cursor):
+        cursor.execute("INSERT INTO items (name) VALUES (?)", (name,))
+        return cursor.lastrowid
+    return operation
+
+def names(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return sorted(row[0] for row in conn.execute("SELECT name FROM items"))
+
+##################################################
+# Write Queue Test Cases
+##################################################
+
+def test_submit_resolves_after_commit(db_path):
+    """Test that a future resolves with the operation's result and the write is visible."""
+    queue = WriteQueue(db_path, max_delay=0)
+
+    assert queue.submit(insert("a")).result(timeout=5) == 1
+    assert names(db_path) == ["a"]
+    queue.stop()
+
+def test_concurrent_writes_are_group_committed(db_path):
+    """Test that writes submitted together share transactions."""
+    queue = WriteQueue(db_path, max_batch=50, max_delay=0.2)
+
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        futures = list(executor.map(lambda i: queue.submit(insert(f"item{i}")), range(20)))
+    assert sorted(future.result(timeout=5) for future in futures) == list(range(1, 21))
+
+    stats = queue.stats()
+    assert stats["operations"] == 20
+    assert stats["batches"] < 20
+    queue.stop()
+
+def test_batches_respect_max_batch(db_path):
+    """Test that no transaction holds more than max_batch operations."""
+    queue = WriteQueue(db_path, max_batch=3, max_delay=0.2)
+
+    futures = [queue.submit(insert(f"item{i}")) for i in range(7)]
+    for future in futures:
+        future.result(timeout=5)
+
+    assert queue.stats()["batches"] >= 3
+    queue.stop()
+
+def test_failed_operation_is_rolled_back_alone(db_path):
+    """Test that an operation that raises only fails its own future."""
+    queue = WriteQueue(db_path, max_delay=0.2)
+
+    def insert_then_fail(cursor):
+        cursor.execute("INSERT INTO items (name) VALUES ('partial')")
+        raise ValueError("rejected")
+
+    first = queue.submit(insert("a"))
+    failing = queue.submit(insert_then_fail)
+    duplicate = queue.submit(insert("a"))
+    last = queue.submit(insert("b"))
+
+    first.result(timeout=5)
+    last.result(timeout=5)
+    with pytest.raises(ValueError, match="rejected"):
+        failing.result(timeout=5)
+    with pytest.raises(sqlite3.IntegrityError):
+        duplicate.result(timeout=5)
+    assert names(db_path) == ["a", "b"]
+    assert queue.stats()["failed"] == 2
+    queue.stop()
+
+def test_stop_commits_queued_writes(db_path):
+    """Test that stopping waits for queued writes and rejects new ones."""
+    queue = WriteQueue(db_path, max_delay=10)
+    future = queue.submit(insert("a"))
+
+    queue.stop()
+
+    assert future.result(timeout=0) == 1
+    with pytest.raises(RuntimeError):
+        queue.submit(insert("b"))
+
+def test_submit_write_inline_when_disabled(db_path, mocker):
+    """Test that writes commit on the calling thread with the queue disabled."""
+    mocker.patch("weather.utils.write_queue_utils.WRITE_QUEUE_ENABLED", False)
+
+    future = submit_write(db_path, insert("a"))
+
+    assert future.done()
+    assert future.result() == 1
+    assert names(db_path) == ["a"]
+    assert db_path not in write_queue_utils._queues
+
+def test_invalid_batch_size(db_path):
+    """Test that a non-positive batch size is rejected."""
+    with pytest.raises(ValueError, match="Invalid batch size"):
+        WriteQueue(db_path, max_batch=0)
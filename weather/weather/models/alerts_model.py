@@ -0,0 +1,277 @@
+from bisect import bisect_left, bisect_right, insort
+from contextlib import closing
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from weather.utils.batch_queue_utils import BatchingQueue
+from weather.utils.logger import configure_logger
+from weather.utils.weather_api_utils import OBSERVATION_FIELDS
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+OPERATORS = ("<", ">")
+
+
+class AlertsModel:
+    """
+    A class to manage per-user weather alert rules and evaluate them incrementally.
+
+    Rules are indexed by (location, metric) and operator in lists sorted by
+    threshold. When a new value arrives, only rules whose threshold lies
+    between the previous and the new value can change state, so they are
+    found with two binary searches. A rule fires only when it starts matching;
+    repeated matches are ignored until it has cleared again. Fired alerts are
+    stored in batches by a background delivery queue.
+
+    Every worker process keeps its own index. Each change to a rule, including
+    its matched state, bumps a version in the database; the index is rebuilt
+    whenever that version differs from the one it was built at, so rules
+    created, deleted or fired by other workers are seen on the next call. A
+    rule's matched state is flipped with a conditional update, so a crossing
+    seen by several workers fires once.
+
+    Attributes:
+        db_path: path to the user database
+    """
+
+    def __init__(self, db_path, max_batch: int = 100, max_delay: float = 1.0):
+        self.db_path = db_path
+        self.deliveries = BatchingQueue(self._store_events, max_batch=max_batch, max_delay=max_delay)
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[Tuple[str, str], Dict[str, List[Tuple[float, int]]]]] = None
+        self._version: Optional[int] = None
+        self._rules: Dict[int, Dict] = {}
+        self._last_values: Dict[Tuple[str, str], float] = {}
+
+    ##################################################
+    # Rule Management Functions
+    ##################################################
+
+    @staticmethod
+    def _read_version(conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT version FROM alert_rules_version").fetchone()[0]
+
+    def _load_index(self, conn: sqlite3.Connection) -> None:
+        """
+        Rebuilds the in-memory rule index if the rules changed since it was built. Caller must hold the lock.
+
+        Last seen values are dropped with a stale index, so the next observation
+        of each metric is compared against every rule's stored state.
+        """
+        version = self._read_version(conn)
+        if version == self._version:
+            return
+        self._index, self._rules, self._last_values = {}, {}, {}
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, user_id, location_name, metric, operator, threshold, matched FROM alert_rules")
+        for rule_id, user_id, location_name, metric, operator, threshold, matched in cursor.fetchall():
+            self._add_to_index(rule_id, user_id, location_name, metric, operator, threshold, bool(matched))
+        self._version = version
+        logger.info("Loaded %d alert rules at version %d", len(self._rules), version)
+
+    def _advance_version(self, conn: sqlite3.Connection, changes: int) -> None:
+        """
+        Records this process's own committed rule changes, unless another process changed rules in between.
+        """
+        version = self._read_version(conn)
+        if self._version is not None and version == self._version + changes:
+            self._version = version
+
+    def _add_to_index(self, rule_id, user_id, location_name, metric, operator, threshold, matched) -> None:
+        self._rules[rule_id] = {
+            "id": rule_id, "user_id": user_id, "location_name": location_name, "metric": metric,
+            "operator": operator, "threshold": threshold, "matched": matched,
+        }
+        thresholds = self._index.setdefault((location_name, metric), {"<": [], ">": []})[operator]
+        insort(thresholds, (threshold, rule_id))
+
+    def create_rule(self, user_id: int, location_name: str, metric: str, operator: str, threshold: float) -> Dict:
+        """
+        Creates an alert rule such as "temp_c < 0" for one of a user's locations.
+
+        If the last known value of the metric already satisfies the rule, it fires immediately.
+
+        Args:
+            user_id (int): The ID of the user.
+            location_name (str): The favorite location the rule watches.
+            metric (str): The observation field compared, e.g. temp_c.
+            operator (str): "<" or ">".
+            threshold (float): The value compared against.
+
+        Returns:
+            Dict: The created rule.
+
+        Raises:
+            ValueError: If the metric, operator or threshold is invalid.
+        """
+        if metric not in OBSERVATION_FIELDS:
+            raise ValueError(f"Invalid metric: {metric} (must be one of {', '.join(OBSERVATION_FIELDS)})")
+        if operator not in OPERATORS:
+            raise ValueError(f"Invalid operator: {operator} (must be < or >)")
+        if isinstance(threshold, bool) or not isinstance(threshold, (int, float)):
+            raise ValueError(f"Invalid threshold: {threshold}")
+
+        with self._lock, closing(sqlite3.connect(self.db_path)) as conn:
+            self._load_index(conn)
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO alert_rules (user_id, location_name, metric, operator, threshold)
+                VALUES (?, ?, ?, ?, ?)
+            """, (user_id, location_name, metric, operator, float(threshold)))
+            rule_id = cursor.lastrowid
+            self._advance_version(conn, 1)
+            conn.commit()
+            self._add_to_index(rule_id, user_id, location_name, metric, operator, float(threshold), False)
+
+            last_value = self._last_values.get((location_name, metric))
+            if last_value is not None and self._matches(operator, float(threshold), last_value):
+                self._fire([rule_id], last_value)
+
+        logger.info("Created alert rule %d for user %d: %s %s %s at %s", rule_id, user_id, metric, operator, threshold, location_name)
+        return dict(self._rules[rule_id])
+
+    def delete_rule(self, user_id: int, rule_id: int) -> None:
+        """
+        Deletes one of a user's alert rules.
+
+        Raises:
+            ValueError: If the user has no rule with that ID.
+        """
+        with self._lock, closing(sqlite3.connect(self.db_path)) as conn:
+            self._load_index(conn)
+            rule = self._rules.get(rule_id)
+            if rule is None or rule["user_id"] != user_id:
+                raise ValueError(f"Alert rule {rule_id} not found for user {user_id}")
+            deleted = conn.execute("DELETE FROM alert_rules WHERE id = ?", (rule_id,)).rowcount
+            self._advance_version(conn, deleted)
+            conn.commit()
+            del self._rules[rule_id]
+            thresholds = self._index[(rule["location_name"], rule["metric"])][rule["operator"]]
+            thresholds.remove((rule["threshold"], rule_id))
+        logger.info("Deleted alert rule %d for user %d", rule_id, user_id)
+
+    def get_rules(self, user_id: int) -> List[Dict]:
+        """
+        Returns every alert rule of a user.
+        """
+        with self._lock, closing(sqlite3.connect(self.db_path)) as conn:
+            self._load_index(conn)
+            return [dict(rule) for rule in self._rules.values() if rule["user_id"] == user_id]
+
+    def get_events(self, user_id: int, limit: int = 50) -> List[Dict]:
+        """
+        Returns the most recent alerts delivered for a user, newest first.
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT rule_id, location_name, metric, operator, threshold, value, triggered_at
+                FROM alert_events
+                WHERE user_id = ?
+                ORDER BY triggered_at DESC, id DESC
+                LIMIT ?
+            """, (user_id, limit))
+            columns = ("rule_id", "location_name", "metric", "operator", "threshold", "value", "triggered_at")
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    ##################################################
+    # Evaluation Functions
+    ##################################################
+
+    @staticmethod
+    def _matches(operator: str, threshold: float, value: float) -> bool:
+        return value < threshold if operator == "<" else value > threshold
+
+    @staticmethod
+    def _crossed(operator: str, thresholds: List[Tuple[float, int]], old: float, new: float) -> List[Tuple[float, int]]:
+        """
+        Returns the rules whose state differs between the old and the new value.
+        """
+        low, high = min(old, new), max(old, new)
+        if operator == "<":
+            # value < t flips for low < t <= high
+            return thresholds[bisect_right(thresholds, (low, float("inf"))):bisect_right(thresholds, (high, float("inf")))]
+        # value > t flips for low <= t < high
+        return thresholds[bisect_left(thresholds, (low, -1)):bisect_left(thresholds, (high, -1))]
+
+    def on_observation(self, location_name: str, lat: float, lon: float, observation: Dict) -> None:
+        """
+        Evaluates the rules of a location against a new observation.
+
+        Meant to be registered as an ObservationsModel listener.
+        """
+        with self._lock:
+            with closing(sqlite3.connect(self.db_path)) as conn:
+                self._load_index(conn)
+            for metric in OBSERVATION_FIELDS:
+                value = observation.get(metric)
+                if value is None:
+                    continue
+                key = (location_name, metric)
+                old = self._last_values.get(key)
+                self._last_values[key] = value
+                rules = self._index.get(key)
+                if rules is None:
+                    continue
+
+                for operator, thresholds in rules.items():
+                    if old is None:
+                        # No previous value since startup: compare against each rule's stored state once
+                        candidates = thresholds
+                    else:
+                        candidates = self._crossed(operator, thresholds, old, value)
+                    fired, cleared = [], []
+                    for threshold, rule_id in candidates:
+                        matched = self._matches(operator, threshold, value)
+                        if matched != self._rules[rule_id]["matched"]:
+                            (fired if matched else cleared).append(rule_id)
+                    if fired:
+                        self._fire(fired, value)
+                    if cleared:
+                        self._set_matched(cleared, False)
+
+    def _fire(self, rule_ids: List[int], value: float) -> None:
+        """
+        Marks rules as matched and queues an alert for each one no other process fired first. Caller must hold the lock.
+        """
+        fired = self._set_matched(rule_ids, True)
+        now = int(time.time())
+        for rule_id in fired:
+            rule = self._rules[rule_id]
+            logger.info("Alert rule %d fired for user %d: %s %s %s at %s (value %s)", rule_id, rule["user_id"],
+                        rule["metric"], rule["operator"], rule["threshold"], rule["location_name"], value)
+            self.deliveries.put((rule_id, rule["user_id"], rule["location_name"], rule["metric"],
+                                 rule["operator"], rule["threshold"], value, now))
+
+    def _set_matched(self, rule_ids: List[int], matched: bool) -> List[int]:
+        """
+        Sets the matched state of rules and returns those whose stored state actually changed.
+        """
+        changed = []
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            for rule_id in rule_ids:
+                self._rules[rule_id]["matched"] = matched
+                if conn.execute("UPDATE alert_rules SET matched = ? WHERE id = ? AND matched != ?",
+                                (int(matched), rule_id, int(matched))).rowcount:
+                    changed.append(rule_id)
+            self._advance_version(conn, len(changed))
+            conn.commit()
+        return changed
+
+    def _store_events(self, events: List[tuple]) -> None:
+        """
+        Delivery sink that stores a batch of alerts in one transaction.
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executemany("""
+                INSERT INTO alert_events (rule_id, user_id, location_name, metric, operator, threshold, value, triggered_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, events)
+            conn.commit()
+        logger.info("Delivered %d alerts", len(events))
@@ -0,0 +1,197 @@
+import logging
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+from weather.utils.logger import configure_logger
+from weather.utils.shard_utils import get_shard_router
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+READING_DTYPE = np.dtype([
+    ("user_id", "i8"),
+    ("name", "O"),
+    ("temp_c", "f8"),
+    ("feelslike_c", "f8"),
+    ("wind_kph", "f8"),
+    ("humidity", "f8"),
+    ("observed_at", "i8"),
+])
+
+KPH_TO_MPH = 0.621371
+
+
+def celsius_to_fahrenheit(values: np.ndarray) -> np.ndarray:
+    """
+    Converts an array of Celsius temperatures to Fahrenheit.
+    """
+    return values * 9.0 / 5.0 + 32.0
+
+
+def kph_to_mph(values: np.ndarray) -> np.ndarray:
+    """
+    Converts an array of speeds from km/h to mph.
+    """
+    return values * KPH_TO_MPH
+
+
+def _nullable(value) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 2)
+
+
+class AnalyticsModel:
+    """
+    A class to compute weather rankings and aggregates across users' favorite locations.
+
+    The latest reading of every favorite is loaded into columnar NumPy arrays
+    sorted by user, and all per-user work is done with grouped array
+    operations rather than Python loops over readings.
+
+    Attributes:
+        db_path: path to the user database
+        shards: routes favorites queries to the shards holding them
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.shards = get_shard_router(db_path)
+
+    def load_latest_readings(self, user_ids: Optional[Iterable[int]] = None) -> np.ndarray:
+        """
+        Loads the latest observation of each favorite location into a structured array.
+
+        Args:
+            user_ids (Iterable[int], optional): The users to load. Defaults to all users.
+
+        Returns:
+            np.ndarray: One record per (user, location) sorted by user ID, with NaN for missing values.
+        """
+        params = []
+        user_filter = ""
+        if user_ids is not None:
+            params = list(user_ids)
+            if not params:
+                return np.empty(0, dtype=READING_DTYPE)
+            user_filter = f"WHERE f.user_id IN ({', '.join('?' for _ in params)})"
+
+        with self.shards.connect_catalog() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT f.user_id, f.location_name, o.temp_c, o.feelslike_c, o.wind_kph, o.humidity, o.observed_at
+                FROM (SELECT DISTINCT user_id, location_name FROM user_favorites) f
+                JOIN (
+                    SELECT location_name, MAX(id) AS id
+                    FROM weather_observations
+                    GROUP BY location_name
+                ) latest ON latest.location_name = f.location_name
+                JOIN weather_observations o ON o.id = latest.id
+                {user_filter}
+                ORDER BY f.user_id
+            """, params)
+            rows = cursor.fetchall()
+
+        # NumPy converts SQL NULLs to NaN in the float columns
+        return np.array(rows, dtype=READING_DTYPE)
+
+    def summarize_users(self, user_ids: Optional[Iterable[int]] = None) -> Dict[int, Dict]:
+        """
+        Computes the favorites summary of many users at once, e.g. for nightly reports.
+
+        Args:
+            user_ids (Iterable[int], optional): The users to summarize. Defaults to all users with readings.
+
+        Returns:
+            Dict[int, Dict]: The summary of each user that has at least one reading.
+        """
+        return self.summarize_readings(self.load_latest_readings(user_ids))
+
+    def summarize_user(self, user_id: int) -> Dict:
+        """
+        Computes the favorites summary of one user.
+
+        Args:
+            user_id (int): The ID of the user.
+
+        Returns:
+            Dict: The warmest, coldest and windiest favorites and the averages across them.
+
+        Raises:
+            ValueError: If none of the user's favorites has a reading yet.
+        """
+        summaries = self.summarize_users([user_id])
+        if user_id not in summaries:
+            logger.error(f"No weather readings found for favorites of user {user_id}")
+            raise ValueError(f"No weather readings found for favorites of user {user_id}")
+        return summaries[user_id]
+
+    @staticmethod
+    def summarize_readings(readings: np.ndarray) -> Dict[int, Dict]:
+        """
+        Computes per-user rankings, averages and unit conversions from readings sorted by user.
+
+        Args:
+            readings (np.ndarray): Records as returned by load_latest_readings.
+
+        Returns:
+            Dict[int, Dict]: The summary of each user present in the readings.
+        """
+        if len(readings) == 0:
+            return {}
+
+        users, starts, counts = np.unique(readings["user_id"], return_index=True, return_counts=True)
+        ends = starts + counts - 1
+        groups = np.repeat(np.arange(len(users)), counts)
+
+        def extreme(field, largest):
+            values = readings[field]
+            filled = np.where(np.isnan(values), -np.inf if largest else np.inf, values)
+            order = np.lexsort((filled, groups))
+            picks = order[ends] if largest else order[starts]
+            # A user whose readings are all missing has no extreme to name
+            names = np.where(np.isnan(values[picks]), None, readings["name"][picks])
+            return names, values[picks]
+
+        def mean(field):
+            values = readings[field]
+            present = ~np.isnan(values)
+            sums = np.add.reduceat(np.where(present, values, 0.0), starts)
+            totals = np.add.reduceat(present.astype("i8"), starts)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return np.where(totals > 0, sums / np.maximum(totals, 1), np.nan)
+
+        warmest_names, warmest = extreme("temp_c", largest=True)
+        coldest_names, coldest = extreme("temp_c", largest=False)
+        windiest_names, windiest = extreme("wind_kph", largest=True)
+        mean_temp = mean("temp_c")
+        mean_feelslike = mean("feelslike_c")
+        mean_wind = mean("wind_kph")
+        mean_humidity = mean("humidity")
+
+        warmest_f, coldest_f, mean_temp_f, mean_feelslike_f = (
+            celsius_to_fahrenheit(values) for values in (warmest, coldest, mean_temp, mean_feelslike))
+        windiest_mph, mean_wind_mph = kph_to_mph(windiest), kph_to_mph(mean_wind)
+        latest = np.maximum.reduceat(readings["observed_at"], starts)
+
+        # Only building the response walks the per-user results
+        summaries = {}
+        for i, user_id in enumerate(users.tolist()):
+            summaries[user_id] = {
+                "locations": int(counts[i]),
+                "latest_observation": int(latest[i]),
+                "warmest": {"name": warmest_names[i], "temp_c": _nullable(warmest[i]), "temp_f": _nullable(warmest_f[i])},
+                "coldest": {"name": coldest_names[i], "temp_c": _nullable(coldest[i]), "temp_f": _nullable(coldest_f[i])},
+                "windiest": {"name": windiest_names[i], "wind_kph": _nullable(windiest[i]), "wind_mph": _nullable(windiest_mph[i])},
+                "averages": {
+                    "temp_c": _nullable(mean_temp[i]),
+                    "temp_f": _nullable(mean_temp_f[i]),
+                    "feelslike_c": _nullable(mean_feelslike[i]),
+                    "feelslike_f": _nullable(mean_feelslike_f[i]),
+                    "wind_kph": _nullable(mean_wind[i]),
+                    "wind_mph": _nullable(mean_wind_mph[i]),
+                    "humidity": _nullable(mean_humidity[i]),
+                },
+            }
+        return summaries
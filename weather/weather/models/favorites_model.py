@@ -1,38 +1,115 @@
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from functools import partial
 import logging
-from typing import List, Dict
+import os
+import threading
+import time
+from typing import Callable, List, Dict, Optional
 
-import requests
 import sqlite3
-from weather.models.user_model import User
+from weather.models.observations_model import ObservationsModel
+from weather.models.user_model import UserSummary
+from weather.utils.cache_utils import FRESH, LOADED, STALE
+from weather.utils.lazy_import_utils import lazy_import
 from weather.utils.logger import configure_logger
-from weather.utils.geocoding_utils import get_latitude_longitude
+from weather.utils.geocoding_utils import batch_get_latitude_longitude
+from weather.utils.quota_utils import quota_manager
+from weather.utils.record_utils import Record
+from weather.utils.shard_utils import get_shard_router
+from weather.utils.sql_trace_utils import traced_connect
+from weather.utils.user_cache_utils import user_cache
+from weather.utils.weather_api_utils import OBSERVATION_FIELDS
+from weather.utils.weather_provider_utils import fetch_current_weather, weather_backend, weather_cache
+from weather.utils.write_queue_utils import submit_write
 
 logger = logging.getLogger(__name__)
 configure_logger(logger)
+requests = lazy_import("requests")
+
+
+# Shared across requests so fetches that miss a latency budget can still finish and be recorded
+WEATHER_FETCH_WORKERS = int(os.getenv("WEATHER_FETCH_WORKERS", "16"))
+_fetch_executor = ThreadPoolExecutor(max_workers=WEATHER_FETCH_WORKERS, thread_name_prefix="weather-fetch")
+# Location name -> its load queued or running on _fetch_executor
+_pending_loads: Dict[str, Future] = {}
+_pending_lock = threading.Lock()
+
+
+def _submit_load(name: str, loader: Callable[[], Dict], max_age: float) -> Future:
+    """
+    Queues a cache load of a location, or returns the one already queued or running for it.
+
+    Dashboards that keep missing their budget therefore wait on one load per
+    location instead of piling more onto the fetch queue.
+    """
+    with _pending_lock:
+        future = _pending_loads.get(name)
+        if future is not None:
+            return future
+        future = _pending_loads[name] = _fetch_executor.submit(weather_cache.load, name, loader, max_age)
+
+    def forget(done: Future) -> None:
+        with _pending_lock:
+            if _pending_loads.get(name) is done:
+                del _pending_loads[name]
+
+    future.add_done_callback(forget)
+    return future
+
+class FavoriteLocation(Record):
+    """
+    A favorite location row: its name and coordinates (None until geocoded).
+    """
+
+    __slots__ = ("name", "lat", "lon")
+
+    def __init__(self, name: str, lat: Optional[float], lon: Optional[float]):
+        self.name = name
+        self.lat = lat
+        self.lon = lon
+
 
 class FavoritesModel:
     """
     A class to manage the favorited locations for users.
 
+    Users and their favorites are read from and written to the user's shard;
+    queries over all users are gathered from every shard.
+
     Attributes:
         db_path: path to the user database
+        shards: routes favorites queries to the shards holding them
     """
 
     def __init__(self, db_path):
         self.db_path = db_path
+        self.shards = get_shard_router(db_path)
+        self.observations = ObservationsModel(db_path)
 
 
     ##################################################
     # User Management Functions
     ##################################################
-    def get_user(self, user_id: int) -> dict:
-        with sqlite3.connect(self.db_path) as conn:
+    def get_user(self, user_id: int) -> UserSummary:
+        """
+        Returns a user's ID, username and email, served from the shared user cache when possible.
+
+        The result is a copy, so callers may change it without touching the cached user.
+
+        Raises:
+            ValueError: If the user does not exist.
+        """
+        user = user_cache.get(self.db_path, user_id, self._load_user)
+        if user is None:
+            raise ValueError(f"User with ID {user_id} not found")
+        return user.copy()
+
+    def _load_user(self, user_id: int) -> Optional[UserSummary]:
+        with traced_connect(self.shards.path_for_user(user_id)) as conn:
+            conn.row_factory = UserSummary.row_factory
             cursor = conn.cursor()
             cursor.execute("SELECT id, username, email FROM users WHERE id = ?", (user_id,))
-            user = cursor.fetchone()
-            if user is None:
-                raise ValueError(f"User with ID {user_id} not found")
-            return {"id": user[0], "username": user[1], "email": user[2]}
+            return cursor.fetchone()
     
     ##################################################
     # Favorites Retrieval Functions
@@ -49,13 +126,14 @@ class FavoritesModel:
         Raises:
             sqlite3.Error: If there is an error executing the SQL query or committing the transaction.
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        def insert(cursor):
             cursor.execute(
                 "INSERT INTO user_favorites (user_id, location_name, latitude, longitude) VALUES (?, ?, ?, ?)",
                 (user_id, location['name'], location.get('lat'), location.get('lon'))
             )
-            conn.commit()
+
+        # Committed together with other queued writes; wait so the favorite is visible on return
+        submit_write(self.shards.path_for_user(user_id), insert).result()
 
 
     def remove_favorite_location(self, user_id: int, location: Dict) -> None:
@@ -70,7 +148,7 @@ class FavoritesModel:
         user.favorite_locations = [loc for loc in user.favorite_locations if loc != location]
         logger.info(f"Removed location {location} from favorites for user {user_id}")
 
-    def get_favorite_locations(self, user_id: int) -> List[Dict]:
+    def get_favorite_locations(self, user_id: int) -> List[FavoriteLocation]:
         """
         Retrieves all favorite locations for a user.
 
@@ -78,30 +156,42 @@ class FavoritesModel:
             user_id (int): The ID of the user.
 
         Returns:
-            List[Dict]: A list of favorite locations for the user.
+            List[FavoriteLocation]: A list of favorite locations for the user.
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with traced_connect(self.shards.path_for_user(user_id)) as conn:
+            conn.row_factory = FavoriteLocation.row_factory
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT location_name, latitude, longitude
                 FROM user_favorites
                 WHERE user_id = ?
             """, (user_id,))
-            locations = cursor.fetchall()
-            return [
-                {
-                    "name": loc[0],
-                    "lat": loc[1],
-                    "lon": loc[2]
-                }
-                for loc in locations
-            ]
+            return cursor.fetchall()
     
+    def get_location_popularity(self) -> List[tuple]:
+        """
+        Returns every favorited location name with the number of favorites referencing it.
+
+        Returns:
+            List[tuple]: (location_name, count) pairs.
+        """
+        rows = self.shards.scatter("""
+            SELECT location_name, COUNT(*)
+            FROM user_favorites
+            GROUP BY location_name
+        """)
+        if not self.shards.sharded:
+            return rows
+        counts: Dict[str, int] = {}
+        for name, count in rows:
+            counts[name] = counts.get(name, 0) + count
+        return list(counts.items())
+
     def get_favorites_length(self) -> int:
         """
         Returns the total number of favorite locations across all users.
         """
-        return sum(len(user.favorite_locations) for user in self.users)
+        return sum(count for count, in self.shards.scatter("SELECT COUNT(*) FROM user_favorites"))
     
     ##################################################
     # Weather Data Management Functions
@@ -115,16 +205,20 @@ class FavoritesModel:
             user_id (int): The ID of the user.
 
         Note:
-            This method makes API calls to update weather data.
+            This method makes API calls to update weather data and records
+            each result as an observation. A location already being refreshed
+            by another request shares that call.
         """
-        with sqlite3.connect(self.db_path) as conn:
+        # Subscriber counts span every shard, so the read goes through the catalog connection
+        with self.shards.connect_catalog() as conn:
             cursor = conn.cursor()
 
-            # Fetch user's favorite locations
+            # Fetch user's favorite locations with the number of users sharing each
             cursor.execute("""
-                SELECT location_name, latitude, longitude
-                FROM user_favorites
-                WHERE user_id = ?
+                SELECT f.location_name, f.latitude, f.longitude,
+                       (SELECT COUNT(DISTINCT s.user_id) FROM user_favorites s WHERE s.location_name = f.location_name)
+                FROM user_favorites f
+                WHERE f.user_id = ?
             """, (user_id,))
             favorite_locations = cursor.fetchall()
 
@@ -132,41 +226,194 @@ class FavoritesModel:
                 logger.error(f"No favorite locations found for user {user_id}")
                 raise ValueError(f"No favorite locations found for user {user_id}")
 
-            base_url = "https://api.weatherapi.com/v1/current.json"
+            # Resolve every missing coordinate up front in one concurrent batch
+            missing = [name for name, lat, lon, _ in favorite_locations if lat is None or lon is None]
+            coordinates = batch_get_latitude_longitude(missing) if missing else {}
+            resolved = [(coords[0], coords[1], user_id, name) for name, coords in coordinates.items() if coords]
+            if resolved:
+                submit_write(self.shards.path_for_user(user_id), lambda write_cursor: write_cursor.executemany("""
+                    UPDATE user_favorites
+                    SET latitude = ?, longitude = ?
+                    WHERE user_id = ? AND location_name = ?
+                """, resolved)).result()
+
+            # Spend the upstream quota on the most demanded locations first
+            _, postponed = quota_manager.schedule(weather_backend.primary.name, {
+                name: subscribers for name, lat, lon, subscribers in favorite_locations
+                if (lat is not None and lon is not None) or coordinates.get(name)
+            }.items())
+            postponed = set(postponed)
 
             for location in favorite_locations:
-                location_name, lat, lon = location
+                location_name, lat, lon, _ = location
 
                 # Get coordinates if missing
                 if lat is None or lon is None:
-                    coordinates = get_latitude_longitude(location_name)
-                    if coordinates:
-                        lat, lon = coordinates
-                        # Update database with new coordinates
-                        cursor.execute("""
-                            UPDATE user_favorites
-                            SET latitude = ?, longitude = ?
-                            WHERE user_id = ? AND location_name = ?
-                        """, (lat, lon, user_id, location_name))
-                        conn.commit()
+                    if coordinates.get(location_name):
+                        lat, lon = coordinates[location_name]
                     else:
                         logger.error(f"Failed to get coordinates for {location_name}")
                         continue
 
+                if location_name in postponed:
+                    logger.info(f"Quota low, keeping cached weather for location {location_name} for user {user_id}")
+                    continue
+
                 # Fetch weather data
-                params = {
-                    "q": f"{lat},{lon}"
-                }
                 try:
-                    response = requests.get(base_url, params=params)
-                    response.raise_for_status()
-                    weather_data = response.json()
+                    weather_cache.refresh(location_name, partial(self._fetch_and_record, location_name, lat, lon))
 
-                    # Log weather data update (you can store it in your database if needed)
                     logger.info(f"Updated weather data for location {location_name} for user {user_id}")
                 except requests.RequestException as e:
                     logger.error(f"Failed to update weather data for location {location_name} for user {user_id}: {str(e)}")
 
+    def backfill_coordinates(self, chunk_size: int = 500) -> Dict[str, int]:
+        """
+        Fills in latitude and longitude for every favorite that is missing them.
+
+        Distinct location names are geocoded in one concurrent batch, then the
+        rows are updated in transactions of at most chunk_size names each so a
+        large backfill never holds the write lock for long.
+
+        Args:
+            chunk_size (int): The number of location names updated per transaction.
+
+        Returns:
+            Dict[str, int]: Counts of the names processed, resolved and rows updated.
+        """
+        if chunk_size <= 0:
+            raise ValueError(f"Invalid chunk size: {chunk_size} (must be positive).")
+
+        names = sorted({row[0] for row in self.shards.scatter("""
+            SELECT DISTINCT location_name
+            FROM user_favorites
+            WHERE latitude IS NULL OR longitude IS NULL
+        """)})
+
+        coordinates = batch_get_latitude_longitude(names)
+        updates = [(coords[0], coords[1], name) for name, coords in coordinates.items() if coords]
+
+        rows_updated = 0
+        for path in self.shards.paths:
+            with traced_connect(path) as conn:
+                cursor = conn.cursor()
+                for start in range(0, len(updates), chunk_size):
+                    cursor.executemany("""
+                        UPDATE user_favorites
+                        SET latitude = ?, longitude = ?
+                        WHERE location_name = ? AND (latitude IS NULL OR longitude IS NULL)
+                    """, updates[start:start + chunk_size])
+                    rows_updated += cursor.rowcount
+                    conn.commit()
+
+        for name, coords in coordinates.items():
+            if coords is None:
+                logger.error(f"Failed to get coordinates for {name}")
+
+        logger.info(f"Backfilled coordinates for {rows_updated} favorites ({len(updates)} of {len(names)} locations resolved)")
+        return {"locations": len(names), "resolved": len(updates), "rows_updated": rows_updated}
+
+    def _fetch_and_record(self, name: str, lat: float, lon: float) -> Dict:
+        observation = fetch_current_weather(lat, lon)
+        self.observations.record_observation(name, lat, lon, observation)
+        return observation
+
+    def get_dashboard(self, user_id: int, max_age: float = 1800, budget: float = 2.0) -> List[Dict]:
+        """
+        Returns every favorite location of a user together with its latest weather.
+
+        Favorites and their latest observations are read with one joined query
+        and served through the shared weather cache. Weather older than max_age
+        but within the stale-while-revalidate window is returned at once and
+        refreshed in the background. Older or missing weather is fetched
+        concurrently as far as the upstream quota allows; whatever is postponed
+        or has not arrived within the budget is returned with its last known
+        observation and marked stale, while the fetch keeps running in the
+        background and records its result for the next request. If fetching
+        fails, the last observation is served until the stale-if-error window
+        ends, after which the entry has no weather.
+
+        Args:
+            user_id (int): The ID of the user.
+            max_age (float): Seconds after which an observation is refreshed.
+            budget (float): Seconds to wait for upstream fetches.
+
+        Returns:
+            List[Dict]: Per favorite, its name, coordinates, weather (or None), age in seconds,
+            stale flag and how the cache answered (fresh, stale, stale-if-error, loaded or none).
+        """
+        with self.shards.connect_catalog() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT f.location_name, f.latitude, f.longitude,
+                       (SELECT COUNT(DISTINCT s.user_id) FROM user_favorites s WHERE s.location_name = f.location_name),
+                       o.observed_at, {", ".join(f"o.{field}" for field in OBSERVATION_FIELDS)}, o.condition
+                FROM user_favorites f
+                LEFT JOIN (
+                    SELECT location_name, MAX(id) AS id
+                    FROM weather_observations
+                    GROUP BY location_name
+                ) latest ON latest.location_name = f.location_name
+                LEFT JOIN weather_observations o ON o.id = latest.id
+                WHERE f.user_id = ?
+                ORDER BY f.id
+            """, (user_id,))
+            rows = cursor.fetchall()
+
+        entries = []
+        to_fetch = {}
+        subscribers = {}
+        for name, lat, lon, subscriber_count, observed_at, *values in rows:
+            if observed_at is not None:
+                # Observations recorded by other workers reach this worker's cache here
+                weather_cache.prime(name, dict(zip(("observed_at", *OBSERVATION_FIELDS, "condition"),
+                                                   (observed_at, *values))), observed_at)
+            entries.append({"name": name, "lat": lat, "lon": lon})
+            if lat is not None and lon is not None and name not in to_fetch:
+                cached = weather_cache.peek(name)
+                if cached is None or cached[1] > max_age:
+                    to_fetch[name] = (lat, lon)
+                    subscribers[name] = subscriber_count
+
+        # Locations the quota cannot cover right now are served from their last observation
+        allowed, _ = quota_manager.schedule(weather_backend.primary.name, subscribers.items())
+
+        reads = {}
+        loads = {}
+        for name in allowed:
+            loader = partial(self._fetch_and_record, name, *to_fetch[name])
+            read = weather_cache.lookup(name, loader, max_age)
+            if read is None:
+                loads[_submit_load(name, loader, max_age)] = name
+            else:
+                reads[name] = read
+        done, pending = wait(loads, timeout=budget)
+
+        for future in done:
+            try:
+                reads[loads[future]] = future.result()
+            except (requests.RequestException, sqlite3.Error) as e:
+                logger.error(f"Failed to update weather data for location {loads[future]}: {str(e)}")
+        if pending:
+            logger.warning(f"{len(pending)} weather fetches for user {user_id} exceeded the {budget}s budget")
+
+        now = time.time()
+        for entry in entries:
+            read = reads.get(entry["name"])
+            if read is None:
+                cached = weather_cache.peek(entry["name"])
+                read = (None, None, None) if cached is None else (cached[0], cached[1], FRESH if cached[1] <= max_age else STALE)
+                if read[1] is not None and read[1] > max_age + weather_cache.stale_if_error:
+                    read = (None, None, None)
+            weather, _, status = read
+            entry["weather"] = weather
+            entry["age_seconds"] = None if weather is None else max(0, int(now - weather["observed_at"]))
+            entry["stale"] = status not in (FRESH, LOADED)
+            entry["cache"] = status or "none"
+            # Counted once served, so the next schedule ranks by earlier reads rather than this one
+            quota_manager.record_read(entry["name"])
+        return entries
+
     ##################################################
     # Utility Functions
     ##################################################
@@ -178,10 +425,7 @@ class FavoritesModel:
         Raises:
             ValueError: If there are no favorite locations.
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM user_favorites")
-            count = cursor.fetchone()[0]
+        count = self.get_favorites_length()
 
         if count == 0:
             logger.error("No favorite locations found")
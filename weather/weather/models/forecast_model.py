@@ -0,0 +1,255 @@
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import sqlite3
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from weather.utils.lazy_import_utils import lazy_import
+from weather.utils.logger import configure_logger
+from weather.utils.quota_utils import WEATHERAPI, quota_manager
+from weather.utils.shard_utils import get_shard_router
+from weather.utils.weather_api_utils import REQUEST_TIMEOUT, WEATHER_API_KEY
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+requests = lazy_import("requests")
+
+
+FORECAST_URL = "https://api.weatherapi.com/v1/forecast.json"
+
+# Hourly fields kept from the forecast payload, each stored as one packed float32 series
+FORECAST_FIELDS = ("temp_c", "feelslike_c", "wind_kph", "humidity", "precip_mm", "chance_of_rain")
+HOUR_SECONDS = 3600
+
+
+def pack_series(values: array) -> bytes:
+    """
+    Serializes a float32 array to little-endian bytes for a BLOB column.
+    """
+    if sys.byteorder != "little":
+        values = array("f", values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def unpack_series(blob: bytes, start: int = 0, stop: Optional[int] = None) -> array:
+    """
+    Deserializes the [start, stop) slice of a packed float32 series without decoding the rest.
+    """
+    itemsize = array("f").itemsize
+    view = memoryview(blob)[start * itemsize:None if stop is None else stop * itemsize]
+    values = array("f")
+    values.frombytes(view)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+class ForecastModel:
+    """
+    A class to fetch and store hourly forecasts for favorite locations.
+
+    Each location's forecast is one row holding a start time, a fixed step and
+    one packed float32 BLOB per field, instead of one row per hour.
+
+    Attributes:
+        db_path: path to the user database
+        shards: routes favorites queries to the shards holding them
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.shards = get_shard_router(db_path)
+
+    ##################################################
+    # Forecast Fetching Functions
+    ##################################################
+
+    def fetch_forecast(self, lat: float, lon: float, days: int = 3) -> Tuple[int, Dict[str, array]]:
+        """
+        Fetches the hourly forecast for a coordinate from WeatherAPI.
+
+        The caller takes the request from the WeatherAPI quota first, as
+        refresh_user_forecasts does through quota_manager.schedule.
+
+        Args:
+            lat (float): The latitude of the location.
+            lon (float): The longitude of the location.
+            days (int): The number of forecast days to request.
+
+        Returns:
+            Tuple[int, Dict[str, array]]: The epoch time of the first hour and one float32 array per field.
+
+        Raises:
+            requests.RequestException: If the request fails.
+            ValueError: If the payload contains no hourly forecast.
+        """
+        params = {"key": WEATHER_API_KEY, "q": f"{lat},{lon}", "days": days, "aqi": "no", "alerts": "no"}
+        response = requests.get(FORECAST_URL, params=params, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        payload = response.json()
+
+        hours = [hour for day in payload.get("forecast", {}).get("forecastday", []) for hour in day.get("hour", [])]
+        if not hours:
+            raise ValueError(f"No hourly forecast returned for {lat},{lon}")
+
+        # Fields missing from an hour, or sent as null, are stored as NaN
+        nan = float("nan")
+        series = {field: array("f", (nan if hour.get(field) is None else float(hour[field]) for hour in hours))
+                  for field in FORECAST_FIELDS}
+        return int(hours[0]["time_epoch"]), series
+
+    def refresh_user_forecasts(self, user_id: int, days: int = 3, max_workers: int = 4) -> int:
+        """
+        Fetches and stores forecasts for every favorite location of a user.
+
+        Args:
+            user_id (int): The ID of the user.
+            days (int): The number of forecast days to request.
+            max_workers (int): The number of concurrent upstream requests.
+
+        Locations are fetched in order of demand as far as the WeatherAPI quota
+        allows; postponed ones keep their stored forecast.
+
+        Returns:
+            int: The number of locations whose forecast was stored.
+
+        Raises:
+            ValueError: If the user has no favorite locations with coordinates.
+        """
+        # Subscriber counts span every shard, so the read goes through the catalog connection
+        with self.shards.connect_catalog() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT DISTINCT f.location_name, f.latitude, f.longitude,
+                       (SELECT COUNT(DISTINCT s.user_id) FROM user_favorites s WHERE s.location_name = f.location_name)
+                FROM user_favorites f
+                WHERE f.user_id = ? AND f.latitude IS NOT NULL AND f.longitude IS NOT NULL
+            """, (user_id,))
+            rows = cursor.fetchall()
+
+        if not rows:
+            logger.error(f"No geocoded favorite locations found for user {user_id}")
+            raise ValueError(f"No geocoded favorite locations found for user {user_id}")
+
+        # Spend the WeatherAPI quota on the most demanded locations; the rest keep their stored forecast
+        allowed, postponed = quota_manager.schedule(WEATHERAPI, {name: subscribers for name, _, _, subscribers in rows}.items())
+        allowed = set(allowed)
+        locations = [(name, lat, lon) for name, lat, lon, _ in rows if name in allowed]
+        if not locations:
+            logger.warning(f"Quota low, keeping stored forecasts for the {len(postponed)} locations of user {user_id}")
+            return 0
+
+        def fetch(location):
+            name, lat, lon = location
+            try:
+                return location, self.fetch_forecast(lat, lon, days)
+            except (requests.RequestException, ValueError) as e:
+                logger.error(f"Failed to fetch forecast for {name}: {str(e)}")
+                return location, None
+
+        stored = 0
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(locations)))) as executor:
+            for (name, lat, lon), forecast in executor.map(fetch, locations):
+                if forecast is not None:
+                    start_time, series = forecast
+                    self.store_forecast(name, lat, lon, start_time, series)
+                    stored += 1
+
+        logger.info(f"Stored forecasts for {stored} of {len(locations)} locations for user {user_id}")
+        return stored
+
+    ##################################################
+    # Forecast Storage Functions
+    ##################################################
+
+    def store_forecast(self, location_name: str, lat: float, lon: float, start_time: int,
+                       series: Dict[str, array], step_seconds: int = HOUR_SECONDS) -> None:
+        """
+        Stores or replaces the forecast series of a location.
+
+        Args:
+            location_name (str): The name of the location.
+            lat (float): The latitude of the location.
+            lon (float): The longitude of the location.
+            start_time (int): The epoch time of the first value.
+            series (Dict[str, array]): One float32 array per forecast field, all the same length.
+            step_seconds (int): The time between consecutive values.
+
+        Raises:
+            ValueError: If a field is missing or the series lengths differ.
+        """
+        lengths = {len(series[field]) for field in FORECAST_FIELDS if field in series}
+        if len(lengths) != 1 or any(field not in series for field in FORECAST_FIELDS):
+            raise ValueError(f"Forecast for {location_name} must have equal-length series for {FORECAST_FIELDS}")
+
+        columns = ", ".join(FORECAST_FIELDS)
+        placeholders = ", ".join("?" for _ in FORECAST_FIELDS)
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                INSERT OR REPLACE INTO location_forecasts
+                    (location_name, latitude, longitude, start_time, step_seconds, hours, fetched_at, {columns})
+                VALUES (?, ?, ?, ?, ?, ?, ?, {placeholders})
+            """, (location_name, lat, lon, start_time, step_seconds, lengths.pop(), int(time.time()),
+                  *(pack_series(series[field]) for field in FORECAST_FIELDS)))
+            conn.commit()
+
+    def get_forecast_window(self, user_id: int, start: int, end: int, fields: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Returns the forecast values between start and end for every favorite location of a user.
+
+        Values are returned column by column, so a location's window is one list
+        per field rather than one dictionary per hour.
+
+        Args:
+            user_id (int): The ID of the user.
+            start (int): The epoch time the window starts at (inclusive).
+            end (int): The epoch time the window ends at (exclusive).
+            fields (List[str], optional): The fields to return. Defaults to all fields.
+
+        Returns:
+            List[Dict]: Per location, its name, coordinates, the time of the first
+            returned value, the step and one list per requested field.
+
+        Raises:
+            ValueError: If an unknown field is requested or the window is empty.
+        """
+        fields = list(fields or FORECAST_FIELDS)
+        unknown = [field for field in fields if field not in FORECAST_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown forecast fields: {', '.join(unknown)}")
+        if end <= start:
+            raise ValueError("Forecast window end must be after its start")
+
+        columns = ", ".join(f"f.{field}" for field in fields)
+        with self.shards.connect_catalog() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT f.location_name, f.latitude, f.longitude, f.start_time, f.step_seconds, f.hours, {columns}
+                FROM location_forecasts f
+                WHERE f.location_name IN (SELECT location_name FROM user_favorites WHERE user_id = ?)
+                ORDER BY f.location_name
+            """, (user_id,))
+            rows = cursor.fetchall()
+
+        windows = []
+        for name, lat, lon, start_time, step, hours, *blobs in rows:
+            first = max(0, -(-(start - start_time) // step))
+            last = min(hours, -(-(end - start_time) // step))
+            window = {
+                "name": name,
+                "lat": lat,
+                "lon": lon,
+                "start_time": start_time + first * step,
+                "step_seconds": step,
+            }
+            for field, blob in zip(fields, blobs):
+                values = unpack_series(blob, first, last).tolist() if last > first else []
+                # Missing hours are stored as NaN, which JSON cannot represent
+                window[field] = [None if value != value else value for value in values]
+            windows.append(window)
+        return windows
@@ -0,0 +1,268 @@
+import logging
+import os
+import sqlite3
+import time
+from typing import Callable, Dict, List, Optional
+
+from weather.utils.logger import configure_logger
+from weather.utils.shard_utils import get_shard_router
+from weather.utils.weather_api_utils import OBSERVATION_FIELDS
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+# Fields aggregated into the hourly and daily rollups
+ROLLUP_FIELDS = ("temp_c", "wind_kph", "humidity", "precip_mm")
+RESOLUTIONS = {"hour": ("observations_hourly", 3600), "day": ("observations_daily", 86400)}
+
+# Raw rows are kept for a week and hourly rollups for 90 days by default
+RAW_RETENTION_SECONDS = int(os.getenv("RAW_RETENTION_SECONDS", str(7 * 86400)))
+HOURLY_RETENTION_SECONDS = int(os.getenv("HOURLY_RETENTION_SECONDS", str(90 * 86400)))
+
+# History ranges up to these spans are served from raw and hourly data respectively
+RAW_MAX_RANGE_SECONDS = 2 * 86400
+HOURLY_MAX_RANGE_SECONDS = 60 * 86400
+
+WATERMARK_NAME = "observations"
+
+
+def _rollup_upsert_sql(table: str, bucket_seconds: int) -> str:
+    """
+    Builds the statement that aggregates a range of raw observations into a rollup table.
+
+    Buckets that already exist are merged with the new partial aggregates, so
+    each raw observation only ever has to be read once.
+    """
+    aggregate_columns = []
+    aggregates = []
+    merges = []
+    for field in ROLLUP_FIELDS:
+        aggregate_columns += [f"{field}_min", f"{field}_max", f"{field}_sum", f"{field}_count"]
+        aggregates += [f"MIN({field})", f"MAX({field})", f"SUM({field})", f"COUNT({field})"]
+        merges += [
+            f"{field}_min = MIN(COALESCE({field}_min, excluded.{field}_min), COALESCE(excluded.{field}_min, {field}_min))",
+            f"{field}_max = MAX(COALESCE({field}_max, excluded.{field}_max), COALESCE(excluded.{field}_max, {field}_max))",
+            f"{field}_sum = COALESCE({field}_sum, 0) + COALESCE(excluded.{field}_sum, 0)",
+            f"{field}_count = {field}_count + excluded.{field}_count",
+        ]
+    return f"""
+        INSERT INTO {table} (location_name, bucket_start, samples, {", ".join(aggregate_columns)})
+        SELECT location_name, (observed_at / {bucket_seconds}) * {bucket_seconds} AS bucket, COUNT(*), {", ".join(aggregates)}
+        FROM weather_observations
+        WHERE id > ? AND id <= ?
+        GROUP BY location_name, bucket
+        ON CONFLICT (location_name, bucket_start) DO UPDATE SET
+            samples = samples + excluded.samples,
+            {", ".join(merges)}
+    """
+
+
+class ObservationsModel:
+    """
+    A class to record weather observations and maintain their hourly and daily rollups.
+
+    Attributes:
+        db_path: path to the user database
+        shards: routes favorites queries to the shards holding them
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.shards = get_shard_router(db_path)
+        self.listeners: List[Callable[[str, float, float, Dict], None]] = []
+
+    ##################################################
+    # Observation Recording Functions
+    ##################################################
+
+    def add_listener(self, listener: Callable[[str, float, float, Dict], None]) -> None:
+        """
+        Registers a callback invoked with (location_name, lat, lon, observation) after each recorded observation.
+        """
+        self.listeners.append(listener)
+
+    def record_observation(self, location_name: str, lat: float, lon: float, observation: Dict) -> int:
+        """
+        Stores a raw observation for a location.
+
+        Args:
+            location_name (str): The name of the location.
+            lat (float): The latitude of the location.
+            lon (float): The longitude of the location.
+            observation (Dict): A normalized observation as returned by parse_current_weather.
+
+        Returns:
+            int: The ID of the stored observation.
+
+        Note:
+            Listener errors are logged and do not affect the stored observation.
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                INSERT INTO weather_observations
+                    (location_name, latitude, longitude, observed_at, {", ".join(OBSERVATION_FIELDS)}, condition)
+                VALUES (?, ?, ?, ?, {", ".join("?" for _ in OBSERVATION_FIELDS)}, ?)
+            """, (location_name, lat, lon, observation["observed_at"],
+                  *(observation.get(field) for field in OBSERVATION_FIELDS), observation.get("condition")))
+            conn.commit()
+            observation_id = cursor.lastrowid
+
+        for listener in self.listeners:
+            try:
+                listener(location_name, lat, lon, observation)
+            except Exception as e:
+                logger.error("Observation listener failed for %s: %s", location_name, str(e))
+        return observation_id
+
+    ##################################################
+    # Rollup Functions
+    ##################################################
+
+    def run_rollups(self, batch_size: int = 50000) -> int:
+        """
+        Aggregates observations recorded since the last run into the hourly and daily rollups.
+
+        The ID of the last processed observation is kept as a watermark, so each
+        run only reads new rows. Every batch is merged and the watermark advanced
+        in a single transaction.
+
+        Args:
+            batch_size (int): The maximum number of observations aggregated per transaction.
+
+        Returns:
+            int: The number of observations processed.
+        """
+        processed = 0
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            while True:
+                cursor.execute("SELECT last_observation_id FROM rollup_watermarks WHERE name = ?", (WATERMARK_NAME,))
+                row = cursor.fetchone()
+                watermark = row[0] if row else 0
+
+                cursor.execute("""
+                    SELECT MAX(id), COUNT(*) FROM (
+                        SELECT id FROM weather_observations WHERE id > ? ORDER BY id LIMIT ?
+                    )
+                """, (watermark, batch_size))
+                upper, count = cursor.fetchone()
+                if not count:
+                    break
+
+                for table, bucket_seconds in RESOLUTIONS.values():
+                    cursor.execute(_rollup_upsert_sql(table, bucket_seconds), (watermark, upper))
+                cursor.execute("""
+                    INSERT INTO rollup_watermarks (name, last_observation_id) VALUES (?, ?)
+                    ON CONFLICT (name) DO UPDATE SET last_observation_id = excluded.last_observation_id
+                """, (WATERMARK_NAME, upper))
+                conn.commit()
+                processed += count
+
+        logger.info("Rolled up %d observations", processed)
+        return processed
+
+    def apply_retention(self, now: Optional[float] = None) -> Dict[str, int]:
+        """
+        Deletes raw observations and hourly rollups older than their retention window.
+
+        Raw observations are only deleted once they are behind the rollup watermark,
+        so no data is lost before it has been aggregated.
+
+        Args:
+            now (float, optional): The current epoch time. Defaults to now.
+
+        Returns:
+            Dict[str, int]: The number of raw and hourly rows deleted.
+        """
+        now = time.time() if now is None else now
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                DELETE FROM weather_observations
+                WHERE observed_at < ?
+                  AND id <= COALESCE((SELECT last_observation_id FROM rollup_watermarks WHERE name = ?), 0)
+            """, (int(now - RAW_RETENTION_SECONDS), WATERMARK_NAME))
+            raw_deleted = cursor.rowcount
+            cursor.execute("DELETE FROM observations_hourly WHERE bucket_start < ?", (int(now - HOURLY_RETENTION_SECONDS),))
+            hourly_deleted = cursor.rowcount
+            conn.commit()
+
+        logger.info("Retention removed %d raw observations and %d hourly rollups", raw_deleted, hourly_deleted)
+        return {"raw_deleted": raw_deleted, "hourly_deleted": hourly_deleted}
+
+    ##################################################
+    # History Retrieval Functions
+    ##################################################
+
+    @staticmethod
+    def choose_resolution(start: int, end: int, now: Optional[float] = None) -> str:
+        """
+        Returns the coarsest-needed resolution for a time range: raw, hour or day.
+
+        A resolution is only chosen if retention still keeps data from the
+        start of the range, so old short ranges fall back to a rollup.
+        """
+        now = time.time() if now is None else now
+        span = end - start
+        if span <= RAW_MAX_RANGE_SECONDS and start >= now - RAW_RETENTION_SECONDS:
+            return "raw"
+        if span <= HOURLY_MAX_RANGE_SECONDS and start >= now - HOURLY_RETENTION_SECONDS:
+            return "hour"
+        return "day"
+
+    def get_history(self, user_id: int, start: int, end: int, resolution: Optional[str] = None) -> Dict:
+        """
+        Returns the observation history of a user's favorite locations.
+
+        Args:
+            user_id (int): The ID of the user.
+            start (int): The epoch time the range starts at (inclusive).
+            end (int): The epoch time the range ends at (exclusive).
+            resolution (str, optional): raw, hour or day. Defaults to the resolution fitting the range.
+
+        Returns:
+            Dict: The resolution used and, per location name, its points in time order.
+
+        Raises:
+            ValueError: If the range or resolution is invalid.
+        """
+        if end <= start:
+            raise ValueError("History range end must be after its start")
+        resolution = resolution or self.choose_resolution(start, end)
+        if resolution != "raw" and resolution not in RESOLUTIONS:
+            raise ValueError(f"Invalid resolution: {resolution} (must be raw, hour or day)")
+
+        with self.shards.connect_catalog() as conn:
+            cursor = conn.cursor()
+            if resolution == "raw":
+                columns = ["observed_at", *ROLLUP_FIELDS]
+                cursor.execute(f"""
+                    SELECT location_name, {", ".join(columns)}
+                    FROM weather_observations
+                    WHERE location_name IN (SELECT location_name FROM user_favorites WHERE user_id = ?)
+                      AND observed_at >= ? AND observed_at < ?
+                    ORDER BY location_name, observed_at
+                """, (user_id, start, end))
+            else:
+                table, _ = RESOLUTIONS[resolution]
+                columns = ["bucket_start", "samples"]
+                selects = ["bucket_start", "samples"]
+                for field in ROLLUP_FIELDS:
+                    columns += [f"{field}_min", f"{field}_max", f"{field}_mean"]
+                    selects += [f"{field}_min", f"{field}_max", f"{field}_sum / NULLIF({field}_count, 0)"]
+                cursor.execute(f"""
+                    SELECT location_name, {", ".join(selects)}
+                    FROM {table}
+                    WHERE location_name IN (SELECT location_name FROM user_favorites WHERE user_id = ?)
+                      AND bucket_start >= ? AND bucket_start < ?
+                    ORDER BY location_name, bucket_start
+                """, (user_id, (start // RESOLUTIONS[resolution][1]) * RESOLUTIONS[resolution][1], end))
+            rows = cursor.fetchall()
+
+        locations: Dict[str, List[Dict]] = {}
+        for name, *values in rows:
+            locations.setdefault(name, []).append(dict(zip(columns, values)))
+        return {"resolution": resolution, "locations": locations}
@@ -1,27 +1,62 @@
-from dataclasses import dataclass, field
 import logging
-import os
 import sqlite3
-from typing import List, Dict
+from typing import List, Optional, Tuple
 
+from weather.utils import sql_utils
+from weather.utils.lazy_import_utils import lazy_import
 from weather.utils.logger import configure_logger
+from weather.utils.record_utils import Record
+from weather.utils.shard_utils import ShardRouter, get_shard_router
 from weather.utils.sql_utils import get_db_connection
-
-import bcrypt
+from weather.utils.user_cache_utils import user_cache
+from weather.utils.write_queue_utils import submit_write
 
 
 logger = logging.getLogger(__name__)
 configure_logger(logger)
+bcrypt = lazy_import("bcrypt")
+
+
+class User(Record):
+    """
+    A user account row.
+    """
+
+    __slots__ = ("id", "username", "email", "password", "salt", "favorite_locations")
+
+    def __init__(self, id: int, username: str, email: str, password: str, salt: str,
+                 favorite_locations: Tuple = ()):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.password = password
+        self.salt = salt
+        self.favorite_locations = favorite_locations
+
+
+class UserSummary(Record):
+    """
+    The public part of a user account: its ID, username and email.
+    """
+
+    __slots__ = ("id", "username", "email")
+
+    def __init__(self, id: int, username: str, email: str):
+        self.id = id
+        self.username = username
+        self.email = email
+
 
+def _shards() -> ShardRouter:
+    return get_shard_router(sql_utils.DB_PATH)
 
-@dataclass
-class User:
-    id: int
-    username: str
-    email: str
-    password: str
-    salt: str
-    favorite_locations: List[Dict] = field(default_factory=list)
+
+def _load_user(user_id: int) -> Optional[UserSummary]:
+    with get_db_connection(_shards().path_for_user(user_id)) as conn:
+        conn.row_factory = UserSummary.row_factory
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, username, email FROM users WHERE id = ?", (user_id,))
+        return cursor.fetchone()
 
 
 def create_user(id: str, username: str, email: str, password: str) -> None:
@@ -55,15 +90,44 @@ def create_user(id: str, username: str, email: str, password: str) -> None:
         salt = bcrypt.gensalt()
         hashed_password = bcrypt.hashpw(password.encode('utf-8'), salt)
 
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO users (username, email, password, salt)
-                VALUES (?, ?, ?, ?)
-            """, (username, email, hashed_password.decode('utf-8'), salt.decode('utf-8')))
-            conn.commit()
-
-            logger.info("User created successfully: %s", username)
+        shards = _shards()
+        values = (username, email, hashed_password.decode('utf-8'), salt.decode('utf-8'))
+        if shards.sharded:
+            # UNIQUE constraints only hold within a shard, and renamed users stay in their original shard
+            if shards.scatter("SELECT 1 FROM users WHERE username = ? OR email = ?", (username, email)):
+                raise sqlite3.IntegrityError("UNIQUE constraint failed: users.username")
+            # The check above races with users created concurrently on other shards; the claim does not
+            shards.claim_email(email)
+            index = shards.shard_for_username(username)
+            path = shards.paths[index]
+
+            def insert(cursor):
+                # The next ID congruent to the shard; the first user of shard i gets ID i + 1
+                cursor.execute("""
+                    INSERT INTO users (id, username, email, password, salt)
+                    VALUES ((SELECT COALESCE(MAX(id), ?) FROM users) + ?, ?, ?, ?, ?)
+                """, (index + 1 - shards.shard_count, shards.shard_count, *values))
+                return cursor.lastrowid
+        else:
+            path = shards.paths[0]
+
+            def insert(cursor):
+                cursor.execute("""
+                    INSERT INTO users (username, email, password, salt)
+                    VALUES (?, ?, ?, ?)
+                """, values)
+                return cursor.lastrowid
+
+        try:
+            user_id = submit_write(path, insert, connect=lambda: get_db_connection(path)).result()
+        except sqlite3.Error:
+            if shards.sharded:
+                shards.release_email(email)
+            raise
+        # The new ID may have been cached as missing
+        user_cache.invalidate(sql_utils.DB_PATH, user_id)
+
+        logger.info("User created successfully: %s", username)
 
     except sqlite3.IntegrityError as e:
         logger.error("Username with '%s' already exists.", username)
@@ -93,67 +157,63 @@ def login_user(username: str, password: str) -> bool:
         raise ValueError("Invalid or empty password provided.")
 
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""SELECT password, salt FROM users WHERE username = ?""", (username,))
-            result = cursor.fetchone()
-
-            if not result:
-                logger.warning("Username '%s' does not exist.", username)
-                return False
-
-            stored_password, salt = result
-            hashed_password = bcrypt.hashpw(password.encode('utf-8'), salt.encode('utf-8'))
-
-            if hashed_password.decode('utf-8') == stored_password:
-                logger.info("Login successful for user: %s", username)
-                return True
-            else:
-                logger.warning("Invalid password for user: %s", username)
-                return False
+        # Renamed users stay in the shard of their ID, so every shard is asked
+        result = None
+        for path in _shards().paths:
+            with get_db_connection(path) as conn:
+                cursor = conn.cursor()
+                cursor.execute("""SELECT password, salt FROM users WHERE username = ?""", (username,))
+                result = cursor.fetchone()
+            if result:
+                break
+
+        if not result:
+            logger.warning("Username '%s' does not exist.", username)
+            return False
+
+        stored_password, salt = result
+        hashed_password = bcrypt.hashpw(password.encode('utf-8'), salt.encode('utf-8'))
+
+        if hashed_password.decode('utf-8') == stored_password:
+            logger.info("Login successful for user: %s", username)
+            return True
+        else:
+            logger.warning("Invalid password for user: %s", username)
+            return False
 
     except sqlite3.Error as e:
         logger.error("Database error during login: %s", str(e))
         raise sqlite3.Error(f"Database error: {str(e)}")
 
-def get_all_users() -> list[dict]:
+def get_all_users() -> List[UserSummary]:
     """
     Retrieves all users that have created an account.
 
     Returns:
-        list[dict]: A list of dictionaries representing all users.
+        List[UserSummary]: The ID, username and email of every user.
 
     Logs:
         Warning: If the catalog is empty.
     """
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            logger.info("Attempting to retrieve all non-users from the db")
-
-            # Determine the sort order based on the 'sort_by_play_count' flag
-            query = """
-                SELECT id, username, email, password
-                FROM users
-            """
-
-            cursor.execute(query)
-            rows = cursor.fetchall()
-
-            if not rows:
-                logger.warning("The user catalog is empty.")
-                return []
-
-            users = [
-                {
-                    "id": row[0],
-                    "username": row[1],
-                    "email": row[2],
-                }
-                for row in rows
-            ]
-            logger.info("Retrieved %d users from the catalog", len(users))
-            return users
+        logger.info("Attempting to retrieve all non-users from the db")
+
+        query = """
+            SELECT id, username, email
+            FROM users
+        """
+
+        shards = _shards()
+        users = shards.scatter(query, connect=get_db_connection, row_factory=UserSummary.row_factory)
+
+        if not users:
+            logger.warning("The user catalog is empty.")
+            return []
+
+        if shards.sharded:
+            users.sort(key=lambda user: user.id)
+        logger.info("Retrieved %d users from the catalog", len(users))
+        return users
 
     except sqlite3.Error as e:
         logger.error("Database error while retrieving all users: %s", str(e))
@@ -172,27 +232,30 @@ def update_password(id: int, new_password: str) -> None:
         ValueError: If the username with the id does not exist.
         sqlite3.Error: If there is a database error.
     """
+    # The user is checked against the shared user cache; the UPDATE catches one removed since
+    if user_cache.get(sql_utils.DB_PATH, id, _load_user) is None:
+        logger.info("User with ID %d not found", id)
+        raise ValueError(f"No user found with id {id}.")
+
+    salt = bcrypt.gensalt()
+    hashed_password = bcrypt.hashpw(new_password.encode('utf-8'), salt)
+
+    def store(cursor):
+        cursor.execute(
+            "UPDATE users SET password = ?, salt = ? WHERE id = ?",
+            (hashed_password.decode('utf-8'), salt.decode('utf-8'), id)
+        )
+        if cursor.rowcount == 0:
+            logger.info("User with ID %d not found", id)
+            raise ValueError(f"No user found with id {id}.")
+
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            logger.info("Attempting to update password for user with ID %d", id)
-
-            cursor.execute("SELECT username FROM users WHERE id = ?", (id,))
-            result = cursor.fetchone()
-            if result is None:
-                logger.info("User with ID %d not found", id)
-                raise ValueError(f"No user found with id {id}.")
-            
-            salt = bcrypt.gensalt()
-            hashed_password = bcrypt.hashpw(new_password.encode('utf-8'), salt)
-
-            cursor.execute(
-                "UPDATE users SET password = ?, salt = ? WHERE id = ?",
-                (hashed_password.decode('utf-8'), salt.decode('utf-8'), id)
-            )
-            conn.commit()
-
-            logger.info("Password updated for user with ID: %d", id)
+        logger.info("Attempting to update password for user with ID %d", id)
+        path = _shards().path_for_user(id)
+        # The cached user holds no password, so its entry stays valid
+        submit_write(path, store, connect=lambda: get_db_connection(path)).result()
+
+        logger.info("Password updated for user with ID: %d", id)
 
     except sqlite3.Error as e:
         logger.error("Database error while updating password for user with ID %d: %s", id, str(e))
@@ -211,22 +274,26 @@ def update_username(id: int, new_username: str) -> None:
         ValueError: If the user does not exist.
         sqlite3.Error: If there is a database error.
     """
-    try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            logger.info("Attempting to update username for user with ID %d", id)
-
-            cursor.execute("SELECT username FROM users WHERE id = ?", (id,))
-            user = cursor.fetchone()
+    def rename(cursor):
+        cursor.execute("SELECT username FROM users WHERE id = ?", (id,))
+        user = cursor.fetchone()
 
-            if user is None:
-                logger.info("User with ID %d not found", id)
-                raise ValueError(f"No user found with id {id}.")
+        if user is None:
+            logger.info("User with ID %d not found", id)
+            raise ValueError(f"No user found with id {id}.")
 
-            cursor.execute("UPDATE users SET username = ? WHERE id = ?", (new_username, id))
-            conn.commit()
+        cursor.execute("UPDATE users SET username = ? WHERE id = ?", (new_username, id))
 
-            logger.info("Username updated for user with ID: %d", id)
+    try:
+        logger.info("Attempting to update username for user with ID %d", id)
+        shards = _shards()
+        if shards.sharded and shards.scatter("SELECT 1 FROM users WHERE username = ? AND id != ?", (new_username, id)):
+            raise sqlite3.IntegrityError("UNIQUE constraint failed: users.username")
+        path = shards.path_for_user(id)
+        submit_write(path, rename, connect=lambda: get_db_connection(path)).result()
+        user_cache.invalidate(sql_utils.DB_PATH, id)
+
+        logger.info("Username updated for user with ID: %d", id)
 
     except sqlite3.Error as e:
         logger.error("Database error while updating username for user with ID %d: %s", id, str(e))
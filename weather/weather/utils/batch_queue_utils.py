@@ -0,0 +1,105 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, List
+
+from weather.utils.logger import configure_logger
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+class BatchingQueue:
+    """
+    A queue that hands items to a sink in batches from a background thread.
+
+    A batch is flushed once it reaches max_batch items or its oldest item has
+    waited max_delay seconds, whichever comes first.
+
+    Attributes:
+        sink (Callable[[List[Any]], None]): Receives each batch.
+        max_batch (int): The largest batch handed to the sink.
+        max_delay (float): The longest an item waits before being flushed.
+    """
+
+    def __init__(self, sink: Callable[[List[Any]], None], max_batch: int = 100, max_delay: float = 1.0):
+        self.sink = sink
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.delivered = 0
+        self.failed = 0
+        self._items: List[Any] = []
+        self._oldest = None
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def put(self, item: Any) -> None:
+        """
+        Queues an item, starting the flusher thread on first use.
+        """
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="batching-queue", daemon=True)
+                self._thread.start()
+            if not self._items:
+                self._oldest = time.monotonic()
+            self._items.append(item)
+            # Wake the flusher to start the delay clock, or to deliver a full batch at once
+            if len(self._items) == 1 or len(self._items) >= self.max_batch:
+                self._condition.notify()
+
+    def _take_batch(self) -> List[Any]:
+        batch, self._items = self._items[:self.max_batch], self._items[self.max_batch:]
+        self._oldest = time.monotonic() if self._items else None
+        return batch
+
+    def _deliver(self, batch: List[Any]) -> None:
+        try:
+            self.sink(batch)
+            self.delivered += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error("Failed to deliver a batch of %d items: %s", len(batch), str(e))
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    if len(self._items) >= self.max_batch:
+                        break
+                    if self._items:
+                        remaining = self._oldest + self.max_delay - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._condition.wait(remaining)
+                    else:
+                        self._condition.wait()
+                if self._stopped and not self._items:
+                    return
+                batch = self._take_batch()
+            self._deliver(batch)
+
+    def flush(self) -> None:
+        """
+        Delivers every queued item immediately on the calling thread.
+        """
+        while True:
+            with self._condition:
+                if not self._items:
+                    return
+                batch = self._take_batch()
+            self._deliver(batch)
+
+    def stop(self) -> None:
+        """
+        Stops the flusher thread after it has delivered the remaining items.
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        self.flush()
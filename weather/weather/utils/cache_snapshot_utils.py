@@ -0,0 +1,311 @@
+## Saves the weather and geocode caches to a binary snapshot and restores them on startup
+
+import fcntl
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from weather.utils.cache_utils import StaleWhileRevalidateCache, TTLCache
+from weather.utils.geocoding_utils import geocode_cache
+from weather.utils.logger import configure_logger
+from weather.utils.weather_api_utils import OBSERVATION_FIELDS
+from weather.utils.weather_provider_utils import weather_cache
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+# Seconds between background snapshots; 0 only saves when the process stops
+CACHE_SNAPSHOT_INTERVAL = float(os.getenv("CACHE_SNAPSHOT_INTERVAL", "60"))
+
+MAGIC = b"WCS2"
+# magic, written at, geocode record count, weather record count
+HEADER = struct.Struct("<4sdII")
+# Fixed-width records follow the header, then one blob holding every key and
+# condition as utf-8, so a section is decoded with a single iter_unpack.
+# text offset, key length, name length (the name follows the key), stored at,
+# latitude, longitude
+GEOCODE_RECORD = struct.Struct("<IHHddd")
+# text offset, key length, condition length (the condition follows the key),
+# stored at, observed at, one value per observation field (NaN for None)
+WEATHER_RECORD = struct.Struct(f"<IHHdq{len(OBSERVATION_FIELDS)}d")
+MAX_TEXT_BYTES = 0xFFFF
+
+# (key, value, stored_at) as returned by TTLCache.items
+Entry = Tuple[str, object, float]
+
+
+def _encode_text(text: Optional[str]) -> Optional[bytes]:
+    encoded = (text or "").encode("utf-8")
+    return encoded if len(encoded) <= MAX_TEXT_BYTES else None
+
+
+def write_snapshot(path: str, geocode_entries: Iterable[Entry], weather_entries: Iterable[Entry]) -> Tuple[int, int]:
+    """
+    Writes cache entries to a snapshot file, replacing any previous snapshot atomically.
+
+    The snapshot is written to a temporary file of this process, flushed to
+    disk and renamed over path, so readers see either the old or the new file.
+    Entries whose key or condition does not fit are left out.
+
+    Args:
+        path (str): The snapshot file.
+        geocode_entries (Iterable[Entry]): (normalized name, (lat, lon, name), stored_at), least recently used first.
+        weather_entries (Iterable[Entry]): (location name, observation, stored_at), least recently used first.
+
+    Returns:
+        Tuple[int, int]: The number of geocode and weather entries written.
+    """
+    texts: List[bytes] = []
+    text_size = 0
+
+    geocode_records = []
+    for key, (lat, lon, name), stored_at in geocode_entries:
+        encoded, spelled = _encode_text(key), _encode_text(name)
+        if encoded is None or spelled is None:
+            continue
+        geocode_records.append(GEOCODE_RECORD.pack(text_size, len(encoded), len(spelled), stored_at, lat, lon))
+        texts.append(encoded)
+        texts.append(spelled)
+        text_size += len(encoded) + len(spelled)
+
+    weather_records = []
+    for key, observation, stored_at in weather_entries:
+        encoded, condition = _encode_text(key), _encode_text(observation.get("condition"))
+        if encoded is None or condition is None:
+            continue
+        values = [math.nan if observation.get(field) is None else float(observation[field]) for field in OBSERVATION_FIELDS]
+        weather_records.append(WEATHER_RECORD.pack(text_size, len(encoded), len(condition), stored_at,
+                                                   int(observation["observed_at"]), *values))
+        texts.append(encoded)
+        texts.append(condition)
+        text_size += len(encoded) + len(condition)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, time.time(), len(geocode_records), len(weather_records)))
+        f.writelines(geocode_records)
+        f.writelines(weather_records)
+        f.writelines(texts)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(geocode_records), len(weather_records)
+
+
+def read_snapshot(path: str) -> Tuple[List[Entry], List[Entry]]:
+    """
+    Reads the geocode and weather entries of a snapshot through a memory map.
+
+    Returns:
+        Tuple[List[Entry], List[Entry]]: The geocode and weather entries, in the order they were written.
+
+    Raises:
+        OSError: If the file cannot be opened.
+        ValueError: If the file is empty, truncated or not a snapshot.
+    """
+    with open(path, "rb") as f:
+        try:
+            view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise ValueError(f"Cache snapshot {path} is empty")
+    with view:
+        if len(view) < HEADER.size:
+            raise ValueError(f"Cache snapshot {path} is truncated")
+        magic, _, geocode_count, weather_count = HEADER.unpack_from(view, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Cache snapshot {path} has an unsupported format")
+        weather_start = HEADER.size + geocode_count * GEOCODE_RECORD.size
+        text_start = weather_start + weather_count * WEATHER_RECORD.size
+        if len(view) < text_start:
+            raise ValueError(f"Cache snapshot {path} is truncated")
+        geocode_records = list(GEOCODE_RECORD.iter_unpack(view[HEADER.size:weather_start]))
+        weather_records = list(WEATHER_RECORD.iter_unpack(view[weather_start:text_start]))
+        text = view[text_start:]
+
+    text_size = (sum(record[1] + record[2] for record in geocode_records)
+                 + sum(record[1] + record[2] for record in weather_records))
+    if len(text) != text_size:
+        raise ValueError(f"Cache snapshot {path} is truncated")
+
+    try:
+        geocode_entries = [(text[offset:offset + key_length].decode("utf-8"),
+                            (lat, lon, text[offset + key_length:offset + key_length + name_length].decode("utf-8")),
+                            stored_at)
+                           for offset, key_length, name_length, stored_at, lat, lon in geocode_records]
+
+        fields = ("observed_at", *OBSERVATION_FIELDS)
+        weather_entries = []
+        for offset, key_length, condition_length, stored_at, *values in weather_records:
+            observation = dict(zip(fields, values))
+            for field in OBSERVATION_FIELDS:
+                if math.isnan(observation[field]):
+                    observation[field] = None
+            middle = offset + key_length
+            observation["condition"] = text[middle:middle + condition_length].decode("utf-8") or None
+            weather_entries.append((text[offset:middle].decode("utf-8"), observation, stored_at))
+    except UnicodeDecodeError:
+        raise ValueError(f"Cache snapshot {path} is corrupt")
+    return geocode_entries, weather_entries
+
+
+def _merge(current: List[Entry], previous: List[Entry], max_entries: int) -> List[Entry]:
+    """
+    Combines in-memory entries with those of an earlier snapshot, keeping the newest value per key.
+    """
+    merged = {key: (value, stored_at) for key, value, stored_at in previous}
+    for key, value, stored_at in current:
+        # Re-inserted so entries used in this process rank as most recently used
+        kept = merged.pop(key, None)
+        merged[key] = (value, stored_at) if kept is None or stored_at >= kept[1] else kept
+    return [(key, value, stored_at) for key, (value, stored_at) in merged.items()][-max_entries:]
+
+
+def _expiry(cache: StaleWhileRevalidateCache) -> float:
+    return cache.max_age + max(cache.stale_while_revalidate, cache.stale_if_error)
+
+
+def save_caches(path: str, geocode: TTLCache = geocode_cache,
+                weather: StaleWhileRevalidateCache = weather_cache) -> Dict[str, int]:
+    """
+    Snapshots the geocode and weather caches, merged with the snapshot already on disk.
+
+    Several worker processes save to the same file, so entries another
+    worker saved are kept unless this process holds a newer value for the
+    key. Saves hold an exclusive lock on path + ".lock" from the read to the
+    rename, so two workers never merge the same snapshot and drop each
+    other's entries. Weather older than the stale-if-error limit is dropped.
+
+    Returns:
+        Dict[str, int]: The number of geocode and weather entries written.
+    """
+    with open(path + ".lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            previous: Tuple[List[Entry], List[Entry]] = ([], [])
+            if os.path.exists(path):
+                try:
+                    previous = read_snapshot(path)
+                except (OSError, ValueError) as e:
+                    logger.warning("Replacing unreadable cache snapshot %s: %s", path, str(e))
+
+            oldest = time.time() - _expiry(weather)
+            weather_entries = [entry for entry in _merge(list(weather.entries.items()), previous[1],
+                                                         weather.entries.max_entries)
+                               if entry[2] >= oldest]
+            geocode_entries = _merge(list(geocode.items()), previous[0], geocode.max_entries)
+            geocode_count, weather_count = write_snapshot(path, geocode_entries, weather_entries)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+    return {"geocode": geocode_count, "weather": weather_count}
+
+
+def load_caches(path: str, geocode: TTLCache = geocode_cache,
+                weather: StaleWhileRevalidateCache = weather_cache) -> Dict[str, int]:
+    """
+    Restores the geocode and weather caches from a snapshot, keeping each entry's original age.
+
+    Entries already cached with a newer value are left alone, and weather
+    past the stale-if-error limit is skipped. A missing snapshot loads nothing.
+
+    Returns:
+        Dict[str, int]: The number of geocode and weather entries loaded.
+
+    Raises:
+        ValueError: If the snapshot is unreadable.
+    """
+    if not os.path.exists(path):
+        return {"geocode": 0, "weather": 0}
+    geocode_entries, weather_entries = read_snapshot(path)
+
+    cached = {key for key, _, _ in geocode.items()}
+    for key, coordinates, stored_at in geocode_entries:
+        if key not in cached:
+            geocode.set(key, coordinates, stored_at=stored_at)
+
+    oldest = time.time() - _expiry(weather)
+    cached_at = {key: stored_at for key, _, stored_at in weather.entries.items()}
+    loaded = 0
+    for key, observation, stored_at in weather_entries:
+        if stored_at >= oldest and stored_at > cached_at.get(key, 0):
+            weather.entries.set(key, observation, stored_at=stored_at)
+            loaded += 1
+    return {"geocode": len(geocode_entries), "weather": loaded}
+
+
+class CacheSnapshotter:
+    """
+    Keeps a snapshot of the process's weather and geocode caches on disk.
+
+    start loads the snapshot left by earlier processes, so a restarted worker
+    answers from warm caches, then saves a new one every interval seconds
+    from a daemon thread. stop saves a final snapshot, so a rolling restart
+    hands the caches over to the next process.
+
+    Attributes:
+        path (str): The snapshot file.
+        interval (float): Seconds between background snapshots, or 0 to save only on stop.
+    """
+
+    def __init__(self, path: str, interval: float = CACHE_SNAPSHOT_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.loaded: Dict[str, int] = {}
+        self.saved: Dict[str, int] = {}
+        self.saved_at: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """
+        Loads the existing snapshot, then starts the periodic snapshots.
+        """
+        started = time.perf_counter()
+        try:
+            self.loaded = load_caches(self.path)
+        except (OSError, ValueError) as e:
+            logger.warning("Starting with cold caches, could not load %s: %s", self.path, str(e))
+        else:
+            logger.info("Loaded %d geocode and %d weather cache entries from %s in %.1f ms",
+                        self.loaded["geocode"], self.loaded["weather"], self.path,
+                        (time.perf_counter() - started) * 1000)
+        if self.interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="cache-snapshot", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.save()
+
+    def save(self) -> None:
+        """
+        Writes a snapshot now; failures are logged and the previous snapshot is kept.
+
+        Any exception is caught, so one failed save does not end the background snapshots.
+        """
+        with self._lock:
+            try:
+                self.saved = save_caches(self.path)
+                self.saved_at = time.time()
+            except Exception:
+                logger.exception("Failed to save cache snapshot %s", self.path)
+
+    def stop(self) -> None:
+        """
+        Stops the background thread and saves a final snapshot.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.save()
+
+    def stats(self) -> Dict:
+        return {"path": self.path, "loaded": self.loaded, "saved": self.saved, "saved_at": self.saved_at}
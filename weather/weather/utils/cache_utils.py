@@ -0,0 +1,353 @@
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, Set, Tuple
+
+from weather.utils.logger import configure_logger
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+# How a StaleWhileRevalidateCache read was answered
+FRESH = "fresh"
+STALE = "stale"
+STALE_IF_ERROR = "stale-if-error"
+LOADED = "loaded"
+
+
+class TTLCache:
+    """
+    A thread-safe, bounded in-memory cache with least-recently-used eviction
+    and an optional time-to-live per entry.
+
+    Attributes:
+        max_entries (int): The maximum number of entries kept before the least
+            recently used one is evicted.
+        ttl (float | None): Seconds an entry stays valid, or None to never expire.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_entry(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """
+        Returns the cached value together with its age in seconds.
+
+        Args:
+            key (Hashable): The cache key.
+
+        Returns:
+            tuple | None: (value, age_seconds) if the key is cached and not expired, otherwise None.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, stored_at = entry
+            age = now - stored_at
+            if self.ttl is not None and age > self.ttl:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value, age
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Returns the cached value for a key, or the default if it is missing or expired.
+        """
+        entry = self.get_entry(key)
+        return default if entry is None else entry[0]
+
+    def set(self, key: Hashable, value: Any, stored_at: Optional[float] = None) -> None:
+        """
+        Stores a value, evicting the least recently used entry when the cache is full.
+
+        Args:
+            key (Hashable): The cache key.
+            value (Any): The value to store.
+            stored_at (float, optional): Epoch seconds the value was produced at. Defaults to now.
+        """
+        with self._lock:
+            self._entries[key] = (value, time.time() if stored_at is None else stored_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def set_if_newer(self, key: Hashable, value: Any, stored_at: float) -> bool:
+        """
+        Stores a value unless the cache holds one stored at or after stored_at.
+
+        Returns:
+            bool: Whether the value was stored.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] >= stored_at:
+                return False
+            self._entries[key] = (value, stored_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return True
+
+    def delete(self, key: Hashable) -> None:
+        """
+        Removes a key from the cache if present.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Removes every entry and resets the hit/miss counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def items(self) -> Iterator[Tuple[Hashable, Any, float]]:
+        """
+        Returns a snapshot of (key, value, stored_at) triples, oldest first.
+        """
+        with self._lock:
+            return iter([(key, value, stored_at) for key, (value, stored_at) in self._entries.items()])
+
+    def stats(self) -> dict:
+        """
+        Returns the size and hit-rate counters of the cache.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class StaleWhileRevalidateCache:
+    """
+    A cache that keeps answering from expired entries while they are refreshed.
+
+    An entry is fresh for max_age seconds after it was stored. For
+    stale_while_revalidate seconds after that it is still returned at once,
+    marked stale, and one background call to its loader refreshes it. Older
+    or missing entries are loaded by the caller; if that load fails, the last
+    good value is returned for up to stale_if_error seconds past max_age.
+    While the last load of a key has failed, reads inside that window get the
+    old value at once and the retry runs in the background, so a failing
+    upstream does not slow reads down. Concurrent loads of one key share a
+    single call to its loader. The loads in flight and the keys whose last
+    load failed are tracked per process, even when the entries are a
+    SharedCache, so workers of one host may load the same key at once.
+
+    Attributes:
+        entries (TTLCache | SharedCache): Key -> value, with the time each value was stored.
+        max_age (float): Seconds an entry is fresh, unless a read asks for another age.
+        stale_while_revalidate (float): Seconds past max_age an entry is served while it is refreshed.
+        stale_if_error (float): Seconds past max_age an entry is served while loading it fails.
+    """
+
+    def __init__(self, max_age: float, stale_while_revalidate: float, stale_if_error: float,
+                 max_entries: int = 10000, workers: int = 4, entries: Optional[TTLCache] = None):
+        # Another store with the TTLCache interface, such as a SharedCache, can hold the entries
+        self.entries = TTLCache(max_entries=max_entries) if entries is None else entries
+        self.max_age = max_age
+        self.stale_while_revalidate = stale_while_revalidate
+        self.stale_if_error = stale_if_error
+        self.workers = workers
+        self.served = {FRESH: 0, STALE: 0, STALE_IF_ERROR: 0, LOADED: 0}
+        self.revalidations = 0
+        self.failures = 0
+        self._in_flight: Dict[Hashable, Future] = {}
+        self._failing: Set[Hashable] = set()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def peek(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """
+        Returns the cached value and its age in seconds, however old, without refreshing it.
+        """
+        return self.entries.get_entry(key)
+
+    def prime(self, key: Hashable, value: Any, stored_at: float) -> None:
+        """
+        Stores a value produced elsewhere unless the cache already holds a newer one.
+        """
+        self.entries.set_if_newer(key, value, stored_at)
+
+    def lookup(self, key: Hashable, loader: Callable[[], Any],
+               max_age: Optional[float] = None) -> Optional[Tuple[Any, float, str]]:
+        """
+        Answers a read from the cache, refreshing a stale entry in the background.
+
+        Args:
+            key (Hashable): The cache key.
+            loader (Callable[[], Any]): Produces a new value for the key.
+            max_age (float, optional): Overrides the cache's max_age for this read.
+
+        Returns:
+            tuple | None: (value, age_seconds, status) with status FRESH, STALE or
+            STALE_IF_ERROR, or None if the caller has to load the key.
+        """
+        max_age = self.max_age if max_age is None else max_age
+        entry = self.entries.get_entry(key)
+        if entry is None:
+            return None
+        value, age = entry
+        if age <= max_age:
+            status = FRESH
+        else:
+            with self._lock:
+                failing = key in self._failing
+            if failing and age <= max_age + self.stale_if_error:
+                status = STALE_IF_ERROR
+            elif age <= max_age + self.stale_while_revalidate:
+                status = STALE
+            else:
+                return None
+            self._revalidate(key, loader)
+        with self._lock:
+            self.served[status] += 1
+        return value, age, status
+
+    def load(self, key: Hashable, loader: Callable[[], Any],
+             max_age: Optional[float] = None) -> Tuple[Any, float, str]:
+        """
+        Loads a key, falling back to its last good value if the load fails within the stale-if-error window.
+
+        Returns:
+            tuple: (value, age_seconds, status) with status LOADED or STALE_IF_ERROR.
+
+        Raises:
+            Exception: The loader's error, if there is no value recent enough to fall back to.
+        """
+        max_age = self.max_age if max_age is None else max_age
+        try:
+            value = self.refresh(key, loader)
+        except Exception:
+            entry = self.entries.get_entry(key)
+            if entry is None or entry[1] > max_age + self.stale_if_error:
+                raise
+            status = STALE_IF_ERROR
+            value, age = entry
+        else:
+            status, age = LOADED, 0.0
+        with self._lock:
+            self.served[status] += 1
+        return value, age, status
+
+    def refresh(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Calls the loader and stores its value, or waits for a load of the key already in progress.
+
+        Raises:
+            Exception: Whatever the loader raised.
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+        if owner:
+            self._run(key, loader, future)
+        return future.result()
+
+    def _revalidate(self, key: Hashable, loader: Callable[[], Any]) -> None:
+        with self._lock:
+            # After shutdown the entry is refreshed by the next load instead
+            if self._closed or key in self._in_flight:
+                return
+            future = self._in_flight[key] = Future()
+            self.revalidations += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="cache-revalidate")
+            executor = self._executor
+        try:
+            executor.submit(self._run, key, loader, future)
+        except RuntimeError:
+            # Shutting down; the entry is refreshed by the next load instead
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def _run(self, key: Hashable, loader: Callable[[], Any], future: Future) -> None:
+        try:
+            value = loader()
+            self.entries.set(key, value)
+        except Exception as e:
+            with self._lock:
+                self._failing.add(key)
+                self.failures += 1
+            logger.warning("Failed to refresh cached %s: %s", key, str(e))
+            future.set_exception(e)
+        else:
+            with self._lock:
+                self._failing.discard(key)
+            future.set_result(value)
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            # Anything escaping the handlers above still releases the callers waiting on the future
+            if not future.done():
+                future.cancel()
+
+    def clear(self) -> None:
+        """
+        Removes every entry and resets the counters.
+        """
+        self.entries.clear()
+        with self._lock:
+            self._failing.clear()
+            self.served = dict.fromkeys(self.served, 0)
+            self.revalidations = 0
+            self.failures = 0
+
+    def shutdown(self) -> None:
+        """
+        Stops starting background refreshes; those already running are left to finish.
+
+        Stale reads after this are still answered, and refreshed only by the next load.
+        """
+        with self._lock:
+            self._closed = True
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        """
+        Returns the size of the cache, how reads were answered and the refreshes made.
+        """
+        with self._lock:
+            return {
+                "size": len(self.entries),
+                "max_age": self.max_age,
+                "stale_while_revalidate": self.stale_while_revalidate,
+                "stale_if_error": self.stale_if_error,
+                "served": dict(self.served),
+                "revalidations": self.revalidations,
+                "failures": self.failures,
+                "failing": len(self._failing),
+                "in_flight": len(self._in_flight),
+            }
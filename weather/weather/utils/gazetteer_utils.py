@@ -0,0 +1,212 @@
+## Offline geocoder backed by a GeoNames-style gazetteer
+## https://download.geonames.org/export/dump/ (e.g. cities15000.txt)
+
+import argparse
+import logging
+import mmap
+import os
+import struct
+from typing import Iterator, List, Optional, Tuple
+
+from weather.utils.geocoding_utils import normalize_location_name
+from weather.utils.logger import configure_logger
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+MAGIC = b"GAZ1"
+# magic, record count, name width
+HEADER = struct.Struct("<4sII")
+NAME_WIDTH = 48
+# normalized name (utf-8, null padded), latitude, longitude, population
+RECORD = struct.Struct(f"<{NAME_WIDTH}sffI")
+
+# Column positions in the GeoNames main table
+GEONAMES_NAME = 1
+GEONAMES_ASCIINAME = 2
+GEONAMES_LATITUDE = 4
+GEONAMES_LONGITUDE = 5
+GEONAMES_POPULATION = 14
+
+
+def _encode_name(name: str) -> bytes:
+    """
+    Encodes a normalized name into its fixed-width key, truncating on a character boundary.
+    """
+    encoded = name.encode("utf-8")
+    if len(encoded) > NAME_WIDTH:
+        encoded = encoded[:NAME_WIDTH].decode("utf-8", errors="ignore").encode("utf-8")
+    return encoded.ljust(NAME_WIDTH, b"\0")
+
+
+def _read_geonames(tsv_path: str) -> Iterator[Tuple[bytes, float, float, int]]:
+    """
+    Yields one (key, latitude, longitude, population) tuple per distinct name of each place.
+    """
+    with open(tsv_path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            columns = line.rstrip("\n").split("\t")
+            if len(columns) <= GEONAMES_POPULATION:
+                logger.warning("Skipping malformed gazetteer line %d", line_number)
+                continue
+            try:
+                latitude = float(columns[GEONAMES_LATITUDE])
+                longitude = float(columns[GEONAMES_LONGITUDE])
+                population = int(columns[GEONAMES_POPULATION] or 0)
+            except ValueError:
+                logger.warning("Skipping gazetteer line %d with invalid numbers", line_number)
+                continue
+
+            keys = {_encode_name(normalize_location_name(columns[GEONAMES_NAME]))}
+            if columns[GEONAMES_ASCIINAME]:
+                keys.add(_encode_name(normalize_location_name(columns[GEONAMES_ASCIINAME])))
+            for key in keys:
+                yield key, latitude, longitude, min(population, 0xFFFFFFFF)
+
+
+def build_index(tsv_path: str, index_path: str) -> int:
+    """
+    Builds a sorted, fixed-width gazetteer index from a GeoNames-style TSV file.
+
+    Records are sorted by name and, for names shared by several places, by
+    descending population so the first match is the most prominent place.
+    The index is written to a temporary file and atomically moved into place.
+
+    Args:
+        tsv_path (str): Path to the GeoNames-style TSV file.
+        index_path (str): Path of the index file to write.
+
+    Returns:
+        int: The number of records written.
+    """
+    records = sorted(_read_geonames(tsv_path), key=lambda record: (record[0], -record[3]))
+
+    tmp_path = f"{index_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(records), NAME_WIDTH))
+        for record in records:
+            f.write(RECORD.pack(*record))
+    os.replace(tmp_path, index_path)
+
+    logger.info("Built gazetteer index %s with %d records", index_path, len(records))
+    return len(records)
+
+
+class Gazetteer:
+    """
+    A read-only, memory-mapped gazetteer index searched with binary search.
+
+    Only the header is read when the index is opened; record pages are loaded
+    by the operating system on first access.
+
+    Attributes:
+        index_path: path to an index written by build_index
+    """
+
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        self._file = open(index_path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"Gazetteer index {index_path} is empty")
+
+        magic, self.count, name_width = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or name_width != NAME_WIDTH:
+            self.close()
+            raise ValueError(f"Gazetteer index {index_path} has an unsupported format")
+        if len(self._mmap) != HEADER.size + self.count * RECORD.size:
+            self.close()
+            raise ValueError(f"Gazetteer index {index_path} is truncated")
+
+    def _key_at(self, position: int) -> bytes:
+        offset = HEADER.size + position * RECORD.size
+        return self._mmap[offset:offset + NAME_WIDTH]
+
+    def _record_at(self, position: int) -> Tuple[str, float, float, int]:
+        key, latitude, longitude, population = RECORD.unpack_from(self._mmap, HEADER.size + position * RECORD.size)
+        return key.rstrip(b"\0").decode("utf-8"), latitude, longitude, population
+
+    def _lower_bound(self, key: bytes) -> int:
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def lookup(self, name: str) -> Optional[Tuple[float, float]]:
+        """
+        Returns the coordinates of the most populous place with exactly this name.
+
+        Args:
+            name (str): The place name, in any case or spacing.
+
+        Returns:
+            tuple | None: (latitude, longitude), or None if the name is not in the index.
+        """
+        key = _encode_name(normalize_location_name(name))
+        position = self._lower_bound(key)
+        if position < self.count and self._key_at(position) == key:
+            _, latitude, longitude, _ = self._record_at(position)
+            return latitude, longitude
+        return None
+
+    def search_prefix(self, prefix: str, limit: int = 10, max_scan: int = 5000) -> List[Tuple[str, float, float, int]]:
+        """
+        Returns up to limit distinct names starting with prefix, most populous first.
+
+        Args:
+            prefix (str): The beginning of a place name.
+            limit (int): The maximum number of results.
+            max_scan (int): The maximum number of records examined, bounding very short prefixes.
+
+        Returns:
+            List[tuple]: (name, latitude, longitude, population) tuples.
+        """
+        encoded = _encode_name(normalize_location_name(prefix)).rstrip(b"\0")
+        if not encoded:
+            return []
+
+        matches = {}
+        position = self._lower_bound(encoded.ljust(NAME_WIDTH, b"\0"))
+        end = min(self.count, position + max_scan)
+        while position < end and self._key_at(position).startswith(encoded):
+            name, latitude, longitude, population = self._record_at(position)
+            # Records of one name are sorted by population, so the first one wins
+            matches.setdefault(name, (name, latitude, longitude, population))
+            position += 1
+
+        return sorted(matches.values(), key=lambda match: -match[3])[:limit]
+
+    def close(self) -> None:
+        """
+        Unmaps the index and closes the underlying file.
+        """
+        self._mmap.close()
+        self._file.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+
+def main():
+    """
+    Builds a gazetteer index from the command line.
+    """
+    parser = argparse.ArgumentParser(description="Build an offline gazetteer index from a GeoNames TSV file.")
+    parser.add_argument("tsv_path", help="GeoNames-style TSV file, e.g. cities15000.txt")
+    parser.add_argument("index_path", help="Path of the index file to write")
+    args = parser.parse_args()
+
+    count = build_index(args.tsv_path, args.index_path)
+    print(f"Wrote {count} records to {args.index_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,108 @@
 ##https://open-meteo.com/en/docs/geocoding-api/#name 
 ## to find the lat and long given the name of the city
 
-import requests
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+import threading
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
 import json
 
+from weather.utils.lazy_import_utils import lazy_import
+from weather.utils.logger import configure_logger
+from weather.utils.quota_utils import OPEN_METEO, quota_manager
+from weather.utils.rate_limit_utils import RateLimiter
+from weather.utils.shared_cache_utils import create_cache
+from weather.utils.weather_api_utils import REQUEST_TIMEOUT
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+requests = lazy_import("requests")
+
+
+# Upstream limits and cache sizing, overridable from the environment
+GEOCODE_RATE_LIMIT = float(os.getenv("GEOCODE_RATE_LIMIT", "10"))
+GEOCODE_MAX_WORKERS = int(os.getenv("GEOCODE_MAX_WORKERS", "8"))
+GEOCODE_CACHE_SIZE = int(os.getenv("GEOCODE_CACHE_SIZE", "50000"))
+# Optional offline index built with `python -m weather.utils.gazetteer_utils`
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH")
+
+# Normalized name -> (latitude, longitude, name as first spelled). Coordinates
+# rarely move, so cached entries never expire on their own; with
+# SHARED_CACHE_PATH set, every worker process shares them
+geocode_cache = create_cache("geocode", GEOCODE_CACHE_SIZE)
+geocode_rate_limiter = RateLimiter(GEOCODE_RATE_LIMIT)
+
+_offline_geocoder = None
+# Set once opening the gazetteer has been attempted, whether or not it succeeded
+_offline_opened = False
+_offline_lock = threading.Lock()
+
+
+def get_offline_geocoder():
+  """
+  Returns the memory-mapped offline gazetteer, opening it on first use.
+
+  Opening is attempted once per process; a missing or unreadable file is
+  logged and Open-Meteo is used from then on.
+
+  Returns:
+      Gazetteer | None: The gazetteer, or None if GAZETTEER_PATH is unset or unreadable.
+  """
+  global _offline_geocoder, _offline_opened
+  if _offline_opened or not GAZETTEER_PATH:
+    return _offline_geocoder
+  with _offline_lock:
+    if not _offline_opened:
+      # Imported here so the index module is only loaded when it is configured
+      from weather.utils.gazetteer_utils import Gazetteer
+      try:
+        _offline_geocoder = Gazetteer(GAZETTEER_PATH)
+      except (OSError, ValueError) as e:
+        logger.warning("Offline gazetteer unavailable, using Open-Meteo only: %s", str(e))
+      _offline_opened = True
+  return _offline_geocoder
+
+
+def _lookup_offline(city):
+  """
+  Looks a city up in the offline gazetteer, if one is configured.
+  """
+  gazetteer = get_offline_geocoder()
+  return gazetteer.lookup(city) if gazetteer is not None else None
+
+
+def normalize_location_name(name):
+  """
+  Normalizes a place name so that spelling variants share one cache entry.
+
+  Args:
+      name (str): The place name as entered by the user.
+
+  Returns:
+      str: The name with surrounding whitespace removed, inner whitespace
+           collapsed and case folded.
+  """
+  return " ".join(str(name).split()).casefold()
+
+
+def _cache_coordinates(key, city, coordinates):
+  """
+  Caches coordinates under a normalized name, keeping the spelling they were requested with.
+  """
+  geocode_cache.set(key, (coordinates[0], coordinates[1], " ".join(str(city).split())))
+
+
+def cached_location_names() -> Iterator[str]:
+  """
+  Yields the names in the geocode cache as they were first spelled, least recently used first.
+  """
+  for _, entry, _ in geocode_cache.items():
+    yield entry[2]
+
+
 def get_latitude_longitude(city):
   """
   Fetches latitude and longitude for a given city using Open-Meteo's Geocoding API.
@@ -15,11 +114,32 @@ def get_latitude_longitude(city):
       tuple: A tuple containing (latitude, longitude) if successful,
              or None if an error occurs.
   """
+  key = normalize_location_name(city)
+  cached = geocode_cache.get(key)
+  if cached is not None:
+    return cached[0], cached[1]
+
+  coordinates = _lookup_offline(city) or _fetch_latitude_longitude(city)
+  if coordinates is not None:
+    _cache_coordinates(key, city, coordinates)
+  return coordinates
 
-  url = f"https://geocoding-api.open-meteo.com/v1/search?name={city}"
 
+def _fetch_latitude_longitude(city, rate_limiter: Optional[RateLimiter] = None):
+  """
+  Calls the Open-Meteo Geocoding API for a single city, bypassing the cache.
+
+  Every call waits on the rate limiter, so single and batch lookups share one upstream rate.
+  """
+  url = "https://geocoding-api.open-meteo.com/v1/search"
+
+  if not quota_manager.try_acquire(OPEN_METEO):
+    logger.warning("Open-Meteo quota exhausted, not geocoding '%s' for now.", city)
+    return None
+
+  (rate_limiter or geocode_rate_limiter).acquire()
   try:
-    response = requests.get(url)
+    response = requests.get(url, params={"name": city}, timeout=REQUEST_TIMEOUT)
     response.raise_for_status()  # Raise an exception for non-200 status codes
   except requests.exceptions.RequestException as e:
     print(f"Error fetching data from Open-Meteo API: {e}")
@@ -37,6 +157,64 @@ def get_latitude_longitude(city):
 
   return latitude, longitude
 
+
+def batch_get_latitude_longitude(cities: Iterable[str],
+                                 max_workers: int = GEOCODE_MAX_WORKERS,
+                                 rate_limiter: Optional[RateLimiter] = None) -> Dict[str, Optional[Tuple[float, float]]]:
+  """
+  Resolves many place names at once.
+
+  Names are normalized and deduplicated first, cached coordinates and names in
+  the offline gazetteer are answered directly, and the remaining names are
+  fetched concurrently while the shared rate limiter keeps the request rate
+  under the upstream quota.
+
+  Args:
+      cities (Iterable[str]): The place names to resolve.
+      max_workers (int): The number of concurrent upstream requests.
+      rate_limiter (RateLimiter, optional): Limiter to use instead of the module-wide one.
+
+  Returns:
+      dict: A mapping of every input name to its (latitude, longitude), or None
+            if it could not be resolved.
+  """
+  cities = list(cities)
+  limiter = rate_limiter or geocode_rate_limiter
+
+  # Keep the first spelling seen for each normalized name; it is what we send upstream
+  names_by_key = {}
+  for city in cities:
+    names_by_key.setdefault(normalize_location_name(city), city)
+
+  resolved = {}
+  misses = []
+  for key, city in names_by_key.items():
+    cached = geocode_cache.get(key)
+    if cached is not None:
+      cached = cached[0], cached[1]
+    else:
+      cached = _lookup_offline(city)
+      if cached is not None:
+        _cache_coordinates(key, city, cached)
+    if cached is not None:
+      resolved[key] = cached
+    else:
+      misses.append((key, city))
+
+  def resolve(item):
+    key, city = item
+    return key, _fetch_latitude_longitude(city, limiter)
+
+  if misses:
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(misses)))) as executor:
+      for key, coordinates in executor.map(resolve, misses):
+        resolved[key] = coordinates
+        if coordinates is not None:
+          _cache_coordinates(key, names_by_key[key], coordinates)
+
+  return {city: resolved.get(normalize_location_name(city)) for city in cities}
+
+
 def main():
   """
   Prompts the user for a city, fetches coordinates, and constructs the weather data URL.
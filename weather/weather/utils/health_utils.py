@@ -0,0 +1,118 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from weather.utils.logger import configure_logger
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+class HealthMonitor:
+    """
+    Runs health checks on a background interval and caches their results.
+
+    Probes read the cached status instead of running the checks themselves,
+    so they cost a dictionary lookup no matter how often they arrive. A
+    check passes by returning and fails by raising. Only critical checks
+    decide readiness; a result older than stale_after counts as failed, so
+    a stuck checker thread also takes the instance out of rotation.
+
+    Attributes:
+        interval (float): Seconds between check runs.
+        stale_after (float): Seconds after which a cached result no longer counts.
+    """
+
+    def __init__(self, interval: float = 10.0, stale_after: Optional[float] = None):
+        self.interval = interval
+        self.stale_after = stale_after if stale_after is not None else 3 * interval
+        self._checks: Dict[str, tuple] = {}
+        self._results: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_check(self, name: str, check: Callable[[], Optional[Dict]], critical: bool = True) -> None:
+        """
+        Registers a check. It may return a dict of details to report alongside its status.
+        """
+        self._checks[name] = (check, critical)
+
+    def run_checks(self) -> None:
+        """
+        Runs every check once and replaces the cached results.
+        """
+        results = {}
+        for name, (check, critical) in self._checks.items():
+            start = time.monotonic()
+            result = {"critical": critical, "checked_at": time.time()}
+            try:
+                details = check()
+                result["ok"] = True
+                if details:
+                    result["details"] = details
+            except Exception as e:
+                result["ok"] = False
+                result["error"] = str(e)
+                previous = self._results.get(name)
+                if previous is None or previous["ok"]:
+                    logger.warning("Health check %s failed: %s", name, str(e))
+            result["duration_ms"] = round((time.monotonic() - start) * 1000, 2)
+            results[name] = result
+        with self._lock:
+            self._results = results
+
+    def start(self) -> None:
+        """
+        Runs the checks once, then keeps refreshing them from a daemon thread.
+        """
+        if self._thread is not None:
+            return
+        self.run_checks()
+        self._thread = threading.Thread(target=self._run, name="health-monitor", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_checks()
+            except Exception as e:
+                logger.error("Health monitor run failed: %s", str(e))
+
+    def stop(self) -> None:
+        """
+        Stops the background thread.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def status(self, name: Optional[str] = None) -> Dict:
+        """
+        Returns the cached results and whether every critical check is passing.
+
+        Args:
+            name (str, optional): Restricts the status to a single check.
+
+        Returns:
+            Dict: "ready" and, per check, its ok flag, age in seconds and error or details.
+        """
+        with self._lock:
+            results = self._results
+        if name is not None:
+            results = {name: results[name]} if name in results else {}
+
+        now = time.time()
+        checks = {}
+        ready = bool(results)
+        for check_name, result in results.items():
+            age = now - result["checked_at"]
+            ok = result["ok"] and age <= self.stale_after
+            checks[check_name] = {**result, "ok": ok, "age_seconds": round(age, 3)}
+            if result["ok"] and age > self.stale_after:
+                checks[check_name]["error"] = f"Result is {int(age)}s old"
+            if result["critical"] and not ok:
+                ready = False
+        return {"ready": ready, "checks": checks}
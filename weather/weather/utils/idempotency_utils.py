@@ -0,0 +1,334 @@
+from functools import wraps
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Hashable, Optional, Tuple, Union
+
+from flask import current_app, jsonify, make_response, request, Response
+
+from weather.utils.cache_utils import TTLCache
+from weather.utils.logger import configure_logger
+from weather.utils.shared_cache_utils import SHARED_CACHE_PATH, SHARED_CACHE_TIMEOUT
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+# How long a stored response can be replayed, how many are kept, and how long a
+# duplicate waits for the first request with its key before giving up
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "100000"))
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", "30"))
+# A claim on a key in the shared store is dropped after this long, in case the
+# worker that made it died before finishing the request
+IDEMPOTENCY_CLAIM_TTL = float(os.getenv("IDEMPOTENCY_CLAIM_TTL", "300"))
+# How often a duplicate checks the shared store for the first request's response
+WAIT_POLL_INTERVAL = 0.05
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+# Outcomes of IdempotencyStore.begin
+EXECUTE = "execute"
+REPLAY = "replay"
+MISMATCH = "mismatch"
+IN_PROGRESS = "in_progress"
+
+
+class StoredResponse:
+    """
+    A response kept for replay: its status, body, content type and the request it answered.
+    """
+
+    __slots__ = ("status", "body", "content_type", "fingerprint")
+
+    def __init__(self, status: int, body: bytes, content_type: str, fingerprint: str):
+        self.status = status
+        self.body = body
+        self.content_type = content_type
+        self.fingerprint = fingerprint
+
+
+class IdempotencyStore:
+    """
+    Remembers the responses of requests sent with an idempotency key.
+
+    The first request with a key executes and its response is stored for ttl
+    seconds. A later request with the same key and body gets the stored
+    response back; one with a different body is refused. A duplicate that
+    arrives while the first is still executing waits for it to finish. If the
+    first request fails with a server error nothing is stored, and one of the
+    waiting duplicates executes instead.
+
+    Attributes:
+        responses (TTLCache): Key -> StoredResponse of completed requests.
+        wait_timeout (float): The longest a duplicate waits for the first request.
+    """
+
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL, max_entries: int = IDEMPOTENCY_MAX_KEYS,
+                 wait_timeout: float = IDEMPOTENCY_WAIT_TIMEOUT):
+        self.responses = TTLCache(max_entries=max_entries, ttl=ttl)
+        self.wait_timeout = wait_timeout
+        self.replays = 0
+        self.waits = 0
+        self._in_flight: Dict[Hashable, Tuple[str, threading.Event]] = {}
+        self._lock = threading.Lock()
+
+    def begin(self, key: Hashable, fingerprint: str) -> Tuple[str, Optional[StoredResponse]]:
+        """
+        Claims a key for execution, or returns the stored response of an earlier request with it.
+
+        Args:
+            key (Hashable): The idempotency key, scoped to the route.
+            fingerprint (str): A digest of the request body.
+
+        Returns:
+            Tuple[str, Optional[StoredResponse]]: EXECUTE if the caller must run the
+            request and then call finish, REPLAY with the stored response, MISMATCH
+            if the key was used for a different request, or IN_PROGRESS if the
+            first request did not finish within wait_timeout.
+        """
+        waited = False
+        while True:
+            with self._lock:
+                stored = self.responses.get(key)
+                if stored is not None:
+                    if stored.fingerprint != fingerprint:
+                        return MISMATCH, None
+                    self.replays += 1
+                    return REPLAY, stored
+                in_flight = self._in_flight.get(key)
+                if in_flight is None:
+                    self._in_flight[key] = (fingerprint, threading.Event())
+                    return EXECUTE, None
+                if in_flight[0] != fingerprint:
+                    return MISMATCH, None
+                if not waited:
+                    self.waits += 1
+                    waited = True
+            if not in_flight[1].wait(self.wait_timeout):
+                return IN_PROGRESS, None
+
+    def finish(self, key: Hashable, response: Optional[StoredResponse]) -> None:
+        """
+        Releases a key claimed with begin, storing the response to replay unless it is None.
+        """
+        with self._lock:
+            if response is not None:
+                self.responses.set(key, response)
+            _, done = self._in_flight.pop(key)
+        done.set()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            in_flight = len(self._in_flight)
+        return {"size": len(self.responses), "in_flight": in_flight, "replays": self.replays, "waits": self.waits}
+
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS idempotency_keys (
+        key TEXT PRIMARY KEY,
+        fingerprint TEXT NOT NULL,
+        status INTEGER,
+        body BLOB,
+        content_type TEXT,
+        stored_at REAL NOT NULL
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idempotency_keys_stored_at ON idempotency_keys (stored_at);
+"""
+
+
+class SharedIdempotencyStore(IdempotencyStore):
+    """
+    An IdempotencyStore kept in a SQLite file shared by every worker process on
+    the host, so a retry that lands on another worker is still replayed.
+
+    A key is claimed with an INSERT that does nothing if the key exists, so
+    exactly one worker executes the request; the claim row then receives the
+    response in finish. A duplicate on any worker polls the row until the
+    response arrives. Claims older than claim_ttl are dropped, so a key held
+    by a worker that died becomes usable again. If the file cannot be used the
+    request executes without deduplication rather than failing. Replay and
+    wait counters are kept per process.
+
+    Attributes:
+        path (str): The shared file, normally SHARED_CACHE_PATH.
+        ttl (float): How long a completed response is replayed.
+        max_entries (int): The maximum number of completed responses kept.
+        claim_ttl (float): How long a claim is honoured.
+    """
+
+    def __init__(self, path: str, ttl: float = IDEMPOTENCY_TTL, max_entries: int = IDEMPOTENCY_MAX_KEYS,
+                 wait_timeout: float = IDEMPOTENCY_WAIT_TIMEOUT, claim_ttl: float = IDEMPOTENCY_CLAIM_TTL,
+                 timeout: float = SHARED_CACHE_TIMEOUT):
+        super().__init__(ttl, max_entries, wait_timeout)
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.claim_ttl = claim_ttl
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    @staticmethod
+    def _encode_key(key: Hashable) -> str:
+        return json.dumps(key, separators=(",", ":"))
+
+    def begin(self, key: Hashable, fingerprint: str) -> Tuple[str, Optional[StoredResponse]]:
+        encoded = self._encode_key(key)
+        deadline = time.monotonic() + self.wait_timeout
+        waited = False
+        try:
+            conn = self._connect()
+            while True:
+                now = time.time()
+                conn.execute("""
+                    DELETE FROM idempotency_keys
+                    WHERE key = ? AND stored_at < CASE WHEN status IS NULL THEN ? ELSE ? END
+                """, (encoded, now - self.claim_ttl, now - self.ttl))
+                claimed = conn.execute("""
+                    INSERT INTO idempotency_keys (key, fingerprint, stored_at) VALUES (?, ?, ?)
+                    ON CONFLICT (key) DO NOTHING
+                """, (encoded, fingerprint, now)).rowcount
+                if claimed:
+                    return EXECUTE, None
+                row = conn.execute("SELECT fingerprint, status, body, content_type FROM idempotency_keys WHERE key = ?",
+                                   (encoded,)).fetchone()
+                if row is None:
+                    # Finished with a server error, or expired, since the insert; claim it again
+                    continue
+                if row[0] != fingerprint:
+                    return MISMATCH, None
+                if row[1] is not None:
+                    with self._lock:
+                        self.replays += 1
+                    return REPLAY, StoredResponse(row[1], row[2], row[3], row[0])
+                if not waited:
+                    with self._lock:
+                        self.waits += 1
+                    waited = True
+                if time.monotonic() >= deadline:
+                    return IN_PROGRESS, None
+                time.sleep(WAIT_POLL_INTERVAL)
+        except sqlite3.Error as e:
+            logger.warning("Idempotency store %s unavailable, executing without deduplication: %s", self.path, e)
+            return EXECUTE, None
+
+    def finish(self, key: Hashable, response: Optional[StoredResponse]) -> None:
+        encoded = self._encode_key(key)
+        try:
+            conn = self._connect()
+            if response is None:
+                conn.execute("DELETE FROM idempotency_keys WHERE key = ? AND status IS NULL", (encoded,))
+                return
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("""
+                    INSERT INTO idempotency_keys (key, fingerprint, status, body, content_type, stored_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (key) DO UPDATE SET status = excluded.status, body = excluded.body,
+                        content_type = excluded.content_type, stored_at = excluded.stored_at
+                """, (encoded, response.fingerprint, response.status, response.body, response.content_type, now))
+                # Expired responses, then the oldest beyond max_entries
+                conn.execute("DELETE FROM idempotency_keys WHERE status IS NOT NULL AND stored_at < ?", (now - self.ttl,))
+                conn.execute("""
+                    DELETE FROM idempotency_keys WHERE key IN (
+                        SELECT key FROM idempotency_keys WHERE status IS NOT NULL
+                        ORDER BY stored_at DESC LIMIT -1 OFFSET ?
+                    )
+                """, (self.max_entries,))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            logger.warning("Could not store the response for idempotency key %s: %s", encoded, e)
+
+    def stats(self) -> Dict:
+        try:
+            size, in_flight = self._connect().execute(
+                "SELECT COUNT(status), COUNT(*) - COUNT(status) FROM idempotency_keys").fetchone()
+        except sqlite3.Error:
+            size = in_flight = None
+        return {"size": size, "in_flight": in_flight, "replays": self.replays, "waits": self.waits,
+                "shared": self.path}
+
+
+def create_store(path: str = SHARED_CACHE_PATH) -> Union[SharedIdempotencyStore, IdempotencyStore]:
+    """
+    Creates an idempotency store shared by the processes of this host if SHARED_CACHE_PATH is set, otherwise one per process.
+    """
+    if not path:
+        return IdempotencyStore()
+    return SharedIdempotencyStore(path)
+
+
+def _replay(stored: StoredResponse) -> Response:
+    response = current_app.response_class(stored.body, status=stored.status, content_type=stored.content_type)
+    response.headers[REPLAYED_HEADER] = "true"
+    return response
+
+
+def idempotent(store: IdempotencyStore) -> Callable:
+    """
+    Makes a route replay its stored response when a request repeats an Idempotency-Key.
+
+    Requests without the header run as usual. Keys are scoped to the method
+    and path, and responses with a 5xx status are not stored so the request
+    can be retried.
+
+    Args:
+        store (IdempotencyStore): Where responses are kept.
+    """
+    def decorator(view: Callable) -> Callable:
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if key is None:
+                return view(*args, **kwargs)
+            if not key or len(key) > MAX_KEY_LENGTH:
+                return make_response(jsonify({'error': f'{IDEMPOTENCY_HEADER} must be 1 to {MAX_KEY_LENGTH} characters.'}), 400)
+
+            scoped_key = (request.method, request.path, key)
+            fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+            outcome, stored = store.begin(scoped_key, fingerprint)
+            if outcome == REPLAY:
+                current_app.logger.info("Replaying response for %s %s with idempotency key %s", request.method, request.path, key)
+                return _replay(stored)
+            if outcome == MISMATCH:
+                return make_response(jsonify({'error': f'{IDEMPOTENCY_HEADER} was already used for a different request.'}), 422)
+            if outcome == IN_PROGRESS:
+                response = make_response(jsonify({'error': 'A request with this key is still being processed.'}), 409)
+                response.headers['Retry-After'] = "1"
+                return response
+
+            stored = None
+            try:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code < 500 and not response.is_streamed:
+                    stored = StoredResponse(response.status_code, response.get_data(), response.content_type, fingerprint)
+                return response
+            finally:
+                store.finish(scoped_key, stored)
+        return wrapper
+    return decorator
+
+
+# Shared by every idempotent route, and by every worker when SHARED_CACHE_PATH is set
+idempotency_store = create_store()
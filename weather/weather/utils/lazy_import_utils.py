@@ -0,0 +1,34 @@
+import importlib.util
+import sys
+from types import ModuleType
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Returns a module that is only executed when one of its attributes is first used.
+
+    Heavy dependencies such as requests and bcrypt are bound at module level
+    this way, so importing the application does not pay for them until a
+    request needs them. A module that is already imported is returned as is.
+
+    Args:
+        name (str): The absolute module name.
+
+    Returns:
+        ModuleType: The module, registered in sys.modules under its name.
+
+    Raises:
+        ModuleNotFoundError: If the module is not installed.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
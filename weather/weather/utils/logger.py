@@ -5,22 +5,34 @@ from flask import current_app, has_request_context
 
 
 def configure_logger(logger):
+    """
+    Sends a module's log records to stderr with a timestamp.
+
+    Module loggers (weather.models.favorites_model, ...) propagate to their
+    top-level package logger, so the console handler is attached there once
+    and every further call only sets the module's level.
+    """
     logger.setLevel(logging.DEBUG)  # Set the desired logging level here
 
-    # Create a console handler that logs to stderr
-    handler = logging.StreamHandler(sys.stderr)
-    handler.setLevel(logging.DEBUG)
+    package_logger = logging.getLogger(logger.name.split(".")[0])
+    if not any(getattr(handler, "_weather_console", False) for handler in package_logger.handlers):
+        package_logger.setLevel(logging.DEBUG)
+
+        # Create a console handler that logs to stderr
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setLevel(logging.DEBUG)
+        handler._weather_console = True
 
-    # Create a formatter with a timestamp
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        # Create a formatter with a timestamp
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
-    # Add the formatter to the handler
-    handler.setFormatter(formatter)
+        # Add the formatter to the handler
+        handler.setFormatter(formatter)
 
-    # Add the handler to the logger
-    logger.addHandler(handler)
+        # Add the handler to the package logger
+        package_logger.addHandler(handler)
 
     if has_request_context():
         app_logger = current_app.logger
         for handler in app_logger.handlers:
-            logger.addHandler(handler)
\ No newline at end of file
+            logger.addHandler(handler)
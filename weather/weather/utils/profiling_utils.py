@@ -0,0 +1,170 @@
+import cProfile
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from flask import Flask, g, request
+
+from weather.utils.logger import configure_logger
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+# Profiling is off unless a sample rate is set or the debug header is allowed.
+# Profiles are accumulated per route and written to PROFILE_DIR as pstats files.
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_HEADER_ENABLED = os.getenv("PROFILE_HEADER_ENABLED", "false").lower() == "true"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+
+PROFILE_HEADER = "X-Profile"
+
+# Source files whose functions the hot function report covers by default
+DEFAULT_HOT_MODULES = ("favorites_model.py", "user_model.py", "sql_utils.py")
+
+
+class RequestProfiler:
+    """
+    Profiles a sample of requests with cProfile and aggregates the results per route.
+
+    A request is profiled with probability sample_rate, or whenever it carries
+    the X-Profile header and header_enabled is set. Each route's profiles are
+    merged into one pstats.Stats, which is rewritten to
+    <output_dir>/<endpoint>.pstats after every profiled request and can be
+    opened with `python -m pstats` or snakeviz. With a zero sample rate and
+    the header disabled, install registers no hooks at all.
+
+    Attributes:
+        sample_rate (float): The fraction of requests profiled.
+        header_enabled (bool): Whether the X-Profile header forces profiling.
+        output_dir (str): Where the pstats files are written, or None to keep them in memory only.
+    """
+
+    def __init__(self, sample_rate: float = PROFILE_SAMPLE_RATE, header_enabled: bool = PROFILE_HEADER_ENABLED,
+                 output_dir: Optional[str] = PROFILE_DIR):
+        if not 0 <= sample_rate <= 1:
+            raise ValueError(f"Invalid sample rate: {sample_rate} (must be between 0 and 1).")
+        self.sample_rate = sample_rate
+        self.header_enabled = header_enabled
+        self.output_dir = output_dir
+        self.skipped = 0
+        self._stats: Dict[str, pstats.Stats] = {}
+        self._requests: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 or self.header_enabled
+
+    def install(self, app: Flask) -> None:
+        """
+        Registers the request hooks on an app if profiling is enabled.
+        """
+        if not self.enabled:
+            return
+        app.before_request(self._start)
+        app.teardown_request(self._stop)
+        logger.info("Profiling %.1f%% of requests%s", self.sample_rate * 100,
+                    f", and requests with {PROFILE_HEADER}" if self.header_enabled else "")
+
+    def _start(self) -> None:
+        if not (random.random() < self.sample_rate or (self.header_enabled and PROFILE_HEADER in request.headers)):
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ allows one active profiler per interpreter; concurrent requests go unprofiled
+            self.skipped += 1
+            return
+        g.profile = profile
+        g.profile_started = time.perf_counter()
+
+    def _stop(self, exc: Optional[BaseException] = None) -> None:
+        profile = g.pop("profile", None)
+        if profile is None:
+            return
+        profile.disable()
+        endpoint = request.endpoint or "unknown"
+        elapsed = time.perf_counter() - g.pop("profile_started")
+        try:
+            self.record(endpoint, profile)
+        except Exception as e:
+            logger.error("Failed to record profile of %s: %s", endpoint, str(e))
+        logger.info("Profiled %s %s in %.1f ms", request.method, request.path, elapsed * 1000)
+
+    def record(self, endpoint: str, profile: cProfile.Profile) -> None:
+        """
+        Merges a finished profile into its route's statistics and rewrites the route's pstats file.
+        """
+        with self._lock:
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                stats = self._stats[endpoint] = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+            self._requests[endpoint] = self._requests.get(endpoint, 0) + 1
+            if self.output_dir:
+                os.makedirs(self.output_dir, exist_ok=True)
+                stats.dump_stats(os.path.join(self.output_dir, f"{re.sub(r'[^A-Za-z0-9_.-]', '_', endpoint)}.pstats"))
+
+    def hot_functions(self, modules: Iterable[str] = DEFAULT_HOT_MODULES, endpoint: Optional[str] = None,
+                      sort: str = "cumulative", limit: int = 20) -> Dict:
+        """
+        Returns the most expensive profiled functions defined in the given source files.
+
+        Args:
+            modules (Iterable[str]): Source file names, e.g. favorites_model.py.
+            endpoint (str, optional): Restricts the report to one route.
+            sort (str): "cumulative" (time including callees) or "total" (time in the function itself).
+            limit (int): The number of functions returned.
+
+        Returns:
+            Dict: The profiled request count per route and the hottest functions,
+            each with its calls and total and cumulative seconds.
+        """
+        if sort not in ("cumulative", "total"):
+            raise ValueError(f"Invalid sort: {sort} (must be cumulative or total)")
+        modules = tuple(modules)
+        with self._lock:
+            endpoints = [endpoint] if endpoint is not None else list(self._stats)
+            requests = {name: self._requests[name] for name in endpoints if name in self._stats}
+            functions: Dict[tuple, List[float]] = {}
+            for name in requests:
+                for (filename, line, function), (_, calls, total, cumulative, _) in self._stats[name].stats.items():
+                    if os.path.basename(filename) not in modules:
+                        continue
+                    totals = functions.setdefault((os.path.basename(filename), line, function), [0, 0.0, 0.0])
+                    totals[0] += calls
+                    totals[1] += total
+                    totals[2] += cumulative
+
+        key = 2 if sort == "cumulative" else 1
+        hottest = sorted(functions.items(), key=lambda item: item[1][key], reverse=True)[:limit]
+        return {
+            "requests": requests,
+            "functions": [
+                {
+                    "function": f"{filename}:{line}({function})",
+                    "calls": calls,
+                    "total_seconds": round(total, 6),
+                    "cumulative_seconds": round(cumulative, 6),
+                }
+                for (filename, line, function), (calls, total, cumulative) in hottest
+            ],
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self._requests.clear()
+
+
+# Installed on the app by create_app
+request_profiler = RequestProfiler()
@@ -0,0 +1,126 @@
+from collections import deque
+import threading
+from typing import Any, Dict, Hashable, Iterable, List, Set
+
+
+class Subscription:
+    """
+    A subscriber's bounded event queue.
+
+    When the queue is full the oldest event is dropped, so a slow consumer
+    never blocks publishers or grows without bound.
+
+    Attributes:
+        topics (frozenset): The topics this subscription receives.
+        dropped (int): The number of events discarded because the queue was full.
+    """
+
+    def __init__(self, hub: "PubSubHub", topics: Iterable[Hashable], max_queue: int):
+        self.topics = frozenset(topics)
+        self.dropped = 0
+        self._hub = hub
+        self._events = deque(maxlen=max_queue)
+        self._condition = threading.Condition()
+        self._closed = False
+
+    def put(self, event: Any) -> None:
+        """
+        Queues an event, dropping the oldest one if the queue is full.
+        """
+        with self._condition:
+            if len(self._events) == self._events.maxlen:
+                self.dropped += 1
+            self._events.append(event)
+            self._condition.notify()
+
+    def get(self, timeout: float) -> List[Any]:
+        """
+        Waits up to timeout seconds for events and returns all queued ones.
+
+        Returns:
+            List[Any]: The queued events, or an empty list if none arrived or the subscription was closed.
+        """
+        with self._condition:
+            if not self._events and not self._closed:
+                self._condition.wait(timeout)
+            events = list(self._events)
+            self._events.clear()
+            return events
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def close(self) -> None:
+        """
+        Unsubscribes from the hub and wakes up any waiting consumer.
+        """
+        self._hub.unsubscribe(self)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class PubSubHub:
+    """
+    An in-process publish/subscribe hub that fans events out to topic subscribers.
+
+    Attributes:
+        max_queue (int): The default queue size of new subscriptions.
+    """
+
+    def __init__(self, max_queue: int = 100):
+        self.max_queue = max_queue
+        self._subscribers: Dict[Hashable, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, topics: Iterable[Hashable], max_queue: int = None) -> Subscription:
+        """
+        Creates a subscription receiving every event published to any of the topics.
+        """
+        subscription = Subscription(self, topics, max_queue or self.max_queue)
+        with self._lock:
+            for topic in subscription.topics:
+                self._subscribers.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """
+        Removes a subscription from all of its topics.
+        """
+        with self._lock:
+            for topic in subscription.topics:
+                subscribers = self._subscribers.get(topic)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[topic]
+
+    def publish(self, topic: Hashable, event: Any) -> int:
+        """
+        Delivers an event to every subscriber of a topic.
+
+        Returns:
+            int: The number of subscribers the event was queued for.
+        """
+        with self._lock:
+            subscribers = list(self._subscribers.get(topic, ()))
+        for subscription in subscribers:
+            subscription.put(event)
+        return len(subscribers)
+
+    def subscriber_count(self) -> int:
+        """
+        Returns the number of distinct active subscriptions.
+        """
+        with self._lock:
+            return len({subscription for subscribers in self._subscribers.values() for subscription in subscribers})
+
+    def close_all(self) -> None:
+        """
+        Closes every active subscription, waking up their consumers.
+        """
+        with self._lock:
+            subscriptions = {subscription for subscribers in self._subscribers.values() for subscription in subscribers}
+        for subscription in subscriptions:
+            subscription.close()
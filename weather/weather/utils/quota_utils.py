@@ -0,0 +1,318 @@
+from collections import deque
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Tuple, Union
+
+from weather.utils.logger import configure_logger
+from weather.utils.rate_limit_utils import RateLimiter
+from weather.utils.shared_cache_utils import SHARED_CACHE_PATH, SHARED_CACHE_TIMEOUT
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+# Requests at or above this priority may spend the reserved part of the daily budget
+HIGH_PRIORITY = 0.75
+# Fraction of the daily budget kept for high-priority requests
+QUOTA_RESERVE_FRACTION = float(os.getenv("QUOTA_RESERVE_FRACTION", "0.2"))
+# How quickly interest in a location fades after its last read, and the subscriber count treated as maximal demand
+READ_HALF_LIFE_SECONDS = 3600
+SUBSCRIBER_SCALE = 50
+
+
+class ProviderQuota:
+    """
+    Tracks one upstream provider's usage against its per-minute and daily limits.
+
+    Both limits are token buckets. Requests below HIGH_PRIORITY are refused
+    once the daily bucket falls into the reserve, so the end of the day's
+    budget is only spent on the most requested locations.
+
+    Attributes:
+        name (str): The provider name.
+        per_minute (int): The per-minute request limit.
+        per_day (int): The daily request limit.
+        reserve_fraction (float): The fraction of the daily budget reserved for high-priority requests.
+    """
+
+    def __init__(self, name: str, per_minute: int, per_day: int, reserve_fraction: float = QUOTA_RESERVE_FRACTION):
+        self.name = name
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.reserve_fraction = reserve_fraction
+        self._minute_bucket = RateLimiter(per_minute / 60.0, per_minute)
+        self._day_bucket = RateLimiter(per_day / 86400.0, per_day)
+        self._recent = deque()
+        self._lock = threading.Lock()
+        self.used_total = 0
+        self.denied_total = 0
+
+    def _trim(self, now: float) -> None:
+        while self._recent and self._recent[0] < now - 3600:
+            self._recent.popleft()
+
+    def try_acquire(self, priority: float = 1.0) -> bool:
+        """
+        Takes one request from the budget if the priority allows it.
+
+        Args:
+            priority (float): The request's priority between 0 and 1.
+
+        Returns:
+            bool: True if the request may be sent, False if it should be postponed.
+        """
+        with self._lock:
+            day_tokens = self._day_bucket.available()
+            floor = 0.0 if priority >= HIGH_PRIORITY else self.reserve_fraction * self.per_day
+            if day_tokens - 1 < floor or not self._minute_bucket.try_acquire():
+                self.denied_total += 1
+                return False
+            self._day_bucket.try_acquire()
+            now = time.time()
+            self._recent.append(now)
+            self._trim(now)
+            self.used_total += 1
+            return True
+
+    def usage(self) -> Dict:
+        """
+        Returns current usage, remaining budget and the projected time the daily budget runs out.
+
+        The projection compares the request rate of the last hour with the
+        daily bucket's refill rate; it is None while usage is sustainable.
+        """
+        with self._lock:
+            now = time.time()
+            self._trim(now)
+            last_minute = sum(1 for stamp in self._recent if stamp >= now - 60)
+            remaining = self._day_bucket.available()
+            drain = len(self._recent) / 3600.0 - self.per_day / 86400.0
+            exhaustion = now + remaining / drain if drain > 0 else None
+            return {
+                "per_minute_limit": self.per_minute,
+                "per_day_limit": self.per_day,
+                "used_last_minute": last_minute,
+                "used_last_hour": len(self._recent),
+                "used_total": self.used_total,
+                "denied_total": self.denied_total,
+                "remaining_minute": int(self._minute_bucket.available()),
+                "remaining_day": int(remaining),
+                "projected_exhaustion": int(exhaustion) if exhaustion is not None else None,
+            }
+
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS quota_buckets (
+        provider TEXT PRIMARY KEY,
+        minute_tokens REAL NOT NULL,
+        day_tokens REAL NOT NULL,
+        updated_at REAL NOT NULL,
+        used_total INTEGER NOT NULL DEFAULT 0,
+        denied_total INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS quota_calls (
+        provider TEXT NOT NULL,
+        called_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS quota_calls_provider ON quota_calls (provider, called_at);
+"""
+
+
+class SharedProviderQuota(ProviderQuota):
+    """
+    A ProviderQuota whose buckets and counters live in a SQLite file shared by
+    every worker process on the host, so the workers together stay within the
+    provider's limits instead of each spending the full budget.
+
+    Each try_acquire refills and takes from both buckets in one write
+    transaction. Buckets refill by wall-clock time, and start full the
+    first time a provider is seen.
+
+    Attributes:
+        path (str): The shared file, normally SHARED_CACHE_PATH.
+    """
+
+    def __init__(self, name: str, per_minute: int, per_day: int, path: str,
+                 reserve_fraction: float = QUOTA_RESERVE_FRACTION, timeout: float = SHARED_CACHE_TIMEOUT):
+        super().__init__(name, per_minute, per_day, reserve_fraction)
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        # Autocommit outside the explicit transactions below
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _buckets(self, conn: sqlite3.Connection, now: float) -> Tuple[float, float]:
+        """
+        Returns the refilled (minute, day) tokens. Must run inside a transaction.
+        """
+        row = conn.execute("SELECT minute_tokens, day_tokens, updated_at FROM quota_buckets WHERE provider = ?",
+                           (self.name,)).fetchone()
+        if row is None:
+            conn.execute("INSERT INTO quota_buckets (provider, minute_tokens, day_tokens, updated_at) VALUES (?, ?, ?, ?)",
+                         (self.name, self.per_minute, self.per_day, now))
+            return float(self.per_minute), float(self.per_day)
+        minute_tokens, day_tokens, updated_at = row
+        elapsed = max(0.0, now - updated_at)
+        return (min(self.per_minute, minute_tokens + elapsed * self.per_minute / 60.0),
+                min(self.per_day, day_tokens + elapsed * self.per_day / 86400.0))
+
+    def try_acquire(self, priority: float = 1.0) -> bool:
+        conn = self._connect()
+        floor = 0.0 if priority >= HIGH_PRIORITY else self.reserve_fraction * self.per_day
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            minute_tokens, day_tokens = self._buckets(conn, now)
+            allowed = day_tokens - 1 >= floor and minute_tokens >= 1
+            if allowed:
+                minute_tokens, day_tokens = minute_tokens - 1, day_tokens - 1
+                conn.execute("INSERT INTO quota_calls (provider, called_at) VALUES (?, ?)", (self.name, now))
+                conn.execute("DELETE FROM quota_calls WHERE provider = ? AND called_at < ?", (self.name, now - 3600))
+            conn.execute("""
+                UPDATE quota_buckets
+                SET minute_tokens = ?, day_tokens = ?, updated_at = ?,
+                    used_total = used_total + ?, denied_total = denied_total + ?
+                WHERE provider = ?
+            """, (minute_tokens, day_tokens, now, int(allowed), int(not allowed), self.name))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed
+
+    def usage(self) -> Dict:
+        conn = self._connect()
+        conn.execute("BEGIN")
+        try:
+            now = time.time()
+            minute_tokens, remaining = self._buckets(conn, now)
+            used_total, denied_total = conn.execute(
+                "SELECT used_total, denied_total FROM quota_buckets WHERE provider = ?", (self.name,)).fetchone()
+            last_minute, last_hour = conn.execute("""
+                SELECT COUNT(CASE WHEN called_at >= ? THEN 1 END), COUNT(*)
+                FROM quota_calls WHERE provider = ? AND called_at >= ?
+            """, (now - 60, self.name, now - 3600)).fetchone()
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        drain = last_hour / 3600.0 - self.per_day / 86400.0
+        exhaustion = now + remaining / drain if drain > 0 else None
+        return {
+            "per_minute_limit": self.per_minute,
+            "per_day_limit": self.per_day,
+            "used_last_minute": last_minute,
+            "used_last_hour": last_hour,
+            "used_total": used_total,
+            "denied_total": denied_total,
+            "remaining_minute": int(minute_tokens),
+            "remaining_day": int(remaining),
+            "projected_exhaustion": int(exhaustion) if exhaustion is not None else None,
+            "shared": self.path,
+        }
+
+
+def create_quota(name: str, per_minute: int, per_day: int,
+                 path: str = SHARED_CACHE_PATH) -> Union[SharedProviderQuota, ProviderQuota]:
+    """
+    Creates a provider quota shared by the processes of this host if SHARED_CACHE_PATH is set, otherwise one per process.
+    """
+    if not path:
+        return ProviderQuota(name, per_minute, per_day)
+    return SharedProviderQuota(name, per_minute, per_day, path)
+
+
+class QuotaManager:
+    """
+    Budgets upstream calls across providers and ranks pending fetches by demand.
+
+    Demand combines how recently a location was read and how many users have
+    it as a favorite.
+    """
+
+    def __init__(self, providers: Iterable[ProviderQuota]):
+        self.providers = {provider.name: provider for provider in providers}
+        self._last_reads: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record_read(self, location_name: str) -> None:
+        """
+        Notes that a user has just read the weather of a location.
+        """
+        with self._lock:
+            self._last_reads[location_name] = time.time()
+
+    def priority(self, location_name: str, subscribers: int = 1) -> float:
+        """
+        Returns a location's fetch priority between 0 and 1.
+
+        Args:
+            location_name (str): The location to be fetched.
+            subscribers (int): The number of users with the location as a favorite.
+        """
+        with self._lock:
+            last_read = self._last_reads.get(location_name)
+        recency = 0.0 if last_read is None else 0.5 ** ((time.time() - last_read) / READ_HALF_LIFE_SECONDS)
+        popularity = min(1.0, math.log2(1 + max(0, subscribers)) / math.log2(1 + SUBSCRIBER_SCALE))
+        return 0.5 * recency + 0.5 * popularity
+
+    def schedule(self, provider: str, fetches: Iterable[Tuple[str, int]]) -> Tuple[List[str], List[str]]:
+        """
+        Ranks pending fetches by priority and takes budget for as many as allowed.
+
+        Args:
+            provider (str): The provider the fetches go to.
+            fetches (Iterable[Tuple[str, int]]): (location_name, subscribers) pairs.
+
+        Returns:
+            Tuple[List[str], List[str]]: The locations to fetch now, in priority order,
+            and the postponed ones that should be served from cached data.
+        """
+        ranked = sorted(((self.priority(name, subscribers), name) for name, subscribers in fetches), reverse=True)
+        allowed, postponed = [], []
+        for priority, name in ranked:
+            (allowed if self.try_acquire(provider, priority) else postponed).append(name)
+        if postponed:
+            logger.warning("Postponed %d %s fetches to stay within quota", len(postponed), provider)
+        return allowed, postponed
+
+    def try_acquire(self, provider: str, priority: float = 1.0) -> bool:
+        """
+        Takes one request from a provider's budget; unknown providers are not limited.
+        """
+        quota = self.providers.get(provider)
+        return True if quota is None else quota.try_acquire(priority)
+
+    def usage(self) -> Dict[str, Dict]:
+        """
+        Returns the usage of every provider.
+        """
+        return {name: provider.usage() for name, provider in self.providers.items()}
+
+
+WEATHERAPI = "weatherapi"
+OPEN_METEO = "open-meteo"
+
+# Budgets are shared by every worker process when SHARED_CACHE_PATH is set
+quota_manager = QuotaManager([
+    create_quota(WEATHERAPI,
+                 int(os.getenv("WEATHERAPI_PER_MINUTE", "60")),
+                 int(os.getenv("WEATHERAPI_PER_DAY", "33000"))),
+    create_quota(OPEN_METEO,
+                 int(os.getenv("OPEN_METEO_PER_MINUTE", "600")),
+                 int(os.getenv("OPEN_METEO_PER_DAY", "10000"))),
+])
@@ -0,0 +1,124 @@
+from operator import attrgetter
+from typing import Any, Dict, Iterator, Tuple
+
+from flask.json.provider import DefaultJSONProvider
+
+
+class Record:
+    """
+    Base class of compact, slotted row types.
+
+    Subclasses list their fields in __slots__ and take them positionally in
+    __init__ in the same order, so instances can be built straight from
+    SQLite rows through row_factory. Records also support read-only
+    dict-style access (record["name"], get, keys) for code written against
+    the old row dicts.
+    """
+
+    __slots__ = ()
+    _field_values = staticmethod(lambda record: ())
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Reads every field in one C call; attrgetter of a single name returns the bare value
+        if len(cls.__slots__) == 1:
+            getter = attrgetter(cls.__slots__[0])
+            cls._field_values = staticmethod(lambda record: (getter(record),))
+        elif cls.__slots__:
+            cls._field_values = staticmethod(attrgetter(*cls.__slots__))
+
+    @classmethod
+    def row_factory(cls, cursor, row) -> "Record":
+        """
+        sqlite3 row_factory building a record from a row whose columns match the fields in order.
+        """
+        return cls(*row)
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default)
+
+    def keys(self) -> Tuple[str, ...]:
+        return self.__slots__
+
+    def values(self) -> Iterator[Any]:
+        return (getattr(self, name) for name in self.__slots__)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns the fields as a new dict; nested records are left as they are.
+        """
+        return dict(zip(self.__slots__, self._field_values(self)))
+
+    def copy(self) -> "Record":
+        """
+        Returns a new record of the same type with the same field values.
+        """
+        return type(self)(*self._field_values(self))
+
+    def __eq__(self, other) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)})"
+
+
+_SCALARS = (str, int, float, type(None))
+
+
+def to_plain(value: Any) -> Any:
+    """
+    Returns the data with records replaced by dicts, ready for the C JSON encoder.
+
+    Containers without records are returned as they are rather than copied.
+    Lists are assumed to be homogeneous, so one whose first item holds no
+    record is not searched further; RecordJSONProvider still serializes any
+    record this misses, through the encoder's default hook.
+    """
+    if isinstance(value, Record):
+        return value.to_dict()
+    if isinstance(value, dict):
+        plain = None
+        for key, item in value.items():
+            if isinstance(item, _SCALARS):
+                continue
+            converted = to_plain(item)
+            if converted is not item:
+                if plain is None:
+                    plain = dict(value)
+                plain[key] = converted
+        return value if plain is None else plain
+    if isinstance(value, (list, tuple)):
+        if not value or isinstance(value[0], _SCALARS) or to_plain(value[0]) is value[0]:
+            return value
+        return [to_plain(item) for item in value]
+    return value
+
+
+def _record_default(value: Any) -> Any:
+    # Records to_plain did not reach, such as those nested in a record's fields
+    if isinstance(value, Record):
+        return value.to_dict()
+    return DefaultJSONProvider.default(value)
+
+
+class RecordJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider for payloads containing records.
+
+    Records are converted to dicts in one pass, then the whole payload goes
+    through the C-accelerated json.dumps once.
+    """
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        kwargs.setdefault("default", _record_default)
+        return super().dumps(to_plain(obj), **kwargs)
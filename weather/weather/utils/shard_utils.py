@@ -0,0 +1,308 @@
+## Partitions the users and user_favorites tables across several SQLite files
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from contextvars import copy_context
+import logging
+import os
+import sqlite3
+import threading
+import zlib
+from typing import Any, Callable, ContextManager, Dict, List, Optional, Sequence
+
+from weather.utils.logger import configure_logger
+from weather.utils.sql_trace_utils import traced_connect
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+# The number of shard files users and favorites are spread over. With one
+# shard they stay in the main database. SQLite attaches at most 10 databases
+# to a connection, which bounds the shard count.
+DB_SHARDS = int(os.getenv("DB_SHARDS", "1"))
+MAX_SHARDS = 10
+
+# The tables moved to the shards; everything else stays in the main database
+SHARDED_TABLES = ("users", "user_favorites")
+
+# UNIQUE on users.email only holds within a shard, so new users also claim
+# their email in this table of the main database
+EMAIL_CLAIMS_SCHEMA = "CREATE TABLE IF NOT EXISTS user_emails (email TEXT PRIMARY KEY)"
+
+
+def shard_paths(db_path: str, shard_count: int) -> List[str]:
+    """
+    Returns the shard files of a database: the database itself for one shard,
+    otherwise user_catalog.shard0.db, user_catalog.shard1.db and so on next to it.
+    """
+    if shard_count == 1:
+        return [db_path]
+    root, ext = os.path.splitext(db_path)
+    return [f"{root}.shard{index}{ext}" for index in range(shard_count)]
+
+
+class ShardRouter:
+    """
+    Routes user and favorite queries to the shard owning each user.
+
+    A user lives in shard (id - 1) % shard_count. New users are placed in the
+    shard picked by a hash of their username and take the next ID congruent to
+    that shard, so IDs stay unique across shards and route without a lookup.
+    Queries over every user are scattered to all shards in parallel and their
+    rows gathered. Queries joining favorites with the tables kept in the main
+    database run on a catalog connection, where users and user_favorites are
+    temporary views over the attached shards.
+
+    Attributes:
+        db_path (str): The main database.
+        shard_count (int): The number of shards.
+        paths (List[str]): The shard files, indexed by shard.
+    """
+
+    def __init__(self, db_path: str, shard_count: int = DB_SHARDS):
+        if not 1 <= shard_count <= MAX_SHARDS:
+            raise ValueError(f"Invalid shard count: {shard_count} (must be between 1 and {MAX_SHARDS}).")
+        self.db_path = db_path
+        self.shard_count = shard_count
+        self.paths = shard_paths(db_path, shard_count)
+        self._executor = None
+        self._lock = threading.Lock()
+        if self.sharded:
+            self.ensure_schema()
+
+    @property
+    def sharded(self) -> bool:
+        return self.shard_count > 1
+
+    def shard_index(self, user_id: int) -> int:
+        return (int(user_id) - 1) % self.shard_count
+
+    def path_for_user(self, user_id: int) -> str:
+        """
+        Returns the shard file holding a user and its favorites.
+        """
+        return self.paths[self.shard_index(user_id)]
+
+    def shard_for_username(self, username: str) -> int:
+        """
+        Returns the shard a new user with this username is created in.
+        """
+        return zlib.crc32(username.encode("utf-8")) % self.shard_count
+
+    def ensure_schema(self) -> None:
+        """
+        Creates the sharded tables in every shard that lacks them, using the main database's schema,
+        and the email claims table in the main database.
+        """
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            conn.execute(EMAIL_CLAIMS_SCHEMA)
+            conn.commit()
+        schema = _sharded_schema(self.db_path)
+        for path in self.paths:
+            with closing(sqlite3.connect(path)) as conn:
+                existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+                for name, sql in schema:
+                    if name not in existing:
+                        conn.execute(sql)
+                conn.commit()
+
+    def claim_email(self, email: str) -> None:
+        """
+        Reserves an email for a new user across all shards.
+
+        Raises:
+            sqlite3.IntegrityError: If another user already claimed the email.
+        """
+        with closing(sqlite3.connect(self.db_path)) as conn, conn:
+            conn.execute("INSERT INTO user_emails (email) VALUES (?)", (email,))
+
+    def release_email(self, email: str) -> None:
+        """
+        Frees an email claimed for a user that was not created.
+        """
+        with closing(sqlite3.connect(self.db_path)) as conn, conn:
+            conn.execute("DELETE FROM user_emails WHERE email = ?", (email,))
+
+    def scatter(self, query: str, params: Sequence = (),
+                connect: Optional[Callable[[str], ContextManager[sqlite3.Connection]]] = None,
+                row_factory: Optional[Callable] = None) -> List[Any]:
+        """
+        Runs a read query on every shard in parallel and returns all rows.
+
+        Args:
+            query (str): The query, written against a single shard.
+            params (Sequence): The query parameters.
+            connect (Callable, optional): Opens a connection to a shard path; defaults to a traced connection.
+            row_factory (Callable, optional): The row factory set on each connection.
+
+        Returns:
+            List[Any]: The rows of every shard, in shard order.
+        """
+        connect = connect or (lambda path: closing(traced_connect(path)))
+
+        def run(path):
+            with connect(path) as conn:
+                if row_factory is not None:
+                    conn.row_factory = row_factory
+                cursor = conn.cursor()
+                cursor.execute(query, params)
+                return cursor.fetchall()
+
+        if not self.sharded:
+            return run(self.paths[0])
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.shard_count, thread_name_prefix="shard-scatter")
+        # Each shard query runs in a copy of the caller's context so it lands in the request's SQL trace
+        futures = [self._executor.submit(copy_context().run, run, path) for path in self.paths]
+        rows = []
+        for future in futures:
+            rows.extend(future.result())
+        return rows
+
+    def connect_catalog(self) -> sqlite3.Connection:
+        """
+        Opens a read connection to the main database that sees the users and favorites of every shard.
+
+        Returns:
+            sqlite3.Connection: A plain connection to the main database when unsharded.
+        """
+        conn = traced_connect(self.db_path)
+        if self.sharded:
+            for index, path in enumerate(self.paths):
+                conn.execute(f"ATTACH DATABASE ? AS shard{index}", (path,))
+            # Temporary objects are looked up before the main schema, so existing queries read the shards
+            for table in SHARDED_TABLES:
+                union = " UNION ALL ".join(f"SELECT * FROM shard{index}.{table}" for index in range(self.shard_count))
+                conn.execute(f"CREATE TEMP VIEW {table} AS {union}")
+        return conn
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+
+def _sharded_schema(db_path: str) -> List[tuple]:
+    with closing(sqlite3.connect(db_path)) as conn:
+        return conn.execute(f"""
+            SELECT name, sql FROM sqlite_master
+            WHERE type = 'table' AND name IN ({", ".join("?" for _ in SHARDED_TABLES)})
+        """, SHARDED_TABLES).fetchall()
+
+
+_routers: Dict[str, ShardRouter] = {}
+_routers_lock = threading.Lock()
+
+
+def get_shard_router(db_path: str) -> ShardRouter:
+    """
+    Returns the shard router of a main database, creating it with DB_SHARDS shards on first use.
+    """
+    with _routers_lock:
+        router = _routers.get(db_path)
+        if router is None:
+            router = _routers[db_path] = ShardRouter(db_path, DB_SHARDS)
+        return router
+
+
+def reshard(db_path: str, old_count: int, new_count: int) -> Dict[str, int]:
+    """
+    Moves users and favorites from one shard layout of a database to another.
+
+    User IDs are kept, so every user moves to shard (id - 1) % new_count. The
+    new shards are written to temporary files and renamed into place, then the
+    shards of the old layout that are no longer used are emptied or removed.
+    Run it while the application is stopped.
+
+    Args:
+        db_path (str): The main database.
+        old_count (int): The current number of shards (1 for an unsharded database).
+        new_count (int): The number of shards to move to.
+
+    Returns:
+        Dict[str, int]: The number of users and favorites moved.
+    """
+    if not 1 <= new_count <= MAX_SHARDS:
+        raise ValueError(f"Invalid shard count: {new_count} (must be between 1 and {MAX_SHARDS}).")
+    old = ShardRouter(db_path, old_count)
+    schema = _sharded_schema(db_path)
+
+    # Every row is read before anything is written, as old and new shard files may overlap
+    rows = {table: old.scatter(f"SELECT * FROM {table}") for table in SHARDED_TABLES}
+    partitions = [{table: [] for table in SHARDED_TABLES} for _ in range(new_count)]
+    for user in rows["users"]:
+        partitions[(user[0] - 1) % new_count]["users"].append(user)
+    for favorite in rows["user_favorites"]:
+        partitions[(favorite[1] - 1) % new_count]["user_favorites"].append(favorite)
+
+    def write(conn, partition):
+        for table, table_rows in partition.items():
+            conn.execute(f"DELETE FROM {table}")
+            if table_rows:
+                placeholders = ", ".join("?" for _ in table_rows[0])
+                conn.executemany(f"INSERT INTO {table} VALUES ({placeholders})", table_rows)
+
+    new_paths = shard_paths(db_path, new_count)
+    if new_count == 1:
+        with closing(sqlite3.connect(db_path)) as conn:
+            write(conn, partitions[0])
+            conn.commit()
+    else:
+        for path, partition in zip(new_paths, partitions):
+            temporary = path + ".resharding"
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            with closing(sqlite3.connect(temporary)) as conn:
+                for _, sql in schema:
+                    conn.execute(sql)
+                write(conn, partition)
+                conn.commit()
+            os.replace(temporary, path)
+
+    if new_count > 1:
+        # Users created before sharding never claimed their emails
+        with closing(sqlite3.connect(db_path)) as conn:
+            conn.execute(EMAIL_CLAIMS_SCHEMA)
+            conn.executemany("INSERT OR IGNORE INTO user_emails (email) VALUES (?)",
+                             ((user[2],) for user in rows["users"]))
+            conn.commit()
+
+    for path in old.paths:
+        if path in new_paths:
+            continue
+        if path == db_path:
+            # The main database keeps its other tables; only the moved rows are dropped
+            with closing(sqlite3.connect(db_path)) as conn:
+                for table in SHARDED_TABLES:
+                    conn.execute(f"DELETE FROM {table}")
+                conn.commit()
+        else:
+            os.remove(path)
+    old.close()
+
+    logger.info("Resharded %s from %d to %d shards: %d users, %d favorites",
+                db_path, old_count, new_count, len(rows["users"]), len(rows["user_favorites"]))
+    return {"users": len(rows["users"]), "favorites": len(rows["user_favorites"])}
+
+
+def main():
+    """
+    Reshards a database from the command line.
+    """
+    parser = argparse.ArgumentParser(description="Move users and favorites to a different number of SQLite shards.")
+    parser.add_argument("db_path", help="Path of the main database, e.g. db/user_catalog.db")
+    parser.add_argument("shards", type=int, help="The number of shards to move to")
+    parser.add_argument("--from-shards", type=int, default=DB_SHARDS,
+                        help="The current number of shards (defaults to DB_SHARDS)")
+    args = parser.parse_args()
+
+    moved = reshard(args.db_path, args.from_shards, args.shards)
+    print(f"Moved {moved['users']} users and {moved['favorites']} favorites to {args.shards} shards; "
+          f"set DB_SHARDS={args.shards} before starting the application")
+
+
+if __name__ == "__main__":
+    main()
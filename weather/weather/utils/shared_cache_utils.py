@@ -0,0 +1,360 @@
+## A cache kept in a SQLite file, so every worker process on a host shares one set of entries
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Iterator, Optional, Tuple, Union
+
+from weather.utils.cache_utils import TTLCache
+from weather.utils.logger import configure_logger
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+# The shared cache file; unset or empty keeps every cache in process memory.
+# A path on tmpfs (for example /dev/shm/weather_cache.db) avoids disk writes.
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "")
+SHARED_CACHE_TIMEOUT = float(os.getenv("SHARED_CACHE_TIMEOUT", "5"))
+
+# A read moves an entry to the most recently used end at most this often,
+# so hot keys do not turn every read into a write
+TOUCH_INTERVAL = 60.0
+# Fraction of max_entries written between two eviction passes
+EVICT_FRACTION = 0.01
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS cache_entries (
+        namespace TEXT NOT NULL,
+        key TEXT NOT NULL,
+        value BLOB NOT NULL,
+        stored_at REAL NOT NULL,
+        used_at REAL NOT NULL,
+        PRIMARY KEY (namespace, key)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS cache_entries_used_at ON cache_entries (namespace, used_at);
+"""
+
+
+# Tuples are stored as {TUPLE_KEY: [...]} so they are read back as tuples
+TUPLE_KEY = "__tuple__"
+
+
+def _tag_tuples(value: Any) -> Any:
+    if isinstance(value, tuple):
+        return {TUPLE_KEY: [_tag_tuples(item) for item in value]}
+    if isinstance(value, list):
+        return [_tag_tuples(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _tag_tuples(item) for key, item in value.items()}
+    return value
+
+
+def _untag_tuple(obj: dict) -> Any:
+    if len(obj) == 1 and TUPLE_KEY in obj:
+        return tuple(obj[TUPLE_KEY])
+    return obj
+
+
+def encode_value(value: Any) -> str:
+    """
+    Encodes a cache value as JSON, keeping tuples apart from lists.
+
+    Raises:
+        TypeError: If the value holds something other than dicts, lists, tuples, strings, numbers, booleans and None.
+    """
+    return json.dumps(_tag_tuples(value), separators=(",", ":"), ensure_ascii=False)
+
+
+def decode_value(text: str) -> Any:
+    """
+    Decodes a value written by encode_value.
+
+    Raises:
+        ValueError: If the text is not JSON, such as an entry pickled by an older version.
+    """
+    return json.loads(text, object_hook=_untag_tuple)
+
+
+class SharedCache:
+    """
+    A bounded cache with least-recently-used eviction and an optional time-to-live,
+    stored in a WAL-mode SQLite file that several processes open at once.
+
+    It has the interface of TTLCache, so the two are interchangeable. Every
+    get and set is a single statement, and so atomic across processes. Readers
+    do not wait for writers, and writers wait up to SHARED_CACHE_TIMEOUT
+    seconds for each other. Keys are strings, and values are stored as JSON
+    rather than pickled, since any process on the host can write the file;
+    they must be dicts, lists, tuples and scalars. If the file cannot be read
+    or written in time, a get is a miss, a set or delete does nothing and the
+    size reads as unknown. Several
+    caches can share one file under different namespaces. Each thread uses
+    its own connection, reopened after a fork. The file holds up to about
+    1% more than max_entries between eviction passes. Hit and miss counters
+    are kept per process.
+
+    Attributes:
+        path (str): The cache file.
+        namespace (str): Separates this cache's keys from other caches in the file.
+        max_entries (int): The maximum number of entries kept before the least
+            recently used ones are evicted.
+        ttl (float | None): Seconds an entry stays valid, or None to never expire.
+    """
+
+    def __init__(self, path: str, namespace: str, max_entries: int = 10000, ttl: Optional[float] = None,
+                 timeout: float = SHARED_CACHE_TIMEOUT):
+        self.path = path
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._writes = 0
+        self._evict_every = max(1, int(max_entries * EVICT_FRACTION))
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        # Autocommit: each statement is its own transaction
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Entries can be fetched again, so a power loss may drop the last writes
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get_entry(self, key: str) -> Optional[Tuple[Any, float]]:
+        """
+        Returns the cached value together with its age in seconds.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            tuple | None: (value, age_seconds) if the key is cached and not expired, otherwise None.
+        """
+        try:
+            conn = self._connect()
+            row = conn.execute("SELECT value, stored_at, used_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                               (self.namespace, key)).fetchone()
+            if row is None:
+                self._count(False)
+                return None
+            text, stored_at, used_at = row
+            now = time.time()
+            age = now - stored_at
+            if self.ttl is not None and age > self.ttl:
+                # Only if no other process stored a new value in the meantime
+                conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ? AND stored_at = ?",
+                             (self.namespace, key, stored_at))
+                self._count(False)
+                return None
+            value = decode_value(text)
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning("Shared cache %s miss on %s: %s", self.namespace, key, e)
+            self._count(False)
+            return None
+        if now - used_at > TOUCH_INTERVAL:
+            self._touch(conn, key, now)
+        self._count(True)
+        return value, age
+
+    def _touch(self, conn: sqlite3.Connection, key: str, now: float) -> None:
+        # Only orders eviction, so a write that cannot get the lock at once is skipped
+        try:
+            conn.execute("UPDATE cache_entries SET used_at = ? WHERE namespace = ? AND key = ?",
+                         (now, self.namespace, key))
+        except sqlite3.Error as e:
+            logger.debug("Shared cache %s could not touch %s: %s", self.namespace, key, e)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Returns the cached value for a key, or the default if it is missing or expired.
+        """
+        entry = self.get_entry(key)
+        return default if entry is None else entry[0]
+
+    def set(self, key: str, value: Any, stored_at: Optional[float] = None) -> None:
+        """
+        Stores a value, evicting the least recently used entries when the cache is full.
+
+        Args:
+            key (str): The cache key.
+            value (Any): The value to store.
+            stored_at (float, optional): Epoch seconds the value was produced at. Defaults to now.
+        """
+        now = time.time()
+        text = encode_value(value)
+        try:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, stored_at, used_at) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, text, now if stored_at is None else stored_at, now))
+            self._written()
+        except sqlite3.Error as e:
+            logger.warning("Shared cache %s did not store %s: %s", self.namespace, key, e)
+
+    def set_if_newer(self, key: str, value: Any, stored_at: float) -> bool:
+        """
+        Stores a value unless the cache holds one stored at or after stored_at.
+
+        Returns:
+            bool: Whether the value was stored.
+        """
+        text = encode_value(value)
+        try:
+            cursor = self._connect().execute("""
+                INSERT INTO cache_entries (namespace, key, value, stored_at, used_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (namespace, key) DO UPDATE
+                SET value = excluded.value, stored_at = excluded.stored_at, used_at = excluded.used_at
+                WHERE excluded.stored_at > cache_entries.stored_at
+            """, (self.namespace, key, text, stored_at, time.time()))
+            if cursor.rowcount:
+                self._written()
+        except sqlite3.Error as e:
+            logger.warning("Shared cache %s did not store %s: %s", self.namespace, key, e)
+            return False
+        return cursor.rowcount > 0
+
+    def _written(self) -> None:
+        with self._lock:
+            self._writes += 1
+            due = self._writes % self._evict_every == 0
+        if due:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        Removes expired entries, then the least recently used ones above max_entries.
+
+        Returns:
+            int: The number of entries removed.
+        """
+        removed = 0
+        try:
+            conn = self._connect()
+            if self.ttl is not None:
+                removed += conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND stored_at < ?",
+                                        (self.namespace, time.time() - self.ttl)).rowcount
+            removed += conn.execute("""
+                DELETE FROM cache_entries WHERE namespace = ? AND key IN (
+                    SELECT key FROM cache_entries WHERE namespace = ? ORDER BY used_at
+                    LIMIT max(0, (SELECT COUNT(*) FROM cache_entries WHERE namespace = ?) - ?)
+                )
+            """, (self.namespace, self.namespace, self.namespace, self.max_entries)).rowcount
+        except sqlite3.Error as e:
+            # The next pass evicts whatever this one could not
+            logger.warning("Shared cache %s eviction failed: %s", self.namespace, e)
+        with self._lock:
+            self.evictions += removed
+        return removed
+
+    def delete(self, key: str) -> None:
+        """
+        Removes a key from the cache if present.
+        """
+        try:
+            self._connect().execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+        except sqlite3.Error as e:
+            logger.warning("Shared cache %s did not delete %s: %s", self.namespace, key, e)
+
+    def clear(self) -> None:
+        """
+        Removes every entry of the namespace and resets the counters.
+        """
+        try:
+            self._connect().execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+        except sqlite3.Error as e:
+            logger.warning("Shared cache %s was not cleared: %s", self.namespace, e)
+        with self._lock:
+            self.hits = self.misses = self.evictions = 0
+
+    def items(self) -> Iterator[Tuple[str, Any, float]]:
+        """
+        Returns a snapshot of (key, value, stored_at) triples, least recently used first.
+        """
+        try:
+            rows = self._connect().execute(
+                "SELECT key, value, stored_at FROM cache_entries WHERE namespace = ? ORDER BY used_at",
+                (self.namespace,)).fetchall()
+        except sqlite3.Error as e:
+            logger.warning("Shared cache %s entries could not be read: %s", self.namespace, e)
+            rows = []
+        entries = []
+        for key, text, stored_at in rows:
+            try:
+                entries.append((key, decode_value(text), stored_at))
+            except ValueError:
+                continue
+        return iter(entries)
+
+    def stats(self) -> dict:
+        """
+        Returns the size of the shared cache (None if the file cannot be read) and this process's hit-rate counters.
+        """
+        size = self._size()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": size,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "shared": self.path,
+            }
+
+    def close(self) -> None:
+        """
+        Closes the calling thread's connection.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.conn = None
+            conn.close()
+
+    def _size(self) -> Optional[int]:
+        try:
+            return self._connect().execute("SELECT COUNT(*) FROM cache_entries WHERE namespace = ?",
+                                           (self.namespace,)).fetchone()[0]
+        except sqlite3.Error as e:
+            logger.warning("Shared cache %s size could not be read: %s", self.namespace, e)
+            return None
+
+    def __len__(self) -> int:
+        size = self._size()
+        return 0 if size is None else size
+
+
+def create_cache(namespace: str, max_entries: int, ttl: Optional[float] = None,
+                 path: str = SHARED_CACHE_PATH) -> Union[SharedCache, TTLCache]:
+    """
+    Creates a cache shared by the processes of this host if SHARED_CACHE_PATH is set, otherwise one in process memory.
+
+    Args:
+        namespace (str): The name of the cache within the shared file.
+        max_entries (int): The maximum number of entries kept.
+        ttl (float, optional): Seconds an entry stays valid, or None to never expire.
+        path (str, optional): The shared cache file. Defaults to SHARED_CACHE_PATH.
+    """
+    if not path:
+        return TTLCache(max_entries=max_entries, ttl=ttl)
+    return SharedCache(path, namespace, max_entries=max_entries, ttl=ttl)
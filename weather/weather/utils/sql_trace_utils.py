@@ -0,0 +1,273 @@
+from contextvars import ContextVar
+from functools import lru_cache
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from flask import Flask, g, request, Response
+
+from weather.utils.logger import configure_logger
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+# Tracing is on by default; a fingerprint executed this many times in one
+# request is reported as a likely N+1 pattern
+SQL_TRACE_ENABLED = os.getenv("SQL_TRACE_ENABLED", "true").lower() == "true"
+SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "3"))
+
+SQL_TRACE_HEADER = "X-SQL-Trace"
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql: str) -> str:
+    """
+    Normalizes a statement so executions differing only in literals or list lengths compare equal.
+
+    Whitespace is collapsed, string and number literals become ? and
+    placeholder lists such as IN (?, ?, ?) become (?+).
+    """
+    normalized = _SPACE.sub(" ", sql).strip()
+    normalized = _STRING.sub("?", normalized)
+    normalized = _NUMBER.sub("?", normalized)
+    return _PLACEHOLDER_LIST.sub("(?+)", normalized)
+
+
+class QueryTrace:
+    """
+    The statements run on behalf of one request, grouped by fingerprint.
+
+    Attributes:
+        queries (int): Statements executed; executemany counts once.
+        rows (int): Rows fetched.
+        seconds (float): Time spent executing and fetching.
+        fingerprints (Dict[str, List]): Fingerprint -> [executions, rows, seconds].
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+        self.seconds = 0.0
+        self.fingerprints: Dict[str, List] = {}
+        # Shard scatters and the write queue record from other threads
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, executions: int, rows: int, seconds: float) -> None:
+        with self._lock:
+            self.queries += executions
+            self.rows += rows
+            self.seconds += seconds
+            totals = self.fingerprints.get(statement)
+            if totals is None:
+                self.fingerprints[statement] = [executions, rows, seconds]
+            else:
+                totals[0] += executions
+                totals[1] += rows
+                totals[2] += seconds
+
+    def repeated(self, threshold: int = SQL_N_PLUS_ONE_THRESHOLD) -> Dict[str, int]:
+        """
+        Returns the fingerprints executed at least threshold times, with their execution counts.
+        """
+        with self._lock:
+            return {statement: totals[0] for statement, totals in self.fingerprints.items() if totals[0] >= threshold}
+
+    def header(self, threshold: int = SQL_N_PLUS_ONE_THRESHOLD) -> str:
+        repeated = self.repeated(threshold)
+        return (f"queries={self.queries}; rows={self.rows}; time_ms={self.seconds * 1000:.2f}; "
+                f"n_plus_one={len(repeated)}; max_repeat={max(repeated.values(), default=0)}")
+
+
+_current_trace: ContextVar[Optional[QueryTrace]] = ContextVar("sql_trace", default=None)
+
+
+def current_trace() -> Optional[QueryTrace]:
+    return _current_trace.get()
+
+
+class TracedCursor(sqlite3.Cursor):
+    """
+    A cursor recording each statement, the rows fetched from it and the time spent in the active trace.
+
+    Rows read by iterating the cursor rather than through the fetch methods are not counted.
+    """
+
+    _statement = None
+
+    def execute(self, sql, parameters=()):
+        trace = _current_trace.get()
+        if trace is None:
+            return super().execute(sql, parameters)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._statement = fingerprint(sql)
+            trace.record(self._statement, 1, 0, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        trace = _current_trace.get()
+        if trace is None:
+            return super().executemany(sql, seq_of_parameters)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._statement = fingerprint(sql)
+            trace.record(self._statement, 1, 0, time.perf_counter() - start)
+
+    def _fetched(self, rows: int, start: float) -> None:
+        trace = _current_trace.get()
+        if trace is not None and self._statement is not None:
+            trace.record(self._statement, 0, rows, time.perf_counter() - start)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(0 if row is None else 1, start)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(len(rows), start)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(len(rows), start)
+        return rows
+
+
+class TracedConnection(sqlite3.Connection):
+    """
+    A connection whose cursors, including those behind conn.execute, are traced.
+    """
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    # The C shortcuts run the statement without calling the cursor's execute
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def traced_connect(db_path: str, **kwargs) -> sqlite3.Connection:
+    """
+    Opens a SQLite connection whose statements are recorded in the current request's trace.
+    """
+    if not SQL_TRACE_ENABLED:
+        return sqlite3.connect(db_path, **kwargs)
+    return sqlite3.connect(db_path, factory=TracedConnection, **kwargs)
+
+
+class SQLTracer:
+    """
+    Traces the SQL run by each request and aggregates it per route.
+
+    Every request gets a QueryTrace that traced connections record into. When
+    the response is sent, its summary is added as the X-SQL-Trace header and
+    folded into per-route totals. Fingerprints repeated threshold times or more
+    within one request are flagged as likely N+1 patterns and logged the first
+    time they are seen on a route.
+
+    Attributes:
+        enabled (bool): Whether the request hooks are installed.
+        threshold (int): Executions of one fingerprint in a request that count as N+1.
+    """
+
+    def __init__(self, enabled: bool = SQL_TRACE_ENABLED, threshold: int = SQL_N_PLUS_ONE_THRESHOLD):
+        self.enabled = enabled
+        self.threshold = threshold
+        self._routes: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def install(self, app: Flask) -> None:
+        """
+        Registers the request hooks on an app if tracing is enabled.
+        """
+        if not self.enabled:
+            return
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._reset)
+
+    def _start(self) -> None:
+        g.sql_trace_token = _current_trace.set(QueryTrace())
+
+    def _finish(self, response: Response) -> Response:
+        trace = _current_trace.get()
+        if trace is not None:
+            response.headers[SQL_TRACE_HEADER] = trace.header(self.threshold)
+            self.record(request.endpoint or "unknown", trace)
+        return response
+
+    def _reset(self, exc: Optional[BaseException] = None) -> None:
+        token = g.pop("sql_trace_token", None)
+        if token is not None:
+            _current_trace.reset(token)
+
+    def record(self, endpoint: str, trace: QueryTrace) -> None:
+        """
+        Adds a finished request's trace to its route's totals.
+        """
+        repeated = trace.repeated(self.threshold)
+        with self._lock:
+            route = self._routes.get(endpoint)
+            if route is None:
+                route = self._routes[endpoint] = {"requests": 0, "queries": 0, "rows": 0, "seconds": 0.0,
+                                                  "n_plus_one_requests": 0, "repeated": {}}
+            route["requests"] += 1
+            route["queries"] += trace.queries
+            route["rows"] += trace.rows
+            route["seconds"] += trace.seconds
+            if repeated:
+                route["n_plus_one_requests"] += 1
+            new = [statement for statement in repeated if statement not in route["repeated"]]
+            for statement, executions in repeated.items():
+                route["repeated"][statement] = max(route["repeated"].get(statement, 0), executions)
+        for statement in new:
+            logger.warning("Possible N+1 query on %s: %d executions of %s", endpoint, repeated[statement], statement)
+
+    def stats(self) -> Dict:
+        """
+        Returns per route the requests traced, queries and rows per request, SQL time and flagged fingerprints.
+        """
+        with self._lock:
+            return {
+                endpoint: {
+                    "requests": route["requests"],
+                    "queries_per_request": round(route["queries"] / route["requests"], 2),
+                    "rows_per_request": round(route["rows"] / route["requests"], 2),
+                    "sql_ms_per_request": round(route["seconds"] * 1000 / route["requests"], 3),
+                    "n_plus_one_requests": route["n_plus_one_requests"],
+                    "n_plus_one": [
+                        {"query": statement, "max_executions": executions}
+                        for statement, executions in sorted(route["repeated"].items(), key=lambda item: -item[1])
+                    ],
+                }
+                for endpoint, route in self._routes.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._routes.clear()
+
+
+# Installed on the app by create_app
+sql_tracer = SQLTracer()
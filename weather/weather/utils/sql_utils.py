@@ -4,6 +4,7 @@ import os
 import sqlite3
 
 from weather.utils.logger import configure_logger
+from weather.utils.sql_trace_utils import traced_connect
 
 
 logger = logging.getLogger(__name__)
@@ -21,7 +22,7 @@ def check_database_connection():
         Exception: If the database connection is not OK
     """
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = traced_connect(DB_PATH)
         cursor = conn.cursor()
         # This ensures the connection is actually active
         cursor.execute("SELECT 1;")
@@ -41,7 +42,7 @@ def check_table_exists(tablename: str):
         Exception: If the table does not exist
     """
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = traced_connect(DB_PATH)
         cursor = conn.cursor()
         cursor.execute(f"SELECT 1 FROM {tablename} LIMIT 1;")
         conn.close()
@@ -50,17 +51,47 @@ def check_table_exists(tablename: str):
         logger.error(error_message)
         raise Exception(error_message) from e
 
+def check_database_tables(tablenames):
+    """Check the database connection and the presence of tables using a single connection
+
+    Args:
+        tablenames (Iterable[str]): The names of the tables that must exist
+
+    Raises:
+        Exception: If the database cannot be queried or a table is missing
+    """
+    tablenames = list(tablenames)
+    try:
+        conn = traced_connect(DB_PATH)
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ({', '.join('?' for _ in tablenames)})",
+            tablenames
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        conn.close()
+    except sqlite3.Error as e:
+        error_message = f"Database connection error: {e}"
+        logger.error(error_message)
+        raise Exception(error_message) from e
+    missing = [tablename for tablename in tablenames if tablename not in existing]
+    if missing:
+        raise Exception(f"Table check error: missing tables {', '.join(missing)}")
+
 @contextmanager
-def get_db_connection():
+def get_db_connection(db_path=None):
     """
     Context manager for SQLite database connection.
 
+    Args:
+        db_path (str, optional): The database to connect to, e.g. a user's shard. Defaults to DB_PATH.
+
     Yields:
         sqlite3.Connection: The SQLite connection object.
     """
     conn = None
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = traced_connect(db_path or DB_PATH)
         yield conn
     except sqlite3.Error as e:
         logger.error("Database connection error: %s", str(e))
@@ -0,0 +1,85 @@
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional, TextIO, Tuple
+
+from flask import Flask
+
+
+def import_breakdown(module: str, cwd: Optional[str] = None) -> Tuple[float, List[Tuple[str, float]]]:
+    """
+    Measures how long a fresh interpreter takes to import a module.
+
+    The import runs in a subprocess with `-X importtime`, so modules already
+    loaded by the calling process do not hide their cost.
+
+    Args:
+        module (str): The module to import.
+        cwd (str, optional): The directory the import runs from.
+
+    Returns:
+        Tuple[float, List[Tuple[str, float]]]: The module's total import time in
+        milliseconds, and each module it imports directly with its cumulative
+        time, slowest first.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=cwd, capture_output=True, text=True, check=True)
+    total = 0.0
+    children, pending = [], []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        # Imports are listed after the modules they pull in, indented two spaces per level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0:
+            if name.strip() == module:
+                total, children = int(cumulative) / 1000, pending
+            pending = []
+        elif depth == 1:
+            pending.append((name.strip(), int(cumulative) / 1000))
+    return total, sorted(children, key=lambda child: child[1], reverse=True)
+
+
+def _timed(action: Callable) -> Tuple[float, object]:
+    start = time.perf_counter()
+    result = action()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def profile_startup(create_app: Callable[[], Flask], initializers: Dict[str, Callable],
+                    module: str = "app", cwd: Optional[str] = None, limit: int = 15,
+                    out: TextIO = sys.stdout) -> None:
+    """
+    Prints where a cold start spends its time: imports, app creation, the
+    first health check and the first use of each lazily created service.
+
+    Args:
+        create_app (Callable[[], Flask]): The application factory.
+        initializers (Dict[str, Callable]): Named callables creating each lazy service.
+        module (str): The module whose import is measured.
+        cwd (str, optional): The directory the import runs from.
+        limit (int): The number of slowest imports listed.
+        out (TextIO): Where the report is written.
+    """
+    total, children = import_breakdown(module, cwd)
+    print(f"import {module}: {total:8.1f} ms", file=out)
+    for name, cumulative in children[:limit]:
+        print(f"  {name:<40} {cumulative:8.1f} ms", file=out)
+
+    elapsed, app = _timed(create_app)
+    print(f"create_app: {elapsed:8.1f} ms", file=out)
+    elapsed, response = _timed(lambda: app.test_client().get("/api/health"))
+    print(f"first /api/health ({response.status_code}): {elapsed:8.1f} ms", file=out)
+
+    print("first use of lazy services:", file=out)
+    with app.app_context():
+        for name, initializer in initializers.items():
+            try:
+                elapsed, _ = _timed(initializer)
+            except Exception as e:
+                print(f"  {name:<40} failed: {e}", file=out)
+                continue
+            print(f"  {name:<40} {elapsed:8.1f} ms", file=out)
@@ -0,0 +1,364 @@
+## Serves /api/stream Server-Sent Events from one asyncio event loop, so idle
+## subscribers cost a coroutine each rather than a request thread
+
+import argparse
+import asyncio
+from collections import deque
+from contextlib import closing
+import json
+import logging
+import os
+import re
+import signal
+import sqlite3
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from weather.utils.logger import configure_logger
+from weather.utils.shard_utils import get_shard_router
+from weather.utils.weather_api_utils import OBSERVATION_FIELDS
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+# Keepalive interval and per-subscriber queue size, shared with the in-worker streams of app.py
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "15"))
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "100"))
+# Port of the stream server; unset or empty serves streams from the request threads instead.
+# STREAM_SERVER_URL overrides the address clients are redirected to, e.g. behind a proxy.
+STREAM_PORT = os.getenv("STREAM_PORT", "")
+STREAM_SERVER_URL = os.getenv("STREAM_SERVER_URL", "")
+# Open streams one server accepts, and seconds between reads of new observations
+STREAM_SERVER_MAX_SUBSCRIBERS = int(os.getenv("STREAM_SERVER_MAX_SUBSCRIBERS", "10000"))
+STREAM_POLL_INTERVAL = float(os.getenv("STREAM_POLL_INTERVAL", "1"))
+
+OBSERVATION_COLUMNS = ("observed_at", *OBSERVATION_FIELDS, "condition")
+TAIL_BATCH_SIZE = 1000
+REQUEST_TIMEOUT = 10
+MAX_REQUEST_HEADERS = 100
+_STREAM_PATH = re.compile(r"/api/stream/(\d+)")
+
+
+def latest_observation_id(conn: sqlite3.Connection) -> int:
+    """
+    Returns the ID of the newest recorded observation, or 0 if there is none.
+    """
+    return conn.execute("SELECT COALESCE(MAX(id), 0) FROM weather_observations").fetchone()[0]
+
+
+def read_observations(conn: sqlite3.Connection, after_id: int,
+                      limit: int = TAIL_BATCH_SIZE) -> List[Tuple[int, str, Dict]]:
+    """
+    Reads observations recorded after an ID, by whichever process recorded them.
+
+    Returns:
+        List[Tuple[int, str, Dict]]: (id, location name, stream event) in recording order.
+    """
+    rows = conn.execute(f"""
+        SELECT id, location_name, latitude, longitude, {", ".join(OBSERVATION_COLUMNS)}
+        FROM weather_observations
+        WHERE id > ?
+        ORDER BY id
+        LIMIT ?
+    """, (after_id, limit)).fetchall()
+    return [(row_id, name, {"name": name, "lat": lat, "lon": lon, "weather": dict(zip(OBSERVATION_COLUMNS, values))})
+            for row_id, name, lat, lon, *values in rows]
+
+
+def encode_event(event: Dict) -> str:
+    return f"event: observation\ndata: {json.dumps(event)}\n\n"
+
+
+class ObservationFeed:
+    """
+    Follows the observations recorded by every process from a daemon thread.
+
+    Each worker records observations into the shared database, so reading
+    new rows every interval seconds lets one worker publish the observations
+    of all of them, not only those it recorded itself.
+
+    Attributes:
+        db_path (str): The database holding weather_observations.
+        publish (Callable[[str, Dict], None]): Called with (location name, stream event) per new observation.
+        interval (float): Seconds between reads.
+    """
+
+    def __init__(self, db_path: str, publish: Callable[[str, Dict], object], interval: float = STREAM_POLL_INTERVAL):
+        self.db_path = db_path
+        self.publish = publish
+        self.interval = interval
+        self.last_id = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """
+        Starts following from the newest observation recorded so far.
+        """
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            self.last_id = latest_observation_id(conn)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="observation-feed", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    def poll(self) -> int:
+        """
+        Publishes the observations recorded since the last read; read failures are logged.
+
+        Returns:
+            int: The number of observations published.
+        """
+        try:
+            with closing(sqlite3.connect(self.db_path)) as conn:
+                observations = read_observations(conn, self.last_id)
+        except sqlite3.Error as e:
+            logger.error("Failed to read new observations: %s", str(e))
+            return 0
+        for row_id, name, event in observations:
+            self.last_id = row_id
+            self.publish(name, event)
+        return len(observations)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class _Client:
+    """
+    One open stream: the location names it follows and its bounded event queue.
+    """
+
+    __slots__ = ("topics", "events", "wakeup", "dropped")
+
+    def __init__(self, topics: Iterable[str], max_queue: int):
+        self.topics = frozenset(topics)
+        self.events: deque = deque(maxlen=max_queue)
+        self.wakeup = asyncio.Event()
+        self.dropped = 0
+
+    def put(self, event: Dict) -> None:
+        if len(self.events) == self.events.maxlen:
+            self.dropped += 1
+        self.events.append(event)
+        self.wakeup.set()
+
+
+class StreamServer:
+    """
+    An HTTP server answering GET /api/stream/<user_id> with Server-Sent Events.
+
+    Every stream is a coroutine on one event loop, so thousands of idle
+    subscribers cost neither request threads nor polling. One task reads the
+    observations recorded since its last read, by any worker process, every
+    poll_interval seconds and fans them out to the streams following each
+    location. A client that falls behind loses its oldest queued events.
+
+    Attributes:
+        host (str): The interface to listen on.
+        port (int): The port to listen on; 0 picks a free port, available once started.
+        heartbeat (float): Seconds without events after which a keepalive comment is sent.
+        max_subscribers (int): Open streams beyond which new ones get 503.
+        poll_interval (float): Seconds between reads of new observations.
+    """
+
+    def __init__(self, db_path: str, host: str = "0.0.0.0", port: int = 5002,
+                 heartbeat: float = STREAM_HEARTBEAT_SECONDS, queue_size: int = STREAM_QUEUE_SIZE,
+                 max_subscribers: int = STREAM_SERVER_MAX_SUBSCRIBERS, poll_interval: float = STREAM_POLL_INTERVAL):
+        self.db_path = db_path
+        self.shards = get_shard_router(db_path)
+        self.host = host
+        self.port = port
+        self.heartbeat = heartbeat
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.poll_interval = poll_interval
+        self.last_id = 0
+        self.delivered = 0
+        self._topics: Dict[str, Set[_Client]] = {}
+        self._clients: Set[_Client] = set()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._tail_task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+
+    async def start(self) -> None:
+        """
+        Starts listening and following new observations from the newest one recorded so far.
+        """
+        loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        self.last_id = await loop.run_in_executor(None, self._latest_id)
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._tail_task = asyncio.create_task(self._tail())
+        logger.info("Stream server listening on %s:%d", self.host, self.port)
+
+    async def stop(self) -> None:
+        """
+        Stops accepting connections and ends every open stream.
+        """
+        if self._server is None:
+            return
+        self._server.close()
+        self._tail_task.cancel()
+        self._stopping.set()
+        for client in list(self._clients):
+            client.wakeup.set()
+        await self._server.wait_closed()
+        self._server = None
+
+    async def serve(self) -> None:
+        """
+        Runs the server until SIGTERM or SIGINT.
+        """
+        await self.start()
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+        await stop.wait()
+        await self.stop()
+
+    def _latest_id(self) -> int:
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            return latest_observation_id(conn)
+
+    def _read_new(self) -> List[Tuple[int, str, Dict]]:
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            return read_observations(conn, self.last_id)
+
+    def _favorite_names(self, user_id: int) -> List[str]:
+        with closing(sqlite3.connect(self.shards.path_for_user(user_id))) as conn:
+            rows = conn.execute("SELECT DISTINCT location_name FROM user_favorites WHERE user_id = ?", (user_id,))
+            return [name for name, in rows]
+
+    async def _tail(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                observations = await loop.run_in_executor(None, self._read_new)
+            except sqlite3.Error as e:
+                logger.error("Failed to read new observations: %s", str(e))
+                continue
+            for row_id, name, event in observations:
+                self.last_id = row_id
+                self.delivered += self.publish(name, event)
+
+    def publish(self, name: str, event: Dict) -> int:
+        """
+        Delivers an event to the streams following a location; must be called on the server's loop.
+        """
+        clients = self._topics.get(name, ())
+        for client in clients:
+            client.put(event)
+        return len(clients)
+
+    def _register(self, client: _Client) -> None:
+        self._clients.add(client)
+        for topic in client.topics:
+            self._topics.setdefault(topic, set()).add(client)
+
+    def _unregister(self, client: _Client) -> None:
+        self._clients.discard(client)
+        for topic in client.topics:
+            clients = self._topics.get(topic)
+            if clients is not None:
+                clients.discard(client)
+                if not clients:
+                    del self._topics[topic]
+
+    @staticmethod
+    def _response(status: str, body: Dict) -> bytes:
+        payload = json.dumps(body).encode("utf-8")
+        return (f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\nContent-Length: {len(payload)}\r\n"
+                f"Access-Control-Allow-Origin: *\r\nConnection: close\r\n\r\n").encode("latin-1") + payload
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Tuple[str, str]:
+        request_line = (await reader.readline()).decode("latin-1").split()
+        for _ in range(MAX_REQUEST_HEADERS):
+            if (await reader.readline()) in (b"\r\n", b"\n", b""):
+                break
+        if len(request_line) != 3:
+            raise ValueError("Malformed request line")
+        return request_line[0], request_line[1].split("?", 1)[0]
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        client = None
+        try:
+            try:
+                method, path = await asyncio.wait_for(self._read_request(reader), REQUEST_TIMEOUT)
+            except (ValueError, asyncio.TimeoutError):
+                writer.write(self._response("400 Bad Request", {"error": "Malformed request."}))
+                return
+            match = _STREAM_PATH.fullmatch(path)
+            if method != "GET" or match is None:
+                writer.write(self._response("404 Not Found", {"error": "Only GET /api/stream/<user_id> is served here."}))
+                return
+            if len(self._clients) >= self.max_subscribers:
+                writer.write(self._response("503 Service Unavailable", {"error": "Too many open streams, retry later."}))
+                return
+            user_id = int(match.group(1))
+            names = await asyncio.get_running_loop().run_in_executor(None, self._favorite_names, user_id)
+            if not names:
+                writer.write(self._response("404 Not Found", {"error": f"No favorite locations found for user {user_id}"}))
+                return
+
+            client = _Client(names, self.queue_size)
+            self._register(client)
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                         b"X-Accel-Buffering: no\r\nAccess-Control-Allow-Origin: *\r\nConnection: close\r\n\r\n")
+            writer.write(f"retry: {int(self.heartbeat * 1000)}\n\n".encode("utf-8"))
+            await writer.drain()
+            # Clients send nothing more, so a finished read means the client went away
+            disconnected = asyncio.ensure_future(reader.read())
+            try:
+                while not self._stopping.is_set():
+                    wakeup = asyncio.ensure_future(client.wakeup.wait())
+                    done, _ = await asyncio.wait((wakeup, disconnected), timeout=self.heartbeat,
+                                                 return_when=asyncio.FIRST_COMPLETED)
+                    if disconnected in done:
+                        wakeup.cancel()
+                        break
+                    if wakeup in done:
+                        client.wakeup.clear()
+                        events = list(client.events)
+                        client.events.clear()
+                        writer.write("".join(encode_event(event) for event in events).encode("utf-8"))
+                    else:
+                        wakeup.cancel()
+                        writer.write(b": keepalive\n\n")
+                    await writer.drain()
+            finally:
+                disconnected.cancel()
+        except (ConnectionError, sqlite3.Error) as e:
+            logger.debug("Stream closed: %s", str(e))
+        finally:
+            if client is not None:
+                self._unregister(client)
+            writer.close()
+
+    def stats(self) -> Dict:
+        return {"streams": len(self._clients), "locations": len(self._topics), "last_observation_id": self.last_id,
+                "delivered": self.delivered, "dropped": sum(client.dropped for client in self._clients)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve /api/stream Server-Sent Events from one event loop.")
+    parser.add_argument("--db-path", default=os.getenv("DB_PATH", "./db/user_catalog.db"))
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(STREAM_PORT or "5002"))
+    args = parser.parse_args()
+    asyncio.run(StreamServer(args.db_path, args.host, args.port).serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+from bisect import bisect_left, insort
+import heapq
+import threading
+from typing import Dict, Iterable, List, Tuple
+
+from weather.utils.geocoding_utils import normalize_location_name
+
+
+# Short prefixes match too many names to rank at query time, so the most
+# popular names of every prefix up to this length are kept ranked
+TOP_PREFIX_LENGTH = 3
+TOP_K = 50
+
+
+class LocationSuggestIndex:
+    """
+    An in-memory prefix index of location names ranked by popularity.
+
+    Normalized names are kept in a sorted list, so a prefix query is a binary
+    search followed by a scan of the matching names, which are then ranked.
+    Prefixes of up to top_prefix_length characters can match a large part of
+    the index, so their top_k names are kept ranked instead and updated as
+    names are added. Popularity only grows, so a name that drops out of a
+    prefix's top_k list can never belong in it again. New names are inserted
+    in place, so the index never needs a full rebuild.
+
+    Attributes:
+        top_prefix_length (int): The longest prefix whose ranking is kept.
+        top_k (int): The number of names kept per short prefix.
+    """
+
+    def __init__(self, top_prefix_length: int = TOP_PREFIX_LENGTH, top_k: int = TOP_K):
+        self.top_prefix_length = top_prefix_length
+        self.top_k = top_k
+        self._keys: List[str] = []
+        # normalized name -> [display name, popularity]
+        self._entries: Dict[str, list] = {}
+        # short prefix -> its top_k normalized names, most popular first
+        self._top: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    def _rank(self, key: str) -> Tuple[int, str]:
+        name, popularity = self._entries[key]
+        return -popularity, name
+
+    def _promote(self, key: str) -> None:
+        """
+        Places a new or more popular name in the ranking of each of its short prefixes.
+        """
+        rank = self._rank(key)
+        for length in range(1, min(len(key), self.top_prefix_length) + 1):
+            top = self._top.setdefault(key[:length], [])
+            if key not in top:
+                if len(top) >= self.top_k and rank >= self._rank(top[-1]):
+                    continue
+                top.append(key)
+            top.sort(key=self._rank)
+            del top[self.top_k:]
+
+    def add(self, name: str, popularity: int = 1) -> None:
+        """
+        Adds a location name or increases the popularity of an existing one.
+
+        Args:
+            name (str): The location name as entered by users.
+            popularity (int): The amount to add to the name's popularity.
+        """
+        key = normalize_location_name(name)
+        if not key:
+            return
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._entries[key] = [" ".join(name.split()), popularity]
+                insort(self._keys, key)
+            else:
+                entry[1] += popularity
+            self._promote(key)
+
+    def add_many(self, names: Iterable[Tuple[str, int]]) -> None:
+        """
+        Adds many (name, popularity) pairs, sorting the key list and ranking the short prefixes once at the end.
+        """
+        with self._lock:
+            for name, popularity in names:
+                key = normalize_location_name(name)
+                if not key:
+                    continue
+                entry = self._entries.get(key)
+                if entry is None:
+                    self._entries[key] = [" ".join(name.split()), popularity]
+                else:
+                    entry[1] += popularity
+            self._keys = sorted(self._entries)
+
+            by_prefix: Dict[str, List[str]] = {}
+            for key in self._keys:
+                for length in range(1, min(len(key), self.top_prefix_length) + 1):
+                    by_prefix.setdefault(key[:length], []).append(key)
+            self._top = {prefix: heapq.nsmallest(self.top_k, keys, key=self._rank) for prefix, keys in by_prefix.items()}
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Dict]:
+        """
+        Returns the most popular names starting with prefix.
+
+        Args:
+            prefix (str): The text typed so far.
+            limit (int): The maximum number of suggestions.
+
+        Returns:
+            List[Dict]: Suggestions with their name and popularity, most popular first.
+        """
+        key = normalize_location_name(prefix)
+        if not key:
+            return []
+        with self._lock:
+            if len(key) <= self.top_prefix_length and limit <= self.top_k:
+                ranked = self._top.get(key, [])[:limit]
+            else:
+                matches = self._keys[bisect_left(self._keys, key):bisect_left(self._keys, key + "\U0010ffff")]
+                ranked = heapq.nsmallest(limit, matches, key=self._rank)
+            return [{"name": self._entries[candidate][0], "popularity": self._entries[candidate][1]}
+                    for candidate in ranked]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._keys)
@@ -0,0 +1,344 @@
+## Streams favorites out of and into the database as NDJSON or CSV
+
+import argparse
+import csv
+import io
+import json
+import logging
+import math
+import os
+import sqlite3
+import sys
+from contextlib import closing
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from weather.utils.logger import configure_logger
+from weather.utils.shard_utils import get_shard_router
+from weather.utils.sql_trace_utils import traced_connect
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+# Rows read per cursor fetch and written per output chunk when exporting, and
+# rows written per transaction when importing. Both bound the memory a
+# transfer uses regardless of its size.
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "5000"))
+
+# The columns of an exported favorite, in CSV column order
+FAVORITE_FIELDS = ("user_id", "location_name", "latitude", "longitude")
+
+# Supported formats and their content types
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+Favorite = Tuple[int, str, Optional[float], Optional[float]]
+
+# Favorites of unknown users are skipped rather than imported as orphans
+_INSERT_FAVORITE = """
+    INSERT INTO user_favorites (user_id, location_name, latitude, longitude)
+    SELECT ?, ?, ?, ?
+    WHERE EXISTS (SELECT 1 FROM users WHERE id = ?)
+"""
+
+
+def _check_format(fmt: str) -> None:
+    if fmt not in FORMATS:
+        raise ValueError(f"Invalid format: {fmt} (must be one of {', '.join(FORMATS)}).")
+
+
+def format_for_content_type(content_type: Optional[str], default: str = "ndjson") -> str:
+    """
+    Returns the format matching a Content-Type header, or default if it names neither format.
+    """
+    mimetype = (content_type or "").split(";")[0].strip().lower()
+    for fmt, known in FORMATS.items():
+        if mimetype == known:
+            return fmt
+    return default
+
+
+##################################################
+# Database Functions
+##################################################
+
+def _shard_favorites(path: str, user_ids: Optional[List[int]], batch_size: int) -> Iterator[Favorite]:
+    with closing(traced_connect(path)) as conn:
+        where = ""
+        if user_ids is not None:
+            # A temporary table avoids SQLite's limit on the number of query parameters
+            conn.execute("CREATE TEMP TABLE export_users (id INTEGER PRIMARY KEY)")
+            conn.executemany("INSERT OR IGNORE INTO export_users (id) VALUES (?)", ((user_id,) for user_id in user_ids))
+            where = "WHERE user_id IN (SELECT id FROM temp.export_users)"
+        # Rowid order reads the table front to back without sorting it first
+        cursor = conn.execute(f"""
+            SELECT user_id, location_name, latitude, longitude
+            FROM user_favorites
+            {where}
+            ORDER BY id
+        """)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
+
+
+def export_favorites(db_path: str, user_ids: Optional[Iterable[int]] = None,
+                     batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Favorite]:
+    """
+    Yields the favorites of every user, or of the given users, reading batch_size rows at a time.
+
+    Each shard is read in turn on its own connection, which stays open until
+    the generator is exhausted or closed.
+
+    Args:
+        db_path (str): The main database.
+        user_ids (Iterable[int], optional): The users to export; all users when None.
+        batch_size (int): The rows fetched per cursor read.
+
+    Yields:
+        Favorite: (user_id, location_name, latitude, longitude) tuples in insertion order per shard.
+    """
+    if batch_size <= 0:
+        raise ValueError(f"Invalid batch size: {batch_size} (must be positive).")
+    router = get_shard_router(db_path)
+    by_shard: Dict[int, Optional[List[int]]]
+    if user_ids is None:
+        by_shard = {index: None for index in range(router.shard_count)}
+    else:
+        by_shard = {}
+        for user_id in user_ids:
+            by_shard.setdefault(router.shard_index(user_id), []).append(user_id)
+
+    for index in sorted(by_shard):
+        yield from _shard_favorites(router.paths[index], by_shard[index], batch_size)
+
+
+def import_favorites(db_path: str, favorites: Iterable[Favorite], chunk_size: int = IMPORT_CHUNK_SIZE) -> Dict[str, int]:
+    """
+    Inserts a stream of favorites into their users' shards in transactions of chunk_size rows.
+
+    Favorites are buffered per shard and each full buffer is written and
+    committed in one transaction, so memory stays bounded by chunk_size rows
+    per shard and other writers wait at most one chunk for the write lock.
+    Favorites of users that do not exist are skipped. If the stream raises
+    part way, the chunks already committed stay imported.
+
+    Args:
+        db_path (str): The main database.
+        favorites (Iterable[Favorite]): (user_id, location_name, latitude, longitude) tuples.
+        chunk_size (int): The rows written per transaction.
+
+    Returns:
+        Dict[str, int]: The rows read, imported and skipped for an unknown user.
+
+    Raises:
+        ValueError: If the chunk size is invalid or the stream contains an invalid
+            favorite; the message includes the number of favorites already imported.
+    """
+    if chunk_size <= 0:
+        raise ValueError(f"Invalid chunk size: {chunk_size} (must be positive).")
+    router = get_shard_router(db_path)
+    connections: Dict[int, sqlite3.Connection] = {}
+    pending: Dict[int, List[tuple]] = {}
+    counts = {"rows": 0, "imported": 0, "skipped": 0}
+
+    def flush(index: int) -> None:
+        batch = pending.pop(index, None)
+        if not batch:
+            return
+        conn = connections.get(index)
+        if conn is None:
+            conn = connections[index] = traced_connect(router.paths[index])
+        with conn:
+            cursor = conn.executemany(_INSERT_FAVORITE, batch)
+        counts["imported"] += cursor.rowcount
+        counts["skipped"] += len(batch) - cursor.rowcount
+
+    try:
+        for user_id, name, lat, lon in favorites:
+            counts["rows"] += 1
+            index = router.shard_index(user_id)
+            batch = pending.setdefault(index, [])
+            batch.append((user_id, name, lat, lon, user_id))
+            if len(batch) >= chunk_size:
+                flush(index)
+        for index in list(pending):
+            flush(index)
+    except ValueError as e:
+        raise ValueError(f"{e} ({counts['imported']} favorites were imported before the error)") from e
+    finally:
+        for conn in connections.values():
+            conn.close()
+
+    logger.info("Imported %d favorites into %s (%d skipped for unknown users)",
+                counts["imported"], db_path, counts["skipped"])
+    return counts
+
+
+##################################################
+# Format Functions
+##################################################
+
+def encode_favorites(favorites: Iterable[Favorite], fmt: str, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[str]:
+    """
+    Serializes favorites as NDJSON lines or CSV rows with a header, yielding batch_size rows per chunk.
+    """
+    _check_format(fmt)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n") if fmt == "csv" else None
+    if writer is not None:
+        writer.writerow(FAVORITE_FIELDS)
+    rows = 0
+    for favorite in favorites:
+        if writer is not None:
+            writer.writerow(favorite)
+        else:
+            buffer.write(json.dumps(dict(zip(FAVORITE_FIELDS, favorite))))
+            buffer.write("\n")
+        rows += 1
+        if rows % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _coordinate(value, field: str, line: int) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool):
+        raise ValueError(f"Line {line}: {field} must be a number.")
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Line {line}: {field} must be a number.")
+    if not math.isfinite(number):
+        raise ValueError(f"Line {line}: {field} must be a finite number.")
+    return number
+
+
+def _favorite(user_id, name, lat, lon, line: int) -> Favorite:
+    if type(user_id) is not int:
+        if not (isinstance(user_id, str) and user_id.strip().isdigit()):
+            raise ValueError(f"Line {line}: user_id must be a positive integer.")
+        user_id = int(user_id)
+    if user_id <= 0:
+        raise ValueError(f"Line {line}: user_id must be a positive integer.")
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError(f"Line {line}: location_name must be a non-empty string.")
+    return user_id, name, _coordinate(lat, "latitude", line), _coordinate(lon, "longitude", line)
+
+
+def decode_favorites(lines: Iterable[str], fmt: str) -> Iterator[Favorite]:
+    """
+    Parses NDJSON lines or CSV rows with a header into favorites, one at a time.
+
+    Blank lines are ignored. CSV input needs user_id and location_name
+    columns; latitude and longitude are optional and empty values mean unknown.
+
+    Raises:
+        ValueError: On the first malformed line, naming its line number.
+    """
+    _check_format(fmt)
+    if fmt == "ndjson":
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                raise ValueError(f"Line {number}: invalid JSON.")
+            if not isinstance(record, dict):
+                raise ValueError(f"Line {number}: expected a JSON object.")
+            yield _favorite(record.get("user_id"), record.get("location_name"),
+                            record.get("latitude"), record.get("longitude"), number)
+        return
+
+    # A plain reader with column positions is much cheaper per row than csv.DictReader
+    reader = csv.reader(lines)
+    header = next(reader, [])
+    missing = [field for field in FAVORITE_FIELDS[:2] if field not in header]
+    if missing:
+        raise ValueError(f"Line 1: CSV header is missing {', '.join(missing)}.")
+    user_column, name_column = header.index("user_id"), header.index("location_name")
+    lat_column = header.index("latitude") if "latitude" in header else None
+    lon_column = header.index("longitude") if "longitude" in header else None
+    width = len(header)
+    for row in reader:
+        if not row:
+            continue
+        if len(row) < width:
+            row += [""] * (width - len(row))
+        yield _favorite(row[user_column], row[name_column],
+                        None if lat_column is None else row[lat_column],
+                        None if lon_column is None else row[lon_column], reader.line_num)
+
+
+##################################################
+# Command Line
+##################################################
+
+def _format_for_path(path: str, fmt: Optional[str]) -> str:
+    if fmt is not None:
+        return fmt
+    return "csv" if path.lower().endswith(".csv") else "ndjson"
+
+
+def main():
+    """
+    Exports or imports favorites from the command line.
+    """
+    parser = argparse.ArgumentParser(description="Stream users' favorites out of or into the database.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Write favorites to a file or standard output")
+    export_parser.add_argument("db_path", help="Path of the main database, e.g. db/user_catalog.db")
+    export_parser.add_argument("output", nargs="?", default="-", help="The file to write, or - for standard output")
+    export_parser.add_argument("--users", help="Comma-separated user IDs to export (defaults to all users)")
+    export_parser.add_argument("--format", choices=sorted(FORMATS),
+                               help="The output format (defaults to csv for .csv files, otherwise ndjson)")
+
+    import_parser = commands.add_parser("import", help="Read favorites from a file or standard input")
+    import_parser.add_argument("db_path", help="Path of the main database, e.g. db/user_catalog.db")
+    import_parser.add_argument("input", nargs="?", default="-", help="The file to read, or - for standard input")
+    import_parser.add_argument("--format", choices=sorted(FORMATS),
+                               help="The input format (defaults to csv for .csv files, otherwise ndjson)")
+    import_parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE,
+                               help="The favorites written per transaction")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        user_ids = None
+        if args.users:
+            try:
+                user_ids = [int(user_id) for user_id in args.users.split(",")]
+            except ValueError:
+                parser.error("--users must be comma-separated integers")
+        fmt = _format_for_path(args.output, args.format)
+        output = sys.stdout if args.output == "-" else open(args.output, "w", newline="", encoding="utf-8")
+        try:
+            for chunk in encode_favorites(export_favorites(args.db_path, user_ids), fmt):
+                output.write(chunk)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+    else:
+        fmt = _format_for_path(args.input, args.format)
+        source = sys.stdin if args.input == "-" else open(args.input, newline="", encoding="utf-8")
+        try:
+            counts = import_favorites(args.db_path, decode_favorites(source, fmt), chunk_size=args.chunk_size)
+        except ValueError as e:
+            parser.exit(1, f"Import failed: {e}\n")
+        finally:
+            if source is not sys.stdin:
+                source.close()
+        print(f"Imported {counts['imported']} of {counts['rows']} favorites "
+              f"({counts['skipped']} skipped for unknown users)")
+
+
+if __name__ == "__main__":
+    main()
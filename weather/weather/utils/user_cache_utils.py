@@ -0,0 +1,87 @@
+import os
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from weather.utils.cache_utils import TTLCache
+
+
+# Cache sizing and freshness, overridable from the environment. Entries are only
+# invalidated in the process that made the write, so the TTLs bound how long
+# other workers can serve an old username or miss a newly created user.
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "300"))
+USER_NEGATIVE_CACHE_TTL = float(os.getenv("USER_NEGATIVE_CACHE_TTL", "30"))
+
+
+class UserCache:
+    """
+    A read-through cache of user records with a negative cache for missing IDs.
+
+    Entries are keyed by database path and user ID, so models pointed at
+    different databases never see each other's users.
+
+    Attributes:
+        users (TTLCache): (db_path, user_id) -> the user's ID, username and email.
+        missing (TTLCache): (db_path, user_id) of users known not to exist.
+    """
+
+    def __init__(self, max_entries: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL,
+                 negative_ttl: float = USER_NEGATIVE_CACHE_TTL):
+        self.users = TTLCache(max_entries=max_entries, ttl=ttl)
+        self.missing = TTLCache(max_entries=max_entries, ttl=negative_ttl)
+
+    def get(self, db_path: str, user_id: int, loader: Callable[[int], Optional[Any]]) -> Optional[Any]:
+        """
+        Returns a user from the cache, loading and caching it on a miss.
+
+        Args:
+            db_path (str): The database the user lives in.
+            user_id (int): The ID of the user.
+            loader (Callable[[int], Optional[Any]]): Reads the user from the database, returning None if missing.
+
+        Returns:
+            Optional[Any]: The user, or None if it does not exist.
+        """
+        key: Hashable = (db_path, user_id)
+        user = self.users.get(key)
+        if user is not None:
+            return user
+        if self.missing.get(key) is not None:
+            return None
+
+        user = loader(user_id)
+        if user is None:
+            self.missing.set(key, True)
+        else:
+            self.users.set(key, user)
+        return user
+
+    def invalidate(self, db_path: str, user_id: int) -> None:
+        """
+        Drops a user's positive and negative entries after it was created or changed.
+        """
+        self.users.delete((db_path, user_id))
+        self.missing.delete((db_path, user_id))
+
+    def clear(self) -> None:
+        self.users.clear()
+        self.missing.clear()
+
+    def stats(self) -> Dict:
+        """
+        Returns the cache sizes and the share of lookups answered without the database.
+        """
+        lookups = self.users.hits + self.users.misses
+        hits = self.users.hits + self.missing.hits
+        return {
+            "size": len(self.users),
+            "missing_size": len(self.missing),
+            "max_entries": self.users.max_entries,
+            "hits": self.users.hits,
+            "negative_hits": self.missing.hits,
+            "misses": lookups - hits,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Shared by FavoritesModel and user_model
+user_cache = UserCache()
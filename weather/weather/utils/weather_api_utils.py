@@ -0,0 +1,60 @@
+## https://www.weatherapi.com/docs/
+## to fetch current conditions for a coordinate
+
+import os
+import time
+
+from weather.utils.lazy_import_utils import lazy_import
+
+requests = lazy_import("requests")
+
+
+WEATHER_API_KEY = os.getenv("WEATHER_API_KEY")
+CURRENT_URL = "https://api.weatherapi.com/v1/current.json"
+
+# Seconds to wait for an upstream weather provider to accept the connection and to send each
+# part of its response, so a hung provider cannot hold a fetch thread indefinitely
+WEATHER_CONNECT_TIMEOUT = float(os.getenv("WEATHER_CONNECT_TIMEOUT", "3.05"))
+WEATHER_READ_TIMEOUT = float(os.getenv("WEATHER_READ_TIMEOUT", "10"))
+REQUEST_TIMEOUT = (WEATHER_CONNECT_TIMEOUT, WEATHER_READ_TIMEOUT)
+
+# Numeric fields of a normalized observation
+OBSERVATION_FIELDS = ("temp_c", "feelslike_c", "wind_kph", "humidity", "precip_mm")
+
+
+def parse_current_weather(payload: dict) -> dict:
+    """
+    Converts a WeatherAPI current.json payload into a normalized observation.
+
+    Args:
+        payload (dict): The decoded JSON response.
+
+    Returns:
+        dict: The observation time in epoch seconds, one value per observation
+              field (None when missing) and the condition text.
+    """
+    current = payload.get("current", {})
+    observation = {"observed_at": int(current.get("last_updated_epoch") or time.time())}
+    for field in OBSERVATION_FIELDS:
+        observation[field] = current.get(field)
+    observation["condition"] = current.get("condition", {}).get("text")
+    return observation
+
+
+def fetch_current_weather(lat: float, lon: float) -> dict:
+    """
+    Fetches current conditions for a coordinate from WeatherAPI.
+
+    Args:
+        lat (float): The latitude of the location.
+        lon (float): The longitude of the location.
+
+    Returns:
+        dict: The normalized observation.
+
+    Raises:
+        requests.RequestException: If the request fails.
+    """
+    response = requests.get(CURRENT_URL, params={"key": WEATHER_API_KEY, "q": f"{lat},{lon}"}, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return parse_current_weather(response.json())
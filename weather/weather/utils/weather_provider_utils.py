@@ -0,0 +1,341 @@
+## https://www.weatherapi.com/docs/ and https://open-meteo.com/en/docs
+## to fetch current conditions from more than one upstream provider
+
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from weather.utils.cache_utils import StaleWhileRevalidateCache
+from weather.utils.lazy_import_utils import lazy_import
+from weather.utils.logger import configure_logger
+from weather.utils.quota_utils import OPEN_METEO, WEATHERAPI, quota_manager
+from weather.utils.shared_cache_utils import create_cache
+from weather.utils.weather_api_utils import (
+    OBSERVATION_FIELDS,
+    REQUEST_TIMEOUT,
+    WEATHER_READ_TIMEOUT,
+    fetch_current_weather as fetch_weatherapi_current
+)
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+requests = lazy_import("requests")
+
+
+OPEN_METEO_CURRENT_URL = "https://api.open-meteo.com/v1/forecast"
+
+# Provider selection and hedging, overridable from the environment
+WEATHER_PRIMARY_PROVIDER = os.getenv("WEATHER_PRIMARY_PROVIDER", WEATHERAPI)
+WEATHER_SECONDARY_PROVIDER = os.getenv("WEATHER_SECONDARY_PROVIDER", OPEN_METEO)
+WEATHER_HEDGE_PERCENTILE = float(os.getenv("WEATHER_HEDGE_PERCENTILE", "95"))
+# Hedge delay used until enough latencies are known, and the range it is kept in
+HEDGE_DEFAULT_DELAY = 1.0
+HEDGE_MIN_DELAY = 0.05
+HEDGE_MAX_DELAY = 5.0
+HEDGE_MIN_SAMPLES = 20
+
+# Current conditions per location are fresh for WEATHER_MAX_AGE seconds, then
+# served while refreshed in the background for WEATHER_STALE_WHILE_REVALIDATE
+# seconds, and served while the upstream fails for WEATHER_STALE_IF_ERROR seconds
+WEATHER_MAX_AGE = float(os.getenv("WEATHER_MAX_AGE", "1800"))
+WEATHER_STALE_WHILE_REVALIDATE = float(os.getenv("WEATHER_STALE_WHILE_REVALIDATE", "1800"))
+WEATHER_STALE_IF_ERROR = float(os.getenv("WEATHER_STALE_IF_ERROR", "21600"))
+WEATHER_CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", "50000"))
+WEATHER_REVALIDATE_WORKERS = int(os.getenv("WEATHER_REVALIDATE_WORKERS", "4"))
+
+# WMO weather interpretation codes returned by Open-Meteo
+WMO_CONDITIONS = {
+    0: "Clear", 1: "Mainly clear", 2: "Partly cloudy", 3: "Overcast",
+    45: "Fog", 48: "Depositing rime fog",
+    51: "Light drizzle", 53: "Drizzle", 55: "Dense drizzle", 56: "Light freezing drizzle", 57: "Freezing drizzle",
+    61: "Slight rain", 63: "Rain", 65: "Heavy rain", 66: "Light freezing rain", 67: "Freezing rain",
+    71: "Slight snow", 73: "Snow", 75: "Heavy snow", 77: "Snow grains",
+    80: "Slight rain showers", 81: "Rain showers", 82: "Violent rain showers", 85: "Snow showers", 86: "Heavy snow showers",
+    95: "Thunderstorm", 96: "Thunderstorm with hail", 99: "Thunderstorm with heavy hail",
+}
+# Open-Meteo variable names for each observation field
+OPEN_METEO_FIELDS = {
+    "temp_c": "temperature_2m",
+    "feelslike_c": "apparent_temperature",
+    "wind_kph": "wind_speed_10m",
+    "humidity": "relative_humidity_2m",
+    "precip_mm": "precipitation",
+}
+
+
+class WeatherProvider(ABC):
+    """
+    Base class of an upstream source of current conditions.
+
+    Subclasses implement _fetch; fetch_current times every successful call so
+    latency percentiles are available for hedging, and remembers when the
+    provider last succeeded and failed.
+
+    Attributes:
+        name (str): The provider name, also used as its quota name.
+        last_success (float): Epoch time of the last successful call, or None.
+        last_failure (float): Epoch time of the last failed call, or None.
+        last_error (str): The error of the last failed call, or None.
+    """
+
+    name = None
+
+    def __init__(self, latency_window: int = 200):
+        self.last_success = None
+        self.last_failure = None
+        self.last_error = None
+        self._latencies = deque(maxlen=latency_window)
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def _fetch(self, lat: float, lon: float) -> Dict:
+        """
+        Calls the provider and returns a normalized observation.
+        """
+
+    def fetch_current(self, lat: float, lon: float) -> Dict:
+        """
+        Fetches current conditions for a coordinate as a normalized observation.
+
+        Raises:
+            requests.RequestException: If the request fails.
+        """
+        start = time.monotonic()
+        try:
+            observation = self._fetch(lat, lon)
+        except Exception as e:
+            with self._lock:
+                self.last_failure, self.last_error = time.time(), str(e)
+            raise
+        with self._lock:
+            self._latencies.append(time.monotonic() - start)
+            self.last_success = time.time()
+        return observation
+
+    def check_health(self) -> Dict:
+        """
+        Health check that fails while the most recent call to the provider failed.
+        """
+        with self._lock:
+            last_success, last_failure, last_error = self.last_success, self.last_failure, self.last_error
+        if last_failure is not None and (last_success is None or last_failure > last_success):
+            raise Exception(f"{self.name}: {last_error}")
+        return {"last_success": last_success, "p99": self.latency_percentile(99)}
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """
+        Returns the given percentile of recent successful latencies in seconds, or None without samples.
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(len(latencies) * percentile / 100.0))
+        return latencies[index]
+
+    def sample_count(self) -> int:
+        with self._lock:
+            return len(self._latencies)
+
+
+class WeatherAPIProvider(WeatherProvider):
+    """
+    Current conditions from WeatherAPI.
+    """
+
+    name = WEATHERAPI
+
+    def _fetch(self, lat: float, lon: float) -> Dict:
+        return fetch_weatherapi_current(lat, lon)
+
+
+class OpenMeteoProvider(WeatherProvider):
+    """
+    Current conditions from Open-Meteo, mapped onto the WeatherAPI observation schema.
+    """
+
+    name = OPEN_METEO
+
+    def _fetch(self, lat: float, lon: float) -> Dict:
+        params = {
+            "latitude": lat,
+            "longitude": lon,
+            "current": ",".join([*OPEN_METEO_FIELDS.values(), "weather_code"]),
+            "wind_speed_unit": "kmh",
+            "timeformat": "unixtime",
+        }
+        response = requests.get(OPEN_METEO_CURRENT_URL, params=params, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        return parse_open_meteo_current(response.json())
+
+
+def parse_open_meteo_current(payload: dict) -> dict:
+    """
+    Converts an Open-Meteo forecast payload with current variables into a normalized observation.
+
+    Args:
+        payload (dict): The decoded JSON response.
+
+    Returns:
+        dict: The same keys as parse_current_weather returns for WeatherAPI.
+    """
+    current = payload.get("current", {})
+    observation = {"observed_at": int(current.get("time") or time.time())}
+    for field in OBSERVATION_FIELDS:
+        observation[field] = current.get(OPEN_METEO_FIELDS[field])
+    observation["condition"] = WMO_CONDITIONS.get(current.get("weather_code"))
+    return observation
+
+
+class HedgedWeatherBackend:
+    """
+    Fetches current conditions from a primary provider, hedging slow calls with a secondary one.
+
+    If the primary has not answered within its recent latency percentile, the
+    same request is sent to the secondary and whichever succeeds first wins.
+    A primary that fails outright falls back to the secondary at once. Hedges
+    are taken from the secondary's quota at low priority, so they never spend
+    its reserve. The delay counts from when the primary call starts, like
+    the latencies it is derived from, so time spent queued behind other
+    calls does not trigger a hedge. The losing request is left to finish in
+    the background, bounded by the providers' request timeout, and still
+    contributes its latency.
+
+    Attributes:
+        primary (WeatherProvider): The provider asked first.
+        secondary (WeatherProvider): The hedge provider, or None to disable hedging.
+        percentile (float): The primary latency percentile after which a hedge is sent.
+    """
+
+    def __init__(self, primary: WeatherProvider, secondary: Optional[WeatherProvider] = None,
+                 percentile: float = WEATHER_HEDGE_PERCENTILE, max_workers: int = 16):
+        self.primary = primary
+        self.secondary = secondary
+        self.percentile = percentile
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="weather-hedge")
+
+    def hedge_delay(self) -> float:
+        """
+        Returns how long to wait for the primary before hedging.
+        """
+        if self.primary.sample_count() < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        delay = self.primary.latency_percentile(self.percentile)
+        return min(HEDGE_MAX_DELAY, max(HEDGE_MIN_DELAY, delay))
+
+    def fetch_current(self, lat: float, lon: float) -> Dict:
+        """
+        Fetches current conditions for a coordinate.
+
+        Returns:
+            Dict: The normalized observation from whichever provider answered first.
+
+        Raises:
+            requests.RequestException: If every provider tried failed.
+        """
+        if self.secondary is None:
+            return self.primary.fetch_current(lat, lon)
+
+        started = threading.Event()
+        start = []
+
+        def fetch_primary():
+            start.append(time.monotonic())
+            started.set()
+            return self.primary.fetch_current(lat, lon)
+
+        primary = self._executor.submit(fetch_primary)
+        delay = self.hedge_delay()
+        remaining = 0.0
+        if started.wait(WEATHER_READ_TIMEOUT):
+            remaining = max(0.0, start[0] + delay - time.monotonic())
+        done, _ = wait([primary], timeout=remaining)
+        if done and primary.exception() is None:
+            return primary.result()
+
+        if not quota_manager.try_acquire(self.secondary.name, priority=0.0):
+            logger.warning("No %s quota left to hedge a request for %s,%s", self.secondary.name, lat, lon)
+            return primary.result()
+
+        with self._lock:
+            self.hedges_sent += 1
+        logger.info("Hedging request for %s,%s to %s", lat, lon, self.secondary.name)
+        pending = {primary, self._executor.submit(self.secondary.fetch_current, lat, lon)}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is not primary:
+                        with self._lock:
+                            self.hedges_won += 1
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    def shutdown(self) -> None:
+        """
+        Stops accepting requests; calls still in flight are left to finish.
+        """
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> Dict:
+        """
+        Returns the current hedge delay, the primary's latency percentiles and hedge counters.
+        """
+        with self._lock:
+            hedges_sent, hedges_won = self.hedges_sent, self.hedges_won
+        return {
+            "primary": self.primary.name,
+            "secondary": self.secondary.name if self.secondary else None,
+            "hedge_delay": self.hedge_delay() if self.secondary else None,
+            "primary_p50": self.primary.latency_percentile(50),
+            "primary_p99": self.primary.latency_percentile(99),
+            "hedges_sent": hedges_sent,
+            "hedges_won": hedges_won,
+        }
+
+
+PROVIDERS = {WEATHERAPI: WeatherAPIProvider, OPEN_METEO: OpenMeteoProvider}
+
+weather_backend = HedgedWeatherBackend(
+    PROVIDERS[WEATHER_PRIMARY_PROVIDER](),
+    PROVIDERS[WEATHER_SECONDARY_PROVIDER]() if WEATHER_SECONDARY_PROVIDER else None,
+)
+
+# Latest observation per location name, shared by every request of the process,
+# and by every worker process when SHARED_CACHE_PATH is set
+weather_cache = StaleWhileRevalidateCache(
+    max_age=WEATHER_MAX_AGE,
+    stale_while_revalidate=WEATHER_STALE_WHILE_REVALIDATE,
+    stale_if_error=WEATHER_STALE_IF_ERROR,
+    max_entries=WEATHER_CACHE_SIZE,
+    workers=WEATHER_REVALIDATE_WORKERS,
+    entries=create_cache("weather", WEATHER_CACHE_SIZE),
+)
+
+
+def fetch_current_weather(lat: float, lon: float) -> dict:
+    """
+    Fetches current conditions for a coordinate through the configured providers.
+
+    Args:
+        lat (float): The latitude of the location.
+        lon (float): The longitude of the location.
+
+    Returns:
+        dict: The normalized observation.
+
+    Raises:
+        requests.RequestException: If every provider tried failed.
+    """
+    return weather_backend.fetch_current(lat, lon)
@@ -0,0 +1,242 @@
+from concurrent.futures import Future
+from contextvars import Context, copy_context
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, ContextManager, Dict, List, Optional, Tuple
+
+from weather.utils.logger import configure_logger
+from weather.utils.sql_trace_utils import traced_connect
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+# Group commit settings, overridable from the environment. With the queue
+# disabled every write runs and commits on the calling thread as before.
+WRITE_QUEUE_ENABLED = os.getenv("WRITE_QUEUE_ENABLED", "true").lower() == "true"
+WRITE_QUEUE_MAX_BATCH = int(os.getenv("WRITE_QUEUE_MAX_BATCH", "64"))
+WRITE_QUEUE_MAX_DELAY = float(os.getenv("WRITE_QUEUE_MAX_DELAY", "0.005"))
+
+# A write operation receives a cursor inside an open transaction and returns its result
+WriteOperation = Callable[[sqlite3.Cursor], Any]
+
+
+class WriteQueue:
+    """
+    Applies write operations to one database from a single writer thread in group-committed transactions.
+
+    Operations are queued with submit and return a future. The writer takes
+    up to max_batch queued operations, waiting at most max_delay after the
+    oldest one for more to arrive, and runs them all in one transaction so
+    the batch pays for a single commit. Each operation runs inside its own
+    savepoint: one that raises is rolled back alone and its future gets the
+    exception, while the rest of the batch still commits. Futures are only
+    resolved once the commit has succeeded; if it fails, every operation of
+    the batch fails with the commit error.
+
+    Attributes:
+        db_path (str): The database written to.
+        max_batch (int): The most operations committed together.
+        max_delay (float): The longest an operation waits for others to join its batch.
+    """
+
+    def __init__(self, db_path: str, max_batch: int = WRITE_QUEUE_MAX_BATCH,
+                 max_delay: float = WRITE_QUEUE_MAX_DELAY):
+        if max_batch <= 0:
+            raise ValueError(f"Invalid batch size: {max_batch} (must be positive).")
+        self.db_path = db_path
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.operations = 0
+        self.batches = 0
+        self.failed = 0
+        self._pending: List[Tuple[WriteOperation, Future, Context]] = []
+        self._oldest = None
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def submit(self, operation: WriteOperation) -> Future:
+        """
+        Queues a write operation, starting the writer thread on first use.
+
+        Args:
+            operation (WriteOperation): Runs the writes on the given cursor and returns their result.
+
+        Returns:
+            Future: Resolved with the operation's result once its batch has committed.
+
+        Raises:
+            RuntimeError: If the queue has been stopped.
+        """
+        future = Future()
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError(f"Write queue for {self.db_path} is stopped")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="write-queue", daemon=True)
+                self._thread.start()
+            if not self._pending:
+                self._oldest = time.monotonic()
+            # Operations run in the submitter's context, so their statements count towards its request trace
+            self._pending.append((operation, future, copy_context()))
+            # Wake the writer to start the delay clock, or to commit a full batch at once
+            if len(self._pending) == 1 or len(self._pending) >= self.max_batch:
+                self._condition.notify()
+        return future
+
+    def _take_batch(self) -> List[Tuple[WriteOperation, Future, Context]]:
+        batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+        self._oldest = time.monotonic() if self._pending else None
+        return batch
+
+    def _apply(self, conn: sqlite3.Connection, batch: List[Tuple[WriteOperation, Future, Context]]) -> None:
+        cursor = conn.cursor()
+        results = []
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            for operation, future, context in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                cursor.execute("SAVEPOINT write_op")
+                try:
+                    result = context.run(operation, cursor)
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO write_op")
+                    cursor.execute("RELEASE write_op")
+                    future.set_exception(e)
+                    self.failed += 1
+                    continue
+                cursor.execute("RELEASE write_op")
+                results.append((future, result))
+            cursor.execute("COMMIT")
+        except sqlite3.Error as e:
+            logger.error("Failed to commit a batch of %d writes to %s: %s", len(batch), self.db_path, str(e))
+            if conn.in_transaction:
+                conn.rollback()
+            for _, future, _ in batch:
+                if future.running():
+                    future.set_exception(e)
+                    self.failed += 1
+            return
+
+        self.batches += 1
+        self.operations += len(results)
+        for future, result in results:
+            future.set_result(result)
+
+    def _run(self) -> None:
+        # The connection is only ever used by this thread; transactions are managed explicitly
+        conn = traced_connect(self.db_path, isolation_level=None)
+        try:
+            while True:
+                with self._condition:
+                    while not self._stopped:
+                        if len(self._pending) >= self.max_batch:
+                            break
+                        if self._pending:
+                            remaining = self._oldest + self.max_delay - time.monotonic()
+                            if remaining <= 0:
+                                break
+                            self._condition.wait(remaining)
+                        else:
+                            self._condition.wait()
+                    if self._stopped and not self._pending:
+                        return
+                    batch = self._take_batch()
+                self._apply(conn, batch)
+        finally:
+            conn.close()
+
+    def stop(self) -> None:
+        """
+        Stops accepting writes and waits for the queued ones to be committed.
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def stats(self) -> Dict:
+        """
+        Returns the operations and batches committed, failed operations and the queue depth.
+        """
+        with self._condition:
+            queued = len(self._pending)
+        return {
+            "db_path": self.db_path,
+            "operations": self.operations,
+            "batches": self.batches,
+            "avg_batch_size": round(self.operations / self.batches, 2) if self.batches else 0.0,
+            "failed": self.failed,
+            "queued": queued,
+        }
+
+
+_queues: Dict[str, WriteQueue] = {}
+_queues_lock = threading.Lock()
+
+
+def get_write_queue(db_path: str) -> WriteQueue:
+    """
+    Returns the write queue of a database, creating it on first use.
+    """
+    with _queues_lock:
+        queue = _queues.get(db_path)
+        if queue is None:
+            queue = _queues[db_path] = WriteQueue(db_path)
+        return queue
+
+
+def submit_write(db_path: str, operation: WriteOperation,
+                 connect: Optional[Callable[[], ContextManager[sqlite3.Connection]]] = None) -> Future:
+    """
+    Runs a write operation through the database's write queue.
+
+    With the queue disabled the operation runs and commits on the calling
+    thread, and the returned future is already resolved.
+
+    Args:
+        db_path (str): The database written to.
+        operation (WriteOperation): Runs the writes on the given cursor and returns their result.
+        connect (Callable, optional): Opens a connection for the inline path; defaults to a traced connection to db_path.
+
+    Returns:
+        Future: Resolved with the operation's result once it has been committed.
+    """
+    if WRITE_QUEUE_ENABLED:
+        return get_write_queue(db_path).submit(operation)
+
+    future = Future()
+    try:
+        with (connect() if connect else traced_connect(db_path)) as conn:
+            result = operation(conn.cursor())
+            conn.commit()
+    except Exception as e:
+        future.set_exception(e)
+    else:
+        future.set_result(result)
+    return future
+
+
+def stop_all() -> None:
+    """
+    Stops every write queue once its queued writes are committed.
+    """
+    with _queues_lock:
+        queues = list(_queues.values())
+        _queues.clear()
+    for queue in queues:
+        queue.stop()
+
+
+def stats() -> List[Dict]:
+    with _queues_lock:
+        queues = list(_queues.values())
+    return [queue.stats() for queue in queues]